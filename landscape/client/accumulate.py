@@ -69,7 +69,14 @@ portion of time that crossed into the new step period:
 
 And so the logic goes, continuing in a similar fashion, yielding
 representative data at each step boundary.
+
+Plugins that sample many keys at once, like one value per network
+interface or per mount point, can use a L{BatchAccumulator} instead of
+an L{Accumulator}.  It applies exactly the same logic, but keeps the
+state of all its keys in memory and only writes it to the persist when
+flushed.
 """
+from array import array
 
 
 class Accumulator:
@@ -90,6 +97,86 @@ class Accumulator:
         return step_data
 
 
+class BatchAccumulator:
+    """Accumulate samples of many keys in a single call.
+
+    The C{(timestamp, accumulated value)} state of every key is loaded
+    from the persist the first time the key is seen, and then kept in
+    memory in compact arrays.  It's written back to the persist only by
+    L{flush}, which must be called before the persist gets saved.
+    """
+
+    def __init__(self, persist, step_size):
+        self._persist = persist
+        self._step_size = step_size
+        self._indexes = {}
+        self._keys = []
+        self._timestamps = array("q")
+        self._values = array("d")
+        self._dirty = set()
+
+    def __call__(self, new_timestamp, samples):
+        """Accumulate a vector of samples taken at C{new_timestamp}.
+
+        @param samples: A sequence of C{(key, value)} pairs.
+        @return: A list with the step data of each sample, in the same
+            order as C{samples}.  The step data is C{None} for samples that
+            didn't cross a step boundary.
+        """
+        timestamps = self._timestamps
+        values = self._values
+        step_size = self._step_size
+        result = []
+        for key, new_value in samples:
+            index = self._indexes.get(key)
+            if index is None:
+                index = self._load(key)
+            values[index], step_data = accumulate(
+                timestamps[index],
+                values[index],
+                new_timestamp,
+                new_value,
+                step_size,
+            )
+            timestamps[index] = new_timestamp
+            self._dirty.add(index)
+            result.append(step_data)
+        return result
+
+    def get(self, key):
+        """Return the C{(timestamp, accumulated value)} state of C{key}."""
+        index = self._indexes.get(key)
+        if index is None:
+            return self._persist.get(key, (0, 0))
+        return self._timestamps[index], self._values[index]
+
+    def flush(self):
+        """Write the state of the keys changed since the last flush."""
+        for index in sorted(self._dirty):
+            self._persist.set(
+                self._keys[index],
+                (self._timestamps[index], self._values[index]),
+            )
+        self._dirty.clear()
+
+    def reset(self):
+        """Forget the in-memory state, without flushing it."""
+        self._indexes.clear()
+        del self._keys[:]
+        del self._timestamps[:]
+        del self._values[:]
+        self._dirty.clear()
+
+    def _load(self, key):
+        timestamp, value = self._persist.get(key, (0, 0))
+        index = len(self._keys)
+        self._indexes[key] = index
+        self._keys.append(key)
+        self._timestamps.append(timestamp)
+        self._values.append(value)
+        return index
+
+
 def accumulate(
     previous_timestamp,
     accumulated_value,
@@ -11,6 +11,8 @@ from twisted.internet.defer import succeed
 
 from landscape.client.amp import remote
 from landscape.lib.format import format_object
+from landscape.lib.profiler import DEFAULT_PROFILE_SECONDS
+from landscape.lib.profiler import start_profiling
 from landscape.lib.twisted_util import gather_results
 
 
@@ -189,6 +191,37 @@ class BrokerClient:
         """Return C{True}"""
         return True
 
+    @remote
+    def get_reactor_stats(self):
+        """Return the timing statistics of the reactor.
+
+        @return: The summary of the L{ReactorStats} of the reactor, or
+            C{None} if they are not enabled.
+        """
+        if self.reactor.stats is None:
+            return None
+        return self.reactor.stats.get_summary()
+
+    @remote
+    def start_profiling(
+        self,
+        seconds=DEFAULT_PROFILE_SECONDS,
+        mode="cprofile",
+    ):
+        """Profile this daemon for the given number of C{seconds}.
+
+        @return: The name of the file in the log directory the profile will
+            be written to, or C{None} if a profile is already running.
+        @see: L{landscape.lib.profiler.start_profiling}.
+        """
+        return start_profiling(
+            self.reactor,
+            self.config.log_dir,
+            self.name,
+            seconds,
+            mode,
+        )
+
     def add(self, plugin):
         """Add a plugin.
 
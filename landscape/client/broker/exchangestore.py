@@ -50,10 +50,14 @@ class ExchangeStore:
     called "message_context", whose schema is defined in
     L{ensure_exchange_schema}.
 
+    The database is only ever used by the broker, so it's switched to the
+    write-ahead log journal mode, which saves a few syncs per transaction.
+
     @param filename: The name of the file that contains the sqlite database.
     """
 
     _db = None
+    _journal_mode = "wal"
 
     def __init__(self, filename):
         self._filename = filename
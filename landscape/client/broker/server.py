@@ -49,6 +49,8 @@ from twisted.internet.defer import Deferred
 from landscape.client.amp import remote
 from landscape.client.manager.manager import FAILED
 from landscape.lib.compat import _PY3
+from landscape.lib.profiler import DEFAULT_PROFILE_SECONDS
+from landscape.lib.profiler import start_profiling
 from landscape.lib.twisted_util import gather_results
 
 
@@ -120,6 +122,37 @@ class BrokerServer:
         """Return C{True}."""
         return True
 
+    @remote
+    def get_reactor_stats(self):
+        """Return the timing statistics of the reactor.
+
+        @return: The summary of the L{ReactorStats} of the reactor, or
+            C{None} if they are not enabled.
+        """
+        if self._reactor.stats is None:
+            return None
+        return self._reactor.stats.get_summary()
+
+    @remote
+    def start_profiling(
+        self,
+        seconds=DEFAULT_PROFILE_SECONDS,
+        mode="cprofile",
+    ):
+        """Profile this daemon for the given number of C{seconds}.
+
+        @return: The name of the file in the log directory the profile will
+            be written to, or C{None} if a profile is already running.
+        @see: L{landscape.lib.profiler.start_profiling}.
+        """
+        return start_profiling(
+            self._reactor,
+            self._config.log_dir,
+            self.name,
+            seconds,
+            mode,
+        )
+
     @remote
     def get_session_id(self, scope=None):
         """Get a unique session ID to be used when sending messages.
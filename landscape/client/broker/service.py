@@ -44,6 +44,7 @@ class BrokerService(LandscapeService):
     transport_factory = HTTPTransport
     pinger_factory = Pinger
     service_name = BrokerServer.name
+    ready_events = ("exchange-done", "exchange-failed")
 
     def __init__(self, config):
         self._config = config
@@ -21,6 +21,38 @@ class BrokerClientTest(LandscapeTest):
         """
         self.assertTrue(self.client.ping())
 
+    def test_get_reactor_stats(self):
+        """
+        The L{BrokerClient.get_reactor_stats} method returns the summary of
+        the reactor statistics, if enabled.
+        """
+        self.assertIsNone(self.client.get_reactor_stats())
+        self.client.reactor.enable_stats()
+        self.client.reactor.fire("foobar")
+        self.assertEqual(
+            {"calls": 1, "total": mock.ANY, "max": mock.ANY},
+            self.client.get_reactor_stats()["events"]["foobar"],
+        )
+
+    @mock.patch("landscape.client.broker.client.start_profiling")
+    def test_start_profiling(self, start_profiling):
+        """
+        The L{BrokerClient.start_profiling} method profiles the client,
+        writing the profile to the log directory.
+        """
+        start_profiling.return_value = "/var/log/client-1.pstats"
+        self.assertEqual(
+            "/var/log/client-1.pstats",
+            self.client.start_profiling(10, "sample"),
+        )
+        start_profiling.assert_called_once_with(
+            self.client.reactor,
+            self.client.config.log_dir,
+            "client",
+            10,
+            "sample",
+        )
+
     def test_add(self):
         """
         The L{BrokerClient.add} method registers a new plugin
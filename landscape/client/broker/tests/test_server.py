@@ -1,3 +1,4 @@
+import os
 import random
 from unittest.mock import Mock
 
@@ -35,6 +36,30 @@ class BrokerServerTest(LandscapeTest):
         """
         self.assertTrue(self.broker.ping())
 
+    def test_get_reactor_stats(self):
+        """
+        The L{BrokerServer.get_reactor_stats} method returns the summary of
+        the reactor statistics, if enabled.
+        """
+        self.assertIsNone(self.broker.get_reactor_stats())
+        self.reactor.enable_stats()
+        self.reactor.fire("foobar")
+        self.assertEqual(
+            ["foobar"],
+            list(self.broker.get_reactor_stats()["events"]),
+        )
+
+    def test_start_profiling(self):
+        """
+        The L{BrokerServer.start_profiling} method profiles the broker,
+        writing the profile to the log directory.
+        """
+        self.config.log_dir = self.makeDir()
+        filename = self.broker.start_profiling(10)
+        self.assertTrue(filename.startswith(self.config.log_dir + "/broker-"))
+        self.reactor.advance(10)
+        self.assertTrue(os.path.exists(filename))
+
     def test_get_session_id(self):
         """
         The L{BrokerServer.get_session_id} method gets the same
@@ -0,0 +1,137 @@
+"""Support for the in-process clones used for load-testing.
+
+When a service runs with C{--clones}, every clone is a full copy of the
+service with its own broker, persist and message store, pretending to be a
+different computer.  All the clones still run on the same machine though,
+so the data they sample from it and the package data they report are the
+same for all of them.  To let a single host drive thousands of clones,
+that data is sampled once and shared through L{SharedSamples}.
+"""
+import logging
+import os
+import random
+import resource
+import time
+
+
+# How long a sample is shared between clones before being taken again.
+DEFAULT_SAMPLE_TTL = 10
+
+# How often the process hosting the clones reports its resource usage.
+CLONE_STATS_INTERVAL = 300
+
+
+class SharedSamples:
+    """A process-wide cache of samples, shared by all the clones.
+
+    The first clone asking for a sample takes it, and the other clones
+    asking for it within the next C{ttl} seconds get the very same object.
+    Samples are snapshots that must be treated as read-only: a clone that
+    needs to change one must copy it first.
+
+    @param ttl: The number of seconds a sample is shared for.
+    @param get_time: The function returning the current time.
+    """
+
+    def __init__(self, ttl=DEFAULT_SAMPLE_TTL, get_time=time.monotonic):
+        self._ttl = ttl
+        self._get_time = get_time
+        self._samples = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, take_sample):
+        """Return the shared sample for C{key}.
+
+        @param key: A hashable key identifying the sample, including
+            whatever the sample depends on, like a file name.
+        @param take_sample: The function taking the sample, if there's no
+            fresh one for C{key}.
+        """
+        now = self._get_time()
+        entry = self._samples.get(key)
+        if entry is not None and now - entry[0] < self._ttl:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        # Forget the expired samples, whose keys may never be asked again.
+        for expired in [
+            expired
+            for expired, (taken, _) in self._samples.items()
+            if now - taken >= self._ttl
+        ]:
+            del self._samples[expired]
+        sample = take_sample()
+        self._samples[key] = (now, sample)
+        return sample
+
+    def clear(self):
+        self._samples.clear()
+
+
+_shared_samples = SharedSamples()
+
+
+def get_shared_samples():
+    """Return the L{SharedSamples} of the current process."""
+    return _shared_samples
+
+
+def shared_sample(config, key, take_sample):
+    """Take a sample, sharing it with the other clones if there are some.
+
+    Without clones this just returns C{take_sample()}, see L{SharedSamples}
+    for the parameters.
+    """
+    if not getattr(config, "clones", 0):
+        return take_sample()
+    return _shared_samples.get(key, take_sample)
+
+
+def get_clone_start_delays(count, start_over, jitter=True):
+    """Return the delays to start C{count} clones over C{start_over} seconds.
+
+    The clones are spread evenly over the period, and each one gets a random
+    jitter within its slot, so that the clones don't all run their periodic
+    work in lockstep.
+    """
+    slot = start_over / count
+    delays = []
+    for index in range(count):
+        delay = slot * (index + 1)
+        if jitter:
+            delay -= random.uniform(0, slot)
+        delays.append(delay)
+    return delays
+
+
+def get_clone_stats(clones):
+    """Return the resource usage of the process hosting C{clones} clones.
+
+    @return: A C{dict} with the number of clones per CPU core, the resident
+        memory per clone in kB and the hit rate of the L{SharedSamples}.
+    """
+    cpus = os.cpu_count() or 1
+    try:
+        with open("/proc/self/statm") as statm:
+            resident = int(statm.read().split()[1])
+        memory = resident * resource.getpagesize() // 1024
+    except (OSError, IndexError, ValueError):
+        memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    lookups = _shared_samples.hits + _shared_samples.misses
+    return {
+        "clones": clones,
+        "clones-per-core": clones / cpus,
+        "memory-per-clone": memory // max(clones, 1),
+        "shared-sample-hits": _shared_samples.hits / lookups if lookups else 0,
+    }
+
+
+def log_clone_stats(clones):
+    """Log the resource usage of the process hosting C{clones} clones."""
+    stats = get_clone_stats(clones)
+    logging.info(
+        "Running {clones:d} clones, {clones-per-core:.1f} per CPU core, "
+        "using {memory-per-clone:d} kB of memory per clone, "
+        "{shared-sample-hits:.0%} of the samples shared".format(**stats),
+    )
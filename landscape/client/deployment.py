@@ -143,6 +143,13 @@ class Configuration(BaseConfiguration):
             help="The interval between package monitor runs "
             "(default: 1800).",
         )
+        parser.add_argument(
+            "--package-reporter-worker",
+            action="store_true",
+            default=False,
+            help="Keep a long-lived package reporter worker around, instead "
+            "of spawning a new package reporter for every run.",
+        )
         parser.add_argument(
             "--apt-update-interval",
             default=6 * 60 * 60,
@@ -173,6 +180,22 @@ class Configuration(BaseConfiguration):
             help="The interval between snap monitor runs (default 1800).",
         )
 
+        parser.add_argument(
+            "--reactor-stats",
+            action="store_true",
+            default=False,
+            help="Time the event handlers and the looping calls of the "
+            "daemons, see landscape-client --dump-reactor-stats.",
+        )
+
+        parser.add_argument(
+            "--trace-startup",
+            action="store_true",
+            default=False,
+            help="Log how long the phases of the daemons startup and the "
+            "modules they import take, until their first exchange.",
+        )
+
         # Hidden options, used for load-testing to run in-process clones
         parser.add_argument("--clones", default=0, type=int, help=SUPPRESS)
         parser.add_argument(
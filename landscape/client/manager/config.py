@@ -60,6 +60,29 @@ class ManagerConfiguration(Configuration):
             "Script output will be truncated at that limit."
             " Default is 512 (kB)",
         )
+        parser.add_argument(
+            "--spool-script-output",
+            action="store_true",
+            default=False,
+            help="Write the output and attachments of scripts to temporary "
+            "files while they run, instead of keeping them in memory.",
+        )
+        parser.add_argument(
+            "--custom-graph-concurrency",
+            metavar="COUNT",
+            type=int,
+            default=5,
+            help="Maximum number of custom graph scripts that are run at "
+            "the same time. Default is 5.",
+        )
+        parser.add_argument(
+            "--custom-graph-jitter",
+            metavar="SECONDS",
+            type=int,
+            default=0,
+            help="Delay the start of each custom graph script by a random "
+            "amount of time, up to this many seconds. Default is 0.",
+        )
 
         return parser
 
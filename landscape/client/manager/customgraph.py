@@ -1,13 +1,16 @@
 import logging
 import os
+import random
 import time
 
+from twisted.internet.defer import Deferred
 from twisted.internet.defer import DeferredList
+from twisted.internet.defer import DeferredSemaphore
 from twisted.internet.defer import fail
 from twisted.internet.defer import succeed
 from twisted.python.compat import iteritems
 
-from landscape.client.accumulate import Accumulator
+from landscape.client.accumulate import BatchAccumulator
 from landscape.client.manager.plugin import ManagerPlugin
 from landscape.client.manager.scriptexecution import ProcessFailedError
 from landscape.client.manager.scriptexecution import (
@@ -15,6 +18,7 @@ from landscape.client.manager.scriptexecution import (
 )
 from landscape.client.manager.scriptexecution import ScriptRunnerMixin
 from landscape.lib.scriptcontent import generate_script_hash
+from landscape.lib.timeseries import TimeSeriesBuffer
 from landscape.lib.user import get_user_info
 from landscape.lib.user import UnknownUserError
 
@@ -67,11 +71,44 @@ class ProhibitedUserError(Exception):
         return f"Custom graph cannot be run as user {self.username}"
 
 
+class GraphRuntime:
+    """Runtime statistics of the script of a custom graph.
+
+    @ivar runs: The number of times the script has been run.
+    @ivar last: The duration of the last run, in seconds.
+    @ivar maximum: The duration of the slowest run, in seconds.
+    @ivar total: The cumulated duration of all the runs, in seconds.
+    """
+
+    def __init__(self):
+        self.runs = 0
+        self.last = 0.0
+        self.maximum = 0.0
+        self.total = 0.0
+
+    def record(self, duration):
+        self.runs += 1
+        self.last = duration
+        self.maximum = max(self.maximum, duration)
+        self.total += duration
+
+    @property
+    def average(self):
+        if not self.runs:
+            return 0.0
+        return self.total / self.runs
+
+
 class CustomGraphPlugin(ManagerPlugin, ScriptRunnerMixin):
     """
     Manage adding and deleting custom graph scripts, and then run the scripts
     in a loop.
 
+    At most C{custom_graph_concurrency} scripts are run at the same time,
+    each of them being optionally delayed by a random jitter of up to
+    C{custom_graph_jitter} seconds, so that a host with many graphs doesn't
+    fork all of them at once.
+
     @param process_factory: The L{IReactorProcess} provider to run the
         process with.
     """
@@ -81,10 +118,16 @@ class CustomGraphPlugin(ManagerPlugin, ScriptRunnerMixin):
     time_limit = 10
     message_type = "custom-graph"
 
+    # Scripts running for longer than this fraction of the time limit are
+    # reported as slow in the logs.
+    slow_fraction = 0.5
+
     def __init__(self, process_factory=None, create_time=time.time):
         super().__init__(process_factory)
         self._create_time = create_time
         self._data = {}
+        self._script_hashes = {}
+        self._runtimes = {}
         self.do_send = True
 
     def register(self, registry):
@@ -98,7 +141,7 @@ class CustomGraphPlugin(ManagerPlugin, ScriptRunnerMixin):
             self._handle_custom_graph_remove,
         )
         self._persist = StoreProxy(self.registry.store)
-        self._accumulate = Accumulator(self._persist, self.run_interval)
+        self._accumulate = BatchAccumulator(self._persist, self.run_interval)
 
     def _handle_custom_graph_remove(self, message):
         """
@@ -114,6 +157,7 @@ class CustomGraphPlugin(ManagerPlugin, ScriptRunnerMixin):
         self.registry.store.remove_graph(graph_id)
         if graph_id in self._data:
             del self._data[graph_id]
+        self._runtimes.pop(graph_id, None)
 
     def _handle_custom_graph_add(self, message):
         """
@@ -131,6 +175,7 @@ class CustomGraphPlugin(ManagerPlugin, ScriptRunnerMixin):
 
         if os.path.exists(filename):
             os.unlink(filename)
+        self._script_hashes.pop(filename, None)
 
         try:
             uid, gid = get_user_info(user)[:2]
@@ -171,22 +216,20 @@ class CustomGraphPlugin(ManagerPlugin, ScriptRunnerMixin):
                 if os.path.isfile(filename):
                     script_hash = self._get_script_hash(filename)
                     self._data[graph_id] = {
-                        "values": [],
+                        "values": TimeSeriesBuffer("qd"),
                         "error": "",
                         "script-hash": script_hash,
                     }
 
-        message = {"type": self.message_type, "data": self._data}
-
-        new_data = {}
+        data = {}
         for graph_id, item in iteritems(self._data):
-            script_hash = item["script-hash"]
-            new_data[graph_id] = {
-                "values": [],
-                "error": "",
-                "script-hash": script_hash,
+            data[graph_id] = {
+                "values": item["values"].pop(),
+                "error": item["error"],
+                "script-hash": item["script-hash"],
             }
-        self._data = new_data
+            item["error"] = ""
+        message = {"type": self.message_type, "data": data}
 
         self.registry.broker.send_message(
             message,
@@ -194,7 +237,7 @@ class CustomGraphPlugin(ManagerPlugin, ScriptRunnerMixin):
             urgent=urgent,
         )
 
-    def _handle_data(self, output, graph_id, now):
+    def _handle_data(self, output, graph_id, samples):
         if graph_id not in self._data:
             return
         try:
@@ -205,9 +248,19 @@ class CustomGraphPlugin(ManagerPlugin, ScriptRunnerMixin):
             else:
                 raise NoOutputError()
 
-        step_data = self._accumulate(now, data, graph_id)
-        if step_data:
-            self._data[graph_id]["values"].append(step_data)
+        samples.append((graph_id, data))
+
+    def _accumulate_samples(self, result, now, samples):
+        """
+        Accumulate the values output by all the graph scripts of a run at
+        once, and write the accumulated state to the store.
+        """
+        all_step_data = self._accumulate(now, samples)
+        for (graph_id, _), step_data in zip(samples, all_step_data):
+            if step_data and graph_id in self._data:
+                self._data[graph_id]["values"].append(step_data)
+        self._accumulate.flush()
+        return result
 
     def _handle_error(self, failure, graph_id):
         if graph_id not in self._data:
@@ -230,9 +283,86 @@ class CustomGraphPlugin(ManagerPlugin, ScriptRunnerMixin):
             )
 
     def _get_script_hash(self, filename):
+        """
+        Return the hash of the script in C{filename}, which is only read and
+        hashed again if its inode, modification time or size changed.
+        """
+        stat = os.stat(filename)
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        cached = self._script_hashes.get(filename)
+        if cached is not None and cached[0] == key:
+            return cached[1]
         with open(filename) as file_object:
             script_content = file_object.read()
-        return generate_script_hash(script_content)
+        script_hash = generate_script_hash(script_content)
+        self._script_hashes[filename] = (key, script_hash)
+        return script_hash
+
+    def get_runtimes(self):
+        """
+        Return a dict mapping graph ids to their L{GraphRuntime} statistics.
+        """
+        return dict(self._runtimes)
+
+    def _schedule_script(self, semaphore, graph_id, filename, uid, gid, path):
+        """
+        Run the script of a graph once a slot is available in C{semaphore},
+        after a random jitter if one is configured.
+        """
+        jitter = self.registry.config.custom_graph_jitter
+        if not jitter:
+            return semaphore.run(
+                self._run_graph_script,
+                graph_id,
+                filename,
+                uid,
+                gid,
+                path,
+            )
+        deferred = Deferred()
+        self.registry.reactor.call_later(
+            random.random() * jitter,
+            deferred.callback,
+            None,
+        )
+        deferred.addCallback(
+            lambda ignored: semaphore.run(
+                self._run_graph_script,
+                graph_id,
+                filename,
+                uid,
+                gid,
+                path,
+            ),
+        )
+        return deferred
+
+    def _run_graph_script(self, graph_id, filename, uid, gid, path):
+        start = self.registry.reactor.time()
+        result = self._run_script(
+            filename,
+            uid,
+            gid,
+            path,
+            {},
+            self.time_limit,
+        )
+        result.addBoth(self._record_runtime, graph_id, start)
+        return result
+
+    def _record_runtime(self, result, graph_id, start):
+        duration = self.registry.reactor.time() - start
+        runtime = self._runtimes.get(graph_id)
+        if runtime is None:
+            runtime = self._runtimes[graph_id] = GraphRuntime()
+        runtime.record(duration)
+        if duration > self.time_limit * self.slow_fraction:
+            logging.info(
+                f"Custom graph {graph_id:d} script took {duration:.1f} "
+                f"seconds to run (average {runtime.average:.1f} seconds "
+                f"over {runtime.runs:d} runs).",
+            )
+        return result
 
     def run(self):
         """
@@ -254,7 +384,11 @@ class CustomGraphPlugin(ManagerPlugin, ScriptRunnerMixin):
 
     def _continue_run(self, graphs):
         deferred_list = []
+        samples = []
         now = int(self._create_time())
+        semaphore = DeferredSemaphore(
+            max(1, self.registry.config.custom_graph_concurrency),
+        )
 
         for graph_id, filename, user in graphs:
             if os.path.isfile(filename):
@@ -263,7 +397,7 @@ class CustomGraphPlugin(ManagerPlugin, ScriptRunnerMixin):
                 script_hash = b""
             if graph_id not in self._data:
                 self._data[graph_id] = {
-                    "values": [],
+                    "values": TimeSeriesBuffer("qd"),
                     "error": "",
                     "script-hash": script_hash,
                 }
@@ -283,15 +417,17 @@ class CustomGraphPlugin(ManagerPlugin, ScriptRunnerMixin):
                 continue
             if not os.path.isfile(filename):
                 continue
-            result = self._run_script(
+            result = self._schedule_script(
+                semaphore,
+                graph_id,
                 filename,
                 uid,
                 gid,
                 path,
-                {},
-                self.time_limit,
             )
-            result.addCallback(self._handle_data, graph_id, now)
+            result.addCallback(self._handle_data, graph_id, samples)
             result.addErrback(self._handle_error, graph_id)
             deferred_list.append(result)
-        return DeferredList(deferred_list)
+        result = DeferredList(deferred_list)
+        result.addCallback(self._accumulate_samples, now, samples)
+        return result
@@ -48,7 +48,7 @@ class KeystoneToken(DataWatcher):
         """
         Reset the persist.
         """
-        self._persist.remove("data")
+        self._forget_data()
 
     def flush(self):
         self._persist.save(self._persist_filename)
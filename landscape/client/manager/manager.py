@@ -16,3 +16,22 @@ class Manager(BrokerClient):
         self.reactor = reactor
         self.config = config
         self.store = ManagerStore(self.config.store_filename)
+        self._snapd_changes = None
+
+    @property
+    def snapd_changes(self):
+        """The L{SnapdChangeTracker} shared by the snap plugins.
+
+        It's only created when first needed, so that managers without snap
+        plugins don't load the snapd client.
+        """
+        if self._snapd_changes is None:
+            from landscape.client.snapd import SnapdChangeTracker
+            from landscape.client.snapd import SnapdClient
+
+            self._snapd_changes = SnapdChangeTracker(
+                SnapdClient(),
+                self.reactor,
+                max_interval=getattr(self.config, "snapd_poll_interval", 15),
+            )
+        return self._snapd_changes
@@ -9,7 +9,9 @@ import sys
 import tempfile
 
 from twisted.internet.defer import Deferred
+from twisted.internet.defer import DeferredList
 from twisted.internet.defer import fail
+from twisted.internet.defer import FirstError
 from twisted.internet.defer import inlineCallbacks
 from twisted.internet.defer import returnValue
 from twisted.internet.defer import succeed
@@ -25,7 +27,7 @@ from landscape.client.manager.plugin import FAILED
 from landscape.client.manager.plugin import ManagerPlugin
 from landscape.client.manager.plugin import SUCCEEDED
 from landscape.constants import UBUNTU_PATH
-from landscape.lib.fetch import fetch_async
+from landscape.lib.fetch import fetch_multi_async
 from landscape.lib.fetch import HTTPCodeError
 from landscape.lib.persist import Persist
 from landscape.lib.scriptcontent import build_script
@@ -124,7 +126,11 @@ class ScriptRunnerMixin:
             for key, value in env.items()
         }
 
-        pp = ProcessAccumulationProtocol(
+        if self.registry.config.spool_script_output:
+            protocol_factory = SpoolingProcessAccumulationProtocol
+        else:
+            protocol_factory = ProcessAccumulationProtocol
+        pp = protocol_factory(
             self.registry.reactor,
             self.registry.config.script_output_limit,
             self.truncation_indicator,
@@ -236,28 +242,73 @@ class ScriptExecutionPlugin(ManagerPlugin, ScriptRunnerMixin):
             "Content-Type": "application/octet-stream",
             "X-Computer-ID": computer_id,
         }
+        spool = self.registry.config.spool_script_output
+        fetches = []
         for filename, attachment_id in attachments.items():
+            full_filename = os.path.join(attachment_dir, filename)
             if isinstance(attachment_id, str):
                 # Backward compatible behavior
                 data = attachment_id.encode("utf-8")
-                yield succeed(None)
+                self._write_attachment(data, full_filename, uid, gid)
+                continue
+            url = f"{root_path}{attachment_id:d}"
+            cainfo = self.registry.config.ssl_public_key
+            if spool:
+                # Stream the attachment straight to its file.
+                output = self._open_attachment(full_filename, uid, gid)
+                result = fetch_multi_async(
+                    url,
+                    cainfo=cainfo,
+                    headers=headers,
+                    output_file=output,
+                )
+                result.addBoth(self._close_attachment, output)
             else:
-                data = yield fetch_async(
-                    f"{root_path}{attachment_id:d}",
-                    cainfo=self.registry.config.ssl_public_key,
+                result = fetch_multi_async(
+                    url,
+                    cainfo=cainfo,
                     headers=headers,
                 )
-            full_filename = os.path.join(attachment_dir, filename)
-            with open(full_filename, "wb") as attachment:
-                os.chmod(full_filename, 0o600)
-                if not self.IS_SNAP and uid is not None:
-                    os.chown(full_filename, uid, gid)
-                attachment.write(data)
+                result.addCallback(
+                    self._write_attachment,
+                    full_filename,
+                    uid,
+                    gid,
+                )
+            fetches.append(result)
+        # All the attachments are downloaded at the same time, over the
+        # shared connections of the multi fetcher.
+        try:
+            yield DeferredList(
+                fetches,
+                fireOnOneErrback=True,
+                consumeErrors=True,
+            )
+        except FirstError as error:
+            error.subFailure.raiseException()
         os.chmod(attachment_dir, 0o700)
         if not self.IS_SNAP and uid is not None:
             os.chown(attachment_dir, uid, gid)
         returnValue(attachment_dir)
 
+    def _open_attachment(self, full_filename, uid, gid):
+        """
+        Create the file of an attachment, only readable by the script user.
+        """
+        attachment = open(full_filename, "wb")
+        os.chmod(full_filename, 0o600)
+        if not self.IS_SNAP and uid is not None:
+            os.chown(full_filename, uid, gid)
+        return attachment
+
+    def _write_attachment(self, data, full_filename, uid, gid):
+        with self._open_attachment(full_filename, uid, gid) as attachment:
+            attachment.write(data)
+
+    def _close_attachment(self, result, attachment):
+        attachment.close()
+        return result
+
     def run_script(
         self,
         shell,
@@ -403,10 +454,7 @@ class ProcessAccumulationProtocol(ProcessProtocol):
         far.
         """
         exit_code = reason.value.exitCode
-        # We get bytes with self.data, but want unicode with replace
-        # characters. This is again attempted in
-        # ScriptExecutionPlugin._respond, but it is not called in all cases.
-        data = b"".join(self.data).decode("utf-8", "replace")
+        data = self._get_data()
         if self._cancelled:
             self.result_deferred.errback(ProcessTimeLimitReachedError(data))
         else:
@@ -422,6 +470,13 @@ class ProcessAccumulationProtocol(ProcessProtocol):
                     ProcessFailedError(data, exit_code),
                 )
 
+    def _get_data(self):
+        """Return the accumulated output."""
+        # We get bytes with self.data, but want unicode with replace
+        # characters. This is again attempted in
+        # ScriptExecutionPlugin._respond, but it is not called in all cases.
+        return b"".join(self.data).decode("utf-8", "replace")
+
     def _cancel(self):
         """
         Close filedescriptors, kill the process, and indicate that a
@@ -438,6 +493,51 @@ class ProcessAccumulationProtocol(ProcessProtocol):
         self._cancelled = True
 
 
+class SpoolingProcessAccumulationProtocol(ProcessAccumulationProtocol):
+    """A ProcessProtocol which spools output to a temporary file.
+
+    At most L{spool_memory_limit} bytes of output are kept in memory, the
+    rest is written to a temporary file, which is truncated once the output
+    reaches L{size_limit}.
+    """
+
+    spool_memory_limit = 64 * 1024
+
+    def __init__(self, reactor, size_limit, truncation_indicator=""):
+        super().__init__(reactor, size_limit, truncation_indicator)
+        self.spool = tempfile.SpooledTemporaryFile(
+            max_size=self.spool_memory_limit,
+        )
+
+    def childDataReceived(self, fd, data):  # noqa: N802
+        """Some data was received from the child.
+
+        Write it to our spool, truncating it if it goes over L{size_limit}
+        bytes.
+        """
+        if self._size < self.size_limit:
+            self.spool.write(data)
+            self._size += len(data)
+            if self._size >= self._truncated_size_limit:
+                self.spool.truncate(self._truncated_size_limit)
+                self.spool.seek(self._truncated_size_limit)
+                self.spool.write(self._truncation_indicator)
+                self._size = self.size_limit
+
+    def _get_data(self):
+        """Return the spooled output, and discard the spool.
+
+        The output is read back in full and then decoded, so that it's
+        briefly held in memory twice, as bytes and as text, up to
+        L{size_limit} bytes each.  Only the output buffered while the
+        process runs is bounded by L{spool_memory_limit}.
+        """
+        self.spool.seek(0)
+        data = self.spool.read().decode("utf-8", "replace")
+        self.spool.close()
+        return data
+
+
 class ScriptExecution(ManagerPlugin):
     """
     Meta-plugin wrapping ScriptExecutionPlugin and CustomGraphPlugin.
@@ -20,7 +20,7 @@ class ManagerService(LandscapeService):
 
     def __init__(self, config):
         super().__init__(config)
-        self.plugins = self.get_plugins()
+        self.plugins = []
         self.manager = Manager(self.reactor, self.config)
         self.publisher = ComponentPublisher(
             self.manager,
@@ -30,26 +30,32 @@ class ManagerService(LandscapeService):
 
     def get_plugins(self):
         """Return instances of all the plugins enabled in the configuration."""
-        plugins = []
-
-        for plugin_name in self.config.plugin_factories:
-            try:
-                plugin = namedClass(
-                    "landscape.client.manager."
-                    f"{plugin_name.lower()}.{plugin_name}",
-                )
-                plugins.append(plugin())
-            except ModuleNotFoundError:
-                logging.warning(
-                    f"Invalid manager plugin specified: '{plugin_name}'"
-                    "See `example.conf` for a full list of monitor plugins.",
-                )
-            except Exception as exc:
-                logging.warning(
-                    f"Unable to load manager plugin '{plugin_name}': {exc}",
-                )
-
-        return plugins
+        plugins = (
+            self.get_plugin(plugin_name)
+            for plugin_name in self.config.plugin_factories
+        )
+        return [plugin for plugin in plugins if plugin is not None]
+
+    def get_plugin(self, plugin_name):
+        """Return an instance of the plugin called C{plugin_name}.
+
+        @return: The plugin, or C{None} if it can't be loaded.
+        """
+        try:
+            plugin = namedClass(
+                "landscape.client.manager."
+                f"{plugin_name.lower()}.{plugin_name}",
+            )
+            return plugin()
+        except ModuleNotFoundError:
+            logging.warning(
+                f"Invalid manager plugin specified: '{plugin_name}'"
+                "See `example.conf` for a full list of monitor plugins.",
+            )
+        except Exception as exc:
+            logging.warning(
+                f"Unable to load manager plugin '{plugin_name}': {exc}",
+            )
 
     def startService(self):  # noqa: N802
         """Start the manager service.
@@ -66,9 +72,10 @@ class ManagerService(LandscapeService):
         def start_plugins(broker):
             self.broker = broker
             self.manager.broker = broker
-            for plugin in self.plugins:
-                self.manager.add(plugin)
-            return self.broker.register_client(self.service_name)
+            loaded = self.load_plugins(self.manager, self.get_plugin)
+            return loaded.addCallback(
+                lambda _: self.broker.register_client(self.service_name),
+            )
 
         self.connector = RemoteBrokerConnector(self.reactor, self.config)
         connected = self.connector.connect()
@@ -3,18 +3,16 @@ import logging
 from collections import deque
 from pathlib import Path
 
-from twisted.internet import task
-
 from landscape.client import GROUP
 from landscape.client import snap_http
 from landscape.client import USER
 from landscape.client.manager.plugin import FAILED
 from landscape.client.manager.plugin import ManagerPlugin
 from landscape.client.manager.plugin import SUCCEEDED
-from landscape.client.snap_http import INCOMPLETE_STATUSES
 from landscape.client.snap_http import SnapdHttpException
 from landscape.client.snap_http import SUCCESS_STATUSES
 from landscape.lib.persist import Persist
+from landscape.lib.twisted_util import gather_results
 from landscape.message_schemas.server_bound import SNAPS
 
 
@@ -122,58 +120,40 @@ class BaseSnapManager(ManagerPlugin):
 
     def _check_statuses(self, change_queue):
         """
-        Repeatedly polls for the status of each change in `change_queue`
-        until all are no longer in-progress.
+        Waits for each change in `change_queue` to be done, with the change
+        tracker shared by the snap plugins.
+
+        Returns a deferred firing with the `(name, status)` of the changes.
         """
-        completed_changes = []
-        interval = getattr(self.registry.config, "snapd_poll_interval", 15)
+        changes = self.registry.snapd_changes
+        statuses = []
+        for cid, name in change_queue:
+            status = changes.wait(cid)
+            status.addCallbacks(
+                self._change_done,
+                self._change_check_failed,
+                callbackArgs=(name,),
+                errbackArgs=(name,),
+            )
+            statuses.append(status)
 
-        def get_status():
-            """
-            Looping function that polls snapd for the status of
-            changes, moving them from the queue when they are done.
-            """
-            if not change_queue:
-                loop.stop()
-                return
+        return gather_results(statuses)
 
-            logging.info("Polling snapd for status of pending snap changes")
+    def _change_done(self, change, name):
+        # It's possible (though unlikely) that a change is not known to
+        # snapd - it could have dropped it for some reason. We need to know
+        # if that happens, hence this check.
+        if change is None:
+            return (name, "Unknown")
 
-            try:
-                result = snap_http.check_changes().result
-                result_dict = {c["id"]: c for c in result}
-            except SnapdHttpException as e:
-                logging.error(f"Error checking status of snap changes: {e}")
-                completed_changes.extend(
-                    [(name, str(e)) for _, name in change_queue],
-                )
-                loop.stop()
-                return
-
-            for _ in range(len(change_queue)):
-                cid, name = change_queue.popleft()
-
-                # It's possible (though unlikely) that a change is not in the
-                # list - snapd could have dropped it for some reason. We need
-                # to know if that happens, hence this check.
-                if cid not in result_dict:
-                    completed_changes.append((name, "Unknown"))
-                    continue
-
-                status = result_dict[cid]["status"]
-                if status in INCOMPLETE_STATUSES:
-                    logging.info(
-                        f"Incomplete status for {name}, waiting...",
-                    )
-                    change_queue.append((cid, name))
-                else:
-                    logging.info(f"Complete status for {name}")
-                    completed_changes.append((name, status))
-
-        loop = task.LoopingCall(get_status)
-        loopDeferred = loop.start(interval)
-
-        return loopDeferred.addCallback(lambda _: completed_changes)
+        logging.info(f"Complete status for {name}")
+        return (name, change["status"])
+
+    def _change_check_failed(self, failure, name):
+        logging.error(
+            f"Error checking status of snap changes: {failure.value}",
+        )
+        return (name, str(failure.value))
 
     def _start_snap_task(self, action, *args, **kwargs):
         """
@@ -4,11 +4,12 @@ except ImportError:
     from pysqlite2 import dbapi2 as sqlite3
 
 from landscape.lib.apt.package.store import with_cursor
+from landscape.lib.store import connect
 
 
 class ManagerStore:
     def __init__(self, filename):
-        self._db = sqlite3.connect(filename)
+        self._db = connect(filename)
         ensure_schema(self._db)
 
     @with_cursor
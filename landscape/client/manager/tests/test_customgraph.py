@@ -946,3 +946,99 @@ class CustomGraphManagerTests(LandscapeTest):
             )
 
         return result.addCallback(check)
+
+    def test_run_concurrency_limit(self):
+        """
+        No more than C{custom_graph_concurrency} scripts are running at the
+        same time, the others are started as soon as a running one exits.
+        """
+        self.manager.config.custom_graph_concurrency = 2
+        for graph_id in (123, 124, 125):
+            filename = self.makeFile("some content")
+            self.store.add_graph(graph_id, filename, None)
+        factory = StubProcessFactory()
+        self.graph_manager.process_factory = factory
+        result = self.graph_manager.run()
+
+        self.assertEqual(len(factory.spawns), 2)
+        self._exit_process_protocol(factory.spawns[0][0], b"1.0")
+        self.assertEqual(len(factory.spawns), 3)
+        self._exit_process_protocol(factory.spawns[1][0], b"2.0")
+        self._exit_process_protocol(factory.spawns[2][0], b"3.0")
+
+        return result
+
+    def test_run_with_jitter(self):
+        """
+        When C{custom_graph_jitter} is set, scripts are started after a
+        random delay of up to that many seconds.
+        """
+        self.manager.config.custom_graph_jitter = 30
+        filename = self.makeFile("some content")
+        self.store.add_graph(123, filename, None)
+        factory = StubProcessFactory()
+        self.graph_manager.process_factory = factory
+
+        with mock.patch("random.random", return_value=0.5):
+            result = self.graph_manager.run()
+
+        self.assertEqual(len(factory.spawns), 0)
+        self.manager.reactor.advance(14)
+        self.assertEqual(len(factory.spawns), 0)
+        self.manager.reactor.advance(1)
+        self.assertEqual(len(factory.spawns), 1)
+        self._exit_process_protocol(factory.spawns[0][0], b"1.0")
+
+        return result
+
+    def test_script_hash_cached(self):
+        """
+        The script of a graph is only hashed again when it changes.
+        """
+        filename = self.makeFile(content="#!/bin/sh\necho 1")
+        with mock.patch(
+            "landscape.client.manager.customgraph.generate_script_hash",
+            return_value=b"hash",
+        ) as generate_script_hash:
+            self.assertEqual(
+                b"hash",
+                self.graph_manager._get_script_hash(filename),
+            )
+            self.assertEqual(
+                b"hash",
+                self.graph_manager._get_script_hash(filename),
+            )
+            self.assertEqual(1, generate_script_hash.call_count)
+
+            with open(filename, "a") as script:
+                script.write("\necho 2")
+            self.graph_manager._get_script_hash(filename)
+            self.assertEqual(2, generate_script_hash.call_count)
+
+    def test_runtime_statistics(self):
+        """
+        The duration of each script run is recorded per graph, and slow runs
+        are logged.
+        """
+        filename = self.makeFile("some content")
+        self.store.add_graph(123, filename, None)
+        factory = StubProcessFactory()
+        self.graph_manager.process_factory = factory
+        result = self.graph_manager.run()
+
+        protocol = factory.spawns[0][0]
+        protocol.makeConnection(DummyProcess())
+        self.manager.reactor.advance(6)
+        self._exit_process_protocol(protocol, b"1.0")
+
+        def check(ignore):
+            runtime = self.graph_manager.get_runtimes()[123]
+            self.assertEqual(1, runtime.runs)
+            self.assertEqual(6, runtime.last)
+            self.assertEqual(6, runtime.maximum)
+            self.assertIn(
+                "Custom graph 123 script took 6.0 seconds to run",
+                self.logfile.getvalue(),
+            )
+
+        return result.addCallback(check)
@@ -3,8 +3,10 @@ import pwd
 import stat
 import sys
 import tempfile
+import tracemalloc
 from unittest import mock
 
+from twisted.internet.defer import Deferred
 from twisted.internet.defer import fail
 from twisted.internet.defer import gatherResults
 from twisted.internet.defer import succeed
@@ -317,7 +319,7 @@ class RunScriptTests(LandscapeTest):
         persist.save()
 
         patch_fetch = mock.patch(
-            "landscape.client.manager.scriptexecution.fetch_async",
+            "landscape.client.manager.scriptexecution.fetch_multi_async",
         )
         mock_fetch = patch_fetch.start()
         mock_fetch.return_value = succeed(b"some other data")
@@ -349,6 +351,50 @@ class RunScriptTests(LandscapeTest):
 
         return result.addCallback(check).addBoth(cleanup)
 
+    def test_run_with_attachment_ids_spooled(self):
+        """
+        When spooling, attachments are streamed straight to their files.
+        """
+        self.manager.config.url = "https://localhost/message-system"
+        self.manager.config.spool_script_output = True
+        persist = Persist(
+            filename=os.path.join(self.config.data_path, "broker.bpickle"),
+        )
+        registration_persist = persist.root_at("registration")
+        registration_persist.set("secure-id", "secure_id")
+        persist.save()
+
+        def fetch_multi_async(url, output_file, **kwargs):
+            output_file.write(b"some other data")
+            return succeed(None)
+
+        patch_fetch = mock.patch(
+            "landscape.client.manager.scriptexecution.fetch_multi_async",
+            side_effect=fetch_multi_async,
+        )
+        mock_fetch = patch_fetch.start()
+
+        result = self.plugin.run_script(
+            "/bin/sh",
+            "ls $LANDSCAPE_ATTACHMENTS && cat $LANDSCAPE_ATTACHMENTS/file1",
+            attachments={"file1": 14},
+        )
+
+        def check(result):
+            self.assertEqual(result, "file1\nsome other data")
+            mock_fetch.assert_called_with(
+                "https://localhost/attachment/14",
+                headers=mock.ANY,
+                cainfo=None,
+                output_file=mock.ANY,
+            )
+
+        def cleanup(result):
+            patch_fetch.stop()
+            return result
+
+        return result.addCallback(check).addBoth(cleanup)
+
     def test_run_with_attachment_ids_and_ssl(self):
         """
         When fetching attachments, L{ScriptExecution} passes the optional ssl
@@ -364,7 +410,7 @@ class RunScriptTests(LandscapeTest):
         persist.save()
 
         patch_fetch = mock.patch(
-            "landscape.client.manager.scriptexecution.fetch_async",
+            "landscape.client.manager.scriptexecution.fetch_multi_async",
         )
         mock_fetch = patch_fetch.start()
         mock_fetch.return_value = succeed(b"some other data")
@@ -395,6 +441,53 @@ class RunScriptTests(LandscapeTest):
 
         return result.addCallback(check).addBoth(cleanup)
 
+    def test_run_with_attachment_ids_fetched_concurrently(self):
+        """
+        All the attachments of a script are fetched at the same time, the
+        script being run only once all of them are available.
+        """
+        self.manager.config.url = "https://localhost/message-system"
+        persist = Persist(
+            filename=os.path.join(self.config.data_path, "broker.bpickle"),
+        )
+        registration_persist = persist.root_at("registration")
+        registration_persist.set("secure-id", "secure_id")
+        persist.save()
+
+        fetches = {}
+
+        def fetch_multi_async(url, **kwargs):
+            fetches[url] = Deferred()
+            return fetches[url]
+
+        patch_fetch = mock.patch(
+            "landscape.client.manager.scriptexecution.fetch_multi_async",
+            side_effect=fetch_multi_async,
+        )
+        patch_fetch.start()
+
+        result = self.plugin.run_script(
+            "/bin/sh",
+            "cat $LANDSCAPE_ATTACHMENTS/file1 $LANDSCAPE_ATTACHMENTS/file2",
+            attachments={"file1": 14, "file2": 15},
+        )
+        self.assertEqual(
+            [
+                "https://localhost/attachment/14",
+                "https://localhost/attachment/15",
+            ],
+            sorted(fetches),
+        )
+        fetches["https://localhost/attachment/15"].callback(b"two\n")
+        fetches["https://localhost/attachment/14"].callback(b"one\n")
+
+        def cleanup(result):
+            patch_fetch.stop()
+            return result
+
+        result.addCallback(self.assertEqual, "one\ntwo\n")
+        return result.addBoth(cleanup)
+
     def test_self_remove_script(self):
         """
         If a script removes itself, it doesn't create an error when the script
@@ -625,6 +718,86 @@ class RunScriptTests(LandscapeTest):
 
         return result
 
+    def test_spool_limit_size(self):
+        """
+        When spooling, data returned from the command is truncated in the
+        spool file.
+        """
+        factory = StubProcessFactory()
+        self.plugin.process_factory = factory
+        self.manager.config.spool_script_output = True
+        self.manager.config.script_output_limit = 1
+        result = self.plugin.run_script("/bin/sh", "")
+        result.addCallback(
+            self.assertEqual,
+            ("x" * (1024 - 21)) + "\n**OUTPUT TRUNCATED**",
+        )
+
+        protocol = factory.spawns[0][0]
+        protocol.childDataReceived(1, b"x" * 1000)
+        protocol.childDataReceived(1, b"x" * 1000)
+        protocol.childDataReceived(1, b"x" * 1000)
+
+        for fd in (0, 1, 2):
+            protocol.childConnectionLost(fd)
+        protocol.processEnded(Failure(ProcessDone(0)))
+
+        return result
+
+    def test_spool_output(self):
+        """
+        When spooling, output beyond the spool memory limit is written to a
+        temporary file, and still returned in full.
+        """
+        self.manager.config.spool_script_output = True
+        result = self.plugin.run_script(
+            "/bin/sh",
+            "head -c 200000 /dev/zero | tr '\\0' x",
+        )
+        result.addCallback(self.assertEqual, "x" * 200000)
+        return result
+
+    def test_spool_concurrent_output_within_memory_budget(self):
+        """
+        When spooling, concurrent scripts producing a lot of output don't
+        keep it in memory while they run, but move it to their spool file.
+        """
+        factory = StubProcessFactory()
+        self.plugin.process_factory = factory
+        self.manager.config.spool_script_output = True
+        self.manager.config.script_output_limit = 1024
+        results = [self.plugin.run_script("/bin/sh", "") for i in range(10)]
+        protocols = [spawn[0] for spawn in factory.spawns]
+        chunk_size = 4096
+        # Each of the processes outputs 2MB, while holding it all in memory
+        # would take 10MB.
+        budget = 2 * 1024 * 1024
+
+        tracemalloc.start()
+        self.addCleanup(tracemalloc.stop)
+        for i in range(512):
+            for protocol in protocols:
+                # Like actual process output, every chunk is a new object.
+                protocol.childDataReceived(1, b"x" * chunk_size)
+        size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.assertTrue(peak < budget, f"{peak} bytes allocated")
+
+        for protocol in protocols:
+            self.assertTrue(protocol.spool._rolled)
+            for fd in (0, 1, 2):
+                protocol.childConnectionLost(fd)
+            protocol.processEnded(Failure(ProcessDone(0)))
+
+        result = gatherResults(results)
+        result.addCallback(
+            lambda outputs: self.assertEqual(
+                [1024 * 1024] * 10,
+                [len(output) for output in outputs],
+            ),
+        )
+        return result
+
     def test_limit_time(self):
         """
         The process only lasts for a certain number of seconds.
@@ -1249,7 +1422,7 @@ class ScriptExecutionMessageTests(LandscapeTest):
         result.addCallback(got_result)
         return result
 
-    @mock.patch("landscape.client.manager.scriptexecution.fetch_async")
+    @mock.patch("landscape.client.manager.scriptexecution.fetch_multi_async")
     def test_fetch_attachment_failure(self, mock_fetch):
         """
         If the plugin fails to retrieve the attachments with a
@@ -26,7 +26,7 @@ class ManagerServiceTest(LandscapeTest):
     @mock.patch("dbus.SystemBus")
     def test_plugins(self, system_bus_mock):
         """
-        By default the L{ManagerService.plugins} list holds an instance of
+        By default L{ManagerService.get_plugins} returns an instance of
         every enabled manager plugin.
 
         We mock `dbus` because in some build environments that run these tests,
@@ -36,7 +36,7 @@ class ManagerServiceTest(LandscapeTest):
         config.load(["-c", self.config_filename])
         service = self.FakeManagerService(config)
 
-        self.assertEqual(len(service.plugins), len(ALL_PLUGINS))
+        self.assertEqual(len(service.get_plugins()), len(ALL_PLUGINS))
         system_bus_mock.assert_called_once_with()
 
     def test_get_plugins(self):
@@ -94,9 +94,14 @@ class ManagerServiceTest(LandscapeTest):
         def assert_broker_connection(ignored):
             self.assertEqual(len(self.broker_service.broker.get_clients()), 1)
             self.assertIs(self.service.broker, self.service.manager.broker)
+            self.assertEqual(
+                self.service.plugins,
+                self.service.manager.get_plugins(),
+            )
             result = self.service.broker.ping()
             return result.addCallback(stop_service)
 
         self.broker_service.startService()
         started = self.service.startService()
+        self.service.reactor.advance(0)
         return started.addCallback(assert_broker_connection)
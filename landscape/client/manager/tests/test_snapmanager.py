@@ -5,6 +5,8 @@ from landscape.client.manager.manager import SUCCEEDED
 from landscape.client.manager.snapmanager import SnapManager
 from landscape.client.snap_http import SnapdHttpException
 from landscape.client.snap_http import SnapdResponse
+from landscape.client.snapd import SnapdChangeTracker
+from landscape.client.tests.helpers import FakeSnapdClient
 from landscape.client.tests.helpers import LandscapeTest
 from landscape.client.tests.helpers import ManagerHelper
 
@@ -21,6 +23,12 @@ class SnapManagerTest(LandscapeTest):
             "landscape.client.manager.snapmanager.snap_http",
         ).start()
 
+        self.snapd = FakeSnapdClient()
+        self.manager._snapd_changes = SnapdChangeTracker(
+            self.snapd,
+            self.reactor,
+        )
+
         self.plugin = SnapManager()
         self.manager.add(self.plugin)
 
@@ -46,15 +54,10 @@ class SnapManagerTest(LandscapeTest):
             return mock.DEFAULT
 
         self.snap_http.install.side_effect = install_snap
-        self.snap_http.check_changes.return_value = SnapdResponse(
-            "sync",
-            "200",
-            "OK",
-            [
-                {"id": "1", "status": "Done"},
-                {"id": "2", "status": "Done"},
-            ],
-        )
+        self.snapd.changes = [
+            {"id": "1", "status": "Done"},
+            {"id": "2", "status": "Done"},
+        ]
         self.snap_http.list.return_value = SnapdResponse("sync", 200, "OK", [])
 
         result = self.manager.dispatch_message(
@@ -67,6 +70,7 @@ class SnapManagerTest(LandscapeTest):
                 ],
             },
         )
+        self.reactor.advance(1)
 
         def got_result(_):
             self.assertMessages(
@@ -96,12 +100,7 @@ class SnapManagerTest(LandscapeTest):
             None,
             change="1",
         )
-        self.snap_http.check_changes.return_value = SnapdResponse(
-            "sync",
-            200,
-            "OK",
-            [{"id": "1", "status": "Done"}],
-        )
+        self.snapd.changes = [{"id": "1", "status": "Done"}]
         self.snap_http.list.return_value = SnapdResponse("sync", 200, "OK", [])
         self.snap_http.get_conf.return_value = SnapdResponse(
             "sync",
@@ -120,6 +119,7 @@ class SnapManagerTest(LandscapeTest):
                 ],
             },
         )
+        self.reactor.advance(1)
 
         def got_result(_):
             self.assertMessages(
@@ -150,6 +150,7 @@ class SnapManagerTest(LandscapeTest):
                 "snaps": [{"name": "hello"}],
             },
         )
+        self.reactor.advance(1)
 
         self.log_helper.ignore_errors(r".+whoops$")
 
@@ -177,12 +178,7 @@ class SnapManagerTest(LandscapeTest):
             None,
             change="1",
         )
-        self.snap_http.check_changes.return_value = SnapdResponse(
-            "sync",
-            200,
-            "OK",
-            [],
-        )
+        self.snapd.changes = []
         self.snap_http.list.return_value = SnapdResponse("sync", 200, "OK", [])
 
         result = self.manager.dispatch_message(
@@ -192,6 +188,7 @@ class SnapManagerTest(LandscapeTest):
                 "snaps": [{"name": "hello"}],
             },
         )
+        self.reactor.advance(1)
 
         def got_result(_):
             self.assertMessages(
@@ -217,7 +214,7 @@ class SnapManagerTest(LandscapeTest):
             None,
             change="1",
         )
-        self.snap_http.check_changes.side_effect = SnapdHttpException("whoops")
+        self.snapd.error = SnapdHttpException("whoops")
         self.snap_http.list.return_value = SnapdResponse("sync", 200, "OK", [])
 
         result = self.manager.dispatch_message(
@@ -227,6 +224,7 @@ class SnapManagerTest(LandscapeTest):
                 "snaps": [{"name": "hello"}],
             },
         )
+        self.reactor.advance(1)
 
         self.log_helper.ignore_errors(r".+whoops$")
 
@@ -254,12 +252,7 @@ class SnapManagerTest(LandscapeTest):
             None,
             change="1",
         )
-        self.snap_http.check_changes.return_value = SnapdResponse(
-            "sync",
-            200,
-            "OK",
-            [{"id": "1", "status": "Done"}],
-        )
+        self.snapd.changes = [{"id": "1", "status": "Done"}]
         self.snap_http.list.return_value = SnapdResponse("sync", 200, "OK", [])
 
         result = self.manager.dispatch_message(
@@ -269,6 +262,7 @@ class SnapManagerTest(LandscapeTest):
                 "snaps": [{"name": "hello"}],
             },
         )
+        self.reactor.advance(1)
 
         def got_result(_):
             self.assertMessages(
@@ -294,12 +288,7 @@ class SnapManagerTest(LandscapeTest):
             None,
             change="1",
         )
-        self.snap_http.check_changes.return_value = SnapdResponse(
-            "sync",
-            "200",
-            "OK",
-            [{"id": "1", "status": "Done"}],
-        )
+        self.snapd.changes = [{"id": "1", "status": "Done"}]
         self.snap_http.list.return_value = SnapdResponse("sync", 200, "OK", [])
 
         result = self.manager.dispatch_message(
@@ -316,6 +305,7 @@ class SnapManagerTest(LandscapeTest):
                 ],
             },
         )
+        self.reactor.advance(1)
 
         def got_result(_):
             self.assertMessages(
@@ -353,6 +343,7 @@ class SnapManagerTest(LandscapeTest):
                 ],
             },
         )
+        self.reactor.advance(1)
 
         def got_result(_):
             self.assertMessages(
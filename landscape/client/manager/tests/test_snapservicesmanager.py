@@ -6,6 +6,8 @@ from landscape.client.manager.manager import SUCCEEDED
 from landscape.client.manager.snapservicesmanager import SnapServicesManager
 from landscape.client.snap_http import SnapdHttpException
 from landscape.client.snap_http import SnapdResponse
+from landscape.client.snapd import SnapdChangeTracker
+from landscape.client.tests.helpers import FakeSnapdClient
 from landscape.client.tests.helpers import LandscapeTest
 from landscape.client.tests.helpers import ManagerHelper
 
@@ -23,6 +25,12 @@ class SnapServicesManagerTest(LandscapeTest):
         self.broker_service.message_store.set_accepted_types(
             ["operation-result"],
         )
+        self.snapd = FakeSnapdClient()
+        self.manager._snapd_changes = SnapdChangeTracker(
+            self.snapd,
+            self.reactor,
+        )
+
         self.plugin = SnapServicesManager()
         self.manager.add(self.plugin)
 
@@ -32,8 +40,7 @@ class SnapServicesManagerTest(LandscapeTest):
     def tearDown(self):
         mock.patch.stopall()
 
-    @mock.patch("landscape.client.manager.snapmanager.snap_http")
-    def test_start_service(self, mock_base_snap_http):
+    def test_start_service(self):
         self.snap_http.start.return_value = SnapdResponse(
             "async",
             202,
@@ -41,12 +48,7 @@ class SnapServicesManagerTest(LandscapeTest):
             None,
             change="1",
         )
-        mock_base_snap_http.check_changes.return_value = SnapdResponse(
-            "sync",
-            200,
-            "OK",
-            [{"id": "1", "status": "Done"}],
-        )
+        self.snapd.changes = [{"id": "1", "status": "Done"}]
         self.snap_http.get_apps.return_value = SnapdResponse(
             "sync",
             200,
@@ -71,6 +73,7 @@ class SnapServicesManagerTest(LandscapeTest):
                 ],
             },
         )
+        self.reactor.advance(1)
 
         def got_result(_):
             self.assertMessages(
@@ -111,6 +114,7 @@ class SnapServicesManagerTest(LandscapeTest):
                 "snaps": [{"name": "idonotexist", "args": {"enable": True}}],
             },
         )
+        self.reactor.advance(1)
 
         self.log_helper.ignore_errors(r".+idonotexist$")
 
@@ -136,8 +140,7 @@ class SnapServicesManagerTest(LandscapeTest):
 
         return result.addCallback(got_result)
 
-    @mock.patch("landscape.client.manager.snapmanager.snap_http")
-    def test_stop_service_batch(self, mock_base_snap_http):
+    def test_stop_service_batch(self):
         self.snap_http.stop_all.return_value = SnapdResponse(
             "async",
             202,
@@ -145,12 +148,7 @@ class SnapServicesManagerTest(LandscapeTest):
             None,
             change="1",
         )
-        mock_base_snap_http.check_changes.return_value = SnapdResponse(
-            "sync",
-            200,
-            "OK",
-            [{"id": "1", "status": "Done"}],
-        )
+        self.snapd.changes = [{"id": "1", "status": "Done"}]
         self.snap_http.get_apps.return_value = SnapdResponse(
             "sync",
             200,
@@ -182,6 +180,7 @@ class SnapServicesManagerTest(LandscapeTest):
                 "args": {"disable": False},
             },
         )
+        self.reactor.advance(1)
 
         def got_result(_):
             self.assertMessages(
@@ -204,8 +203,7 @@ class SnapServicesManagerTest(LandscapeTest):
 
         return result.addCallback(got_result)
 
-    @mock.patch("landscape.client.manager.snapmanager.snap_http")
-    def test_restart_service(self, mock_base_snap_http):
+    def test_restart_service(self):
         self.snap_http.restart_all.return_value = SnapdResponse(
             "async",
             202,
@@ -213,12 +211,7 @@ class SnapServicesManagerTest(LandscapeTest):
             None,
             change="1",
         )
-        mock_base_snap_http.check_changes.return_value = SnapdResponse(
-            "sync",
-            200,
-            "OK",
-            [{"id": "1", "status": "Done"}],
-        )
+        self.snapd.changes = [{"id": "1", "status": "Done"}]
         self.snap_http.get_apps.return_value = SnapdResponse(
             "sync",
             200,
@@ -249,6 +242,7 @@ class SnapServicesManagerTest(LandscapeTest):
                 ],
             },
         )
+        self.reactor.advance(1)
 
         def got_result(_):
             self.assertMessages(
@@ -270,8 +264,7 @@ class SnapServicesManagerTest(LandscapeTest):
 
         return result.addCallback(got_result)
 
-    @mock.patch("landscape.client.manager.snapmanager.snap_http")
-    def test_restart_service_update_failure(self, mock_base_snap_http):
+    def test_restart_service_update_failure(self):
         """
         Test when the client runs the operation successfully but
          `_send_snap_update` fails.
@@ -283,12 +276,7 @@ class SnapServicesManagerTest(LandscapeTest):
             None,
             change="1",
         )
-        mock_base_snap_http.check_changes.return_value = SnapdResponse(
-            "sync",
-            200,
-            "OK",
-            [{"id": "1", "status": "Done"}],
-        )
+        self.snapd.changes = [{"id": "1", "status": "Done"}]
         self.snap_http.get_apps.side_effect = SnapdHttpException(
             "An error occurred.",
         )
@@ -305,6 +293,7 @@ class SnapServicesManagerTest(LandscapeTest):
                 ],
             },
         )
+        self.reactor.advance(1)
 
         self.log_helper.ignore_errors(r".+error$")
 
@@ -1379,6 +1379,82 @@ class GroupOperationsMessagingTest(UserGroupTestBase):
         result.addCallback(handle_callback)
         return result
 
+    def test_wb_batched_events(self):
+        """
+        The requests received while a batch of operations is running are
+        handled together in the next batch, reporting their changes in a
+        single C{users} message.
+        """
+
+        def handle_callback(result):
+            messages = self.broker_service.message_store.get_pending_messages()
+            self.assertEqual(
+                [
+                    ("operation-result", 1),
+                    ("operation-result", 2),
+                    ("operation-result", 3),
+                    ("users", 3),
+                ],
+                [
+                    (message["type"], message["operation-id"])
+                    for message in messages
+                ],
+            )
+            groups = messages[3]["create-groups"]
+            self.assertEqual(
+                ["bizdev", "ops", "sales"],
+                sorted(group["name"] for group in groups),
+            )
+
+        self.setup_environment([], [], self.empty_shadow_file)
+        user_manager = self.plugins[1]
+        user_manager._batch_running = True
+        results = [
+            self.manager.dispatch_message(
+                {"groupname": name, "type": "add-group", "operation-id": i},
+            )
+            for i, name in enumerate(["bizdev", "sales", "ops"], 1)
+        ]
+        self.assertEqual(
+            [],
+            self.broker_service.message_store.get_pending_messages(),
+        )
+        user_manager._run_batch()
+        return gather_results(results).addCallback(handle_callback)
+
+    def test_wb_batched_events_with_failure(self):
+        """
+        A failing operation doesn't prevent the others of its batch from
+        being run.
+        """
+
+        def handle_callback(result):
+            messages = self.broker_service.message_store.get_pending_messages()
+            self.assertEqual(
+                [(1, SUCCEEDED), (2, FAILED), (3, SUCCEEDED)],
+                [
+                    (message["operation-id"], message["status"])
+                    for message in messages
+                    if message["type"] == "operation-result"
+                ],
+            )
+
+        self.log_helper.ignore_errors(KeyError)
+        self.setup_environment([], [], self.empty_shadow_file)
+        user_manager = self.plugins[1]
+        user_manager._batch_running = True
+        messages = [
+            {"groupname": "bizdev", "type": "add-group"},
+            {"groupname": "sales", "type": "remove-group"},
+            {"groupname": "ops", "type": "add-group"},
+        ]
+        results = []
+        for i, message in enumerate(messages, 1):
+            message["operation-id"] = i
+            results.append(self.manager.dispatch_message(message))
+        user_manager._run_batch()
+        return gather_results(results).addCallback(handle_callback)
+
     def test_add_group_event_in_sync(self):
         """
         The client and server should be in sync after an C{add-group}
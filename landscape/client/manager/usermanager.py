@@ -1,5 +1,9 @@
 import logging
 
+from twisted.internet.defer import Deferred
+from twisted.internet.defer import succeed
+from twisted.python.failure import Failure
+
 from landscape.client import IS_CORE
 from landscape.client.amp import ComponentConnector
 from landscape.client.amp import ComponentPublisher
@@ -37,6 +41,8 @@ class UserManager(ManagerPlugin):
             "remove-group-member": self._remove_group_member,
         }
         self._publisher = None
+        self._pending = []
+        self._batch_running = False
 
     def register(self, registry):
         """
@@ -81,11 +87,33 @@ class UserManager(ManagerPlugin):
                 logging.error(f"Error reading shadow file. {e}")
         return locked_users
 
+    @remote
+    def is_running_operations(self):
+        """Return whether a batch of user operations is in progress."""
+        return self._batch_running
+
     def _message_dispatch(self, message):
-        """Dispatch the given user-change request to the correct handler.
+        """Queue the given user-change request for the next batch.
+
+        Requests are handled in batches, sharing one connection to the user
+        monitor, and one detection of the changes before and after all the
+        operations of the batch: the requests received while a batch is
+        running are coalesced into the next one.
 
         @param message: The request we got from the server.
+        @return: A L{Deferred} firing once the request has been handled.
         """
+        result = Deferred()
+        self._pending.append((message, result))
+        if not self._batch_running:
+            self._run_batch()
+        return result
+
+    def _run_batch(self):
+        """Handle all the queued requests, then the ones queued meanwhile."""
+        self._batch_running = True
+        batch = self._pending
+        self._pending = []
         user_monitor_connector = RemoteUserMonitorConnector(
             self.registry.reactor,
             self.registry.config,
@@ -95,12 +123,44 @@ class UserManager(ManagerPlugin):
             self._user_monitor = user_monitor
             return user_monitor.detect_changes()
 
+        def batch_done(outcome):
+            user_monitor_connector.disconnect()
+            for i, (message, result) in enumerate(batch):
+                if isinstance(outcome, Failure):
+                    result.errback(outcome)
+                elif isinstance(outcome[i], Failure):
+                    result.errback(outcome[i])
+                else:
+                    result.callback(None)
+            if self._pending:
+                self._run_batch()
+            else:
+                self._batch_running = False
+
         result = user_monitor_connector.connect()
         result.addCallback(detect_changes)
-        result.addCallback(self._perform_operation, message)
-        result.addCallback(self._send_changes, message)
-        result.addCallback(lambda x: user_monitor_connector.disconnect())
-        return result
+        result.addCallback(self._perform_operations, batch)
+        result.addCallback(self._send_batch_changes, batch)
+        result.addBoth(batch_done)
+
+    def _perform_operations(self, result, batch):
+        """Perform the operations of C{batch} one after the other.
+
+        @return: A L{Deferred} firing with the outcome of each operation, a
+            L{Failure} if it couldn't be reported.
+        """
+        outcomes = []
+        result = succeed(None)
+        for message, _ in batch:
+            result.addCallback(self._perform_operation, message)
+            result.addBoth(outcomes.append)
+        return result.addCallback(lambda _: outcomes)
+
+    def _send_batch_changes(self, outcomes, batch):
+        """Report the changes of the batch, tagged with its last operation."""
+        last_message = batch[-1][0]
+        result = self._send_changes(None, last_message)
+        return result.addCallback(lambda _: outcomes)
 
     def _perform_operation(self, result, message):
         message_type = message["type"]
@@ -2,6 +2,7 @@ import subprocess
 
 from twisted.python.compat import itervalues
 
+from landscape.client.clones import shared_sample
 from landscape.client.diff import diff
 from landscape.client.monitor.plugin import DataWatcher
 from landscape.lib.jiffies import detect_jiffies
@@ -67,7 +68,12 @@ class ActiveProcessInfo(DataWatcher):
 
     def _get_processes(self):
         processes = {}
-        for process_info in self._process_info.get_all_process_info():
+        all_process_info = shared_sample(
+            self.registry.config,
+            ("process-info", self._proc_dir),
+            lambda: list(self._process_info.get_all_process_info()),
+        )
+        for process_info in all_process_info:
             if process_info["state"] != b"X":
                 processes[process_info["pid"]] = process_info
         return processes
@@ -16,12 +16,19 @@ class AptPreferences(DataWatcher):
     message_type = "apt-preferences"
     message_key = "data"
     run_interval = 900  # 15 minutes
+    watched_run_interval = 3600  # 1 hour
     scope = "package"
     size_limit = APT_PREFERENCES_SIZE_LIMIT
 
     def __init__(self, etc_apt_directory="/etc/apt"):
         self._etc_apt_directory = etc_apt_directory
 
+    def get_watched_files(self, config):
+        return [
+            os.path.join(self._etc_apt_directory, "preferences"),
+            os.path.join(self._etc_apt_directory, "preferences.d"),
+        ]
+
     def get_data(self):
         """Return a C{dict} mapping APT preferences files to their contents.
 
@@ -21,6 +21,15 @@ class ComputerTags(DataWatcher):
             args = sys.argv
         self.args = args  # Defined to specify args in unit tests
 
+    def get_watched_files(self, config):
+        filename = config.get_config_filename()
+        return [filename] if filename else []
+
+    def files_changed(self):
+        """Send the tags, as the configuration file changed."""
+        if self._session_id is not None:
+            self.exchange()
+
     def get_data(self):
         config = BrokerConfiguration()
         config.load(self.args)  # Load the default or specified config
@@ -2,8 +2,10 @@ import logging
 import time
 
 from landscape.client.accumulate import Accumulator
+from landscape.client.clones import shared_sample
 from landscape.client.monitor.plugin import MonitorPlugin
 from landscape.lib.monitor import CoverageMonitor
+from landscape.lib.timeseries import TimeSeriesBuffer
 
 LAST_MESURE_KEY = "last-cpu-usage-measure"
 ACCUMULATOR_KEY = "cpu-usage-accumulator"
@@ -27,7 +29,7 @@ class CPUUsage(MonitorPlugin):
     ):
         self._interval = interval
         self._monitor_interval = monitor_interval
-        self._cpu_usage_points = []
+        self._cpu_usage_points = TimeSeriesBuffer("qd")
         self._create_time = create_time
         self._stat_file = "/proc/stat"
 
@@ -51,8 +53,7 @@ class CPUUsage(MonitorPlugin):
         self.call_on_accepted("cpu-usage", self.send_message, True)
 
     def create_message(self):
-        cpu_points = self._cpu_usage_points
-        self._cpu_usage_points = []
+        cpu_points = self._cpu_usage_points.pop()
         return {"type": "cpu-usage", "cpu-usages": cpu_points}
 
     def send_message(self, urgent=False):
@@ -91,11 +92,19 @@ class CPUUsage(MonitorPlugin):
         This method computes the CPU usage from C{stat_file}.
         """
         result = None
-        try:
+
+        def read_stat():
             with open(stat_file, "r") as f:
                 # The first line of the file is the CPU information aggregated
                 # across cores.
-                stat = f.readline()
+                return f.readline()
+
+        try:
+            stat = shared_sample(
+                self.registry.config,
+                ("cpu-usage", stat_file),
+                read_stat,
+            )
         except OSError:
             logging.error(
                 f"Could not open {stat_file} for reading, "
@@ -4,6 +4,7 @@ import time
 from landscape.client.accumulate import Accumulator
 from landscape.client.monitor.plugin import MonitorPlugin
 from landscape.lib.monitor import CoverageMonitor
+from landscape.lib.timeseries import TimeSeriesBuffer
 
 
 class LoadAverage(MonitorPlugin):
@@ -24,7 +25,7 @@ class LoadAverage(MonitorPlugin):
         self._interval = interval
         self._monitor_interval = monitor_interval
         self._create_time = create_time
-        self._load_averages = []
+        self._load_averages = TimeSeriesBuffer("qd")
         self._get_load_average = get_load_average
 
     def register(self, registry):
@@ -47,8 +48,7 @@ class LoadAverage(MonitorPlugin):
         self.call_on_accepted("load-average", self.send_message, True)
 
     def create_message(self):
-        load_averages = self._load_averages
-        self._load_averages = []
+        load_averages = self._load_averages.pop()
         return {"type": "load-average", "load-averages": load_averages}
 
     def exchange(self, urgent=False):
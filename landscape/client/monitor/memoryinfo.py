@@ -1,9 +1,11 @@
 import time
 
 from landscape.client.accumulate import Accumulator
+from landscape.client.clones import shared_sample
 from landscape.client.monitor.plugin import MonitorPlugin
 from landscape.lib.monitor import CoverageMonitor
 from landscape.lib.sysstats import MemoryStats
+from landscape.lib.timeseries import TimeSeriesBuffer
 
 
 class MemoryInfo(MonitorPlugin):
@@ -24,7 +26,7 @@ class MemoryInfo(MonitorPlugin):
         self._interval = interval
         self._monitor_interval = monitor_interval
         self._source_filename = source_filename
-        self._memory_info = []
+        self._memory_info = TimeSeriesBuffer("qqq")
         self._create_time = create_time
 
     def register(self, registry):
@@ -45,8 +47,7 @@ class MemoryInfo(MonitorPlugin):
         self.call_on_accepted("memory-info", self.send_message, True)
 
     def create_message(self):
-        memory_info = self._memory_info
-        self._memory_info = []
+        memory_info = self._memory_info.pop()
         return {"type": "memory-info", "memory-info": memory_info}
 
     def send_message(self, urgent=False):
@@ -68,7 +69,11 @@ class MemoryInfo(MonitorPlugin):
     def run(self):
         self._monitor.ping()
         new_timestamp = int(self._create_time())
-        memstats = MemoryStats(self._source_filename)
+        memstats = shared_sample(
+            self.registry.config,
+            ("memory-info", self._source_filename),
+            lambda: MemoryStats(self._source_filename),
+        )
         memory_step_data = self._accumulate(
             new_timestamp,
             memstats.free_memory,
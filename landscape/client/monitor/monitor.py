@@ -2,6 +2,8 @@
 import os
 
 from landscape.client.broker.client import BrokerClient
+from landscape.lib.filewatch import FileWatcher
+from landscape.lib.reactor import EventHandlingReactor
 
 
 class Monitor(BrokerClient):
@@ -26,10 +28,30 @@ class Monitor(BrokerClient):
             self.persist.load(persist_filename)
         self._plugins = []
         self.step_size = step_size
+        self._file_watcher = None
         self.reactor.call_every(self.config.flush_interval, self.flush)
 
+    @property
+    def file_watcher(self):
+        """The L{FileWatcher} shared by the plugins.
+
+        Changes are notified by inotify when the Twisted reactor is used
+        directly, and the files are polled otherwise.
+        """
+        if self._file_watcher is None:
+            self._file_watcher = FileWatcher(
+                self.reactor,
+                use_inotify=isinstance(self.reactor, EventHandlingReactor),
+            )
+        return self._file_watcher
+
     def flush(self):
-        """Flush data to disk."""
+        """Flush data to disk.
+
+        The C{flush} event is fired first, so that plugins keeping state in
+        memory get a chance to write it to the persist.
+        """
+        self.reactor.fire("flush")
         if self.persist_filename:
             self.persist.save(self.persist_filename)
 
@@ -2,11 +2,12 @@ import codecs
 import os
 import time
 
-from landscape.client.accumulate import Accumulator
+from landscape.client.accumulate import BatchAccumulator
 from landscape.client.monitor.plugin import MonitorPlugin
 from landscape.lib.disk import get_mount_info
 from landscape.lib.disk import is_device_removable
 from landscape.lib.monitor import CoverageMonitor
+from landscape.lib.timeseries import KeyedTimeSeriesBuffer
 
 
 class MountInfo(MonitorPlugin):
@@ -34,14 +35,18 @@ class MountInfo(MonitorPlugin):
             statvfs = os.statvfs
         self._statvfs = statvfs
         self._create_time = create_time
-        self._free_space = []
+        self._free_space = KeyedTimeSeriesBuffer("qq")
         self._mount_info = []
         self._mount_info_to_persist = None
         self.is_device_removable = is_device_removable
 
     def register(self, registry):
         super().register(registry)
-        self._accumulate = Accumulator(self._persist, self.registry.step_size)
+        self._accumulate = BatchAccumulator(
+            self._persist,
+            self.registry.step_size,
+        )
+        self.registry.reactor.call_on("flush", self._accumulate.flush)
         self._monitor = CoverageMonitor(
             self.run_interval,
             0.8,
@@ -55,6 +60,10 @@ class MountInfo(MonitorPlugin):
         self.registry.reactor.call_on("stop", self._monitor.log, priority=2000)
         self.call_on_accepted("mount-info", self.send_messages, True)
 
+    def _reset(self):
+        self._accumulate.reset()
+        super()._reset()
+
     def create_messages(self):
         return [
             message
@@ -75,14 +84,14 @@ class MountInfo(MonitorPlugin):
 
     def create_free_space_message(self):
         if self._free_space:
-            items_to_exchange = self._free_space[
-                : self.max_free_space_items_to_exchange
-            ]
-            message = {"type": "free-space", "free-space": items_to_exchange}
-            self._free_space = self._free_space[
-                self.max_free_space_items_to_exchange :
+            points = self._free_space.pop(
+                self.max_free_space_items_to_exchange,
+            )
+            items_to_exchange = [
+                (timestamp, mount_point, free_space)
+                for mount_point, (timestamp, free_space) in points
             ]
-            return message
+            return {"type": "free-space", "free-space": items_to_exchange}
         return None
 
     def send_messages(self, urgent=False):
@@ -112,16 +121,21 @@ class MountInfo(MonitorPlugin):
         self._monitor.ping()
         now = int(self._create_time())
         current_mount_points = set()
-        for mount_info in self._get_mount_info():
+        mount_infos = list(self._get_mount_info())
+        samples = [
+            (
+                ("accumulate-free-space", mount_info["mount-point"]),
+                mount_info.pop("free-space"),
+            )
+            for mount_info in mount_infos
+        ]
+        all_step_data = self._accumulate(now, samples)
+        for mount_info, step_data in zip(mount_infos, all_step_data):
             mount_point = mount_info["mount-point"]
-            free_space = mount_info.pop("free-space")
-
-            key = ("accumulate-free-space", mount_point)
-            step_data = self._accumulate(now, free_space, key)
             if step_data:
                 timestamp = step_data[0]
                 free_space = int(step_data[1])
-                self._free_space.append((timestamp, mount_point, free_space))
+                self._free_space.append(mount_point, (timestamp, free_space))
 
             prev_mount_info = self._persist.get(("mount-info", mount_point))
             if not prev_mount_info or prev_mount_info != mount_info:
@@ -4,10 +4,12 @@ with the inbound/outbound traffic per interface per step interval.
 """
 import time
 
-from landscape.client.accumulate import Accumulator
+from landscape.client.accumulate import BatchAccumulator
+from landscape.client.clones import shared_sample
 from landscape.client.monitor.plugin import MonitorPlugin
 from landscape.lib.network import get_network_traffic
 from landscape.lib.network import is_64
+from landscape.lib.timeseries import KeyedTimeSeriesBuffer
 
 
 class NetworkActivity(MonitorPlugin):
@@ -30,7 +32,7 @@ class NetworkActivity(MonitorPlugin):
     ):
         self._source_file = network_activity_file
         # accumulated values for sending out via message
-        self._network_activity = {}
+        self._network_activity = KeyedTimeSeriesBuffer("qqq")
         # our last traffic sample for calculating a traffic delta
         self._last_activity = {}
         self._create_time = create_time
@@ -40,9 +42,17 @@ class NetworkActivity(MonitorPlugin):
 
     def register(self, registry):
         super().register(registry)
-        self._accumulate = Accumulator(self._persist, self.registry.step_size)
+        self._accumulate = BatchAccumulator(
+            self._persist,
+            self.registry.step_size,
+        )
+        self.registry.reactor.call_on("flush", self._accumulate.flush)
         self.call_on_accepted("network-activity", self.exchange, True)
 
+    def _reset(self):
+        self._accumulate.reset()
+        super()._reset()
+
     def create_message(self):
         network_activity = {}
         items = 0
@@ -52,11 +62,10 @@ class NetworkActivity(MonitorPlugin):
                 # encode it here right before the message is created as it is
                 # used as string in other places.
                 interface = interface.encode("ascii")
-                network_activity[interface] = []
-                while data and items < self.max_network_items_to_exchange:
-                    item = data.pop(0)
-                    network_activity[interface].append(item)
-                    items += 1
+                network_activity[interface] = data.pop(
+                    self.max_network_items_to_exchange - items,
+                )
+                items += len(network_activity[interface])
                 if items >= self.max_network_items_to_exchange:
                     break
         if not network_activity:
@@ -121,25 +130,25 @@ class NetworkActivity(MonitorPlugin):
         accumulator, recording step data.
         """
         new_timestamp = int(self._create_time())
-        new_traffic = get_network_traffic(self._source_file)
-        for interface, delta_out, delta_in in self._traffic_delta(new_traffic):
-            out_step_data = self._accumulate(
-                new_timestamp,
-                delta_out,
-                f"delta-out-{interface}",
-            )
-
-            in_step_data = self._accumulate(
-                new_timestamp,
-                delta_in,
-                f"delta-in-{interface}",
-            )
-
+        new_traffic = shared_sample(
+            self.registry.config,
+            ("network-activity", self._source_file),
+            lambda: get_network_traffic(self._source_file),
+        )
+        deltas = list(self._traffic_delta(new_traffic))
+        samples = []
+        for interface, delta_out, delta_in in deltas:
+            samples.append((f"delta-out-{interface}", delta_out))
+            samples.append((f"delta-in-{interface}", delta_in))
+        step_data = self._accumulate(new_timestamp, samples)
+
+        for index, (interface, _, _) in enumerate(deltas):
+            out_step_data, in_step_data = step_data[2 * index : 2 * index + 2]
             # there's only data when we cross a step boundary
             if not (in_step_data and out_step_data):
                 continue
 
-            steps = self._network_activity.setdefault(interface, [])
-            steps.append(
+            self._network_activity.append(
+                interface,
                 (in_step_data[0], int(in_step_data[1]), int(out_step_data[1])),
             )
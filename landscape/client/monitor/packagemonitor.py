@@ -1,10 +1,13 @@
 import logging
 import os
 
+from twisted.internet.defer import DeferredLock
+from twisted.internet.defer import succeed
 from twisted.internet.utils import getProcessOutput
 
 from landscape.client.monitor.plugin import MonitorPlugin
 from landscape.client.package.reporter import find_reporter_command
+from landscape.client.package.reporter import PackageReporterConnector
 from landscape.lib.apt.package.store import PackageStore
 from landscape.lib.encoding import encode_values
 
@@ -16,8 +19,15 @@ class PackageMonitor(MonitorPlugin):
 
     _reporter_command = None
 
+    # How many times to try connecting to a freshly spawned reporter worker.
+    worker_connect_retries = 20
+
     def __init__(self, package_store_filename=None):
         super().__init__()
+        self._worker_lock = DeferredLock()
+        self._worker_process = None
+        self._worker_connector = None
+        self._worker = None
         if package_store_filename:
             self._package_store = PackageStore(package_store_filename)
         else:
@@ -143,6 +153,8 @@ class PackageMonitor(MonitorPlugin):
         # path is set to None so that getProcessOutput does not
         # chdir to "." see bug #211373
         env = encode_values(env)
+        if self.config.package_reporter_worker and not self.config.clones:
+            return self._run_reporter_worker(args, env)
         result = getProcessOutput(
             self._reporter_command,
             args=args,
@@ -157,6 +169,63 @@ class PackageMonitor(MonitorPlugin):
         if output:
             logging.warning(f"Package reporter output:\n{output}")
 
+    def _run_reporter_worker(self, args, env):
+        """Request a run from the long-lived package reporter worker.
+
+        The worker gets spawned first, if we're not connected to it yet.
+        """
+        result = self._worker_lock.run(self._get_reporter_worker, args, env)
+        result.addCallback(lambda worker: worker.run_reporter())
+        result.addErrback(self._reporter_worker_failed)
+        return result
+
+    def _get_reporter_worker(self, args, env):
+        if self._worker is not None:
+            return succeed(self._worker)
+        if self._worker_process is None:
+            self._worker_process = getProcessOutput(
+                self._reporter_command,
+                args=args + ["--worker"],
+                env=env,
+                errortoo=1,
+                path=None,
+            )
+            self._worker_process.addBoth(self._reporter_worker_exited)
+        self._worker_connector = PackageReporterConnector(
+            self.registry.reactor,
+            self.config,
+        )
+        result = self._worker_connector.connect(
+            max_retries=self.worker_connect_retries,
+            quiet=True,
+        )
+
+        def connected(worker):
+            self._worker = worker
+            return worker
+
+        return result.addCallback(connected)
+
+    def _reporter_worker_exited(self, output):
+        # Our connection, if any, will fail on the next request and get
+        # dropped then.  The worker might also have exited because another
+        # one is already running, in which case we'll connect to that one.
+        self._worker_process = None
+        if output:
+            logging.warning(f"Package reporter worker output:\n{output}")
+
+    def _reporter_worker_failed(self, failure):
+        logging.warning(
+            f"Couldn't request a package reporter run: {failure.value}",
+        )
+        self._disconnect_reporter_worker()
+
+    def _disconnect_reporter_worker(self):
+        if self._worker_connector is not None:
+            self._worker_connector.disconnect()
+            self._worker_connector = None
+        self._worker = None
+
     def _reset(self):
         """
         Remove all tasks *except* the resynchronize task.  This is
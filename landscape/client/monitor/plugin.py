@@ -1,22 +1,36 @@
+import hashlib
+from logging import exception
 from logging import info
 
 from twisted.internet.defer import succeed
 
 from landscape.client.broker.client import BrokerClientPlugin
+from landscape.lib import bpickle
 from landscape.lib.format import format_object
 from landscape.lib.log import log_failure
 
 
+def get_digest(data):
+    """Return a stable digest of C{data}, hashing its L{bpickle} encoding."""
+    return hashlib.sha256(bpickle.dumps(data)).hexdigest()
+
+
 class MonitorPlugin(BrokerClientPlugin):
     """
     @cvar persist_name: If specified as a string, a C{_persist} attribute
     will be available after registration.
+    @cvar watched_run_interval: If specified, the interval used instead of
+    C{run_interval} when changes to the files returned by
+    L{get_watched_files} are notified by inotify, running only as a safety
+    net.
     """
 
     persist_name = None
     scope = None
+    watched_run_interval = None
 
     def register(self, monitor):
+        self._watch_files(monitor)
         super().register(monitor)
         if self.persist_name is not None:
             self._persist = self.monitor.persist.root_at(self.persist_name)
@@ -27,6 +41,34 @@ class MonitorPlugin(BrokerClientPlugin):
         if self.persist_name is not None:
             self.registry.persist.remove(self.persist_name)
 
+    def get_watched_files(self, config):
+        """
+        Return the paths of the files or directories whose changes call
+        L{files_changed}.
+
+        @param config: The L{MonitorConfiguration} of the monitor.
+        """
+        return []
+
+    def files_changed(self):
+        """Run the plugin, as some of its watched files changed."""
+        if self._session_id is not None and hasattr(self, "run"):
+            self._run_with_error_log()
+
+    def _watch_files(self, monitor):
+        try:
+            paths = self.get_watched_files(monitor.config)
+            if not paths:
+                return
+            file_watcher = monitor.file_watcher
+            for path in paths:
+                file_watcher.watch(path, self.files_changed)
+        except Exception:
+            exception(f"Couldn't watch the files of {format_object(self)}")
+            return
+        if file_watcher.uses_inotify and self.watched_run_interval:
+            self.run_interval = self.watched_run_interval
+
     @property
     def persist(self):
         """Return our L{Persist}, if any."""
@@ -45,6 +87,8 @@ class DataWatcher(MonitorPlugin):
     when the result of get_data() has changed since the last time it
     was called.
 
+    Only a digest of the data is persisted, rather than the data itself.
+
     Subclasses should provide a get_data method, and message_type,
     message_key, and persist_name class attributes.
     """
@@ -58,10 +102,28 @@ class DataWatcher(MonitorPlugin):
         has not changed since the last call.
         """
         data = self.get_data()
-        if self._persist.get("data") != data:
-            self._persist.set("data", data)
+        digest = get_digest(data)
+        if self._get_persisted_digest() != digest:
+            self._persist.set("digest", digest)
             return {"type": self.message_type, self.message_key: data}
 
+    def _get_persisted_digest(self):
+        """
+        Return the digest of the last data, C{None} having been the last one
+        if there's none, converting the full copy of it persisted by older
+        versions if needed.
+        """
+        if self._persist.has("data"):
+            data = self._persist.get("data")
+            self._persist.remove("data")
+            self._persist.set("digest", get_digest(data))
+        return self._persist.get("digest", get_digest(None))
+
+    def _forget_data(self):
+        """Forget the last data, so that it's sent again."""
+        self._persist.remove("digest")
+        self._persist.remove("data")
+
     def send_message(self, urgent):
         message = self.get_message()
         if message is not None:
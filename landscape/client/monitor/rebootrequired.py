@@ -19,12 +19,16 @@ class RebootRequired(MonitorPlugin):
     persist_name = "reboot-required"
     scope = "package"
     run_interval = 900  # 15 minutes
+    watched_run_interval = 3600  # 1 hour
     run_immediately = True
 
     def __init__(self, reboot_required_filename=REBOOT_REQUIRED_FILENAME):
         self._flag_filename = reboot_required_filename
         self._packages_filename = reboot_required_filename + ".pkgs"
 
+    def get_watched_files(self, config):
+        return [self._flag_filename, self._packages_filename]
+
     def _get_flag(self):
         """Return a boolean indicating whether the computer needs a reboot."""
         return os.path.exists(self._flag_filename)
@@ -26,7 +26,7 @@ class MonitorService(LandscapeService):
             f"{self.service_name}.bpickle",
         )
         super().__init__(config)
-        self.plugins = self.get_plugins()
+        self.plugins = []
         self.monitor = Monitor(
             self.reactor,
             self.config,
@@ -40,26 +40,33 @@ class MonitorService(LandscapeService):
         )
 
     def get_plugins(self):
-        plugins = []
-
-        for plugin_name in self.config.plugin_factories:
-            try:
-                plugin = namedClass(
-                    "landscape.client.monitor."
-                    f"{plugin_name.lower()}.{plugin_name}",
-                )
-                plugins.append(plugin())
-            except ModuleNotFoundError:
-                logging.warning(
-                    f"Invalid monitor plugin specified: '{plugin_name}'. "
-                    "See `example.conf` for a full list of monitor plugins.",
-                )
-            except Exception as exc:
-                logging.warning(
-                    f"Unable to load monitor plugin '{plugin_name}': {exc}",
-                )
-
-        return plugins
+        """Return instances of all the plugins enabled in the configuration."""
+        plugins = (
+            self.get_plugin(plugin_name)
+            for plugin_name in self.config.plugin_factories
+        )
+        return [plugin for plugin in plugins if plugin is not None]
+
+    def get_plugin(self, plugin_name):
+        """Return an instance of the plugin called C{plugin_name}.
+
+        @return: The plugin, or C{None} if it can't be loaded.
+        """
+        try:
+            plugin = namedClass(
+                "landscape.client.monitor."
+                f"{plugin_name.lower()}.{plugin_name}",
+            )
+            return plugin()
+        except ModuleNotFoundError:
+            logging.warning(
+                f"Invalid monitor plugin specified: '{plugin_name}'. "
+                "See `example.conf` for a full list of monitor plugins.",
+            )
+        except Exception as exc:
+            logging.warning(
+                f"Unable to load monitor plugin '{plugin_name}': {exc}",
+            )
 
     def startService(self):  # noqa: N802
         """Start the monitor."""
@@ -69,9 +76,10 @@ class MonitorService(LandscapeService):
         def start_plugins(broker):
             self.broker = broker
             self.monitor.broker = broker
-            for plugin in self.plugins:
-                self.monitor.add(plugin)
-            return self.broker.register_client(self.service_name)
+            loaded = self.load_plugins(self.monitor, self.get_plugin)
+            return loaded.addCallback(
+                lambda _: self.broker.register_client(self.service_name),
+            )
 
         self.connector = RemoteBrokerConnector(self.reactor, self.config)
         connected = self.connector.connect()
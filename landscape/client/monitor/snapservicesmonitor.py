@@ -1,28 +1,73 @@
 import logging
 
-from landscape.client import snap_http
+from twisted.internet.defer import succeed
+
 from landscape.client.monitor.plugin import DataWatcher
 from landscape.client.snap_http import SnapdHttpException
+from landscape.client.snapd import SnapdClient
 
 
 class SnapServicesMonitor(DataWatcher):
+    """Report the snap services, whenever they change.
+
+    The services are listed asynchronously with a L{SnapdClient}, so that a
+    slow snapd doesn't stall the monitor.  When snapd answers exactly what
+    it did the last time, the services are known to be unchanged and aren't
+    compared with the last reported ones.
+
+    @param snapd: The L{SnapdClient} to use, by default one talking to the
+        snapd socket.
+    """
 
     message_type = "snap-services"
     message_key = "services"
     persist_name = message_type
     scope = "snaps"
 
+    def __init__(self, snapd=None):
+        self._snapd = snapd
+        self._services = []
+        self._digest = None
+        self._reported_digest = None
+
     def register(self, registry):
         self.config = registry.config
         self.run_interval = 60  # 1 minute
         super().register(registry)
+        if self._snapd is None:
+            self._snapd = SnapdClient()
 
-    def get_data(self):
-        try:
-            services = snap_http.get_apps(services_only=True).result
-        except SnapdHttpException as e:
-            logging.warning(f"Unable to list services: {e}")
-            services = []
-        services.sort(key=lambda x: x["name"])
+    def _reset(self):
+        super()._reset()
+        self._reported_digest = None
 
+    def send_message(self, urgent):
+        result = self._snapd.get_apps_with_digest(services_only=True)
+        result.addCallback(self._got_services, urgent)
+        result.addErrback(self._list_failed, urgent)
+        return result
+
+    def _got_services(self, response_digest, urgent):
+        response, digest = response_digest
+        if digest == self._reported_digest:
+            return succeed(None)
+        self._services = response.result
+        self._digest = digest
+        return super().send_message(urgent)
+
+    def _list_failed(self, failure, urgent):
+        failure.trap(SnapdHttpException)
+        logging.warning(f"Unable to list services: {failure.value}")
+        self._services = []
+        self._digest = None
+        return super().send_message(urgent)
+
+    def get_message(self):
+        message = super().get_message()
+        # Either way, the services are now the persisted ones.
+        self._reported_digest = self._digest
+        return message
+
+    def get_data(self):
+        services = sorted(self._services, key=lambda x: x["name"])
         return {"running": services}
@@ -1,6 +1,8 @@
 from landscape.client.monitor.computertags import ComputerTags
 from landscape.client.tests.helpers import LandscapeTest
 from landscape.client.tests.helpers import MonitorHelper
+from landscape.lib.filewatch import DEBOUNCE_DELAY
+from landscape.lib.filewatch import POLL_INTERVAL
 
 
 class ComputerTagsTest(LandscapeTest):
@@ -63,3 +65,27 @@ class ComputerTagsTest(LandscapeTest):
         Makes sure no errors when tags section is empty
         """
         self.assertEqual(self.plugin.get_data(), None)
+
+    def test_config_file_watched(self):
+        """
+        Tags are sent shortly after the configuration file of the monitor
+        changes, without parsing the command line again.
+        """
+        filename = self.makeFile("[client]\ntags = check")
+        self.config.config = filename
+        plugin = ComputerTags(args=["hello.py", "--config", filename])
+        self.monitor.add(plugin)
+        self.mstore.set_accepted_types(["computer-tags"])
+        self.makeFile("[client]\ntags = check,linode", path=filename)
+        self.reactor.advance(POLL_INTERVAL + DEBOUNCE_DELAY)
+        messages = self.mstore.get_pending_messages()
+        self.assertEqual("check,linode", messages[-1]["tags"])
+
+    def test_unknown_arguments(self):
+        """
+        Arguments unknown to the broker don't prevent the plugin from being
+        registered.
+        """
+        plugin = ComputerTags(args=["hello.py", "--monitor-plugins", "ALL"])
+        self.monitor.add(plugin)
+        self.assertIn(plugin, self.monitor.get_plugins())
@@ -156,7 +156,6 @@ class CPUUsagePluginTest(LandscapeTest):
         plugin = CPUUsage(create_time=self.reactor.time)
         self.monitor.add(plugin)
 
-        plugin._cpu_usage_points = []
         message = plugin.create_message()
         self.assertIn("type", message)
         self.assertEqual(message["type"], "cpu-usage")
@@ -165,7 +164,7 @@ class CPUUsagePluginTest(LandscapeTest):
         self.assertEqual(len(cpu_usages), 0)
 
         point = (60, 1.0)
-        plugin._cpu_usage_points = [point]
+        plugin._cpu_usage_points.append(point)
         message = plugin.create_message()
         self.assertIn("type", message)
         self.assertEqual(message["type"], "cpu-usage")
@@ -196,7 +195,7 @@ class CPUUsagePluginTest(LandscapeTest):
         self.mstore.set_accepted_types(["cpu-usage"])
 
         plugin = CPUUsage(create_time=self.reactor.time)
-        plugin._cpu_usage_points = [(60, 1.0)]
+        plugin._cpu_usage_points.append((60, 1.0))
         self.monitor.add(plugin)
 
         self.monitor.exchange()
@@ -173,6 +173,20 @@ Inter-|   Receive                           |  Transmit
         message = self.plugin.create_message()
         self.assertFalse(message)
 
+    def test_accumulated_state_persisted_on_flush(self):
+        """
+        The accumulated traffic of each interface is written to the persist
+        when the monitor is flushed.
+        """
+        self.write_activity(lo_in=1000, lo_out=1000)
+        self.plugin.run()
+        self.reactor.advance(30)
+        self.write_activity(lo_in=2000, lo_out=2000)
+        self.plugin.run()
+        self.assertEqual(None, self.plugin._persist.get("delta-in-lo"))
+        self.monitor.flush()
+        self.assertEqual((30, 30000), self.plugin._persist.get("delta-in-lo"))
+
     def test_exchange_no_message(self):
         """
         No message is sent to the exchange if there isn't a traffic delta.
@@ -2,6 +2,8 @@ import os
 from unittest import mock
 
 from twisted.internet.defer import Deferred
+from twisted.internet.defer import fail
+from twisted.internet.defer import succeed
 
 from landscape.client.monitor.packagemonitor import PackageMonitor
 from landscape.client.tests.helpers import LandscapeTest
@@ -211,6 +213,77 @@ class PackageMonitorTest(LandscapeTest):
 
         return result.addCallback(got_result)
 
+    @mock.patch("landscape.client.monitor.packagemonitor.getProcessOutput")
+    @mock.patch(
+        "landscape.client.monitor.packagemonitor.PackageReporterConnector",
+    )
+    def test_spawn_reporter_worker(self, connector_mock, process_mock):
+        """
+        With the C{package_reporter_worker} option, a long-lived reporter
+        worker is spawned and connected to once, and then asked for a run
+        every time the reporter would otherwise be spawned.
+        """
+        self.config.package_reporter_worker = True
+        process_mock.return_value = Deferred()
+        worker = mock.Mock()
+        worker.run_reporter.return_value = succeed(True)
+        connector_mock.return_value.connect.return_value = succeed(worker)
+
+        package_monitor = PackageMonitor(self.package_store_filename)
+        self.monitor.add(package_monitor)
+        self.successResultOf(package_monitor.spawn_reporter())
+        self.successResultOf(package_monitor.spawn_reporter())
+
+        process_mock.assert_called_once_with(
+            mock.ANY,
+            args=["--quiet", "-c", self.config.config, "--worker"],
+            env=mock.ANY,
+            errortoo=1,
+            path=None,
+        )
+        connector_mock.return_value.connect.assert_called_once_with(
+            max_retries=package_monitor.worker_connect_retries,
+            quiet=True,
+        )
+        self.assertEqual(2, worker.run_reporter.call_count)
+
+    @mock.patch("landscape.client.monitor.packagemonitor.getProcessOutput")
+    @mock.patch(
+        "landscape.client.monitor.packagemonitor.PackageReporterConnector",
+    )
+    def test_spawn_reporter_worker_again_when_gone(
+        self,
+        connector_mock,
+        process_mock,
+    ):
+        """
+        If the worker can't be reached anymore, a new one gets spawned on
+        the next run.
+        """
+        self.config.package_reporter_worker = True
+        processes = [Deferred(), Deferred()]
+        process_mock.side_effect = processes
+        worker = mock.Mock()
+        worker.run_reporter.return_value = succeed(True)
+        connector_mock.return_value.connect.return_value = succeed(worker)
+
+        package_monitor = PackageMonitor(self.package_store_filename)
+        self.monitor.add(package_monitor)
+        self.successResultOf(package_monitor.spawn_reporter())
+
+        processes[0].callback(b"")
+        worker.run_reporter.return_value = fail(RuntimeError("gone"))
+        self.successResultOf(package_monitor.spawn_reporter())
+        self.assertIn(
+            "Couldn't request a package reporter run: gone",
+            self.logfile.getvalue(),
+        )
+        connector_mock.return_value.disconnect.assert_called_once_with()
+
+        worker.run_reporter.return_value = succeed(True)
+        self.successResultOf(package_monitor.spawn_reporter())
+        self.assertEqual(2, process_mock.call_count)
+
     def test_call_on_accepted(self):
         with mock.patch.object(self.package_monitor, "spawn_reporter") as mkd:
             self.monitor.add(self.package_monitor)
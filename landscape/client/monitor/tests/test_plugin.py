@@ -3,9 +3,12 @@ from unittest.mock import Mock
 from unittest.mock import patch
 
 from landscape.client.monitor.plugin import DataWatcher
+from landscape.client.monitor.plugin import get_digest
 from landscape.client.monitor.plugin import MonitorPlugin
 from landscape.client.tests.helpers import LandscapeTest
 from landscape.client.tests.helpers import MonitorHelper
+from landscape.lib.filewatch import DEBOUNCE_DELAY
+from landscape.lib.filewatch import POLL_INTERVAL
 from landscape.lib.schema import Int
 from landscape.lib.testing import LogKeeperHelper
 from landscape.message_schemas.message import Message
@@ -112,6 +115,34 @@ class MonitorPluginTest(LandscapeTest):
         self.reactor.fire("resynchronize", scopes=["chrutfup"])
         self.assertEqual(self.monitor.persist.get("wubble"), {"hi": "there"})
 
+    def test_watched_files(self):
+        """
+        Plugins are run shortly after the files they watch change.
+        """
+        filename = self.makeFile()
+        plugin = MonitorPlugin()
+        plugin.run = Mock()
+        plugin.run_interval = None
+        plugin.get_watched_files = lambda config: [filename]
+        plugin.register(self.monitor)
+        plugin.run.assert_not_called()
+        self.makeFile("changed", path=filename)
+        self.reactor.advance(POLL_INTERVAL + DEBOUNCE_DELAY)
+        plugin.run.assert_called_once_with()
+
+    def test_watched_files_error(self):
+        """
+        Errors setting up the watch of the files of a plugin are logged, and
+        don't prevent the plugin from being registered.
+        """
+        self.log_helper.ignore_errors(ZeroDivisionError)
+        plugin = MonitorPlugin()
+        plugin.persist_name = "wubble"
+        plugin.get_watched_files = lambda config: 1 / 0
+        plugin.register(self.monitor)
+        self.assertIsNotNone(plugin.persist)
+        self.assertIn("Couldn't watch the files of", self.logfile.getvalue())
+
 
 class StubDataWatchingPlugin(DataWatcher):
 
@@ -149,6 +180,29 @@ class DataWatcherTest(LandscapeTest):
         )
         self.assertEqual(self.plugin.get_message(), None)
 
+    def test_get_message_persists_digest(self):
+        """
+        Only a digest of the data is persisted, not the data itself.
+        """
+        self.plugin.get_message()
+        self.assertEqual(get_digest(1), self.plugin._persist.get("digest"))
+        self.assertFalse(self.plugin._persist.has("data"))
+
+    def test_get_message_none_unchanged(self):
+        """Without any previous data, C{None} data isn't sent."""
+        self.plugin.data = None
+        self.assertIsNone(self.plugin.get_message())
+
+    def test_get_message_converts_persisted_data(self):
+        """
+        The data persisted by older versions is replaced by its digest, and
+        considered as the last data.
+        """
+        self.plugin._persist.set("data", 1)
+        self.assertIsNone(self.plugin.get_message())
+        self.assertFalse(self.plugin._persist.has("data"))
+        self.assertEqual(get_digest(1), self.plugin._persist.get("digest"))
+
     def test_basic_exchange(self):
         # Is this really want we want to do?
         self.mstore.set_accepted_types(["wubble"])
@@ -3,11 +3,12 @@ from unittest import mock
 from landscape.client.monitor.rebootrequired import RebootRequired
 from landscape.client.tests.helpers import LandscapeTest
 from landscape.client.tests.helpers import MonitorHelper
+from landscape.lib.filewatch import DEBOUNCE_DELAY
+from landscape.lib.filewatch import POLL_INTERVAL
 from landscape.lib.testing import LogKeeperHelper
 
 
 class RebootRequiredTest(LandscapeTest):
-
     helpers = [MonitorHelper, LogKeeperHelper]
 
     def setUp(self):
@@ -144,3 +145,15 @@ class RebootRequiredTest(LandscapeTest):
         self.plugin.run()
         messages = self.mstore.get_pending_messages()
         self.assertEqual(len(messages), 2)
+
+    def test_flag_file_changed(self):
+        """
+        The plugin sends a message shortly after the reboot-required flag
+        file is created, without waiting for its next run.
+        """
+        self.makeFile(path=self.reboot_required_filename, content="")
+        self.reactor.advance(POLL_INTERVAL + DEBOUNCE_DELAY)
+        self.assertMessages(
+            self.mstore.get_pending_messages(),
+            [{"type": "reboot-required-info", "flag": True, "packages": []}],
+        )
@@ -28,10 +28,36 @@ class MonitorServiceTest(LandscapeTest):
 
     def test_plugins(self):
         """
-        By default the L{MonitorService.plugins} list holds an instance of
-        every enabled monitor plugin.
+        By default L{MonitorService.get_plugins} returns an instance of every
+        enabled monitor plugin.
         """
-        self.assertEqual(len(self.service.plugins), len(ALL_PLUGINS))
+        self.assertEqual(len(self.service.get_plugins()), len(ALL_PLUGINS))
+
+    def test_plugins_loaded_on_start(self):
+        """
+        The plugins aren't loaded when the service is created, but one at a
+        time once it's connected to the broker.
+        """
+        self.assertEqual([], self.service.plugins)
+        self.service.config.load(
+            ["--monitor-plugins", "ComputerInfo, LoadAverage"],
+        )
+        self.service.monitor.broker = Mock()
+        loaded = self.service.load_plugins(
+            self.service.monitor,
+            self.service.get_plugin,
+        )
+        self.assertEqual(1, len(self.service.plugins))
+        self.assertFalse(loaded.called)
+        self.service.reactor.advance(0)
+        self.assertTrue(loaded.called)
+        [computer_info, load_average] = self.service.monitor.get_plugins()
+        self.assertTrue(isinstance(computer_info, ComputerInfo))
+        self.assertTrue(isinstance(load_average, LoadAverage))
+        self.assertEqual(
+            [computer_info, load_average],
+            self.service.plugins,
+        )
 
     def test_get_plugins(self):
         """
@@ -94,6 +120,7 @@ class MonitorServiceTest(LandscapeTest):
 
         self.broker_service.startService()
         started = self.service.startService()
+        self.service.reactor.advance(0)
         return started.addCallback(assert_broker_connection)
 
     def test_stop_service(self):
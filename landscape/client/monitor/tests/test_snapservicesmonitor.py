@@ -1,4 +1,7 @@
-from unittest.mock import patch
+from unittest.mock import Mock
+
+from twisted.internet.defer import fail
+from twisted.internet.defer import succeed
 
 from landscape.client.monitor.snapservicesmonitor import SnapServicesMonitor
 from landscape.client.snap_http import SnapdHttpException
@@ -14,14 +17,17 @@ class SnapServicesMonitorTest(LandscapeTest):
     def setUp(self):
         super().setUp()
         self.mstore.set_accepted_types(["snap-services"])
+        self.snapd = Mock()
+
+    def set_services(self, services, digest="digest"):
+        response = SnapdResponse("sync", 200, "OK", services)
+        self.snapd.get_apps_with_digest.side_effect = lambda **kwargs: succeed(
+            (response, digest),
+        )
 
-    @patch("landscape.client.monitor.snapservicesmonitor.snap_http")
-    def test_get_data(self, snap_http_mock):
+    def test_get_data(self):
         """Tests getting running snap services data."""
-        snap_http_mock.get_apps.return_value = SnapdResponse(
-            "sync",
-            200,
-            "OK",
+        self.set_services(
             [
                 {
                     "snap": "test-snap",
@@ -32,7 +38,7 @@ class SnapServicesMonitorTest(LandscapeTest):
             ],
         )
 
-        plugin = SnapServicesMonitor()
+        plugin = SnapServicesMonitor(self.snapd)
         self.monitor.add(plugin)
 
         plugin.exchange()
@@ -41,11 +47,13 @@ class SnapServicesMonitorTest(LandscapeTest):
 
         self.assertTrue(len(messages) > 0)
         self.assertIn("running", messages[0]["services"])
+        self.snapd.get_apps_with_digest.assert_called_once_with(
+            services_only=True,
+        )
 
-    @patch("landscape.client.monitor.snapservicesmonitor.snap_http")
-    def test_get_snap_services(self, snap_http_mock):
+    def test_get_snap_services(self):
         """Tests that we can get and coerce snap services."""
-        plugin = SnapServicesMonitor()
+        plugin = SnapServicesMonitor(self.snapd)
         self.monitor.add(plugin)
         self.maxDiff = None
 
@@ -79,19 +87,7 @@ class SnapServicesMonitorTest(LandscapeTest):
                 "snap": "lxd",
             },
         ]
-        snap_http_mock.list.return_value = SnapdResponse("sync", 200, "OK", [])
-        snap_http_mock.get_conf.return_value = SnapdResponse(
-            "sync",
-            200,
-            "OK",
-            {},
-        )
-        snap_http_mock.get_apps.return_value = SnapdResponse(
-            "sync",
-            200,
-            "OK",
-            services,
-        )
+        self.set_services(services)
         plugin.exchange()
 
         messages = self.mstore.get_pending_messages()
@@ -99,22 +95,15 @@ class SnapServicesMonitorTest(LandscapeTest):
         self.assertTrue(len(messages) > 0)
         self.assertCountEqual(messages[0]["services"]["running"], services)
 
-    @patch("landscape.client.monitor.snapservicesmonitor.snap_http")
-    def test_get_snap_services_error(self, snap_http_mock):
+    def test_get_snap_services_error(self):
         """Tests that we can get and coerce snap services."""
-        plugin = SnapServicesMonitor()
+        plugin = SnapServicesMonitor(self.snapd)
         self.monitor.add(plugin)
 
-        snap_http_mock.list.return_value = SnapdResponse("sync", 200, "OK", [])
-        snap_http_mock.get_conf.return_value = SnapdResponse(
-            "sync",
-            200,
-            "OK",
-            {},
-        )
-
         with self.assertLogs(level="WARNING") as cm:
-            snap_http_mock.get_apps.side_effect = SnapdHttpException
+            self.snapd.get_apps_with_digest.return_value = fail(
+                SnapdHttpException(),
+            )
             plugin.exchange()
 
         messages = self.mstore.get_pending_messages()
@@ -125,3 +114,40 @@ class SnapServicesMonitorTest(LandscapeTest):
             ["WARNING:root:Unable to list services: "],
         )
         self.assertCountEqual(messages[0]["services"]["running"], [])
+
+    def test_same_digest(self):
+        """
+        When snapd answers the same as last time, the services aren't
+        compared with the reported ones again.
+        """
+        plugin = SnapServicesMonitor(self.snapd)
+        self.monitor.add(plugin)
+        self.set_services([{"snap": "test-snap", "name": "svc"}])
+        plugin.exchange()
+        plugin.get_data = Mock()
+        plugin.exchange()
+        plugin.get_data.assert_not_called()
+        self.assertEqual(1, len(self.mstore.get_pending_messages()))
+
+    def test_changed_digest(self):
+        """A different answer from snapd is reported."""
+        plugin = SnapServicesMonitor(self.snapd)
+        self.monitor.add(plugin)
+        self.set_services([{"snap": "test-snap", "name": "svc"}])
+        plugin.exchange()
+        self.set_services([], digest="other")
+        plugin.exchange()
+
+        messages = self.mstore.get_pending_messages()
+        self.assertEqual(2, len(messages))
+        self.assertEqual([], messages[1]["services"]["running"])
+
+    def test_reset(self):
+        """After a resynchronisation, the services are reported again."""
+        plugin = SnapServicesMonitor(self.snapd)
+        self.monitor.add(plugin)
+        self.set_services([{"snap": "test-snap", "name": "svc"}])
+        plugin.exchange()
+        plugin._reset()
+        plugin.exchange()
+        self.assertEqual(2, len(self.mstore.get_pending_messages()))
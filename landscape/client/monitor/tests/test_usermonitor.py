@@ -415,6 +415,31 @@ class UserMonitorTest(LandscapeTest):
 
         self.assertEqual(self.plugin.run.call_count, 5)
 
+    def test_files_changed(self):
+        """
+        The plugin is run when the user databases change.
+        """
+        self.monitor.add(self.plugin)
+        self.plugin.run = Mock()
+        result = self.plugin.files_changed()
+        return result.addCallback(
+            lambda _: self.plugin.run.assert_called_once_with(),
+        )
+
+    def test_files_changed_while_running_operations(self):
+        """
+        Changes to the user databases made while the user manager runs
+        operations are left for it to report, along with the operation they
+        come from.
+        """
+        self.user_manager._batch_running = True
+        self.monitor.add(self.plugin)
+        self.plugin.run = Mock()
+        result = self.plugin.files_changed()
+        return result.addCallback(
+            lambda _: self.plugin.run.assert_not_called(),
+        )
+
     def test_run_with_operation_id(self):
         """
         The L{UserMonitor} should have message run which should enqueue a
@@ -51,6 +51,52 @@ class UserMonitor(MonitorPlugin):
         )
         self._publisher.start()
 
+    def get_watched_files(self, config):
+        return self._provider.get_files()
+
+    def files_changed(self):
+        """
+        Detect the changes to the user databases, unless the user manager is
+        running operations: it detects their changes itself once they are
+        done, to report them along with the operation they come from.
+        """
+        if self._session_id is None:
+            return
+        if getattr(self.registry.config, "monitor_only", False):
+            self._run_with_error_log()
+            return
+
+        from landscape.client.manager.usermanager import (
+            RemoteUserManagerConnector,
+        )
+
+        user_manager_connector = RemoteUserManagerConnector(
+            self.registry.reactor,
+            self.registry.config,
+        )
+
+        def is_running_operations(user_manager):
+            return user_manager.is_running_operations()
+
+        def checked(running):
+            user_manager_connector.disconnect()
+            if running:
+                logging.debug(
+                    "Not detecting user changes, as the user manager is "
+                    "running operations.",
+                )
+                return
+            return self._run_with_error_log()
+
+        def check_failed(failure):
+            user_manager_connector.disconnect()
+            return self._run_with_error_log()
+
+        result = user_manager_connector.connect()
+        result.addCallback(is_running_operations)
+        result.addCallbacks(checked, check_failed)
+        return result
+
     def stop(self):
         """Stop listening for incoming AMP connections."""
         if self._publisher:
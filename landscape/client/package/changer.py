@@ -14,6 +14,7 @@ from landscape.client import USER
 from landscape.client.manager.manager import FAILED
 from landscape.client.monitor.rebootrequired import REBOOT_REQUIRED_FILENAME
 from landscape.client.package.reporter import find_reporter_command
+from landscape.client.package.reporter import PackageReporterConnector
 from landscape.client.package.taskhandler import PackageTaskError
 from landscape.client.package.taskhandler import PackageTaskHandler
 from landscape.client.package.taskhandler import (
@@ -113,11 +114,37 @@ class PackageChanger(PackageTaskHandler):
     def run_package_reporter(self):
         """
         Run the L{PackageReporter} if there were successfully completed tasks.
+
+        If the long-lived L{PackageReporterWorker} is enabled, the run is
+        requested from it, as a spawned reporter would find the worker
+        holding the reporter lock and exit right away.  A reporter gets
+        spawned only if the worker can't be reached.
         """
         if self.handled_tasks_count == 0:
             # Nothing was done
             return
 
+        if self._config.package_reporter_worker:
+            connector = PackageReporterConnector(
+                self._landscape_reactor,
+                self._config,
+            )
+            result = connector.connect(max_retries=0, quiet=True)
+            result.addCallback(lambda worker: worker.run_reporter())
+            result.addErrback(self._reporter_worker_failed)
+            result.addBoth(lambda ignored: connector.disconnect())
+            return result
+
+        self._spawn_package_reporter()
+
+    def _reporter_worker_failed(self, failure):
+        logging.info(
+            "Couldn't request a run from the package reporter worker, "
+            f"spawning a package reporter: {failure.value}",
+        )
+        self._spawn_package_reporter()
+
+    def _spawn_package_reporter(self):
         if os.getuid() == 0:
             os.setgid(grp.getgrnam(GROUP).gr_gid)
             os.setuid(pwd.getpwnam(USER).pw_uid)
@@ -234,14 +261,20 @@ class PackageChanger(PackageTaskHandler):
         if upgrade:
             self._facade.mark_global_upgrade()
 
-        for mark_function, mark_ids in [
+        marks = [
             (self._facade.mark_install, install),
             (self._facade.mark_remove, remove),
             (self._facade.mark_hold, hold),
             (self._facade.mark_remove_hold, remove_hold),
-        ]:
+        ]
+        # Resolve all the ids at once, rather than with one store
+        # transaction per package.
+        id_hashes = self._store.get_id_hashes(
+            {mark_id for _, mark_ids in marks for mark_id in mark_ids},
+        )
+        for mark_function, mark_ids in marks:
             for mark_id in mark_ids:
-                hash = self._store.get_id_hash(mark_id)
+                hash = id_hashes.get(mark_id)
                 if hash is None:
                     raise UnknownPackageData(mark_id)
                 package = self._facade.get_package_by_hash(hash)
@@ -19,7 +19,7 @@ from landscape.client.package.taskhandler import (
 )
 from landscape.client.package.taskhandler import run_task_handler
 from landscape.lib.config import get_bindir
-from landscape.lib.fetch import fetch_to_files
+from landscape.lib.fetch import stream_to_files
 from landscape.lib.fetch import url_to_filename
 from landscape.lib.fs import read_text_file
 from landscape.lib.gpg import gpg_verify
@@ -137,7 +137,7 @@ class ReleaseUpgrader(PackageTaskHandler):
         if not os.path.exists(self._config.upgrade_tool_directory):
             os.mkdir(self._config.upgrade_tool_directory)
 
-        result = fetch_to_files(
+        result = stream_to_files(
             [tarball_url, signature_url],
             self._config.upgrade_tool_directory,
             logger=logging.warning,
@@ -24,10 +24,23 @@ from landscape.lib.apt.package.store import (
 )
 from landscape.lib.config import get_bindir
 from landscape.lib.sequenceranges import sequence_to_ranges
+from landscape.lib.sequenceranges import SequenceBitmap
+from landscape.lib.store import transaction
 from landscape.lib.twisted_util import gather_results, spawn_process
-from landscape.lib.fetch import fetch_async
-from landscape.lib.fs import touch_file, create_binary_file
+from landscape.lib.fetch import (
+    fetch_multi_async,
+    fetch_to_file_async,
+    HTTPCodeError,
+)
+from landscape.lib.fs import touch_file
 from landscape.lib.os_release import parse_os_release
+from landscape.lib.log import log_failure
+from landscape.client.amp import (
+    ComponentConnector,
+    ComponentPublisher,
+    remote,
+)
+from landscape.client.clones import get_shared_samples
 from landscape.client.package.taskhandler import (
     PackageTaskHandlerConfiguration,
     PackageTaskHandler,
@@ -43,6 +56,13 @@ RELEASE_UPGRADER_PATTERN = "/tmp/ubuntu-release-upgrader-"
 UID_ROOT = "0"
 
 
+def _to_ranges(ids):
+    """Return the ranges list of a set of package ids, bitmap or not."""
+    if isinstance(ids, SequenceBitmap):
+        return ids.to_ranges()
+    return list(sequence_to_ranges(sorted(ids)))
+
+
 class PackageReporterConfiguration(PackageTaskHandlerConfiguration):
     """Specialized configuration for the Landscape package-reporter."""
 
@@ -68,6 +88,20 @@ class PackageReporterConfiguration(PackageTaskHandlerConfiguration):
             metavar="URL",
             help="The URL of the HTTPS proxy, if one is needed.",
         )
+        parser.add_argument(
+            "--bitmap-id-sets",
+            default=False,
+            action="store_true",
+            help="Store the sets of known package ids as compressed "
+            "bitmaps, rather than as one database row per package.",
+        )
+        parser.add_argument(
+            "--worker",
+            default=False,
+            action="store_true",
+            help="Keep running and wait for reporter runs to be requested "
+            "over AMP.",
+        )
         return parser
 
 
@@ -86,6 +120,13 @@ class PackageReporter(PackageTaskHandler):
     sources_list_directory = "/etc/apt/sources.list.d"
     _got_task = False
 
+    @classmethod
+    def create_package_store(cls, config):
+        return cls.package_store_class(
+            config.store_filename,
+            bitmap_id_sets=config.bitmap_id_sets,
+        )
+
     def run(self):
         self._got_task = False
 
@@ -130,6 +171,13 @@ class PackageReporter(PackageTaskHandler):
         config.package_hash_id_url, or config.url/hash-id-databases if
         the former is not set.
 
+        The database is streamed to disk, and an interrupted download is
+        resumed by the next call rather than started over.  The download
+        is checked against the <filename>.sha256 checksum published next to
+        the database before being put in place.  If the server doesn't
+        publish one, the download goes ahead unverified, and the next calls
+        don't ask for it again until the database is in place.
+
         Fetch failures are handled gracefully and logged as appropriate.
         """
 
@@ -151,8 +199,39 @@ class PackageReporter(PackageTaskHandler):
             # Cast to str as pycurl doesn't like unicode
             url = str(base_url + os.path.basename(hash_id_db_filename))
 
-            def fetch_ok(data):
-                create_binary_file(hash_id_db_filename, data)
+            if url.startswith("https"):
+                proxy = self._config.get("https_proxy")
+            else:
+                proxy = self._config.get("http_proxy")
+            options = dict(
+                cainfo=self._config.get("ssl_public_key"),
+                proxy=proxy,
+            )
+
+            no_checksum_filename = hash_id_db_filename + ".no-sha256"
+
+            def got_checksum(data):
+                return data.split()[0].decode("ascii")
+
+            def no_checksum(failure):
+                failure.trap(HTTPCodeError)
+                if failure.value.http_code != 404:
+                    return failure
+                logging.debug(f"No checksum available for {url}")
+                touch_file(no_checksum_filename)
+                return None
+
+            def fetch_database(sha256):
+                return fetch_to_file_async(
+                    url,
+                    hash_id_db_filename,
+                    sha256=sha256,
+                    **options,
+                )
+
+            def fetch_ok(filename):
+                if os.path.exists(no_checksum_filename):
+                    os.unlink(no_checksum_filename)
                 logging.info(f"Downloaded hash=>id database from {url}")
 
             def fetch_error(failure):
@@ -161,16 +240,13 @@ class PackageReporter(PackageTaskHandler):
                     f"Couldn't download hash=>id database: {str(exception)}",
                 )
 
-            if url.startswith("https"):
-                proxy = self._config.get("https_proxy")
+            if os.path.exists(no_checksum_filename):
+                result = fetch_database(None)
             else:
-                proxy = self._config.get("http_proxy")
-
-            result = fetch_async(
-                url,
-                cainfo=self._config.get("ssl_public_key"),
-                proxy=proxy,
-            )
+                # The checksum file is in the format of sha256sum.
+                result = fetch_multi_async(url + ".sha256", **options)
+                result.addCallbacks(got_checksum, no_checksum)
+                result.addCallback(fetch_database)
             result.addCallback(fetch_ok)
             result.addErrback(fetch_error)
 
@@ -452,12 +528,13 @@ class PackageReporter(PackageTaskHandler):
     def _handle_resynchronize(self):
         self._store.clear_hash_ids()
         yield self._remove_hash_id_db()
-        self._store.clear_available()
-        self._store.clear_available_upgrades()
-        self._store.clear_installed()
-        self._store.clear_locked()
-        self._store.clear_hash_id_requests()
-        self._store.clear_autoremovable()
+        with transaction(self._store):
+            self._store.clear_available()
+            self._store.clear_available_upgrades()
+            self._store.clear_installed()
+            self._store.clear_locked()
+            self._store.clear_hash_id_requests()
+            self._store.clear_autoremovable()
 
     def _handle_unknown_packages(self, hashes):
         self._facade.ensure_channels_reloaded()
@@ -641,18 +718,24 @@ class PackageReporter(PackageTaskHandler):
         if not os.path.exists(stamp_file):
             return True
 
-        status_file = apt_pkg.config.find_file("dir::state::status")
-        lists_dir = apt_pkg.config.find_dir("dir::state::lists")
-        files = [status_file, lists_dir]
-        files.extend(glob.glob(f"{lists_dir}/*Packages"))
-
         last_checked = os.stat(stamp_file).st_mtime
-        for f in files:
+        for f in self._get_package_state_files():
             last_changed = os.stat(f).st_mtime
             if last_changed >= last_checked:
                 return True
         return False
 
+    def _get_package_state_files(self):
+        """
+        Return the dpkg status file and apt lists reflecting the state of
+        the known packages.
+        """
+        status_file = apt_pkg.config.find_file("dir::state::status")
+        lists_dir = apt_pkg.config.find_dir("dir::state::lists")
+        files = [status_file, lists_dir]
+        files.extend(glob.glob(f"{lists_dir}/*Packages"))
+        return files
+
     def _compute_packages_changes(self):  # noqa: max-complexity: 13
         """Analyse changes in the universe of known packages.
 
@@ -681,19 +764,19 @@ class PackageReporter(PackageTaskHandler):
         """
         self._facade.ensure_channels_reloaded()
 
-        old_installed = set(self._store.get_installed())
-        old_available = set(self._store.get_available())
-        old_upgrades = set(self._store.get_available_upgrades())
-        old_locked = set(self._store.get_locked())
-        old_autoremovable = set(self._store.get_autoremovable())
-        old_security = set(self._store.get_security())
-
-        current_installed = set()
-        current_available = set()
-        current_upgrades = set()
-        current_locked = set()
-        current_autoremovable = set()
-        current_security = set()
+        old_installed = self._store.get_id_set("installed")
+        old_available = self._store.get_id_set("available")
+        old_upgrades = self._store.get_id_set("available_upgrade")
+        old_locked = self._store.get_id_set("locked")
+        old_autoremovable = self._store.get_id_set("autoremovable")
+        old_security = self._store.get_id_set("security")
+
+        current_installed = []
+        current_available = []
+        current_upgrades = []
+        current_locked = []
+        current_autoremovable = []
+        current_security = []
         os_release_info = parse_os_release()
         backports_archive = "{}-backports".format(os_release_info["code-name"])
         security_archive = "{}-security".format(os_release_info["code-name"])
@@ -722,17 +805,17 @@ class PackageReporter(PackageTaskHandler):
             id = self._store.get_hash_id(hash)
             if id is not None:
                 if self._facade.is_package_installed(package):
-                    current_installed.add(id)
+                    current_installed.append(id)
                     if self._facade.is_package_available(package):
-                        current_available.add(id)
+                        current_available.append(id)
                     if self._facade.is_package_autoremovable(package):
-                        current_autoremovable.add(id)
+                        current_autoremovable.append(id)
                 else:
-                    current_available.add(id)
+                    current_available.append(id)
 
                 # Are there any packages that this package is an upgrade for?
                 if self._facade.is_package_upgrade(package):
-                    current_upgrades.add(id)
+                    current_upgrades.append(id)
 
                 # Is this package present in the security pocket?
                 security_origins = any(
@@ -741,13 +824,23 @@ class PackageReporter(PackageTaskHandler):
                     if origin.archive == security_archive
                 )
                 if security_origins:
-                    current_security.add(id)
+                    current_security.append(id)
 
         for package in self._facade.get_locked_packages():
             hash = self._facade.get_package_hash(package)
             id = self._store.get_hash_id(hash)
             if id is not None:
-                current_locked.add(id)
+                current_locked.append(id)
+
+        # Build the current sets like the stored ones, either bitmaps whose
+        # differences are computed at once, or plain sets.
+        id_set = type(old_installed)
+        current_installed = id_set(current_installed)
+        current_available = id_set(current_available)
+        current_upgrades = id_set(current_upgrades)
+        current_locked = id_set(current_locked)
+        current_autoremovable = id_set(current_autoremovable)
+        current_security = id_set(current_security)
 
         new_installed = current_installed - old_installed
         new_available = current_available - old_available
@@ -765,54 +858,32 @@ class PackageReporter(PackageTaskHandler):
 
         message = {}
         if new_installed:
-            message["installed"] = list(
-                sequence_to_ranges(sorted(new_installed)),
-            )
+            message["installed"] = _to_ranges(new_installed)
         if new_available:
-            message["available"] = list(
-                sequence_to_ranges(sorted(new_available)),
-            )
+            message["available"] = _to_ranges(new_available)
         if new_upgrades:
-            message["available-upgrades"] = list(
-                sequence_to_ranges(sorted(new_upgrades)),
-            )
+            message["available-upgrades"] = _to_ranges(new_upgrades)
         if new_locked:
-            message["locked"] = list(sequence_to_ranges(sorted(new_locked)))
+            message["locked"] = _to_ranges(new_locked)
 
         if new_autoremovable:
-            message["autoremovable"] = list(
-                sequence_to_ranges(sorted(new_autoremovable)),
-            )
+            message["autoremovable"] = _to_ranges(new_autoremovable)
         if not_autoremovable:
-            message["not-autoremovable"] = list(
-                sequence_to_ranges(sorted(not_autoremovable)),
-            )
+            message["not-autoremovable"] = _to_ranges(not_autoremovable)
 
         if new_security:
-            message["security"] = list(
-                sequence_to_ranges(sorted(new_security)),
-            )
+            message["security"] = _to_ranges(new_security)
         if not_security:
-            message["not-security"] = list(
-                sequence_to_ranges(sorted(not_security)),
-            )
+            message["not-security"] = _to_ranges(not_security)
 
         if not_installed:
-            message["not-installed"] = list(
-                sequence_to_ranges(sorted(not_installed)),
-            )
+            message["not-installed"] = _to_ranges(not_installed)
         if not_available:
-            message["not-available"] = list(
-                sequence_to_ranges(sorted(not_available)),
-            )
+            message["not-available"] = _to_ranges(not_available)
         if not_upgrades:
-            message["not-available-upgrades"] = list(
-                sequence_to_ranges(sorted(not_upgrades)),
-            )
+            message["not-available-upgrades"] = _to_ranges(not_upgrades)
         if not_locked:
-            message["not-locked"] = list(
-                sequence_to_ranges(sorted(not_locked)),
-            )
+            message["not-locked"] = _to_ranges(not_locked)
 
         if not message:
             return succeed(False)
@@ -837,30 +908,31 @@ class PackageReporter(PackageTaskHandler):
         )
 
         def update_currently_known(result):
-            if new_installed:
-                self._store.add_installed(new_installed)
-            if not_installed:
-                self._store.remove_installed(not_installed)
-            if new_available:
-                self._store.add_available(new_available)
-            if new_locked:
-                self._store.add_locked(new_locked)
-            if new_autoremovable:
-                self._store.add_autoremovable(new_autoremovable)
-            if not_available:
-                self._store.remove_available(not_available)
-            if new_upgrades:
-                self._store.add_available_upgrades(new_upgrades)
-            if not_upgrades:
-                self._store.remove_available_upgrades(not_upgrades)
-            if not_locked:
-                self._store.remove_locked(not_locked)
-            if not_autoremovable:
-                self._store.remove_autoremovable(not_autoremovable)
-            if new_security:
-                self._store.add_security(new_security)
-            if not_security:
-                self._store.remove_security(not_security)
+            with transaction(self._store):
+                if new_installed:
+                    self._store.add_installed(new_installed)
+                if not_installed:
+                    self._store.remove_installed(not_installed)
+                if new_available:
+                    self._store.add_available(new_available)
+                if new_locked:
+                    self._store.add_locked(new_locked)
+                if new_autoremovable:
+                    self._store.add_autoremovable(new_autoremovable)
+                if not_available:
+                    self._store.remove_available(not_available)
+                if new_upgrades:
+                    self._store.add_available_upgrades(new_upgrades)
+                if not_upgrades:
+                    self._store.remove_available_upgrades(not_upgrades)
+                if not_locked:
+                    self._store.remove_locked(not_locked)
+                if not_autoremovable:
+                    self._store.remove_autoremovable(not_autoremovable)
+                if new_security:
+                    self._store.add_security(new_security)
+                if not_security:
+                    self._store.remove_security(not_security)
             # Something has changed wrt the former run, let's update the
             # timestamp and return True.
             stamp_file = self._config.detect_package_changes_stamp
@@ -918,31 +990,203 @@ class FakeReporter(PackageReporter):
         if not os.path.exists(self.global_store_filename):
             return succeed(None)
         message_sent = set(self._store.get_message_ids())
-        global_store = FakePackageStore(self.global_store_filename)
-        all_message_ids = set(global_store.get_message_ids())
-        not_sent = all_message_ids - message_sent
+        messages = self._get_global_messages()
         deferred = succeed(None)
         got_type = set()
-        if not_sent:
-            messages = global_store.get_messages_by_ids(not_sent)
-            sent = []
-            for message_id, message in messages:
-                message = bpickle.loads(message)
-                if message["type"] not in got_type:
-                    got_type.add(message["type"])
-                    sent.append(message_id)
-                    deferred.addCallback(
-                        lambda x, message=message: self.send_message(message),
-                    )
+        sent = []
+        for message_id, message in messages:
+            if message_id in message_sent:
+                continue
+            if message["type"] not in got_type:
+                got_type.add(message["type"])
+                sent.append(message_id)
+                # The decoded messages are shared with the other clones,
+                # so send a copy of them.
+                deferred.addCallback(
+                    lambda x, message=message: self.send_message(
+                        dict(message),
+                    ),
+                )
+        if sent:
             self._store.save_message_ids(sent)
         return deferred
 
+    def _get_global_messages(self):
+        """
+        Return the C{(message_id, message)} tuples of the global store.
+
+        The messages are decoded once for all the clones running in this
+        process, until the global store changes.
+        """
+        stat = os.stat(self.global_store_filename)
+        key = (
+            "fake-package-messages",
+            self.global_store_filename,
+            stat.st_mtime_ns,
+            stat.st_size,
+        )
+
+        def load_messages():
+            global_store = FakePackageStore(self.global_store_filename)
+            message_ids = global_store.get_message_ids()
+            if not message_ids:
+                return []
+            return [
+                (message_id, bpickle.loads(message))
+                for message_id, message in global_store.get_messages_by_ids(
+                    message_ids,
+                )
+            ]
+
+        return get_shared_samples().get(key, load_messages)
+
+
+class PackageReporterWorker(PackageReporter):
+    """A long-lived L{PackageReporter}, running reports on demand.
+
+    Instead of being spawned by the monitor for every run, the worker keeps
+    running and gets runs requested over AMP, so the apt cache and the
+    package hash maps of its facade stay loaded between runs.  The cache
+    is only reopened when the dpkg status file or the apt lists change.
+
+    The worker exits when the process that spawned it goes away, or when
+    no run got requested for three package monitor intervals.
+    """
+
+    name = "package-reporter"
+
+    # How often, in seconds, to check whether our parent process is gone.
+    parent_check_interval = 5
+
+    _package_state = None
+
+    def run(self):
+        """Publish the worker and handle run requests until it exits.
+
+        @return: A L{Deferred} firing once the worker has exited.
+        """
+        self._exited = Deferred()
+        self._running = None
+        self._pending = False
+        self._exiting = False
+        self._idle_call = None
+        self._parent_pid = os.getppid()
+        self._publisher = ComponentPublisher(self, self._reactor, self._config)
+        self._publisher.start()
+        self._parent_check = self._reactor.call_every(
+            self.parent_check_interval,
+            self._check_parent,
+        )
+        self._reset_idle_timeout()
+        return self._exited
+
+    @remote
+    def ping(self):
+        return True
+
+    @remote
+    def run_reporter(self):
+        """Request a reporter run.
+
+        If a run is already in progress, another one will follow it, so
+        that changes made in the meantime get reported.
+
+        @return: C{True} if a run got started, C{False} otherwise.
+        """
+        if self._exiting:
+            return False
+        self._reset_idle_timeout()
+        if self._running is not None:
+            self._pending = True
+            return False
+        self._running = super().run()
+        self._running.addErrback(log_failure, "Package reporter run failed")
+        self._running.addCallback(self._run_done)
+        return True
+
+    @remote
+    def exit(self):
+        """Stop accepting requests and exit once the current run is over."""
+        if self._exiting:
+            return
+        self._exiting = True
+        self._pending = False
+        if self._idle_call is not None:
+            self._reactor.cancel_call(self._idle_call)
+            self._idle_call = None
+        self._reactor.cancel_call(self._parent_check)
+        self._publisher.stop()
+        if self._running is None:
+            self._exited.callback(None)
+
+    def run_apt_update(self):
+        result = super().run_apt_update()
+        return result.addCallback(self._refresh_channels)
+
+    def _refresh_channels(self, result):
+        """Reopen the apt cache if the state of the packages changed."""
+        package_state = self._get_package_state()
+        if (
+            self._package_state is not None
+            and package_state != self._package_state
+        ):
+            logging.info("Package state changed, reloading the apt cache.")
+            self._facade.reload_channels()
+        self._package_state = package_state
+        return result
+
+    def _get_package_state(self):
+        state = []
+        for filename in self._get_package_state_files():
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                continue
+            state.append(
+                (filename, stat.st_ino, stat.st_size, stat.st_mtime_ns),
+            )
+        return state
+
+    def _run_done(self, ignored):
+        self._running = None
+        if self._exiting:
+            self._exited.callback(None)
+        elif self._pending:
+            self._pending = False
+            self.run_reporter()
+
+    def _reset_idle_timeout(self):
+        if self._idle_call is not None:
+            self._reactor.cancel_call(self._idle_call)
+        self._idle_call = self._reactor.call_later(
+            3 * self._config.package_monitor_interval,
+            self._idle_timeout,
+        )
+
+    def _idle_timeout(self):
+        self._idle_call = None
+        logging.info("No package reporter run requested for a while, exiting.")
+        self.exit()
+
+    def _check_parent(self):
+        if os.getppid() != self._parent_pid:
+            logging.info("Parent process is gone, exiting.")
+            self.exit()
+
+
+class PackageReporterConnector(ComponentConnector):
+    """Connect to the L{PackageReporterWorker}."""
+
+    component = PackageReporterWorker
+
 
 def main(args):
     if "FAKE_GLOBAL_PACKAGE_STORE" in os.environ:
         return run_task_handler(FakeGlobalReporter, args)
     elif "FAKE_PACKAGE_STORE" in os.environ:
         return run_task_handler(FakeReporter, args)
+    elif "--worker" in args:
+        return run_task_handler(PackageReporterWorker, args)
     else:
         return run_task_handler(PackageReporter, args)
 
@@ -116,6 +116,11 @@ class PackageTaskHandler:
         self._session_id = None
         self._reactor = reactor
 
+    @classmethod
+    def create_package_store(cls, config):
+        """Create the package store the handler works with."""
+        return cls.package_store_class(config.store_filename)
+
     def run(self):
         return self.handle_tasks()
 
@@ -193,7 +198,7 @@ class PackageTaskHandler:
                 return
 
             try:
-                self._store.add_hash_id_db(hash_id_db_filename)
+                self._store.add_hash_id_db(hash_id_db_filename, index=True)
             except InvalidHashIdDb:
                 # The appropriate database is there but broken,
                 # let's remove it and go on
@@ -303,7 +308,7 @@ def run_task_handler(cls, args, reactor=None):
     # 0o644 so...
     os.umask(0o022)
 
-    package_store = cls.package_store_class(config.store_filename)
+    package_store = cls.create_package_store(config)
     # Delay importing of the facades so that we don't
     # import Apt unless we need to.
     from landscape.lib.apt.package.facade import AptFacade
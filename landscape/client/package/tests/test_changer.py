@@ -20,6 +20,8 @@ from landscape.client.package.changer import POLICY_ALLOW_ALL_CHANGES
 from landscape.client.package.changer import POLICY_ALLOW_INSTALLS
 from landscape.client.package.changer import SUCCESS_RESULT
 from landscape.client.package.changer import UNKNOWN_PACKAGE_DATA_TIMEOUT
+from landscape.client.package.reporter import PackageReporter
+from landscape.client.package.reporter import PackageReporterWorker
 from landscape.client.tests.helpers import BrokerServiceHelper
 from landscape.client.tests.helpers import LandscapeTest
 from landscape.lib import base64
@@ -269,6 +271,33 @@ class AptPackageChangerTest(LandscapeTest):
         )
         self.assertTrue(self.store.get_next_task("changer"))
 
+    def test_mark_packages_resolves_ids_at_once(self):
+        """
+        L{PackageChanger.mark_packages} looks up the hashes of all the
+        package ids with a single store query.
+        """
+        self.store.set_hash_ids({HASH1: 1, HASH2: 2, HASH3: 3})
+        self.facade.reload_channels()
+        self.facade.mark_install = Mock()
+        self.facade.mark_remove = Mock()
+        with patch.object(
+            self.store,
+            "get_id_hashes",
+            wraps=self.store.get_id_hashes,
+        ) as get_id_hashes:
+            self.changer.mark_packages(install=[1, 2], remove=[3])
+        get_id_hashes.assert_called_once_with({1, 2, 3})
+        self.assertEqual(
+            [
+                self.facade.get_package_by_hash(HASH1),
+                self.facade.get_package_by_hash(HASH2),
+            ],
+            [args[0] for args, _ in self.facade.mark_install.call_args_list],
+        )
+        self.facade.mark_remove.assert_called_once_with(
+            self.facade.get_package_by_hash(HASH3),
+        )
+
     def test_unknown_data_timeout(self):
         """After a while, unknown package data is reported as an error.
 
@@ -887,6 +916,61 @@ class AptPackageChangerTest(LandscapeTest):
             "/fake/bin/landscape-package-reporter",
         )
 
+    @patch("os.system")
+    def test_request_run_from_reporter_worker(self, system_mock):
+        """
+        When the package reporter worker is running, the changer requests
+        the run from it over AMP, as a spawned reporter would find the
+        worker holding the reporter lock.
+        """
+        self.config.package_reporter_worker = True
+        worker = PackageReporterWorker(
+            self.store,
+            self.facade,
+            self.remote,
+            self.config,
+            self.landscape_reactor,
+        )
+        worker.run()
+        self.addCleanup(worker.exit)
+        self.store.add_task(
+            "changer",
+            {"type": "change-packages", "operation-id": 123},
+        )
+
+        with patch.object(
+            PackageReporter,
+            "run",
+            return_value=Deferred(),
+        ) as run_mock:
+            result = self.changer.run()
+
+            def check(ignored):
+                run_mock.assert_called_once_with()
+                system_mock.assert_not_called()
+
+            return result.addCallback(check)
+
+    @patch("os.system")
+    def test_spawn_reporter_if_worker_unreachable(self, system_mock):
+        """
+        If the package reporter worker can't be reached, the changer spawns
+        a reporter.
+        """
+        self.config.package_reporter_worker = True
+        self.config.bindir = "/fake/bin"
+        self.store.add_task(
+            "changer",
+            {"type": "change-packages", "operation-id": 123},
+        )
+
+        def check(ignored):
+            system_mock.assert_called_once_with(
+                "/fake/bin/landscape-package-reporter",
+            )
+
+        return self.changer.run().addCallback(check)
+
     def test_run(self):
         changer_mock = patch.object(self, "changer")
 
@@ -63,7 +63,7 @@ class ReleaseUpgraderTest(LandscapeTest):
     def get_pending_messages(self):
         return self.broker_service.message_store.get_pending_messages()
 
-    @mock.patch("landscape.lib.fetch.fetch_async")
+    @mock.patch("landscape.lib.fetch.fetch_multi_async")
     def test_fetch(self, fetch_mock):
         """
         L{ReleaseUpgrader.fetch} fetches the upgrade tool tarball and signature
@@ -73,12 +73,13 @@ class ReleaseUpgraderTest(LandscapeTest):
         signature_url = "http://some/where/karmic.tar.gz.gpg"
 
         method_returns = {
-            tarball_url: succeed(b"tarball"),
-            signature_url: succeed(b"signature"),
+            tarball_url: b"tarball",
+            signature_url: b"signature",
         }
 
-        def side_effect(param):
-            return method_returns[param]
+        def side_effect(param, output_file):
+            output_file.write(method_returns[param])
+            return succeed(None)
 
         fetch_mock.side_effect = side_effect
 
@@ -99,13 +100,16 @@ class ReleaseUpgraderTest(LandscapeTest):
                 "INFO: Successfully fetched upgrade-tool files",
                 self.logfile.getvalue(),
             )
-            calls = [mock.call(tarball_url), mock.call(signature_url)]
+            calls = [
+                mock.call(tarball_url, output_file=mock.ANY),
+                mock.call(signature_url, output_file=mock.ANY),
+            ]
             fetch_mock.assert_has_calls(calls, any_order=True)
 
         result.addCallback(check_result)
         return result
 
-    @mock.patch("landscape.lib.fetch.fetch_async")
+    @mock.patch("landscape.lib.fetch.fetch_multi_async")
     def test_fetch_with_errors(self, fetch_mock):
         """
         L{ReleaseUpgrader.fetch} logs a warning in case any of the upgrade tool
@@ -115,11 +119,11 @@ class ReleaseUpgraderTest(LandscapeTest):
         signature_url = "http://some/where/karmic.tar.gz.gpg"
 
         method_returns = {
-            tarball_url: succeed(b"tarball"),
+            tarball_url: succeed(None),
             signature_url: fail(HTTPCodeError(404, b"not found")),
         }
 
-        def side_effect(param):
+        def side_effect(param, output_file):
             return method_returns[param]
 
         fetch_mock.side_effect = side_effect
@@ -136,7 +140,10 @@ class ReleaseUpgraderTest(LandscapeTest):
                 "WARNING: Couldn't fetch all upgrade-tool files",
                 self.logfile.getvalue(),
             )
-            calls = [mock.call(tarball_url), mock.call(signature_url)]
+            calls = [
+                mock.call(tarball_url, output_file=mock.ANY),
+                mock.call(signature_url, output_file=mock.ANY),
+            ]
             fetch_mock.assert_has_calls(calls, any_order=True)
 
         result.addCallback(self.fail)
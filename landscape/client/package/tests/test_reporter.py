@@ -21,6 +21,8 @@ from landscape.client.package.reporter import HASH_ID_REQUEST_TIMEOUT
 from landscape.client.package.reporter import main
 from landscape.client.package.reporter import PackageReporter
 from landscape.client.package.reporter import PackageReporterConfiguration
+from landscape.client.package.reporter import PackageReporterConnector
+from landscape.client.package.reporter import PackageReporterWorker
 from landscape.client.tests.helpers import BrokerServiceHelper
 from landscape.client.tests.helpers import LandscapeTest
 from landscape.lib import bpickle
@@ -34,7 +36,10 @@ from landscape.lib.apt.package.testing import HASH2
 from landscape.lib.apt.package.testing import HASH3
 from landscape.lib.apt.package.testing import PKGNAME1
 from landscape.lib.apt.package.testing import SimpleRepositoryHelper
+from landscape.lib.fetch import ChecksumError
 from landscape.lib.fetch import FetchError
+from landscape.lib.fetch import HTTPCodeError
+from landscape.lib.fs import create_binary_file
 from landscape.lib.fs import create_text_file
 from landscape.lib.fs import touch_file
 from landscape.lib.os_release import get_os_filename
@@ -58,7 +63,33 @@ UBUNTU_CODENAME=codename
 """
 
 
+def fake_fetch_to_file(data):
+    """Return a fake L{fetch_to_file_async} saving C{data} to the file."""
+
+    def fetch_to_file(url, filename, sha256=None, **kwargs):
+        create_binary_file(filename, data)
+        return succeed(filename)
+
+    return fetch_to_file
+
+
+def no_checksum(url, **kwargs):
+    """A fake L{fetch_multi_async} for a server not publishing checksums."""
+    return fail(HTTPCodeError(404, b""))
+
+
 class PackageReporterConfigurationTest(LandscapeTest):
+    def test_worker_option(self):
+        """
+        The L{PackageReporterConfiguration} supports a '--worker' command
+        line option.
+        """
+        config = PackageReporterConfiguration()
+        config.default_config_filenames = (self.makeFile(""),)
+        self.assertFalse(config.worker)
+        config.load(["--worker"])
+        self.assertTrue(config.worker)
+
     def test_force_apt_update_option(self):
         """
         The L{PackageReporterConfiguration} supports a '--force-apt-update'
@@ -382,11 +413,20 @@ class PackageReporterAptTest(LandscapeTest):
         return deferred.addCallback(got_result)
 
     @mock.patch(
-        "landscape.client.package.reporter.fetch_async",
-        return_value=succeed(b"hash-ids"),
+        "landscape.client.package.reporter.fetch_multi_async",
+        side_effect=no_checksum,
+    )
+    @mock.patch(
+        "landscape.client.package.reporter.fetch_to_file_async",
+        side_effect=fake_fetch_to_file(b"hash-ids"),
     )
     @mock.patch("logging.info", return_value=None)
-    def test_fetch_hash_id_db(self, logging_mock, mock_fetch_async):
+    def test_fetch_hash_id_db(
+        self,
+        logging_mock,
+        mock_fetch_to_file,
+        mock_fetch_async,
+    ):
         # Assume package_hash_id_url is set
         self.config.data_path = self.makeDir()
         self.config.package_hash_id_url = "http://fake.url/path/"
@@ -423,18 +463,34 @@ class PackageReporterAptTest(LandscapeTest):
             f"Downloaded hash=>id database from {hash_id_db_url}",
         )
         mock_fetch_async.assert_called_once_with(
+            hash_id_db_url + ".sha256",
+            cainfo=None,
+            proxy=None,
+        )
+        mock_fetch_to_file.assert_called_once_with(
             hash_id_db_url,
+            hash_id_db_filename,
+            sha256=None,
             cainfo=None,
             proxy=None,
         )
         return result
 
     @mock.patch(
-        "landscape.client.package.reporter.fetch_async",
-        return_value=succeed(b"hash-ids"),
+        "landscape.client.package.reporter.fetch_multi_async",
+        side_effect=no_checksum,
+    )
+    @mock.patch(
+        "landscape.client.package.reporter.fetch_to_file_async",
+        side_effect=fake_fetch_to_file(b"hash-ids"),
     )
     @mock.patch("logging.info", return_value=None)
-    def test_fetch_hash_id_db_with_proxy(self, logging_mock, mock_fetch_async):
+    def test_fetch_hash_id_db_with_proxy(
+        self,
+        logging_mock,
+        mock_fetch_to_file,
+        mock_fetch_async,
+    ):
         """fetching hash-id-db uses proxy settings"""
         # Assume package_hash_id_url is set
         self.config.data_path = self.makeDir()
@@ -455,13 +511,20 @@ class PackageReporterAptTest(LandscapeTest):
 
         result = self.reporter.fetch_hash_id_db()
         mock_fetch_async.assert_called_once_with(
+            hash_id_db_url + ".sha256",
+            cainfo=None,
+            proxy="http://helloproxy:8000",
+        )
+        mock_fetch_to_file.assert_called_once_with(
             hash_id_db_url,
+            mock.ANY,
+            sha256=None,
             cainfo=None,
             proxy="http://helloproxy:8000",
         )
         return result
 
-    @mock.patch("landscape.client.package.reporter.fetch_async")
+    @mock.patch("landscape.client.package.reporter.fetch_multi_async")
     def test_fetch_hash_id_db_does_not_download_twice(self, mock_fetch_async):
         # Let's say that the hash=>id database is already there
         self.config.package_hash_id_url = "http://fake.url/path/"
@@ -545,10 +608,18 @@ class PackageReporterAptTest(LandscapeTest):
         return result
 
     @mock.patch(
-        "landscape.client.package.reporter.fetch_async",
-        return_value=succeed(b"hash-ids"),
+        "landscape.client.package.reporter.fetch_multi_async",
+        side_effect=no_checksum,
     )
-    def test_fetch_hash_id_db_with_default_url(self, mock_fetch_async):
+    @mock.patch(
+        "landscape.client.package.reporter.fetch_to_file_async",
+        side_effect=fake_fetch_to_file(b"hash-ids"),
+    )
+    def test_fetch_hash_id_db_with_default_url(
+        self,
+        mock_fetch_to_file,
+        mock_fetch_async,
+    ):
         # Let's say package_hash_id_url is not set but url is
         self.config.data_path = self.makeDir()
         self.config.package_hash_id_url = None
@@ -579,21 +650,28 @@ class PackageReporterAptTest(LandscapeTest):
             self.assertEqual(open(hash_id_db_filename).read(), "hash-ids")
 
         result.addCallback(callback)
-        mock_fetch_async.assert_called_once_with(
+        mock_fetch_to_file.assert_called_once_with(
             hash_id_db_url,
+            hash_id_db_filename,
+            sha256=None,
             cainfo=None,
             proxy=None,
         )
         return result
 
     @mock.patch(
-        "landscape.client.package.reporter.fetch_async",
+        "landscape.client.package.reporter.fetch_multi_async",
+        side_effect=no_checksum,
+    )
+    @mock.patch(
+        "landscape.client.package.reporter.fetch_to_file_async",
         return_value=fail(FetchError("fetch error")),
     )
     @mock.patch("logging.warning", return_value=None)
     def test_fetch_hash_id_db_with_download_error(
         self,
         logging_mock,
+        mock_fetch_to_file,
         mock_fetch_async,
     ):
         # Assume package_hash_id_url is set
@@ -626,8 +704,10 @@ class PackageReporterAptTest(LandscapeTest):
         logging_mock.assert_called_once_with(
             "Couldn't download hash=>id database: fetch error",
         )
-        mock_fetch_async.assert_called_once_with(
+        mock_fetch_to_file.assert_called_once_with(
             hash_id_db_url,
+            mock.ANY,
+            sha256=None,
             cainfo=None,
             proxy=None,
         )
@@ -665,10 +745,18 @@ class PackageReporterAptTest(LandscapeTest):
         return result
 
     @mock.patch(
-        "landscape.client.package.reporter.fetch_async",
-        return_value=succeed(b"hash-ids"),
+        "landscape.client.package.reporter.fetch_multi_async",
+        side_effect=no_checksum,
     )
-    def test_fetch_hash_id_db_with_custom_certificate(self, mock_fetch_async):
+    @mock.patch(
+        "landscape.client.package.reporter.fetch_to_file_async",
+        side_effect=fake_fetch_to_file(b"hash-ids"),
+    )
+    def test_fetch_hash_id_db_with_custom_certificate(
+        self,
+        mock_fetch_to_file,
+        mock_fetch_async,
+    ):
         """
         The L{PackageReporter.fetch_hash_id_db} method takes into account the
         possible custom SSL certificate specified in the client configuration.
@@ -691,13 +779,169 @@ class PackageReporterAptTest(LandscapeTest):
         # Now go!
         result = self.reporter.fetch_hash_id_db()
         mock_fetch_async.assert_called_once_with(
+            hash_id_db_url + ".sha256",
+            cainfo=self.config.ssl_public_key,
+            proxy=None,
+        )
+        mock_fetch_to_file.assert_called_once_with(
             hash_id_db_url,
+            mock.ANY,
+            sha256=None,
             cainfo=self.config.ssl_public_key,
             proxy=None,
         )
 
         return result
 
+    @mock.patch(
+        "landscape.client.package.reporter.fetch_multi_async",
+        side_effect=no_checksum,
+    )
+    @mock.patch(
+        "landscape.client.package.reporter.fetch_to_file_async",
+        return_value=fail(FetchError("fetch error")),
+    )
+    def test_fetch_hash_id_db_remembers_missing_checksum(
+        self,
+        mock_fetch_to_file,
+        mock_fetch_async,
+    ):
+        """
+        If the server doesn't publish the checksum of the hash=>id database,
+        it isn't asked for again when retrying a failed download, until the
+        database is in place.
+        """
+        self.config.data_path = self.makeDir()
+        self.config.package_hash_id_url = "http://fake.url/path/"
+        os.makedirs(os.path.join(self.config.data_path, "package", "hash-id"))
+        hash_id_db_filename = os.path.join(
+            self.config.data_path,
+            "package",
+            "hash-id",
+            "uuid_codename_arch",
+        )
+        message_store = self.broker_service.message_store
+        message_store.set_server_uuid("uuid")
+        self.reporter.os_release_filename = self.makeFile(SAMPLE_OS_RELEASE)
+        self.facade.set_arch("arch")
+
+        def retry(ignored):
+            self.assertTrue(os.path.exists(hash_id_db_filename + ".no-sha256"))
+            mock_fetch_to_file.side_effect = fake_fetch_to_file(b"hash-ids")
+            return self.reporter.fetch_hash_id_db()
+
+        def check(ignored):
+            self.assertEqual(1, mock_fetch_async.call_count)
+            self.assertEqual(2, mock_fetch_to_file.call_count)
+            self.assertEqual(
+                None,
+                mock_fetch_to_file.call_args.kwargs["sha256"],
+            )
+            self.assertTrue(os.path.exists(hash_id_db_filename))
+            self.assertFalse(
+                os.path.exists(hash_id_db_filename + ".no-sha256"),
+            )
+
+        result = self.reporter.fetch_hash_id_db()
+        result.addCallback(retry)
+        return result.addCallback(check)
+
+    @mock.patch(
+        "landscape.client.package.reporter.fetch_multi_async",
+        return_value=succeed(b"0123abcd  uuid_codename_arch\n"),
+    )
+    @mock.patch(
+        "landscape.client.package.reporter.fetch_to_file_async",
+        side_effect=fake_fetch_to_file(b"hash-ids"),
+    )
+    def test_fetch_hash_id_db_with_checksum(
+        self,
+        mock_fetch_to_file,
+        mock_fetch_async,
+    ):
+        """
+        If the server publishes a checksum next to the hash=>id database, the
+        download is verified against it.
+        """
+        self.config.data_path = self.makeDir()
+        self.config.package_hash_id_url = "http://fake.url/path/"
+        os.makedirs(os.path.join(self.config.data_path, "package", "hash-id"))
+        message_store = self.broker_service.message_store
+        message_store.set_server_uuid("uuid")
+        self.reporter.os_release_filename = self.makeFile(SAMPLE_OS_RELEASE)
+        self.facade.set_arch("arch")
+        hash_id_db_url = self.config.package_hash_id_url + "uuid_codename_arch"
+
+        result = self.reporter.fetch_hash_id_db()
+        mock_fetch_to_file.assert_called_once_with(
+            hash_id_db_url,
+            mock.ANY,
+            sha256="0123abcd",
+            cainfo=None,
+            proxy=None,
+        )
+        return result
+
+    @mock.patch(
+        "landscape.client.package.reporter.fetch_multi_async",
+        return_value=succeed(b"0123abcd  uuid_codename_arch\n"),
+    )
+    @mock.patch(
+        "landscape.client.package.reporter.fetch_to_file_async",
+        return_value=fail(ChecksumError("0123abcd", "4567ef01")),
+    )
+    @mock.patch("logging.warning", return_value=None)
+    def test_fetch_hash_id_db_with_checksum_mismatch(
+        self,
+        logging_mock,
+        mock_fetch_to_file,
+        mock_fetch_async,
+    ):
+        self.config.data_path = self.makeDir()
+        self.config.package_hash_id_url = "http://fake.url/path/"
+        message_store = self.broker_service.message_store
+        message_store.set_server_uuid("uuid")
+        self.reporter.os_release_filename = self.makeFile(SAMPLE_OS_RELEASE)
+        self.facade.set_arch("arch")
+
+        result = self.reporter.fetch_hash_id_db()
+        logging_mock.assert_called_once_with(
+            "Couldn't download hash=>id database: Checksum mismatch: "
+            "expected 0123abcd, got 4567ef01",
+        )
+        return result
+
+    @mock.patch(
+        "landscape.client.package.reporter.fetch_multi_async",
+        return_value=fail(HTTPCodeError(500, b"")),
+    )
+    @mock.patch("landscape.client.package.reporter.fetch_to_file_async")
+    @mock.patch("logging.warning", return_value=None)
+    def test_fetch_hash_id_db_with_checksum_error(
+        self,
+        logging_mock,
+        mock_fetch_to_file,
+        mock_fetch_async,
+    ):
+        """
+        The hash=>id database isn't downloaded if its checksum can't be
+        fetched, unless the server doesn't publish it at all.
+        """
+        self.config.data_path = self.makeDir()
+        self.config.package_hash_id_url = "http://fake.url/path/"
+        message_store = self.broker_service.message_store
+        message_store.set_server_uuid("uuid")
+        self.reporter.os_release_filename = self.makeFile(SAMPLE_OS_RELEASE)
+        self.facade.set_arch("arch")
+
+        result = self.reporter.fetch_hash_id_db()
+        mock_fetch_to_file.assert_not_called()
+        logging_mock.assert_called_once_with(
+            "Couldn't download hash=>id database: "
+            "Server returned HTTP code 500",
+        )
+        return result
+
     def test_wb_apt_sources_have_changed(self):
         """
         The L{PackageReporter._apt_sources_have_changed} method returns a bool
@@ -962,6 +1206,35 @@ class PackageReporterAptTest(LandscapeTest):
         result = self.reporter.detect_packages_changes()
         return result.addCallback(got_result)
 
+    def test_detect_packages_changes_with_bitmap_id_sets(self):
+        """
+        Package changes are detected the same way when the store keeps the
+        sets of package ids as bitmaps.
+        """
+        message_store = self.broker_service.message_store
+        message_store.set_accepted_types(["packages"])
+
+        self.store = PackageStore(self.makeFile(), bitmap_id_sets=True)
+        self.reporter._store = self.store
+        self.store.set_hash_ids({HASH1: 1, HASH2: 2, HASH3: 3})
+        self.store.add_available([1, 4])
+
+        def got_result(result):
+            self.assertMessages(
+                message_store.get_pending_messages(),
+                [
+                    {
+                        "type": "packages",
+                        "available": [2, 3],
+                        "not-available": [4],
+                    },
+                ],
+            )
+            self.assertEqual(self.store.get_available(), [1, 2, 3])
+
+        result = self.reporter.detect_packages_changes()
+        return result.addCallback(got_result)
+
     def test_detect_packages_changes_with_available_and_unknown_hash(self):
         message_store = self.broker_service.message_store
         message_store.set_accepted_types(["packages"])
@@ -1449,6 +1722,17 @@ class PackageReporterAptTest(LandscapeTest):
         self.assertTrue(self.reporter.request_unknown_hashes.called)
         self.assertTrue(self.reporter.detect_changes.called)
 
+    def test_create_package_store(self):
+        """
+        The reporter store keeps package id sets as bitmaps if the
+        C{bitmap_id_sets} option is set.
+        """
+        store = PackageReporter.create_package_store(self.config)
+        self.assertFalse(store._bitmap_id_sets)
+        self.config.bitmap_id_sets = True
+        store = PackageReporter.create_package_store(self.config)
+        self.assertTrue(store._bitmap_id_sets)
+
     def test_main(self):
         mocktarget = "landscape.client.package.reporter.run_task_handler"
         with mock.patch(mocktarget) as m:
@@ -1456,6 +1740,12 @@ class PackageReporterAptTest(LandscapeTest):
             self.assertEqual("RESULT", main(["ARGS"]))
         m.assert_called_once_with(PackageReporter, ["ARGS"])
 
+    def test_main_worker(self):
+        mocktarget = "landscape.client.package.reporter.run_task_handler"
+        with mock.patch(mocktarget) as m:
+            main(["--worker"])
+        m.assert_called_once_with(PackageReporterWorker, ["--worker"])
+
     def test_find_reporter_command_with_bindir(self):
         self.config.bindir = "/spam/eggs"
         command = find_reporter_command(self.config)
@@ -2485,6 +2775,117 @@ class FakePackageReporterTest(LandscapeTest):
         return self.reporter.run().addCallback(check1)
 
 
+class PackageReporterWorkerTest(LandscapeTest):
+    helpers = [AptFacadeHelper, BrokerServiceHelper]
+
+    Facade = AptFacade
+
+    def setUp(self):
+        super().setUp()
+        self.store = PackageStore(self.makeFile())
+        self.config = PackageReporterConfiguration()
+        self.config.data_path = self.makeDir()
+        os.mkdir(self.config.package_directory)
+        self.reactor = FakeReactor()
+        self.worker = PackageReporterWorker(
+            self.store,
+            self.facade,
+            self.remote,
+            self.config,
+            self.reactor,
+        )
+        self.exited = self.worker.run()
+        self.addCleanup(self.worker.exit)
+
+    @mock.patch.object(PackageReporter, "run")
+    def test_run_reporter(self, run_mock):
+        """
+        L{PackageReporterWorker.run_reporter} starts a reporter run, and
+        has another one follow it if requested while it's in progress.
+        """
+        runs = [Deferred(), Deferred()]
+        run_mock.side_effect = runs
+        self.assertTrue(self.worker.run_reporter())
+        self.assertFalse(self.worker.run_reporter())
+        self.assertFalse(self.worker.run_reporter())
+        self.assertEqual(1, run_mock.call_count)
+        runs[0].callback(None)
+        self.assertEqual(2, run_mock.call_count)
+        runs[1].callback(None)
+        self.assertEqual(2, run_mock.call_count)
+
+    @mock.patch.object(PackageReporter, "run")
+    def test_run_reporter_failure(self, run_mock):
+        """
+        Failed runs are logged, and don't prevent further runs.
+        """
+        self.log_helper.ignore_errors(RuntimeError)
+        run_mock.return_value = fail(RuntimeError("boom"))
+        self.assertTrue(self.worker.run_reporter())
+        self.assertIn("Package reporter run failed", self.logfile.getvalue())
+        self.assertTrue(self.worker.run_reporter())
+
+    def test_run_reporter_over_amp(self):
+        """
+        The worker is published over AMP, for the monitor to request runs.
+        """
+        connector = PackageReporterConnector(self.reactor, self.config)
+        self.addCleanup(connector.disconnect)
+        with mock.patch.object(
+            PackageReporter,
+            "run",
+            return_value=Deferred(),
+        ) as run_mock:
+            remote = self.successResultOf(connector.connect())
+            self.assertTrue(self.successResultOf(remote.run_reporter()))
+        run_mock.assert_called_once_with()
+
+    def test_refresh_channels(self):
+        """
+        The apt cache only gets reloaded when the dpkg status file or the
+        apt lists changed since the previous run.
+        """
+        status_file = apt_pkg.config.find_file("dir::state::status")
+        with mock.patch.object(self.facade, "reload_channels") as reload_mock:
+            self.worker._refresh_channels(None)
+            self.worker._refresh_channels(None)
+            self.assertEqual(0, reload_mock.call_count)
+            touch_file(status_file, offset_seconds=5)
+            self.worker._refresh_channels(None)
+            self.assertEqual(1, reload_mock.call_count)
+            self.worker._refresh_channels(None)
+            self.assertEqual(1, reload_mock.call_count)
+
+    def test_exit_when_idle(self):
+        """
+        The worker exits if no run got requested for three package monitor
+        intervals.
+        """
+        self.reactor.advance(2 * self.config.package_monitor_interval)
+        self.assertNoResult(self.exited)
+        self.reactor.advance(self.config.package_monitor_interval)
+        self.successResultOf(self.exited)
+
+    @mock.patch.object(PackageReporter, "run")
+    def test_exit_waits_for_run(self, run_mock):
+        """
+        When asked to exit, the worker waits for its current run to be over.
+        """
+        run_mock.return_value = Deferred()
+        self.worker.run_reporter()
+        self.worker.exit()
+        self.assertNoResult(self.exited)
+        self.assertFalse(self.worker.run_reporter())
+        run_mock.return_value.callback(None)
+        self.successResultOf(self.exited)
+
+    def test_exit_when_parent_is_gone(self):
+        parent_pid = self.worker._parent_pid + 1
+        with mock.patch("os.getppid", return_value=parent_pid):
+            self.reactor.advance(self.worker.parent_check_interval)
+        self.successResultOf(self.exited)
+
+
 class EqualsHashes:
     def __init__(self, *hashes):
         self._hashes = sorted(hashes)
@@ -17,6 +17,7 @@ from landscape.client.package.taskhandler import run_task_handler
 from landscape.client.tests.helpers import BrokerServiceHelper
 from landscape.client.tests.helpers import LandscapeTest
 from landscape.lib.apt.package.facade import AptFacade
+from landscape.lib.apt.package.store import HashIdIndex
 from landscape.lib.apt.package.store import HashIdStore
 from landscape.lib.apt.package.store import PackageStore
 from landscape.lib.apt.package.testing import AptFacadeHelper
@@ -89,6 +90,39 @@ class PackageTaskHandlerTest(LandscapeTest):
 
         return result
 
+    def test_use_hash_id_db_index(self):
+        """
+        The hash=>id database gets indexed the first time it's used, and the
+        mappings are then looked up in the index.
+        """
+        hash = b"h" * 20
+        self.config.data_path = self.makeDir()
+        os.makedirs(os.path.join(self.config.data_path, "package", "hash-id"))
+        hash_id_db_filename = os.path.join(
+            self.config.data_path,
+            "package",
+            "hash-id",
+            "uuid_codename_arch",
+        )
+        HashIdStore(hash_id_db_filename).set_hash_ids({hash: 123})
+
+        message_store = self.broker_service.message_store
+        message_store.set_server_uuid("uuid")
+        self.handler.os_release_filename = self.makeFile(SAMPLE_OS_RELEASE)
+        self.facade.set_arch("arch")
+
+        result = self.handler.use_hash_id_db()
+
+        def callback(ignored):
+            self.assertTrue(os.path.exists(hash_id_db_filename + ".index"))
+            [hash_id_store] = self.store._hash_id_stores
+            self.assertIsInstance(hash_id_store, HashIdIndex)
+            self.assertEqual(self.store.get_hash_id(hash), 123)
+            self.assertEqual(self.store.get_id_hash(123), hash)
+
+        result.addCallback(callback)
+        return result
+
     @patch("logging.warning")
     def test_use_hash_id_db_undetermined_codename(self, logging_mock):
         # Fake uuid
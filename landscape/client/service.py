@@ -1,15 +1,22 @@
 import logging
 import signal
+import time
 
 from twisted.application.app import startApplication
 from twisted.application.service import Application
 from twisted.application.service import Service
+from twisted.internet.defer import Deferred
 
+from landscape.client.clones import CLONE_STATS_INTERVAL
+from landscape.client.clones import get_clone_start_delays
+from landscape.client.clones import log_clone_stats
 from landscape.client.deployment import get_versioned_persist
 from landscape.client.deployment import init_logging
 from landscape.client.reactor import LandscapeReactor
 from landscape.lib.logging import LoggingAttributeError
 from landscape.lib.logging import rotate_logs
+from landscape.lib.profiler import start_profiling
+from landscape.lib.startup import StartupTrace
 
 
 class LandscapeService(Service):
@@ -19,28 +26,100 @@ class LandscapeService(Service):
 
     @cvar service_name: The lower-case name of the service. This is used to
         generate the bpickle and the Unix socket filenames.
+    @cvar ready_events: The reactor events marking the end of the startup,
+        when tracing it.
     @ivar config: A L{Configuration} object.
     @ivar reactor: A L{LandscapeReactor} object.
     @ivar persist: A L{Persist} object, if C{persist_filename} is defined.
     @ivar factory: A L{LandscapeComponentProtocolFactory}, it must be provided
         by instances of sub-classes.
+    @ivar startup_trace: The L{StartupTrace} of the service, if enabled.
     """
 
     reactor_factory = LandscapeReactor
     persist_filename = None
+    ready_events = ("impending-exchange",)
+    startup_trace = None
 
     def __init__(self, config):
         self.config = config
         self.reactor = self.reactor_factory()
+        if self.config is not None and self.config.reactor_stats:
+            self.reactor.enable_stats()
         if self.persist_filename:
             self.persist = get_versioned_persist(self)
-        if not (self.config is not None and self.config.ignore_sigusr1):
-            from twisted.internet import reactor
 
+        from twisted.internet import reactor
+
+        if not (self.config is not None and self.config.ignore_sigusr1):
             signal.signal(
                 signal.SIGUSR1,
                 lambda signal, frame: reactor.callFromThread(rotate_logs),
             )
+        if self.config is not None:
+            # SIGUSR2 profiles the daemon with the default settings
+            signal.signal(
+                signal.SIGUSR2,
+                lambda signal, frame: reactor.callFromThread(
+                    self._start_profiling,
+                ),
+            )
+
+    def _start_profiling(self):
+        start_profiling(
+            self.reactor,
+            self.config.log_dir,
+            self.service_name,
+        )
+
+    def load_plugins(self, registry, get_plugin):
+        """Load the plugins enabled in the configuration into C{registry}.
+
+        Services call this once they are connected to the broker, rather
+        than when they are created, so that they start listening and connect
+        to the broker first.  The plugins are still all loaded then, not on
+        their first use: their modules are imported one per reactor
+        iteration, so that the service stays responsive meanwhile.
+
+        @param registry: The L{BrokerClient} to add the plugins to.
+        @param get_plugin: A callable taking the name of a plugin, and
+            returning an instance of it or C{None} if it can't be loaded.
+        @return: A L{Deferred} firing once all the plugins are added.
+        """
+        loaded = Deferred()
+        plugin_names = list(self.config.plugin_factories)
+        started = time.monotonic()
+
+        def load_next():
+            if not plugin_names:
+                if self.startup_trace is not None:
+                    self.startup_trace.record_phase(
+                        "plugins",
+                        time.monotonic() - started,
+                    )
+                loaded.callback(None)
+                return
+            plugin = get_plugin(plugin_names.pop(0))
+            if plugin is not None:
+                self.plugins.append(plugin)
+                registry.add(plugin)
+            self.reactor.call_later(0, load_next)
+
+        load_next()
+        return loaded
+
+    def trace_startup(self, trace):
+        """Log the startup C{trace} once one of L{ready_events} fires."""
+        self.startup_trace = trace
+        calls = []
+
+        def ready(*args, **kwargs):
+            for call in calls:
+                self.reactor.cancel_call(call)
+            trace.finish()
+
+        for event in self.ready_events:
+            calls.append(self.reactor.call_on(event, ready))
 
     def startService(self):  # noqa: N802
         Service.startService(self)
@@ -78,14 +157,21 @@ def run_landscape_service(configuration_class, service_class, args):
     #     startLoggingWithObserver, PythonLoggingObserver)
     # startLoggingWithObserver(PythonLoggingObserver().emit, setStdout=False)
 
-    configuration = configuration_class()
-    configuration.load(args)
-    try:
-        init_logging(configuration, service_class.service_name)
-    except LoggingAttributeError:
-        return
+    trace = StartupTrace()
+    with trace.phase("configuration"):
+        configuration = configuration_class()
+        configuration.load(args)
+        try:
+            init_logging(configuration, service_class.service_name)
+        except LoggingAttributeError:
+            return
+    if configuration.trace_startup:
+        trace.trace_imports()
     application = Application(f"landscape-{service_class.service_name}")
-    service = service_class(configuration)
+    with trace.phase("service"):
+        service = service_class(configuration)
+    if configuration.trace_startup:
+        service.trace_startup(trace)
     service.setServiceParent(application)
 
     if configuration.clones > 0:
@@ -111,21 +197,31 @@ def run_landscape_service(configuration_class, service_class, args):
         configuration.is_clone = False
 
         def start_clones():
-            # Spawn instances over the given time window
-            start_clones_over = float(configuration.start_clones_over)
-            delay = start_clones_over / configuration.clones
+            # Spawn instances over the given time window, with some jitter
+            # so that they don't all run their periodic work in lockstep
+            delays = get_clone_start_delays(
+                configuration.clones,
+                float(configuration.start_clones_over),
+            )
 
-            for i, clone in enumerate(clones):
+            for delay, clone in zip(delays, clones):
 
                 def start(clone):
                     clone.setServiceParent(application)
                     clone.reactor.fire("run")
 
-                service.reactor.call_later(delay * (i + 1), start, clone=clone)
+                service.reactor.call_later(delay, start, clone=clone)
+
+            service.reactor.call_every(
+                CLONE_STATS_INTERVAL,
+                log_clone_stats,
+                configuration.clones,
+            )
 
         service.reactor.call_when_running(start_clones)
 
-    startApplication(application, False)
+    with trace.phase("start"):
+        startApplication(application, False)
     if configuration.ignore_sigint:
         signal.signal(signal.SIGINT, signal.SIG_IGN)
 
@@ -0,0 +1,307 @@
+"""An asynchronous client for the snapd REST API.
+
+The functions of L{landscape.client.snap_http} open a new connection to the
+snapd socket for every request, and block until snapd answers: a slow snapd
+stalls the whole daemon calling them.  The L{SnapdClient} makes its requests
+on the Twisted reactor instead, keeping its connection to snapd open between
+requests.
+"""
+import hashlib
+import json
+import logging
+from http.client import responses
+from io import BytesIO
+from urllib.parse import urlencode
+
+from twisted.internet.defer import Deferred
+from twisted.internet.defer import DeferredList
+from twisted.internet.endpoints import UNIXClientEndpoint
+from twisted.web.client import Agent
+from twisted.web.client import FileBodyProducer
+from twisted.web.client import HTTPConnectionPool
+from twisted.web.client import readBody
+from twisted.web.http_headers import Headers
+from twisted.web.iweb import IAgentEndpointFactory
+from zope.interface import implementer
+
+from landscape.client.snap_http import INCOMPLETE_STATUSES
+from landscape.client.snap_http import SnapdHttpException
+from landscape.client.snap_http import SnapdResponse
+from landscape.client.snap_http.http import BASE_URL
+from landscape.client.snap_http.http import SNAPD_SOCKET
+
+#: The seconds between the first two polls of L{SnapdChangeTracker}.
+INITIAL_POLL_INTERVAL = 0.25
+
+
+@implementer(IAgentEndpointFactory)
+class _SocketEndpointFactory:
+    """Connect to the snapd socket, whatever the host of the URL."""
+
+    def __init__(self, reactor, socket_path):
+        self._reactor = reactor
+        self._socket_path = socket_path
+
+    def endpointForURI(self, uri):  # noqa: N802
+        return UNIXClientEndpoint(self._reactor, self._socket_path)
+
+
+class _RawResponse:
+    """The status, content type and body of a response from snapd."""
+
+    def __init__(self, code, content_type, body):
+        self.code = code
+        self.content_type = content_type
+        self.body = body
+        self.digest = hashlib.sha256(body).hexdigest()
+
+    def parse(self):
+        """Return the L{SnapdResponse} for this response.
+
+        This parses the body the same way L{snap_http} does.
+
+        @raise SnapdHttpException: If snapd answered with an error.
+        """
+        if self.code >= 400:
+            raise SnapdHttpException(self.body)
+        if self.content_type == "application/json":
+            return SnapdResponse.from_http_response(json.loads(self.body))
+        if self.content_type in (
+            "application/json-seq",
+            "application/x-ndjson",
+        ):
+            result = [
+                json.loads(record)
+                for record in self.body.split(b"\x1e")
+                if record.strip()
+            ]
+        else:
+            result = self.body
+        return SnapdResponse(
+            type="async" if self.code == 202 else "sync",
+            status_code=self.code,
+            status=responses[self.code],
+            result=result,
+        )
+
+
+class SnapdClient:
+    """Make requests to the snapd REST API on the Twisted reactor.
+
+    Connections to snapd are kept open and reused between requests, and
+    identical C{GET} requests made while one is in flight share its answer
+    instead of being sent again.
+
+    @param reactor: The Twisted reactor, defaults to the global one.
+    @param socket_path: The path of the snapd socket.
+    """
+
+    def __init__(self, reactor=None, socket_path=SNAPD_SOCKET):
+        if reactor is None:
+            from twisted.internet import reactor
+        self._pool = HTTPConnectionPool(reactor, persistent=True)
+        self._agent = Agent.usingEndpointFactory(
+            reactor,
+            _SocketEndpointFactory(reactor, socket_path),
+            pool=self._pool,
+        )
+        self._in_flight = {}
+
+    def get(self, path, query_params=None):
+        """Perform a C{GET} request of C{path}.
+
+        @return: A L{Deferred} firing with a L{SnapdResponse}, or failing
+            with L{SnapdHttpException} if snapd answered with an error.
+        """
+        result = self.get_with_digest(path, query_params)
+        return result.addCallback(lambda response_digest: response_digest[0])
+
+    def get_with_digest(self, path, query_params=None):
+        """Perform a C{GET} request of C{path}, and hash the answer.
+
+        The digest identifies the exact body snapd answered with, much like
+        an HTTP C{ETag}: comparing it with the one of a previous request
+        tells whether anything changed, without comparing the results.
+
+        @return: A L{Deferred} firing with a C{(response, digest)} tuple.
+        """
+        url = _get_url(path, query_params)
+        waiting = self._in_flight.get(url)
+        if waiting is None:
+            waiting = self._in_flight[url] = []
+            request = self._request(b"GET", url)
+            request.addBoth(self._answer_waiting, url)
+        result = Deferred()
+        waiting.append(result)
+        return result.addCallback(
+            lambda raw: (raw.parse(), raw.digest),
+        )
+
+    def post(self, path, body):
+        """Perform a C{POST} request of C{path}, JSON-ifying C{body}.
+
+        @return: A L{Deferred} firing with a L{SnapdResponse}.
+        """
+        request = self._request(b"POST", _get_url(path), body)
+        return request.addCallback(lambda raw: raw.parse())
+
+    def get_apps(self, services_only=False):
+        """List the available apps, see L{snap_http.get_apps}."""
+        return self.get("/apps", _get_apps_params(services_only))
+
+    def get_apps_with_digest(self, services_only=False):
+        """List the available apps, along with the digest of the answer."""
+        return self.get_with_digest("/apps", _get_apps_params(services_only))
+
+    def check_changes(self):
+        """List all the snapd changes, see L{snap_http.check_changes}."""
+        return self.get("/changes", {"select": "all"})
+
+    def check_change(self, change_id):
+        """Get the snapd change C{change_id}, see L{snap_http.check_change}."""
+        return self.get("/changes/" + change_id)
+
+    def close(self):
+        """Close the connections kept open to snapd.
+
+        @return: A L{Deferred} firing once they are closed.
+        """
+        return self._pool.closeCachedConnections()
+
+    def _request(self, method, url, body=None):
+        headers = Headers({b"Host": [b"localhost"]})
+        producer = None
+        if body is not None:
+            headers.addRawHeader(b"Content-Type", b"application/json")
+            producer = FileBodyProducer(BytesIO(json.dumps(body).encode()))
+        request = self._agent.request(method, url.encode(), headers, producer)
+        return request.addCallback(self._read_response)
+
+    def _read_response(self, response):
+        content_type = response.headers.getRawHeaders(b"Content-Type", [b""])
+        content_type = content_type[0].decode("ascii").split(";")[0].strip()
+        body = readBody(response)
+        return body.addCallback(
+            lambda body: _RawResponse(response.code, content_type, body),
+        )
+
+    def _answer_waiting(self, result, url):
+        for waiting in self._in_flight.pop(url):
+            waiting.callback(result)
+
+
+class SnapdChangeTracker:
+    """Wait for snapd changes to be done, polling them in a single loop.
+
+    snapd doesn't notify anyone when a change is done, so the pending
+    changes are polled, only asking snapd about those ones.  Most changes
+    are done within a second, so polls start often and back off
+    exponentially while changes stay pending, up to C{max_interval}
+    seconds between two polls.
+
+    @param client: The L{SnapdClient} to poll the changes with.
+    @param reactor: The L{LandscapeReactor} to schedule the polls with.
+    @param initial_interval: The seconds between the first two polls.
+    @param max_interval: The maximum seconds between two polls.
+    """
+
+    def __init__(
+        self,
+        client,
+        reactor,
+        initial_interval=INITIAL_POLL_INTERVAL,
+        max_interval=15,
+    ):
+        self._client = client
+        self._reactor = reactor
+        self._initial_interval = min(initial_interval, max_interval)
+        self._max_interval = max_interval
+        self._interval = self._initial_interval
+        self._waiting = {}
+        self._call = None
+        self._polling = False
+
+    def wait(self, change_id):
+        """Wait for the change C{change_id} to be done.
+
+        Waiting for a new change makes the polls start over often, so that
+        it's reported quickly whatever the other pending changes.
+
+        @return: A L{Deferred} firing with the change as returned by snapd,
+            or with C{None} if snapd doesn't know the change.  It fails if
+            the change couldn't be checked.
+        """
+        deferred = Deferred()
+        self._waiting.setdefault(change_id, []).append(deferred)
+        self._interval = self._initial_interval
+        if not self._polling:
+            self._schedule()
+        return deferred
+
+    def _schedule(self):
+        if self._call is not None:
+            self._reactor.cancel_call(self._call)
+        self._call = self._reactor.call_later(self._interval, self._poll)
+        self._interval = min(self._interval * 2, self._max_interval)
+
+    def _poll(self):
+        self._call = None
+        self._polling = True
+        logging.info("Polling snapd for status of pending snap changes")
+        checks = []
+        for change_id in list(self._waiting):
+            check = self._client.check_change(change_id)
+            check.addCallbacks(
+                self._got_change,
+                self._check_failed,
+                callbackArgs=(change_id,),
+                errbackArgs=(change_id,),
+            )
+            checks.append(check)
+        result = DeferredList(checks, consumeErrors=True)
+        return result.addCallback(self._polled)
+
+    def _got_change(self, response, change_id):
+        change = response.result
+        if change["status"] in INCOMPLETE_STATUSES:
+            logging.debug(f"Change {change_id} is {change['status']}")
+        else:
+            self._done(change_id, change)
+
+    def _check_failed(self, failure, change_id):
+        if failure.check(SnapdHttpException) and _is_not_found(failure.value):
+            # snapd could have dropped the change for some reason, which is
+            # reported rather than waited for forever.
+            self._done(change_id, None)
+            return
+        for deferred in self._waiting.pop(change_id, ()):
+            deferred.errback(failure)
+
+    def _done(self, change_id, change):
+        for deferred in self._waiting.pop(change_id, ()):
+            deferred.callback(change)
+
+    def _polled(self, results):
+        self._polling = False
+        if self._waiting:
+            self._schedule()
+
+
+def _is_not_found(error):
+    try:
+        return error.json["status-code"] == 404
+    except (ValueError, TypeError, KeyError):
+        return False
+
+
+def _get_url(path, query_params=None):
+    url = BASE_URL + path
+    if query_params:
+        url += "?" + urlencode(query_params)
+    return url
+
+
+def _get_apps_params(services_only):
+    if services_only:
+        return {"select": "service"}
+    return None
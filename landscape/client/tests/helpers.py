@@ -1,6 +1,10 @@
+import json
 import pprint
 import unittest
 
+from twisted.internet.defer import fail
+from twisted.internet.defer import succeed
+
 from landscape.client.broker.amp import FakeRemoteBroker
 from landscape.client.broker.amp import RemoteBrokerConnector
 from landscape.client.broker.config import BrokerConfiguration
@@ -11,6 +15,8 @@ from landscape.client.manager.config import ManagerConfiguration
 from landscape.client.manager.manager import Manager
 from landscape.client.monitor.config import MonitorConfiguration
 from landscape.client.monitor.monitor import Monitor
+from landscape.client.snap_http import SnapdHttpException
+from landscape.client.snap_http import SnapdResponse
 from landscape.client.tests.subunit import run_isolated
 from landscape.client.watchdog import bootstrap_list
 from landscape.lib import testing
@@ -267,3 +273,25 @@ class FakePersist:
 
     def remove(self, key):
         self.called = True
+
+
+class FakeSnapdClient:
+    """
+    Fake the C{check_change} method of a L{SnapdClient}, answering with the
+    given C{changes} as snapd would, or failing with the given C{error}.
+    """
+
+    def __init__(self):
+        self.changes = []
+        self.error = None
+        self.checked = []
+
+    def check_change(self, change_id):
+        self.checked.append(change_id)
+        if self.error is not None:
+            return fail(self.error)
+        for change in self.changes:
+            if change["id"] == change_id:
+                return succeed(SnapdResponse("sync", 200, "OK", change))
+        body = {"type": "error", "status-code": 404, "result": {}}
+        return fail(SnapdHttpException(json.dumps(body)))
@@ -1,5 +1,6 @@
 from landscape.client.accumulate import accumulate
 from landscape.client.accumulate import Accumulator
+from landscape.client.accumulate import BatchAccumulator
 from landscape.client.tests.helpers import LandscapeTest
 from landscape.lib.persist import Persist
 
@@ -158,3 +159,70 @@ class AccumulatorTest(LandscapeTest):
         step_data = accumulate(0, 14, "key")
         self.assertEqual(step_data, None)
         self.assertEqual(persist.get("key"), (0, 0))
+
+
+class BatchAccumulatorTest(LandscapeTest):
+    """Tests for the L{BatchAccumulator} multi-key accumulator."""
+
+    def test_same_results_as_accumulator(self):
+        """
+        A L{BatchAccumulator} yields the same step data as an
+        L{Accumulator} fed with the same samples.
+        """
+        samples = [(2, 4), (4, 3), (7, 0.5), (13, 3), (14, 2), (21, 8)]
+        accumulate = Accumulator(Persist(), 5)
+        batch_accumulate = BatchAccumulator(Persist(), 5)
+        for timestamp, value in samples:
+            expected = [
+                accumulate(timestamp, value, "key1"),
+                accumulate(timestamp, value * 2, "key2"),
+            ]
+            step_data = batch_accumulate(
+                timestamp,
+                [("key1", value), ("key2", value * 2)],
+            )
+            self.assertEqual(expected, step_data)
+
+    def test_accumulate_loads_persisted_state(self):
+        persist = Persist()
+        persist.set("key", (7, 8))
+        accumulate = BatchAccumulator(persist, 5)
+        step_data = accumulate(13, [("key", 3)])
+        self.assertEqual([(10, float((2 * 4) + (3 * 3)) / 5)], step_data)
+        self.assertEqual((13, 9), accumulate.get("key"))
+
+    def test_persist_only_written_on_flush(self):
+        """
+        The accumulated state is kept in memory until L{flush} is called.
+        """
+        persist = Persist()
+        accumulate = BatchAccumulator(persist, 5)
+        accumulate(2, [("key1", 4), ("key2", 3)])
+        self.assertEqual(None, persist.get("key1"))
+        accumulate.flush()
+        self.assertEqual((2, 8), persist.get("key1"))
+        self.assertEqual((2, 6), persist.get("key2"))
+
+    def test_flush_only_changed_keys(self):
+        persist = Persist()
+        accumulate = BatchAccumulator(persist, 5)
+        accumulate(2, [("key1", 4), ("key2", 3)])
+        accumulate.flush()
+        persist.remove("key2")
+        accumulate(4, [("key1", 1)])
+        accumulate.flush()
+        self.assertEqual((4, 10), persist.get("key1"))
+        self.assertEqual(None, persist.get("key2"))
+
+    def test_reset(self):
+        """
+        L{BatchAccumulator.reset} drops the in-memory state without writing
+        it to the persist.
+        """
+        persist = Persist()
+        accumulate = BatchAccumulator(persist, 5)
+        accumulate(2, [("key", 4)])
+        accumulate.reset()
+        accumulate.flush()
+        self.assertEqual(None, persist.get("key"))
+        self.assertEqual((0, 0), accumulate.get("key"))
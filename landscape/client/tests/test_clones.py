@@ -0,0 +1,139 @@
+from unittest import mock
+
+from landscape.client import clones
+from landscape.client.clones import get_clone_start_delays
+from landscape.client.clones import get_clone_stats
+from landscape.client.clones import get_shared_samples
+from landscape.client.clones import log_clone_stats
+from landscape.client.clones import shared_sample
+from landscape.client.clones import SharedSamples
+from landscape.client.deployment import Configuration
+from landscape.client.monitor.memoryinfo import MemoryInfo
+from landscape.client.tests.helpers import LandscapeTest
+from landscape.client.tests.helpers import MonitorHelper
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class SharedSamplesTest(LandscapeTest):
+    def setUp(self):
+        super().setUp()
+        self.time = FakeTime()
+        self.samples = SharedSamples(ttl=10, get_time=self.time)
+
+    def test_get(self):
+        """
+        A sample is taken once, and then shared until it's too old.
+        """
+        take_sample = mock.Mock(side_effect=[{"free": 1}, {"free": 2}])
+        sample = self.samples.get(("memory",), take_sample)
+        self.assertEqual({"free": 1}, sample)
+        self.time.now = 9
+        self.assertIs(sample, self.samples.get(("memory",), take_sample))
+        self.assertEqual(1, take_sample.call_count)
+        self.time.now = 10
+        self.assertEqual(
+            {"free": 2}, self.samples.get(("memory",), take_sample)
+        )
+        self.assertEqual(1, self.samples.hits)
+        self.assertEqual(2, self.samples.misses)
+
+    def test_get_different_keys(self):
+        self.assertEqual(1, self.samples.get(("cpu", "/a"), lambda: 1))
+        self.assertEqual(2, self.samples.get(("cpu", "/b"), lambda: 2))
+
+    def test_get_failing_sample(self):
+        """Failures to take a sample are not cached."""
+
+        def fail():
+            raise OSError()
+
+        self.assertRaises(OSError, self.samples.get, ("cpu",), fail)
+        self.assertEqual(1, self.samples.get(("cpu",), lambda: 1))
+
+    def test_expired_samples_are_forgotten(self):
+        self.samples.get(("old",), lambda: 1)
+        self.time.now = 10
+        self.samples.get(("new",), lambda: 2)
+        self.assertEqual([("new",)], list(self.samples._samples))
+
+    def test_shared_sample_without_clones(self):
+        """Samples are only shared when running clones."""
+        config = Configuration()
+        take_sample = mock.Mock(return_value=1)
+        shared_sample(config, ("test",), take_sample)
+        shared_sample(config, ("test",), take_sample)
+        self.assertEqual(2, take_sample.call_count)
+
+    def test_shared_sample_with_clones(self):
+        config = Configuration()
+        config.clones = 3
+        self.addCleanup(get_shared_samples().clear)
+        take_sample = mock.Mock(return_value=1)
+        shared_sample(config, ("test",), take_sample)
+        shared_sample(config, ("test",), take_sample)
+        self.assertEqual(1, take_sample.call_count)
+
+
+class CloneStatsTest(LandscapeTest):
+    def test_get_clone_start_delays(self):
+        """
+        Each clone starts at a random time within its own slot of the start
+        period.
+        """
+        delays = get_clone_start_delays(4, 100)
+        self.assertEqual(4, len(delays))
+        for index, delay in enumerate(delays):
+            self.assertTrue(25 * index <= delay <= 25 * (index + 1))
+
+    def test_get_clone_start_delays_without_jitter(self):
+        self.assertEqual(
+            [25, 50, 75, 100],
+            get_clone_start_delays(4, 100, jitter=False),
+        )
+
+    @mock.patch("os.cpu_count", return_value=4)
+    def test_get_clone_stats(self, cpu_count):
+        samples = SharedSamples()
+        samples.hits = 3
+        samples.misses = 1
+        with mock.patch.object(clones, "_shared_samples", samples):
+            stats = get_clone_stats(10)
+        self.assertEqual(10, stats["clones"])
+        self.assertEqual(2.5, stats["clones-per-core"])
+        self.assertTrue(stats["memory-per-clone"] > 0)
+        self.assertEqual(0.75, stats["shared-sample-hits"])
+
+    def test_log_clone_stats(self):
+        self.log_helper.ignore_errors(".*")
+        log_clone_stats(10)
+        self.assertIn("Running 10 clones", self.logfile.getvalue())
+
+
+class SharedPluginSampleTest(LandscapeTest):
+    helpers = [MonitorHelper]
+
+    def test_clones_share_samples(self):
+        """
+        Plugins of different clones running in the same process share the
+        data they sample from the system.
+        """
+        self.config.clones = 2
+        self.addCleanup(get_shared_samples().clear)
+        plugin = MemoryInfo(create_time=self.reactor.time)
+        other_plugin = MemoryInfo(create_time=self.reactor.time)
+        self.monitor.add(plugin)
+        self.monitor.add(other_plugin)
+        with mock.patch(
+            "landscape.client.monitor.memoryinfo.MemoryStats",
+        ) as memory_stats:
+            memory_stats.return_value.free_memory = 512
+            memory_stats.return_value.free_swap = 1024
+            self.reactor.advance(self.monitor.step_size)
+        memory_stats.assert_called_once_with("/proc/meminfo")
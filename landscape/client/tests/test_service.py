@@ -1,5 +1,6 @@
 import logging
 import signal
+from unittest import mock
 
 from twisted.internet import reactor
 from twisted.internet.task import deferLater
@@ -7,6 +8,7 @@ from twisted.internet.task import deferLater
 from landscape.client.deployment import Configuration
 from landscape.client.service import LandscapeService
 from landscape.client.tests.helpers import LandscapeTest
+from landscape.lib.startup import StartupTrace
 from landscape.lib.testing import FakeReactor
 
 
@@ -26,10 +28,12 @@ class LandscapeServiceTest(LandscapeTest):
         self.makeDir(path=self.config.sockets_path)
         self.reactor = FakeReactor()
         signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+        signal.signal(signal.SIGUSR2, signal.SIG_DFL)
 
     def tearDown(self):
         super().tearDown()
         signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+        signal.signal(signal.SIGUSR2, signal.SIG_DFL)
 
     def test_create_persist(self):
         """
@@ -84,6 +88,80 @@ class LandscapeServiceTest(LandscapeTest):
         d = deferLater(reactor, 0, lambda: None)
         return d.addCallback(check)
 
+    def test_reactor_stats(self):
+        """
+        The reactor statistics are only enabled if configured.
+        """
+        self.assertIsNone(TestService(self.config).reactor.stats)
+        self.config.reactor_stats = True
+        self.assertIsNotNone(TestService(self.config).reactor.stats)
+
+    def test_trace_startup(self):
+        """
+        The startup trace is logged when one of the C{ready_events} fires.
+        """
+        service = TestService(self.config)
+        service.reactor = self.reactor
+        trace = StartupTrace()
+        trace.record_phase("service", 0.5)
+        service.trace_startup(trace)
+        self.assertIs(trace, service.startup_trace)
+        self.reactor.fire("impending-exchange")
+        self.assertIsNotNone(trace.finished)
+        self.assertIn("Startup took", self.logfile.getvalue())
+        self.assertIn("service 0.500s", self.logfile.getvalue())
+        self.assertEqual(
+            [],
+            self.reactor._event_handlers["impending-exchange"],
+        )
+
+    def test_load_plugins(self):
+        """
+        The plugins are loaded one per reactor iteration, and the time it
+        took is recorded in the startup trace.
+        """
+        self.config.plugin_factories = ["First", "Second"]
+        service = TestService(self.config)
+        service.reactor = self.reactor
+        service.plugins = []
+        service.startup_trace = StartupTrace()
+        get_plugin = mock.Mock(side_effect=["first", None])
+        registry = mock.Mock()
+        loaded = service.load_plugins(registry, get_plugin)
+        registry.add.assert_called_once_with("first")
+        self.assertFalse(loaded.called)
+        self.reactor.advance(0)
+        self.assertTrue(loaded.called)
+        self.assertEqual(["first"], service.plugins)
+        self.assertEqual(
+            [mock.call("First"), mock.call("Second")],
+            get_plugin.mock_calls,
+        )
+        [(phase, _)] = service.startup_trace.phases
+        self.assertEqual("plugins", phase)
+
+    def test_usr2_profiles(self):
+        """
+        SIGUSR2 profiles the service, writing the profile to the log
+        directory.
+        """
+        patcher = mock.patch("landscape.client.service.start_profiling")
+        start_profiling = patcher.start()
+        self.addCleanup(patcher.stop)
+        service = TestService(self.config)
+        handler = signal.getsignal(signal.SIGUSR2)
+        handler(None, None)
+        d = deferLater(reactor, 0, lambda: None)
+
+        def check(ignored):
+            start_profiling.assert_called_once_with(
+                service.reactor,
+                self.config.log_dir,
+                "monitor",
+            )
+
+        return d.addCallback(check)
+
     def test_ignore_sigusr1(self):
         """
         SIGUSR1 is ignored if we so request.
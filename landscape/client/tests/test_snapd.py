@@ -0,0 +1,239 @@
+import json
+import os
+
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred
+from twisted.internet.defer import gatherResults
+from twisted.internet.defer import inlineCallbacks
+from twisted.internet.protocol import Factory
+from twisted.web.resource import Resource
+from twisted.web.server import NOT_DONE_YET
+from twisted.web.server import Site
+
+from landscape.client.snap_http import SnapdHttpException
+from landscape.client.snapd import SnapdChangeTracker
+from landscape.client.snapd import SnapdClient
+from landscape.client.tests.helpers import FakeSnapdClient
+from landscape.client.tests.helpers import LandscapeTest
+from landscape.lib.testing import FakeReactor
+
+
+class FakeSnapd(Resource):
+    """A snapd answering C{GET}s with C{results} and echoing C{POST}s."""
+
+    isLeaf = True
+
+    def __init__(self):
+        super().__init__()
+        self.results = {}
+        self.requests = []
+        self.held = None
+
+    def render_GET(self, request):  # noqa: N802
+        self.requests.append(request.uri)
+        path = request.path.decode()
+        if path not in self.results:
+            request.setResponseCode(404)
+            return self.encode(request, 404, {"message": "not found"})
+        if self.held is not None:
+            # Answer once the test says so.
+            self.held.addCallback(
+                lambda _: (
+                    request.write(
+                        self.encode(request, 200, self.results[path]),
+                    ),
+                    request.finish(),
+                ),
+            )
+            return NOT_DONE_YET
+        return self.encode(request, 200, self.results[path])
+
+    def render_POST(self, request):  # noqa: N802
+        self.requests.append(request.uri)
+        body = json.loads(request.content.read())
+        request.setResponseCode(202)
+        return self.encode(request, 202, body)
+
+    def encode(self, request, code, result):
+        request.setHeader(b"Content-Type", b"application/json")
+        return json.dumps(
+            {
+                "type": "sync" if code < 400 else "error",
+                "status-code": code,
+                "status": "OK",
+                "result": result,
+            },
+        ).encode()
+
+
+class CountingFactory(Factory):
+    """Wrap a factory to count the connections it accepts."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.connections = 0
+
+    def buildProtocol(self, addr):  # noqa: N802
+        self.connections += 1
+        return self.factory.buildProtocol(addr)
+
+
+class SnapdClientTest(LandscapeTest):
+    def setUp(self):
+        super().setUp()
+        self.snapd = FakeSnapd()
+        self.factory = CountingFactory(Site(self.snapd))
+        socket_path = os.path.join(self.makeDir(), "snapd.socket")
+        port = reactor.listenUNIX(socket_path, self.factory)
+        self.addCleanup(port.stopListening)
+        self.client = SnapdClient(reactor, socket_path)
+        self.addCleanup(self.client.close)
+
+    @inlineCallbacks
+    def test_get(self):
+        self.snapd.results["/v2/apps"] = [{"name": "svc"}]
+        response = yield self.client.get_apps(services_only=True)
+        self.assertEqual("sync", response.type)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([{"name": "svc"}], response.result)
+        self.assertEqual([b"/v2/apps?select=service"], self.snapd.requests)
+
+    @inlineCallbacks
+    def test_get_error(self):
+        """Errors answered by snapd are raised as L{SnapdHttpException}."""
+        with self.assertRaises(SnapdHttpException):
+            yield self.client.get("/missing")
+
+    @inlineCallbacks
+    def test_get_coalesced(self):
+        """Identical C{GET}s in flight at the same time share a request."""
+        self.snapd.results["/v2/changes"] = []
+        self.snapd.held = Deferred()
+        first = self.client.check_changes()
+        second = self.client.check_changes()
+        reactor.callLater(0.01, self.snapd.held.callback, None)
+        responses = yield gatherResults([first, second])
+        self.assertEqual([[], []], [response.result for response in responses])
+        self.assertEqual([b"/v2/changes?select=all"], self.snapd.requests)
+
+    @inlineCallbacks
+    def test_connection_reused(self):
+        """The connection to snapd is kept open between requests."""
+        self.snapd.results["/v2/changes"] = []
+        yield self.client.check_changes()
+        yield self.client.check_changes()
+        self.assertEqual(2, len(self.snapd.requests))
+        self.assertEqual(1, self.factory.connections)
+
+    @inlineCallbacks
+    def test_get_with_digest(self):
+        """The digest changes with the answer of snapd, and only with it."""
+        self.snapd.results["/v2/apps"] = [{"name": "svc"}]
+        _, first = yield self.client.get_apps_with_digest()
+        _, second = yield self.client.get_apps_with_digest()
+        self.snapd.results["/v2/apps"] = []
+        response, third = yield self.client.get_apps_with_digest()
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, third)
+        self.assertEqual([], response.result)
+
+    @inlineCallbacks
+    def test_post(self):
+        """C{POST} bodies are sent as JSON."""
+        response = yield self.client.post("/snaps", {"action": "refresh"})
+        self.assertEqual(202, response.status_code)
+        self.assertEqual({"action": "refresh"}, response.result)
+
+
+class SnapdChangeTrackerTest(LandscapeTest):
+    def setUp(self):
+        super().setUp()
+        self.client = FakeSnapdClient()
+        self.reactor = FakeReactor()
+        self.tracker = SnapdChangeTracker(
+            self.client,
+            self.reactor,
+            initial_interval=0.25,
+            max_interval=2,
+        )
+
+    def test_wait(self):
+        """Changes are reported once snapd is done with them."""
+        self.client.changes = [{"id": "1", "status": "Doing"}]
+        results = []
+        self.tracker.wait("1").addCallback(results.append)
+        self.reactor.advance(0.25)
+        self.assertEqual([], results)
+        self.client.changes = [{"id": "1", "status": "Done"}]
+        self.reactor.advance(0.5)
+        self.assertEqual([{"id": "1", "status": "Done"}], results)
+
+    def test_back_off(self):
+        """
+        Polls happen less and less often while changes stay pending, up to
+        the maximum interval.
+        """
+        self.client.changes = [{"id": "1", "status": "Doing"}]
+        self.tracker.wait("1")
+        polls = []
+        for _ in range(7):
+            self.reactor.advance(0.25)
+            polls.append(len(self.client.checked))
+        # Polls at 0.25, 0.75, 1.75, 3.75, 5.75, ...
+        self.assertEqual([1, 1, 2, 2, 2, 2, 3], polls)
+        self.reactor.advance(2)
+        self.assertEqual(4, len(self.client.checked))
+        self.reactor.advance(2)
+        self.assertEqual(5, len(self.client.checked))
+
+    def test_wait_resets_interval(self):
+        """Waiting for a new change makes polls frequent again."""
+        self.client.changes = [
+            {"id": "1", "status": "Doing"},
+            {"id": "2", "status": "Done"},
+        ]
+        self.tracker.wait("1")
+        self.reactor.advance(4)
+        results = []
+        self.tracker.wait("2").addCallback(results.append)
+        self.reactor.advance(0.25)
+        self.assertEqual([{"id": "2", "status": "Done"}], results)
+
+    def test_shared_poll(self):
+        """
+        All the pending changes are checked by the same polls, and only
+        they are checked.
+        """
+        self.client.changes = [
+            {"id": "1", "status": "Done"},
+            {"id": "2", "status": "Doing"},
+        ]
+        self.tracker.wait("1")
+        self.tracker.wait("2")
+        self.reactor.advance(0.25)
+        self.assertEqual(["1", "2"], self.client.checked)
+        self.reactor.advance(0.5)
+        self.assertEqual(["1", "2", "2"], self.client.checked)
+
+    def test_no_poll_when_idle(self):
+        """Nothing is polled once no change is waited for."""
+        self.client.changes = [{"id": "1", "status": "Done"}]
+        self.tracker.wait("1")
+        self.reactor.advance(60)
+        self.assertEqual(["1"], self.client.checked)
+
+    def test_unknown_change(self):
+        """Changes unknown to snapd are reported as C{None}."""
+        results = []
+        self.tracker.wait("1").addCallback(results.append)
+        self.reactor.advance(0.25)
+        self.assertEqual([None], results)
+
+    def test_check_error(self):
+        """Errors checking a change are passed to its waiters."""
+        self.client.error = SnapdHttpException("whoops")
+        failures = []
+        self.tracker.wait("1").addErrback(failures.append)
+        self.reactor.advance(0.25)
+        [failure] = failures
+        self.assertEqual("whoops", str(failure.value))
@@ -1,3 +1,5 @@
+import io
+import json
 import os
 import signal
 import stat
@@ -23,18 +25,24 @@ from landscape.client.tests.helpers import LandscapeTest
 from landscape.client.watchdog import bootstrap_list
 from landscape.client.watchdog import Broker
 from landscape.client.watchdog import Daemon
+from landscape.client.watchdog import get_reactor_stats
 from landscape.client.watchdog import ExecutableNotFoundError
+from landscape.client.watchdog import format_reactor_stats
+from landscape.client.watchdog import format_status
 from landscape.client.watchdog import Manager
 from landscape.client.watchdog import MAXIMUM_CONSECUTIVE_RESTARTS
+from landscape.client.watchdog import profile_daemon
 from landscape.client.watchdog import Monitor
 from landscape.client.watchdog import RESTART_BURST_DELAY
 from landscape.client.watchdog import run
+from landscape.client.watchdog import STATUS_INTERVAL
 from landscape.client.watchdog import WatchDog
 from landscape.client.watchdog import WatchDogConfiguration
 from landscape.client.watchdog import WatchDogService
 from landscape.lib.encoding import encode_values
 from landscape.lib.fs import read_text_file
 from landscape.lib.testing import EnvironSaverHelper
+from landscape.lib.testing import FakeReactor as FakeLandscapeReactor
 
 
 class StubDaemon:
@@ -559,6 +567,209 @@ class NonMockerWatchDogTests(LandscapeTest):
         result = dog.request_exit()
         return result
 
+    def test_ping_latency(self):
+        """
+        The watchdog records how long the daemons take to answer its pings.
+        """
+        clock = Clock()
+        dog = WatchDog(
+            clock,
+            broker=AsynchronousPingDaemon("test-broker"),
+            monitor=AsynchronousPingDaemon("test-monitor"),
+            manager=AsynchronousPingDaemon("test-manager"),
+        )
+        dog.start_monitoring()
+        clock.advance(5)
+        dog.broker.fire_running(True)
+        clock.advance(0.5)
+        dog.monitor.fire_running(True)
+        dog.manager.fire_running(False)
+
+        status = dog.get_status()["daemons"]
+        self.assertEqual(1, status["test-broker"]["ping-latency"]["count"])
+        self.assertEqual(0, status["test-broker"]["ping-latency"]["max"])
+        self.assertEqual(5, status["test-broker"]["last-pong"])
+        self.assertEqual(0.5, status["test-monitor"]["ping-latency"]["max"])
+        self.assertEqual(0, status["test-manager"]["ping-latency"]["count"])
+        self.assertIsNone(status["test-manager"]["last-pong"])
+        self.assertEqual(1, status["test-manager"]["failed-pings"])
+
+    def test_reactor_lag(self):
+        """
+        The watchdog records how late its reactor runs the periodic checks.
+        """
+        clock = Clock()
+        dog = WatchDog(
+            clock,
+            broker=BoringDaemon("test-broker"),
+            monitor=BoringDaemon("test-monitor"),
+            manager=BoringDaemon("test-manager"),
+        )
+        dog.start_monitoring()
+        clock.advance(5)
+        clock.advance(7)
+        self.assertEqual(2, dog.reactor_lag.count)
+        self.assertEqual(2, dog.reactor_lag.max)
+
+    def test_write_status(self):
+        """
+        If given a status file, the watchdog periodically writes its status
+        to it.
+        """
+        clock = Clock()
+        status_filename = self.makeFile()
+        dog = WatchDog(
+            clock,
+            broker=BoringDaemon("test-broker"),
+            monitor=BoringDaemon("test-monitor"),
+            manager=BoringDaemon("test-manager"),
+            status_filename=status_filename,
+        )
+        dog.start_monitoring()
+        clock.advance(5)
+        with open(status_filename) as status_file:
+            status = json.load(status_file)
+        self.assertEqual(5, status["time"])
+        self.assertEqual(
+            ["test-broker", "test-manager", "test-monitor"],
+            sorted(status["daemons"]),
+        )
+
+        # The status is only written every STATUS_INTERVAL seconds
+        clock.advance(5)
+        with open(status_filename) as status_file:
+            self.assertEqual(5, json.load(status_file)["time"])
+        clock.advance(STATUS_INTERVAL - 5)
+        with open(status_filename) as status_file:
+            status = json.load(status_file)
+        self.assertEqual(5 + STATUS_INTERVAL, status["time"])
+
+    def test_write_status_error(self):
+        self.log_helper.ignore_errors(".*")
+        clock = Clock()
+        dog = WatchDog(
+            clock,
+            broker=BoringDaemon("test-broker"),
+            monitor=BoringDaemon("test-monitor"),
+            manager=BoringDaemon("test-manager"),
+            status_filename=os.path.join(self.makeFile(), "status"),
+        )
+        dog.start_monitoring()
+        clock.advance(5)
+        self.assertIn(
+            "Couldn't write the watchdog status",
+            self.logfile.getvalue(),
+        )
+
+    def test_format_status(self):
+        status = {
+            "time": 100,
+            "reactor-lag": {"p50": 0.001, "p99": 0.002, "max": 0.0025},
+            "daemons": {
+                "landscape-broker": {
+                    "ping-latency": {"p50": 0.01, "p99": 0.5, "max": 1},
+                    "last-pong": 95,
+                    "failed-pings": 0,
+                },
+                "landscape-monitor": {
+                    "ping-latency": {"p50": None, "p99": None, "max": 0},
+                    "last-pong": None,
+                    "failed-pings": 3,
+                },
+            },
+        }
+        self.assertEqual(
+            "Watchdog status as of 10 seconds ago\n"
+            "  watchdog: reactor lag p50 1.0 ms, p99 2.0 ms, max 2.5 ms\n"
+            "  landscape-broker: responding, last answered 15 seconds ago, "
+            "ping p50 10.0 ms, p99 500.0 ms, max 1000.0 ms\n"
+            "  landscape-monitor: not responding, 3 failed pings, "
+            "never answered, ping p50 -, p99 -, max 0.0 ms",
+            format_status(status, now=110),
+        )
+
+
+class ReactorStatsTest(LandscapeTest):
+
+    helpers = [FakeBrokerServiceHelper]
+
+    def test_get_reactor_stats(self):
+        """
+        The reactor statistics of the running daemons are fetched over AMP.
+        """
+        self.broker_service.startService()
+        self.addCleanup(self.broker_service.stopService)
+        reactor = self.broker_service.reactor
+        reactor.enable_stats()
+        reactor.fire("foobar")
+        result = get_reactor_stats(self.broker_service.config, reactor)
+
+        def check(stats):
+            self.assertEqual(["broker", "manager", "monitor"], sorted(stats))
+            self.assertEqual(1, stats["broker"]["events"]["foobar"]["calls"])
+            self.assertIsNone(stats["monitor"])
+            self.assertIsNone(stats["manager"])
+
+        return result.addCallback(check)
+
+    def test_profile_daemon(self):
+        """
+        The daemon named with C{--profile} is asked to profile itself.
+        """
+        self.broker_service.startService()
+        self.addCleanup(self.broker_service.stopService)
+        config = self.broker_service.config
+        config.log_dir = self.makeDir()
+        config.profile = "broker"
+        config.profile_seconds = 5
+        config.profile_mode = "cprofile"
+        reactor = self.broker_service.reactor
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            result = profile_daemon(config, reactor)
+        self.assertEqual(0, self.successResultOf(result))
+        self.assertIn(
+            "Profiling the broker for 5 seconds, the profile will be "
+            f"written to {config.log_dir}/broker-",
+            stdout.getvalue(),
+        )
+        reactor.advance(5)
+        self.assertEqual(1, len(os.listdir(config.log_dir)))
+
+    def test_profile_daemon_not_running(self):
+        config = WatchDogConfiguration()
+        config.data_path = self.makeDir()
+        config.profile = "monitor"
+        config.profile_seconds = 5
+        config.profile_mode = "sample"
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            result = profile_daemon(config, FakeLandscapeReactor())
+        self.assertEqual(1, self.successResultOf(result))
+        self.assertEqual(
+            "Couldn't profile the monitor, is it running?\n",
+            stdout.getvalue(),
+        )
+
+    def test_format_reactor_stats(self):
+        calls = {"calls": 2, "total": 0.003, "max": 0.002}
+        stats = {
+            "broker": {
+                "events": {"message": calls},
+                "handlers": {"message: handle()": calls},
+                "lag": {"p50": 0.001, "p99": 0.002, "max": 0.0025},
+            },
+            "monitor": None,
+        }
+        self.assertEqual(
+            "broker:\n"
+            "  looping call lag: p50 1.0 ms, p99 2.0 ms, max 2.5 ms\n"
+            "  events:\n"
+            "    message: 2 calls, 3.0 ms total, 2.0 ms max\n"
+            "  handlers:\n"
+            "    message: handle(): 2 calls, 3.0 ms total, 2.0 ms max\n"
+            "monitor: not running, or reactor_stats disabled",
+            format_reactor_stats(stats),
+        )
+
 
 class StubBroker:
 
@@ -596,6 +807,7 @@ class DaemonTestBase(LandscapeTest):
         self.daemon = self.get_daemon()
 
     def tearDown(self):
+        self.daemon.disconnect()
         if hasattr(self, "broker_service"):
             # DaemonBrokerTest
             self.broker_service.stopService()
@@ -1120,6 +1332,45 @@ class DaemonBrokerTest(DaemonTestBase):
         result.addCallback(self.assertTrue)
         return result
 
+    def test_is_running_keeps_connection(self):
+        """
+        The connection to the daemon is kept open between pings.
+        """
+        self.daemon._connector._reactor = self.broker_service.reactor
+        connect = mock.Mock(wraps=self.daemon._connector.connect)
+        self.daemon._connector.connect = connect
+        result = self.daemon.is_running()
+        result.addCallback(lambda ignored: self.daemon.is_running())
+
+        def check(is_running):
+            self.assertTrue(is_running)
+            self.assertEqual(1, connect.call_count)
+
+        return result.addCallback(check)
+
+    def test_is_running_reconnects_after_failure(self):
+        """
+        When a ping fails, the connection is dropped, and established again
+        by the next ping.
+        """
+        self.daemon._connector._reactor = self.broker_service.reactor
+        result = self.daemon.is_running()
+
+        def break_connection(ignored):
+            remote = self.daemon._remote
+            remote.ping = lambda: fail(RuntimeError())
+            return self.daemon.is_running()
+
+        def check_failed(is_running):
+            self.assertFalse(is_running)
+            self.assertIsNone(self.daemon._remote)
+            return self.daemon.is_running()
+
+        result.addCallback(break_connection)
+        result.addCallback(check_failed)
+        result.addCallback(self.assertTrue)
+        return result
+
 
 class WatchDogOptionsTest(LandscapeTest):
     def setUp(self):
@@ -1502,6 +1753,33 @@ class WatchDogRunTests(LandscapeTest):
         self.assertNotIn("MAIL", os.environ)
         self.assertEqual(os.environ["UNRELATED"], "unrelated")
 
+    def test_status(self):
+        """
+        With C{--status}, the status written by the running watchdog is
+        printed instead of starting the client.
+        """
+        data_path = self.makeDir()
+        config = WatchDogConfiguration()
+        config.data_path = data_path
+        dog = WatchDog(
+            Clock(),
+            broker=BoringDaemon("landscape-broker"),
+            monitor=BoringDaemon("landscape-monitor"),
+            manager=BoringDaemon("landscape-manager"),
+            status_filename=config.status_filename,
+        )
+        dog._write_status()
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            exit_code = run(["--status", "--data-path", data_path])
+        self.assertEqual(0, exit_code)
+        self.assertIn("landscape-broker: responding", stdout.getvalue())
+
+    def test_status_not_available(self):
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            exit_code = run(["--status", "--data-path", self.makeDir()])
+        self.assertEqual(1, exit_code)
+        self.assertIn("status is not available", stdout.getvalue())
+
     @mock.patch.object(WatchDogConfiguration, "auto_configure")
     @mock.patch("landscape.client.watchdog.IS_SNAP", "1")
     def test_is_snap(self, mock_auto_configure):
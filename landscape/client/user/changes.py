@@ -1,3 +1,6 @@
+import hashlib
+import json
+
 from twisted.python.compat import iteritems
 from twisted.python.compat import itervalues
 
@@ -10,23 +13,28 @@ class UserChanges:
     If no snapshot is available all users and groups are reported.
     When a snapshot is available, only the changes between the current
     state and the snapshotted state are transmitted to the server.
+
+    Along with the snapshot are persisted the stamp of the provider, which
+    tells when the users and groups can't have changed without reading them
+    again, and a digest of the snapshot, which tells when they didn't
+    change without comparing them with the snapshot.
     """
 
     def __init__(self, persist, provider):
         super().__init__()
         self._persist = persist
         self._provider = provider
-        # FIXME This shouldn't really be necessary.  Not having it
-        # here with the current factoring is also problematic.  Figure
-        # out a clean way to factor this.  Gustavo suggested splitting
-        # it into _build_old_data and _build_new_data and just calling
-        # that from the necessary places.
-        self._refresh()
+        self._new_users = None
+        self._new_groups = None
+        self._stamp = None
 
     def _refresh(self):
         """Load the previous snapshot and update current data."""
         self._old_users = self._persist.get("users", {})
         self._old_groups = self._persist.get("groups", {})
+        # The stamp is taken first, so that changes made while reading the
+        # data will be noticed next time.
+        self._stamp = self._provider.get_stamp()
         self._new_users = self._create_index(
             "username",
             self._provider.get_users(),
@@ -38,8 +46,12 @@ class UserChanges:
 
     def snapshot(self):
         """Save the current state and use it as a comparison snapshot."""
+        if self._new_users is None:
+            self._refresh()
         self._persist.set("users", self._new_users)
         self._persist.set("groups", self._new_groups)
+        self._persist.set("digest", self._get_digest())
+        self._persist.set("stamp", self._stamp)
 
     def clear(self):
         """
@@ -48,6 +60,13 @@ class UserChanges:
         """
         self._persist.remove("users")
         self._persist.remove("groups")
+        self._persist.remove("digest")
+        self._persist.remove("stamp")
+
+    def _get_digest(self):
+        """Return a digest of the current users and groups."""
+        data = json.dumps([self._new_users, self._new_groups], sort_keys=True)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
 
     def _create_index(self, key, sequence):
         """
@@ -65,7 +84,20 @@ class UserChanges:
         See landscape.message_schemas.USERS schema for a description of the
         dictionary returned by this method.
         """
+        stamp = self._provider.get_stamp()
+        if stamp is not None and stamp == self._persist.get("stamp"):
+            # Nothing changed since the snapshot, don't even read the data.
+            self._old_users = self._new_users = self._persist.get("users")
+            self._old_groups = self._new_groups = self._persist.get("groups")
+            self._stamp = stamp
+            return {}
+
         self._refresh()
+        if self._get_digest() == self._persist.get("digest"):
+            # The files were touched, but the data didn't change.
+            self._persist.set("stamp", self._stamp)
+            return {}
+
         changes = {}
         changes.update(self._detect_user_changes())
         changes.update(self._detect_group_changes())
@@ -1,11 +1,9 @@
-import csv
 import logging
+import os
 import subprocess
 from grp import struct_group
 from pwd import struct_passwd
 
-from landscape.lib.compat import _PY3
-
 
 class UserManagementError(Exception):
     """Catch all error for problems with User Management."""
@@ -109,6 +107,19 @@ class UserProviderBase:
                 return data["gid"]
         raise GroupNotFoundError(f"Group not found for group {groupname}.")
 
+    def get_files(self):
+        """Return the files the users and groups are read from, if any."""
+        return []
+
+    def get_stamp(self):
+        """Return a stamp of the users and groups data.
+
+        The stamp changes whenever the users or groups may have changed, so
+        that unchanged data doesn't need to be read again.  Providers which
+        can't tell return C{None}.
+        """
+        return None
+
 
 class UserProvider(UserProviderBase):
 
@@ -135,6 +146,23 @@ class UserProvider(UserProviderBase):
         self._passwd_file = passwd_file
         self._group_file = group_file
 
+    def get_files(self):
+        return [self._passwd_file, self._group_file]
+
+    def get_stamp(self):
+        """
+        Return a stamp made of the inode, modification time and size of the
+        passwd and group files, along with the locked users.
+        """
+        stamp = [sorted(self.locked_users)]
+        for filename in (self._passwd_file, self._group_file):
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                return None
+            stamp.append([stat.st_ino, stat.st_mtime_ns, stat.st_size])
+        return stamp
+
     def get_user_data(self):
         """
         Parse passwd(5) formatted files and return tuples of user data in the
@@ -142,43 +170,31 @@ class UserProvider(UserProviderBase):
         directory, path to the user's shell)
         """
         user_data = []
-        # The DictReader takes bytes in Python 2 and unicode in Python 3 so we
-        # have to pass Python 3 specific parameters to open() and do the
-        # decoding for Python 2 later after we have parsed the rows. We have to
-        # explicitly indicate the encoding as we cannot rely on the system
-        # default encoding.
-        if _PY3:
-            open_params = dict(encoding="utf-8", errors="replace")
-        else:
-            open_params = dict()
-        with open(self._passwd_file, "r", **open_params) as passwd_file:
-            reader = csv.DictReader(
-                passwd_file,
-                fieldnames=self.passwd_fields,
-                delimiter=":",
-                quoting=csv.QUOTE_NONE,
-            )
+        # We have to explicitly indicate the encoding as we cannot rely on
+        # the system default encoding.
+        with open(
+            self._passwd_file,
+            "r",
+            encoding="utf-8",
+            errors="replace",
+        ) as passwd_file:
             current_line = 0
-            for row in reader:
+            for row in _split_rows(passwd_file, len(self.passwd_fields)):
                 current_line += 1
+                username, passwd, uid, gid, gecos, home, shell = row
                 # This skips the NIS user marker in the passwd file.
-                if row["username"].startswith("+") or row[
-                    "username"
-                ].startswith("-"):
+                if username.startswith("+") or username.startswith("-"):
                     continue
-                gecos = row["gecos"]
-                if not _PY3 and gecos is not None:
-                    gecos = gecos.decode("utf-8", "replace")
                 try:
                     user_data.append(
                         (
-                            row["username"],
-                            row["passwd"],
-                            int(row["uid"]),
-                            int(row["primary-gid"]),
+                            username,
+                            passwd,
+                            int(uid),
+                            int(gid),
                             gecos,
-                            row["home"],
-                            row["shell"],
+                            home,
+                            shell,
                         ),
                     )
                 except (ValueError, TypeError):
@@ -195,32 +211,38 @@ class UserProvider(UserProviderBase):
         usernames).
         """
         group_data = []
-        group_file = open(self._group_file, "r")
-        reader = csv.DictReader(
-            group_file,
-            fieldnames=self.group_fields,
-            delimiter=":",
-            quoting=csv.QUOTE_NONE,
-        )
-        current_line = 0
-        for row in reader:
-            current_line += 1
-            # Skip if we find the NIS marker
-            if row["name"].startswith("+") or row["name"].startswith("-"):
-                continue
-            try:
-                group_data.append(
-                    (
-                        row["name"],
-                        row["passwd"],
-                        int(row["gid"]),
-                        row["members"].split(","),
-                    ),
-                )
-            except (AttributeError, ValueError):
-                logging.warn(
-                    f"group file {self._group_file} is incorrectly formatted: "
-                    f"line {current_line:d}.",
-                )
-        group_file.close()
+        with open(self._group_file, "r") as group_file:
+            current_line = 0
+            for row in _split_rows(group_file, len(self.group_fields)):
+                current_line += 1
+                name, passwd, gid, members = row
+                # Skip if we find the NIS marker
+                if name.startswith("+") or name.startswith("-"):
+                    continue
+                try:
+                    group_data.append(
+                        (name, passwd, int(gid), members.split(",")),
+                    )
+                except (AttributeError, ValueError, TypeError):
+                    logging.warn(
+                        f"group file {self._group_file} is incorrectly "
+                        f"formatted: line {current_line:d}.",
+                    )
         return group_data
+
+
+def _split_rows(lines, count):
+    """Split colon separated C{lines} into rows of C{count} fields.
+
+    Missing fields are C{None} and extra ones are dropped, and blank lines
+    are skipped, like L{csv.DictReader} does.
+    """
+    padding = [None] * count
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line:
+            continue
+        fields = line.split(":")
+        if len(fields) != count:
+            fields = (fields + padding)[:count]
+        yield fields
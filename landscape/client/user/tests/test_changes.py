@@ -357,3 +357,46 @@ sbarnes:$1$q7sz09uw$q.A3526M/SHu8vUb.Jo1A/:13349:0:99999:7:::
                 },
             },
         )
+
+    def test_create_diff_same_stamp(self):
+        """
+        L{UserChanges.create_diff} doesn't read the users and groups again
+        when the stamp of the provider didn't change since the snapshot.
+        """
+        users = [("jdoe", "x", 1000, 1000, "JD,,,,", "/home/jdoe", "/bin/sh")]
+        provider = FakeUserProvider(users=users)
+        provider.get_stamp = lambda: ["stamp"]
+        changes = UserChanges(self.persist, provider)
+        changes.create_diff()
+        changes.snapshot()
+        users.pop(0)
+        changes = UserChanges(self.persist, provider)
+        self.assertEqual({}, changes.create_diff())
+        provider.get_stamp = lambda: ["new stamp"]
+        self.assertEqual({"delete-users": ["jdoe"]}, changes.create_diff())
+
+    def test_create_diff_same_digest(self):
+        """
+        When the stamp changes but the users and groups don't, no changes
+        are reported, and the new stamp is persisted.
+        """
+        users = [("jdoe", "x", 1000, 1000, "JD,,,,", "/home/jdoe", "/bin/sh")]
+        provider = FakeUserProvider(users=users)
+        provider.get_stamp = lambda: ["stamp"]
+        changes = UserChanges(self.persist, provider)
+        changes.create_diff()
+        changes.snapshot()
+        provider.get_stamp = lambda: ["new stamp"]
+        self.assertEqual({}, changes.create_diff())
+        self.assertEqual(["new stamp"], self.persist.get("stamp"))
+
+    def test_clear_forgets_stamp(self):
+        """L{UserChanges.clear} makes the data be read and reported again."""
+        users = [("jdoe", "x", 1000, 1000, "JD,,,,", "/home/jdoe", "/bin/sh")]
+        provider = FakeUserProvider(users=users)
+        provider.get_stamp = lambda: ["stamp"]
+        changes = UserChanges(self.persist, provider)
+        changes.create_diff()
+        changes.snapshot()
+        changes.clear()
+        self.assertIn("create-users", changes.create_diff())
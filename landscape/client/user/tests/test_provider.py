@@ -694,6 +694,56 @@ broken2
         )
         self.assertIn(log3, self.logfile.getvalue())
 
+    def test_get_users_blank_and_short_lines(self):
+        """
+        Blank lines are skipped without being counted, and lines with
+        missing fields are reported as incorrectly formatted.
+        """
+        passwd_file = self.makeFile(
+            """\
+root:x:0:0:root:/root:/bin/bash
+
+kevin:x:1001
+""",
+        )
+        provider = UserProvider(
+            passwd_file=passwd_file,
+            group_file=self.group_file,
+        )
+        users = provider.get_users()
+        self.assertEqual(["root"], [user["username"] for user in users])
+        self.assertIn(
+            f"WARNING: passwd file {passwd_file} is incorrectly "
+            "formatted: line 2.",
+            self.logfile.getvalue(),
+        )
+
+    def test_get_stamp(self):
+        """
+        The stamp of the provider changes when the passwd or group files
+        change, or when the locked users do.
+        """
+        provider = UserProvider(
+            passwd_file=self.passwd_file,
+            group_file=self.group_file,
+        )
+        stamp = provider.get_stamp()
+        self.assertEqual(stamp, provider.get_stamp())
+        with open(self.group_file, "a") as group_file:
+            group_file.write("sales:x:1001:\n")
+        self.assertNotEqual(stamp, provider.get_stamp())
+        stamp = provider.get_stamp()
+        provider.locked_users = ["kevin"]
+        self.assertNotEqual(stamp, provider.get_stamp())
+
+    def test_get_stamp_missing_file(self):
+        """Without the passwd file, the provider has no stamp."""
+        provider = UserProvider(
+            passwd_file=self.makeFile(),
+            group_file=self.group_file,
+        )
+        self.assertIsNone(provider.get_stamp())
+
     def test_get_users_nis_line(self):
         """
         This tests the functionality for parsing /etc/passwd style files.
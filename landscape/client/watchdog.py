@@ -6,11 +6,13 @@ The main C{landscape-client} program uses this watchdog.
 """
 
 import errno
+import json
 import os
 import pwd
 import signal
 import sys
 import time
+from functools import partial
 from logging import error
 from logging import info
 from logging import warning
@@ -40,14 +42,25 @@ from landscape.lib.bootstrap import BootstrapFile
 from landscape.lib.bootstrap import BootstrapList
 from landscape.lib.config import get_bindir
 from landscape.lib.encoding import encode_values
+from landscape.lib.histogram import LatencyHistogram
 from landscape.lib.log import log_failure
 from landscape.lib.logging import rotate_logs
+from landscape.lib.profiler import DEFAULT_PROFILE_SECONDS
+from landscape.lib.profiler import PROFILE_MODES
 from landscape.lib.twisted_util import gather_results
 
 GRACEFUL_WAIT_PERIOD = 10
 MAXIMUM_CONSECUTIVE_RESTARTS = 5
 RESTART_BURST_DELAY = 30  # seconds
 SIGKILL_DELAY = 10
+CHECK_INTERVAL = 5  # seconds
+STATUS_INTERVAL = 30  # seconds
+STATUS_FILENAME = "watchdog-status.json"
+DAEMON_CONNECTORS = {
+    "broker": RemoteBrokerConnector,
+    "monitor": RemoteMonitorConnector,
+    "manager": RemoteManagerConnector,
+}
 
 
 class DaemonError(Exception):
@@ -120,6 +133,7 @@ class Daemon:
         self._last_started = 0
         self._quick_starts = 0
         self._allow_restart = True
+        self._remote = None
 
     def find_executable(self):
         """Find the fully-qualified path to the executable.
@@ -136,6 +150,7 @@ class Daemon:
     def start(self):
         """Start this daemon."""
         self._process = None
+        self.disconnect()
 
         now = time.time()
         if self._last_started + RESTART_BURST_DELAY > now:
@@ -170,13 +185,42 @@ class Daemon:
 
     def stop(self):
         """Stop this daemon."""
+        self.disconnect()
         if not self._process:
             return succeed(None)
         return self._process.kill()
 
+    def _get_remote(self):
+        """Return a L{Deferred} resulting in the remote daemon.
+
+        The AMP connection is kept open once established, so that the
+        periodic pings of the watchdog don't have to connect every time.
+        """
+        if self._remote is not None:
+            return succeed(self._remote)
+
+        def connected(remote):
+            self._remote = remote
+            return remote
+
+        result = self._connector.connect(
+            self.max_retries,
+            self.factor,
+            quiet=True,
+        )
+        return result.addCallback(connected)
+
+    def disconnect(self):
+        """Close the AMP connection to the daemon, if any."""
+        self._remote = None
+        self._connector.disconnect()
+
     def _connect_and_call(self, name, *args, **kwargs):
         """Connect to the remote daemon over AMP and perform the given command.
 
+        If the command fails the connection is dropped, and established again
+        by the next command.
+
         @param name: The name of the command to perform.
         @param args: Arguments list to be passed to the connect method
         @param kwargs: Keywords arguments to pass to the connect method.
@@ -185,22 +229,24 @@ class Daemon:
         @see: L{RemoteLandscapeComponentCreator.connect}.
         """
 
-        def disconnect(ignored):
-            self._connector.disconnect()
-            return True
+        def failed(failure):
+            self.disconnect()
+            return False
 
-        connected = self._connector.connect(
-            self.max_retries,
-            self.factor,
-            quiet=True,
-        )
-        connected.addCallback(lambda remote: getattr(remote, name)())
-        connected.addCallback(disconnect)
-        connected.addErrback(lambda x: False)
-        return connected
+        result = self._get_remote()
+        result.addCallback(lambda remote: getattr(remote, name)())
+        result.addCallback(lambda ignored: True)
+        result.addErrback(failed)
+        return result
 
     def request_exit(self):
-        return self._connect_and_call("exit")
+        result = self._connect_and_call("exit")
+
+        def disconnect(exited):
+            self.disconnect()
+            return exited
+
+        return result.addCallback(disconnect)
 
     def is_running(self):
         # FIXME Error cases may not be handled in the best possible way
@@ -222,6 +268,7 @@ class Daemon:
         died by that point, send it a SIGTERM. If it doesn't die for
         C{SIGKILL_DELAY},
         """
+        self.disconnect()
         if not self._process:
             return succeed(None)
         return self._process.wait_or_die()
@@ -344,6 +391,11 @@ class WatchDog:
     """
     The Landscape WatchDog starts all other landscape daemons and ensures that
     they are working.
+
+    While checking the daemons, it records how long they take to answer its
+    pings, and how late its own reactor runs the checks.  If a
+    C{status_filename} is given, a summary of those measurements is
+    periodically written to it, see L{get_status}.
     """
 
     def __init__(
@@ -355,6 +407,7 @@ class WatchDog:
         monitor=None,
         manager=None,
         enabled_daemons=None,
+        status_filename=None,
     ):
         landscape_reactor = LandscapeReactor()
         if enabled_daemons is None:
@@ -406,6 +459,12 @@ class WatchDog:
                 daemon.options = options
 
         self._ping_failures = {}
+        self._ping_latencies = {}
+        self._last_pongs = {}
+        self._check_due = None
+        self.reactor_lag = LatencyHistogram()
+        self._status_filename = status_filename
+        self._status_written = None
 
     def check_running(self):
         """Return a list of any daemons that are already running."""
@@ -441,7 +500,20 @@ class WatchDog:
         """Start monitoring processes which have already been started."""
         # Must wait before daemons actually start, otherwise check will
         # restart them *again*.
-        self._checking = self.reactor.callLater(5, self._check)
+        self._schedule_check()
+
+    def _schedule_check(self):
+        self._check_due = self.reactor.seconds() + CHECK_INTERVAL
+        self._checking = self.reactor.callLater(CHECK_INTERVAL, self._check)
+
+    def _record_ping(self, is_running, daemon, started):
+        if is_running:
+            now = self.reactor.seconds()
+            if daemon not in self._ping_latencies:
+                self._ping_latencies[daemon] = LatencyHistogram()
+            self._ping_latencies[daemon].add(now - started)
+            self._last_pongs[daemon] = now
+        return is_running
 
     def _restart_if_not_running(self, is_running, daemon):
         if (not is_running) and (not self._stopping):
@@ -463,14 +535,22 @@ class WatchDog:
             self._ping_failures[daemon] = 0
 
     def _check(self):
+        if self._check_due is not None:
+            self.reactor_lag.add(self.reactor.seconds() - self._check_due)
         all_running = []
         for daemon in self.daemons:
             is_running = daemon.is_running()
+            is_running.addCallback(
+                self._record_ping,
+                daemon,
+                self.reactor.seconds(),
+            )
             is_running.addCallback(self._restart_if_not_running, daemon)
             all_running.append(is_running)
 
         def reschedule(ignored):
-            self._checking = self.reactor.callLater(5, self._check)
+            self._write_status()
+            self._schedule_check()
 
         gather_results(all_running).addBoth(reschedule)
 
@@ -501,6 +581,46 @@ class WatchDog:
         result = self.broker.request_exit()
         return result.addCallback(terminate_processes)
 
+    def get_status(self):
+        """Return the health status of the daemons, suitable for JSON.
+
+        For each daemon, it includes a summary of the latency of its pings,
+        the time of the last successful one and the number of pings that
+        failed since.  A daemon that answers slowly is busy, while a daemon
+        that doesn't answer at all is most likely hung.
+        """
+        daemons = {}
+        for daemon in self.daemons:
+            latency = self._ping_latencies.get(daemon, LatencyHistogram())
+            daemons[daemon.program] = {
+                "ping-latency": latency.get_summary(),
+                "last-pong": self._last_pongs.get(daemon),
+                "failed-pings": self._ping_failures.get(daemon, 0),
+            }
+        return {
+            "time": self.reactor.seconds(),
+            "reactor-lag": self.reactor_lag.get_summary(),
+            "daemons": daemons,
+        }
+
+    def _write_status(self):
+        if self._status_filename is None:
+            return
+        now = self.reactor.seconds()
+        if (
+            self._status_written is not None
+            and now - self._status_written < STATUS_INTERVAL
+        ):
+            return
+        self._status_written = now
+        temporary_filename = self._status_filename + ".new"
+        try:
+            with open(temporary_filename, "w") as status_file:
+                json.dump(self.get_status(), status_file)
+            os.rename(temporary_filename, self._status_filename)
+        except OSError as e:
+            warning(f"Couldn't write the watchdog status: {e}")
+
     def _notify_rotate_logs(self):
         for daemon in self.daemons:
             daemon.rotate_logs()
@@ -527,8 +647,44 @@ class WatchDogConfiguration(Configuration):
             "useful if you want to run the client as a non-root "
             "user.",
         )
+        parser.add_argument(
+            "--status",
+            action="store_true",
+            help="Print the health status of the running daemons and exit.",
+        )
+        parser.add_argument(
+            "--dump-reactor-stats",
+            action="store_true",
+            help="Print the event handler timings of the running daemons "
+            "and exit. The daemons must run with reactor_stats enabled.",
+        )
+        parser.add_argument(
+            "--profile",
+            choices=sorted(DAEMON_CONNECTORS),
+            metavar="DAEMON",
+            help="Profile the given running daemon, one of broker, monitor "
+            "or manager, and exit. The profile is written to the log "
+            "directory.",
+        )
+        parser.add_argument(
+            "--profile-seconds",
+            type=int,
+            default=DEFAULT_PROFILE_SECONDS,
+            help="How long to profile for, in seconds (default: 30).",
+        )
+        parser.add_argument(
+            "--profile-mode",
+            choices=PROFILE_MODES,
+            default="cprofile",
+            help="Either trace all calls with cProfile (cprofile), or sample "
+            "the stacks with low overhead (sample).",
+        )
         return parser
 
+    @property
+    def status_filename(self):
+        return os.path.join(self.data_path, STATUS_FILENAME)
+
     def get_enabled_daemons(self):
         daemons = [Broker, Monitor]
         if not self.monitor_only:
@@ -562,6 +718,7 @@ class WatchDogService(Service):
             verbose=not config.daemon,
             config=config,
             enabled_daemons=config.get_enabled_daemons(),
+            status_filename=config.status_filename,
         )
         self.exit_code = 0
 
@@ -677,6 +834,231 @@ bootstrap_list = BootstrapList(
 )
 
 
+def _format_latency(seconds):
+    if seconds is None:
+        return "-"
+    return f"{seconds * 1000:.1f} ms"
+
+
+def format_status(status, now=None):
+    """Format the status written by a L{WatchDog} for humans.
+
+    @param status: A C{dict} returned by L{WatchDog.get_status}.
+    @param now: The current time, by default C{time.time()}.
+    """
+    if now is None:
+        now = time.time()
+    lag = status["reactor-lag"]
+    lines = [
+        "Watchdog status as of {:.0f} seconds ago".format(
+            now - status["time"],
+        ),
+        "  watchdog: reactor lag p50 {}, p99 {}, max {}".format(
+            _format_latency(lag["p50"]),
+            _format_latency(lag["p99"]),
+            _format_latency(lag["max"]),
+        ),
+    ]
+    for program, daemon in sorted(status["daemons"].items()):
+        latency = daemon["ping-latency"]
+        if daemon["failed-pings"]:
+            state = "not responding, {:d} failed pings".format(
+                daemon["failed-pings"],
+            )
+        else:
+            state = "responding"
+        if daemon["last-pong"] is None:
+            last_pong = "never answered"
+        else:
+            last_pong = "last answered {:.0f} seconds ago".format(
+                now - daemon["last-pong"],
+            )
+        lines.append(
+            "  {}: {}, {}, ping p50 {}, p99 {}, max {}".format(
+                program,
+                state,
+                last_pong,
+                _format_latency(latency["p50"]),
+                _format_latency(latency["p99"]),
+                _format_latency(latency["max"]),
+            ),
+        )
+    return "\n".join(lines)
+
+
+def print_status(config):
+    """Print the status of the running watchdog.
+
+    @return: The exit code, 1 if the status is not available.
+    """
+    try:
+        with open(config.status_filename) as status_file:
+            status = json.load(status_file)
+    except (OSError, ValueError):
+        print("The watchdog status is not available, is the client running?")
+        return 1
+    print(format_status(status))
+    return 0
+
+
+def call_daemon(connector, method, *args, **kwargs):
+    """Call a remote method of a running daemon.
+
+    @param connector: The L{ComponentConnector} of the daemon, the
+        connection is closed once the call is done.
+    @param method: The name of the remote method.
+    @return: A L{Deferred} resulting in the result of the call, failing if
+        the daemon is not running.
+    """
+
+    def connected(remote):
+        result = getattr(remote, method)(*args, **kwargs)
+        return result.addBoth(disconnect)
+
+    def disconnect(result):
+        connector.disconnect()
+        return result
+
+    result = connector.connect(max_retries=0, quiet=True)
+    return result.addCallback(connected)
+
+
+def run_daemon_command(command, reactor=None):
+    """Run the reactor until the L{Deferred} returned by C{command} fires.
+
+    @param command: A function taking a L{LandscapeReactor} and returning a
+        L{Deferred} resulting in an exit code.
+    @return: The exit code.
+    """
+    if reactor is None:
+        reactor = LandscapeReactor()
+    exit_codes = []
+
+    def run_command():
+        result = command(reactor)
+        result.addCallback(exit_codes.append)
+        result.addErrback(log_failure)
+        result.addBoth(lambda ignored: reactor.call_later(0, reactor.stop))
+
+    reactor.call_when_running(run_command)
+    reactor.run()
+    return exit_codes[0] if exit_codes else 2
+
+
+def get_reactor_stats(config, reactor):
+    """Fetch the reactor statistics of the running daemons over AMP.
+
+    @return: A L{Deferred} resulting in a C{dict} mapping the names of the
+        daemons to their statistics, or to C{None} if they are not enabled,
+        or if the daemon is not running.
+    """
+    stats = {}
+
+    def get_stats(name, connector_class):
+        def got_stats(daemon_stats):
+            stats[name] = daemon_stats
+
+        def failed(failure):
+            stats[name] = None
+
+        result = call_daemon(
+            connector_class(reactor, config),
+            "get_reactor_stats",
+        )
+        return result.addCallbacks(got_stats, failed)
+
+    result = gather_results(
+        [
+            get_stats(name, connector_class)
+            for name, connector_class in DAEMON_CONNECTORS.items()
+        ],
+    )
+    return result.addCallback(lambda ignored: stats)
+
+
+def format_reactor_stats(stats):
+    """Format the reactor statistics of the daemons for humans.
+
+    @param stats: A C{dict} as returned by L{get_reactor_stats}.
+    """
+
+    def format_calls(calls):
+        return "{:d} calls, {} total, {} max".format(
+            calls["calls"],
+            _format_latency(calls["total"]),
+            _format_latency(calls["max"]),
+        )
+
+    lines = []
+    for name, daemon_stats in sorted(stats.items()):
+        if daemon_stats is None:
+            lines.append(f"{name}: not running, or reactor_stats disabled")
+            continue
+        lag = daemon_stats["lag"]
+        lines.append(f"{name}:")
+        lines.append(
+            "  looping call lag: p50 {}, p99 {}, max {}".format(
+                _format_latency(lag["p50"]),
+                _format_latency(lag["p99"]),
+                _format_latency(lag["max"]),
+            ),
+        )
+        # Show the most expensive events and handlers first
+        for kind in ("events", "handlers"):
+            lines.append(f"  {kind}:")
+            items = sorted(
+                daemon_stats[kind].items(),
+                key=lambda item: item[1]["total"],
+                reverse=True,
+            )
+            for item_name, calls in items:
+                lines.append(f"    {item_name}: {format_calls(calls)}")
+    return "\n".join(lines)
+
+
+def dump_reactor_stats(config, reactor):
+    """Print the reactor statistics of the running daemons.
+
+    @return: A L{Deferred} resulting in the exit code.
+    """
+
+    def print_stats(stats):
+        print(format_reactor_stats(stats))
+        return 0
+
+    return get_reactor_stats(config, reactor).addCallback(print_stats)
+
+
+def profile_daemon(config, reactor):
+    """Start profiling the daemon named by C{config.profile}.
+
+    @return: A L{Deferred} resulting in the exit code.
+    """
+    name = config.profile
+
+    def started(filename):
+        if filename is None:
+            print(f"The {name} is already being profiled.")
+            return 1
+        print(
+            f"Profiling the {name} for {config.profile_seconds:d} seconds, "
+            f"the profile will be written to {filename}",
+        )
+        return 0
+
+    def failed(failure):
+        print(f"Couldn't profile the {name}, is it running?")
+        return 1
+
+    result = call_daemon(
+        DAEMON_CONNECTORS[name](reactor, config),
+        "start_profiling",
+        config.profile_seconds,
+        config.profile_mode,
+    )
+    return result.addCallbacks(started, failed)
+
+
 def clean_environment():
     """Unset dangerous environment variables.
 
@@ -712,6 +1094,13 @@ def run(args=sys.argv, reactor=None):
     config = WatchDogConfiguration()
     config.load(args)
 
+    if config.status:
+        return print_status(config)
+    if config.dump_reactor_stats:
+        return run_daemon_command(partial(dump_reactor_stats, config))
+    if config.profile:
+        return run_daemon_command(partial(profile_daemon, config))
+
     try:
         landscape_uid = pwd.getpwnam(USER).pw_uid
     except KeyError:
@@ -1,4 +1,9 @@
 """Provide access to the persistent data used by L{PackageTaskHandler}s."""
+import logging
+import mmap
+import os
+import struct
+import tempfile
 import time
 
 try:
@@ -9,9 +14,24 @@ except ImportError:
 from twisted.python.compat import iteritems, long
 
 from landscape.lib import bpickle
+from landscape.lib.sequenceranges import SequenceBitmap
 from landscape.lib.store import with_cursor
 
 
+# The number of ids looked up by a single query, safely below the default
+# SQLITE_MAX_VARIABLE_NUMBER of old SQLite versions.
+ID_LOOKUP_CHUNK_SIZE = 500
+
+
+# The layout of a hash=>id index: a header, the (hash, id) records sorted by
+# hash, then the (id, record number) entries sorted by id.
+HASH_ID_INDEX_MAGIC = b"LSHIDX01"
+HASH_ID_INDEX_HEADER = struct.Struct(">8sQQQ")
+HASH_ID_INDEX_RECORD = struct.Struct(">20sQ")
+HASH_ID_INDEX_ID_ENTRY = struct.Struct(">QI")
+HASH_SIZE = 20
+
+
 class UnknownHashIDRequest(Exception):
     """Raised for unknown hash id requests."""
 
@@ -80,6 +100,28 @@ class HashIdStore:
             return bytes(value[0])
         return None
 
+    @with_cursor
+    def get_id_hashes(self, cursor, ids):
+        """Return a C{dict} holding the id=>hash mappings of the given C{ids}.
+
+        All the ids are looked up in a single transaction, ids that are not
+        available being left out of the result.
+
+        @param ids: an iterable of C{int} ids.
+        """
+        ids = list(ids)
+        id_hashes = {}
+        for start in range(0, len(ids), ID_LOOKUP_CHUNK_SIZE):
+            chunk = ids[start : start + ID_LOOKUP_CHUNK_SIZE]
+            params = ", ".join(["?"] * len(chunk))
+            cursor.execute(
+                f"SELECT id, hash FROM hash WHERE id IN ({params})",
+                chunk,
+            )
+            for id, hash in cursor.fetchall():
+                id_hashes[id] = bytes(hash)
+        return id_hashes
+
     @with_cursor
     def clear_hash_ids(self, cursor):
         """Delete all hash=>id mappings."""
@@ -99,6 +141,122 @@ class HashIdStore:
             raise InvalidHashIdDb(self._filename)
 
 
+class HashIdIndex:
+    """Read-only, memory-mapped index of a L{HashIdStore} database.
+
+    The index holds the same hash=>id mappings as the database it's built
+    from, in fixed-width records sorted by hash and searched by bisection.
+    Since it's mapped in memory rather than queried, lookups don't go
+    through SQLite at all, and the pages of the index are shared through
+    the page cache by all the processes using it.
+
+    An index can only be built for databases of SHA-1 hashes, see
+    L{build_hash_id_index}.
+
+    @param filename: The file of the index.
+    """
+
+    def __init__(self, filename):
+        self._filename = filename
+        with open(filename, "rb") as fd:
+            try:
+                self._mmap = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise InvalidHashIdDb(filename)
+        try:
+            header = HASH_ID_INDEX_HEADER.unpack_from(self._mmap)
+        except struct.error:
+            self.close()
+            raise InvalidHashIdDb(filename)
+        magic, count, self.db_size, self.db_mtime = header
+        size = (
+            HASH_ID_INDEX_HEADER.size
+            + HASH_ID_INDEX_RECORD.size * count
+            + HASH_ID_INDEX_ID_ENTRY.size * count
+        )
+        if magic != HASH_ID_INDEX_MAGIC or len(self._mmap) != size:
+            self.close()
+            raise InvalidHashIdDb(filename)
+        self._count = count
+        self._ids_offset = (
+            HASH_ID_INDEX_HEADER.size + HASH_ID_INDEX_RECORD.size * count
+        )
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        self._mmap.close()
+
+    def is_index_of(self, db_filename):
+        """Whether this is an up-to-date index of the given database."""
+        stat = os.stat(db_filename)
+        return (
+            stat.st_size == self.db_size and stat.st_mtime_ns == self.db_mtime
+        )
+
+    def get_hash_id(self, hash):
+        """Return the id associated to C{hash}, or C{None} if not available.
+
+        @param hash: a C{bytes} representing a hash.
+        """
+        if len(hash) != HASH_SIZE:
+            return None
+        data = self._mmap
+        record_size = HASH_ID_INDEX_RECORD.size
+        start = HASH_ID_INDEX_HEADER.size
+        low = 0
+        high = self._count
+        while low < high:
+            middle = (low + high) // 2
+            offset = start + middle * record_size
+            key = data[offset : offset + HASH_SIZE]
+            if key < hash:
+                low = middle + 1
+            elif key > hash:
+                high = middle
+            else:
+                return HASH_ID_INDEX_RECORD.unpack_from(data, offset)[1]
+        return None
+
+    def get_id_hash(self, id):
+        """Return the hash associated to C{id}, or C{None} if not available."""
+        data = self._mmap
+        entry_size = HASH_ID_INDEX_ID_ENTRY.size
+        start = self._ids_offset
+        low = 0
+        high = self._count
+        while low < high:
+            middle = (low + high) // 2
+            key, record = HASH_ID_INDEX_ID_ENTRY.unpack_from(
+                data,
+                start + middle * entry_size,
+            )
+            if key < id:
+                low = middle + 1
+            elif key > id:
+                high = middle
+            else:
+                offset = (
+                    HASH_ID_INDEX_HEADER.size
+                    + record * HASH_ID_INDEX_RECORD.size
+                )
+                return data[offset : offset + HASH_SIZE]
+        return None
+
+    def get_id_hashes(self, ids):
+        """Return a C{dict} holding the id=>hash mappings of the given C{ids}.
+
+        Ids that are not available are left out of the result.
+        """
+        id_hashes = {}
+        for id in ids:
+            hash = self.get_id_hash(id)
+            if hash is not None:
+                id_hashes[id] = hash
+        return id_hashes
+
+
 class PackageStore(HashIdStore):
     """Persist data about system packages and L{PackageTaskHandler}'s tasks.
 
@@ -108,18 +266,26 @@ class PackageStore(HashIdStore):
 
     The additional tables and schemas are defined in L{ensure_package_schema}.
 
+    The sets of package ids (available, installed, locked and so on) are
+    stored as one row per id, unless C{bitmap_id_sets} is set, in which
+    case each set is stored as a single compressed L{SequenceBitmap} in
+    the "id_bitmap" table.  Sets still stored as rows get converted the
+    first time they're modified.
+
     @param filename: The file where data is persisted to.
+    @param bitmap_id_sets: Whether to store package id sets as bitmaps.
     """
 
-    def __init__(self, filename):
+    def __init__(self, filename, bitmap_id_sets=False):
         super().__init__(filename)
         self._hash_id_stores = []
+        self._bitmap_id_sets = bitmap_id_sets
 
     def _ensure_schema(self):
         super()._ensure_schema()
         ensure_package_schema(self._db)
 
-    def add_hash_id_db(self, filename):
+    def add_hash_id_db(self, filename, index=False):
         """
         Attach an additional "lookaside" hash=>id database.
 
@@ -133,6 +299,9 @@ class PackageStore(HashIdStore):
 
         @param filename: a secondary SQLite databases to look for pre-canned
                          hash=>id mappings.
+        @param index: Whether to look the mappings up in a L{HashIdIndex}
+            of the database, stored next to it and built if needed, rather
+            than in the database itself.
         """
         hash_id_store = HashIdStore(filename)
 
@@ -142,6 +311,11 @@ class PackageStore(HashIdStore):
             # propagate the error
             raise e
 
+        if index:
+            hash_id_index = get_hash_id_index(filename)
+            if hash_id_index is not None:
+                hash_id_store = hash_id_index
+
         self._hash_id_stores.append(hash_id_store)
 
     def has_hash_id_db(self):
@@ -179,124 +353,213 @@ class PackageStore(HashIdStore):
                 return hash
         return HashIdStore.get_id_hash(self, id)
 
+    def get_id_hashes(self, ids):
+        """Return a C{dict} holding the id=>hash mappings of the given C{ids}.
+
+        This is the bulk version of L{get_id_hash}: the ids are looked up in
+        the attached lookaside databases first, and the ones that couldn't
+        be found there in the main one.
+        """
+        missing = set(ids)
+        id_hashes = {}
+        for store in self._hash_id_stores:
+            if not missing:
+                break
+            found = store.get_id_hashes(missing)
+            id_hashes.update(found)
+            missing.difference_update(found)
+        if missing:
+            id_hashes.update(HashIdStore.get_id_hashes(self, missing))
+        return id_hashes
+
     @with_cursor
     def add_available(self, cursor, ids):
-        for id in ids:
-            cursor.execute("REPLACE INTO available VALUES (?)", (id,))
+        self._add_ids(cursor, "available", ids)
 
     @with_cursor
     def remove_available(self, cursor, ids):
-        id_list = ",".join(str(int(id)) for id in ids)
-        cursor.execute(f"DELETE FROM available WHERE id IN ({id_list})")
+        self._remove_ids(cursor, "available", ids)
 
     @with_cursor
     def clear_available(self, cursor):
-        cursor.execute("DELETE FROM available")
+        self._clear_ids(cursor, "available")
 
     @with_cursor
     def get_available(self, cursor):
-        cursor.execute("SELECT id FROM available")
-        return [row[0] for row in cursor.fetchall()]
+        return self._get_ids(cursor, "available")
 
     @with_cursor
     def add_available_upgrades(self, cursor, ids):
-        for id in ids:
-            cursor.execute("REPLACE INTO available_upgrade VALUES (?)", (id,))
+        self._add_ids(cursor, "available_upgrade", ids)
 
     @with_cursor
     def remove_available_upgrades(self, cursor, ids):
-        id_list = ",".join(str(int(id)) for id in ids)
-        cursor.execute(
-            f"DELETE FROM available_upgrade WHERE id IN ({id_list})",
-        )
+        self._remove_ids(cursor, "available_upgrade", ids)
 
     @with_cursor
     def clear_available_upgrades(self, cursor):
-        cursor.execute("DELETE FROM available_upgrade")
+        self._clear_ids(cursor, "available_upgrade")
 
     @with_cursor
     def get_available_upgrades(self, cursor):
-        cursor.execute("SELECT id FROM available_upgrade")
-        return [row[0] for row in cursor.fetchall()]
+        return self._get_ids(cursor, "available_upgrade")
 
     @with_cursor
     def add_autoremovable(self, cursor, ids):
-        for id in ids:
-            cursor.execute("REPLACE INTO autoremovable VALUES (?)", (id,))
+        self._add_ids(cursor, "autoremovable", ids)
 
     @with_cursor
     def remove_autoremovable(self, cursor, ids):
-        id_list = ",".join(str(int(id)) for id in ids)
-        cursor.execute(f"DELETE FROM autoremovable WHERE id IN ({id_list})")
+        self._remove_ids(cursor, "autoremovable", ids)
 
     @with_cursor
     def clear_autoremovable(self, cursor):
-        cursor.execute("DELETE FROM autoremovable")
+        self._clear_ids(cursor, "autoremovable")
 
     @with_cursor
     def get_autoremovable(self, cursor):
-        cursor.execute("SELECT id FROM autoremovable")
-        return [row[0] for row in cursor.fetchall()]
+        return self._get_ids(cursor, "autoremovable")
 
     @with_cursor
     def add_security(self, cursor, ids):
-        for id in ids:
-            cursor.execute("REPLACE INTO security VALUES (?)", (id,))
+        self._add_ids(cursor, "security", ids)
 
     @with_cursor
     def remove_security(self, cursor, ids):
-        id_list = ",".join(str(int(id)) for id in ids)
-        cursor.execute(f"DELETE FROM security WHERE id IN ({id_list})")
+        self._remove_ids(cursor, "security", ids)
 
     @with_cursor
     def clear_security(self, cursor):
-        cursor.execute("DELETE FROM security")
+        self._clear_ids(cursor, "security")
 
     @with_cursor
     def get_security(self, cursor):
-        cursor.execute("SELECT id FROM security")
-        return [row[0] for row in cursor.fetchall()]
+        return self._get_ids(cursor, "security")
 
     @with_cursor
     def add_installed(self, cursor, ids):
-        for id in ids:
-            cursor.execute("REPLACE INTO installed VALUES (?)", (id,))
+        self._add_ids(cursor, "installed", ids)
 
     @with_cursor
     def remove_installed(self, cursor, ids):
-        id_list = ",".join(str(int(id)) for id in ids)
-        cursor.execute(f"DELETE FROM installed WHERE id IN ({id_list})")
+        self._remove_ids(cursor, "installed", ids)
 
     @with_cursor
     def clear_installed(self, cursor):
-        cursor.execute("DELETE FROM installed")
+        self._clear_ids(cursor, "installed")
 
     @with_cursor
     def get_installed(self, cursor):
-        cursor.execute("SELECT id FROM installed")
-        return [row[0] for row in cursor.fetchall()]
+        return self._get_ids(cursor, "installed")
 
     @with_cursor
     def get_locked(self, cursor):
         """Get the package ids of all locked packages."""
-        cursor.execute("SELECT id FROM locked")
-        return [row[0] for row in cursor.fetchall()]
+        return self._get_ids(cursor, "locked")
 
     @with_cursor
     def add_locked(self, cursor, ids):
         """Add the given package ids to the list of locked packages."""
-        for id in ids:
-            cursor.execute("REPLACE INTO locked VALUES (?)", (id,))
+        self._add_ids(cursor, "locked", ids)
 
     @with_cursor
     def remove_locked(self, cursor, ids):
-        id_list = ",".join(str(int(id)) for id in ids)
-        cursor.execute(f"DELETE FROM locked WHERE id IN ({id_list})")
+        self._remove_ids(cursor, "locked", ids)
 
     @with_cursor
     def clear_locked(self, cursor):
         """Remove all the package ids in the locked table."""
-        cursor.execute("DELETE FROM locked")
+        self._clear_ids(cursor, "locked")
+
+    @with_cursor
+    def get_id_bitmap(self, cursor, table):
+        """Return a L{SequenceBitmap} holding a set of package ids.
+
+        @param table: The name of the set, for example "installed" or
+            "available_upgrade".
+        """
+        return self._load_id_bitmap(cursor, table)
+
+    @with_cursor
+    def get_id_set(self, cursor, table):
+        """Return a set of package ids, to compute differences with.
+
+        With C{bitmap_id_sets}, the set is a L{SequenceBitmap}, as it's
+        stored as one already.  Otherwise it's a C{set}, since a bitmap is
+        sized by the largest id, which makes it expensive to build and to
+        iterate over for sparse ids.
+
+        @param table: The name of the set, for example "installed" or
+            "available_upgrade".
+        """
+        if self._bitmap_id_sets:
+            return self._load_id_bitmap(cursor, table)
+        return set(self._get_ids(cursor, table))
+
+    def _add_ids(self, cursor, table, ids):
+        if self._bitmap_id_sets:
+            bitmap = self._load_id_bitmap(cursor, table)
+            self._save_id_bitmap(cursor, table, bitmap | SequenceBitmap(ids))
+        else:
+            self._unpack_id_bitmap(cursor, table)
+            for id in ids:
+                cursor.execute(f"REPLACE INTO {table} VALUES (?)", (id,))
+
+    def _remove_ids(self, cursor, table, ids):
+        if self._bitmap_id_sets:
+            bitmap = self._load_id_bitmap(cursor, table)
+            self._save_id_bitmap(cursor, table, bitmap - SequenceBitmap(ids))
+        else:
+            self._unpack_id_bitmap(cursor, table)
+            id_list = ",".join(str(int(id)) for id in ids)
+            cursor.execute(f"DELETE FROM {table} WHERE id IN ({id_list})")
+
+    def _clear_ids(self, cursor, table):
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute("DELETE FROM id_bitmap WHERE name=?", (table,))
+
+    def _get_ids(self, cursor, table):
+        bitmap = self._get_stored_id_bitmap(cursor, table)
+        if bitmap is not None:
+            return bitmap.to_sequence()
+        cursor.execute(f"SELECT id FROM {table}")
+        return [row[0] for row in cursor.fetchall()]
+
+    def _load_id_bitmap(self, cursor, table):
+        # The set might be stored either way, whatever the mode, as it could
+        # have been changed since the set got stored.
+        bitmap = self._get_stored_id_bitmap(cursor, table)
+        if bitmap is not None:
+            return bitmap
+        cursor.execute(f"SELECT id FROM {table}")
+        return SequenceBitmap(row[0] for row in cursor.fetchall())
+
+    def _get_stored_id_bitmap(self, cursor, table):
+        """Return the set stored as a bitmap, or C{None} if it's in rows."""
+        cursor.execute("SELECT data FROM id_bitmap WHERE name=?", (table,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return SequenceBitmap.loads(bytes(row[0]))
+
+    def _unpack_id_bitmap(self, cursor, table):
+        """Store the set as rows again, if it's stored as a bitmap."""
+        bitmap = self._get_stored_id_bitmap(cursor, table)
+        if bitmap is None:
+            return
+        cursor.executemany(
+            f"REPLACE INTO {table} VALUES (?)",
+            ((id,) for id in bitmap),
+        )
+        cursor.execute("DELETE FROM id_bitmap WHERE name=?", (table,))
+
+    def _save_id_bitmap(self, cursor, table, bitmap):
+        cursor.execute(
+            "REPLACE INTO id_bitmap VALUES (?, ?)",
+            (table, sqlite3.Binary(bitmap.dumps())),
+        )
+        # The set is only stored as a bitmap from now on.
+        cursor.execute(f"DELETE FROM {table}")
 
     @with_cursor
     def add_hash_id_request(self, cursor, hashes):
@@ -464,6 +727,98 @@ class PackageTask:
         cursor.execute("DELETE FROM task WHERE id=?", (self.id,))
 
 
+def build_hash_id_index(db_filename, index_filename):
+    """Build a L{HashIdIndex} of a hash=>id database.
+
+    The index is written to a temporary file first, and then renamed to
+    C{index_filename}, so readers never see a partial index.
+
+    @param db_filename: The hash=>id SQLite database to index.
+    @param index_filename: The file to write the index to.
+    @raise ValueError: If some hashes of the database are not SHA-1 hashes,
+        which don't fit in the fixed-width records of the index.
+    """
+    stat = os.stat(db_filename)
+    db = sqlite3.connect(db_filename)
+    try:
+        rows = db.execute("SELECT hash, id FROM hash").fetchall()
+    finally:
+        db.close()
+    records = sorted((bytes(hash), id) for hash, id in rows)
+    if any(len(hash) != HASH_SIZE for hash, _ in records):
+        raise ValueError("Only SHA-1 hashes can be indexed")
+
+    count = len(records)
+    data = bytearray(
+        HASH_ID_INDEX_HEADER.size
+        + HASH_ID_INDEX_RECORD.size * count
+        + HASH_ID_INDEX_ID_ENTRY.size * count,
+    )
+    HASH_ID_INDEX_HEADER.pack_into(
+        data,
+        0,
+        HASH_ID_INDEX_MAGIC,
+        count,
+        stat.st_size,
+        stat.st_mtime_ns,
+    )
+    offset = HASH_ID_INDEX_HEADER.size
+    for record in records:
+        HASH_ID_INDEX_RECORD.pack_into(data, offset, *record)
+        offset += HASH_ID_INDEX_RECORD.size
+    for number in sorted(range(count), key=lambda number: records[number][1]):
+        HASH_ID_INDEX_ID_ENTRY.pack_into(
+            data,
+            offset,
+            records[number][1],
+            number,
+        )
+        offset += HASH_ID_INDEX_ID_ENTRY.size
+
+    fd, temp_filename = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(index_filename)),
+    )
+    try:
+        with os.fdopen(fd, "wb") as index_file:
+            index_file.write(data)
+        os.chmod(temp_filename, 0o644)
+        os.rename(temp_filename, index_filename)
+    except BaseException:
+        os.unlink(temp_filename)
+        raise
+
+
+def get_hash_id_index(db_filename):
+    """Return an up-to-date L{HashIdIndex} of a hash=>id database.
+
+    The index is kept next to the database, with an C{.index} suffix, and
+    it gets (re)built if it's missing or if the database changed since.
+
+    @return: The L{HashIdIndex}, or C{None} if the database can't be
+        indexed, in which case it should be used directly.
+    """
+    index_filename = db_filename + ".index"
+    try:
+        hash_id_index = HashIdIndex(index_filename)
+    except (OSError, InvalidHashIdDb):
+        pass
+    else:
+        if hash_id_index.is_index_of(db_filename):
+            return hash_id_index
+        hash_id_index.close()
+
+    try:
+        build_hash_id_index(db_filename, index_filename)
+        return HashIdIndex(index_filename)
+    except ValueError:
+        return None
+    except (OSError, InvalidHashIdDb, sqlite3.Error) as error:
+        logging.warning(
+            f"Couldn't index hash=>id database {db_filename}: {error}",
+        )
+        return None
+
+
 def ensure_hash_id_schema(db):
     """Create all tables needed by a L{HashIdStore}.
 
@@ -519,6 +874,14 @@ def ensure_package_schema(db):
     else:
         cursor.close()
         db.commit()
+    # Added later on, so it may be missing from existing databases.
+    cursor = db.cursor()
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS id_bitmap"
+        " (name TEXT PRIMARY KEY, data BLOB)",
+    )
+    cursor.close()
+    db.commit()
 
 
 def ensure_fake_package_schema(db):
@@ -1,3 +1,4 @@
+import os
 import sqlite3
 import threading
 import time
@@ -5,10 +6,16 @@ import unittest
 from unittest import mock
 
 from landscape.lib import testing
+from landscape.lib.apt.package.store import build_hash_id_index
+from landscape.lib.apt.package.store import get_hash_id_index
+from landscape.lib.apt.package.store import HASH_ID_INDEX_HEADER
+from landscape.lib.apt.package.store import HASH_ID_INDEX_MAGIC
+from landscape.lib.apt.package.store import HashIdIndex
 from landscape.lib.apt.package.store import HashIdStore
 from landscape.lib.apt.package.store import InvalidHashIdDb
 from landscape.lib.apt.package.store import PackageStore
 from landscape.lib.apt.package.store import UnknownHashIDRequest
+from landscape.lib.sequenceranges import SequenceBitmap
 
 
 class BaseTestCase(testing.FSTestCase, unittest.TestCase):
@@ -89,6 +96,33 @@ class HashIdStoreTest(BaseTestCase):
         self.assertEqual(self.store2.get_id_hash(123), b"hash1")
         self.assertEqual(self.store2.get_id_hash(456), b"hash2")
 
+    def test_get_id_hashes(self):
+        """
+        L{HashIdStore.get_id_hashes} returns the hashes of all the given
+        ids, leaving out the unknown ones.
+        """
+        self.store1.set_hash_ids({b"hash1": 123, b"hash2": 456})
+        self.assertEqual(
+            {123: b"hash1", 456: b"hash2"},
+            self.store2.get_id_hashes([123, 456, 789]),
+        )
+
+    def test_get_id_hashes_empty(self):
+        self.assertEqual({}, self.store1.get_id_hashes([]))
+
+    def test_get_id_hashes_many(self):
+        """
+        Ids are looked up in chunks, so that any number of them can be
+        resolved at once.
+        """
+        hash_ids = {f"hash{id:d}".encode("ascii"): id for id in range(1234)}
+        self.store1.set_hash_ids(hash_ids)
+        id_hashes = self.store2.get_id_hashes(range(1234))
+        self.assertEqual(
+            {id: hash for hash, id in hash_ids.items()},
+            id_hashes,
+        )
+
     def test_clear_hash_ids(self):
         self.store1.set_hash_ids({b"ha\x00sh1": 123, b"ha\x00sh2": 456})
         self.store1.clear_hash_ids()
@@ -129,6 +163,147 @@ class HashIdStoreTest(BaseTestCase):
         self.assertRaises(InvalidHashIdDb, store.check_sanity)
 
 
+class HashIdIndexTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.hash1 = b"1" * 20
+        self.hash2 = b"2" * 20
+        self.hash3 = b"3" * 20
+        self.db_filename = os.path.join(self.makeDir(), "hash-id-db")
+        HashIdStore(self.db_filename).set_hash_ids(
+            {self.hash2: 20, self.hash1: 30, self.hash3: 10},
+        )
+        self.index_filename = self.db_filename + ".index"
+
+    def test_get_hash_id(self):
+        build_hash_id_index(self.db_filename, self.index_filename)
+        index = HashIdIndex(self.index_filename)
+        self.assertEqual(3, len(index))
+        self.assertEqual(30, index.get_hash_id(self.hash1))
+        self.assertEqual(20, index.get_hash_id(self.hash2))
+        self.assertEqual(10, index.get_hash_id(self.hash3))
+        self.assertIsNone(index.get_hash_id(b"0" * 20))
+        self.assertIsNone(index.get_hash_id(b"4" * 20))
+        self.assertIsNone(index.get_hash_id(b"short"))
+
+    def test_get_id_hash(self):
+        build_hash_id_index(self.db_filename, self.index_filename)
+        index = HashIdIndex(self.index_filename)
+        self.assertEqual(self.hash3, index.get_id_hash(10))
+        self.assertEqual(self.hash2, index.get_id_hash(20))
+        self.assertEqual(self.hash1, index.get_id_hash(30))
+        self.assertIsNone(index.get_id_hash(15))
+        self.assertEqual(
+            {10: self.hash3, 30: self.hash1},
+            index.get_id_hashes([10, 30, 40]),
+        )
+
+    def test_empty(self):
+        db_filename = self.makeFile()
+        HashIdStore(db_filename).set_hash_ids({})
+        build_hash_id_index(db_filename, self.index_filename)
+        index = HashIdIndex(self.index_filename)
+        self.assertEqual(0, len(index))
+        self.assertIsNone(index.get_hash_id(self.hash1))
+        self.assertIsNone(index.get_id_hash(1))
+
+    def test_non_sha1_hashes(self):
+        """Databases with hashes of other sizes can't be indexed."""
+        HashIdStore(self.db_filename).set_hash_ids({b"hash": 1})
+        self.assertRaises(
+            ValueError,
+            build_hash_id_index,
+            self.db_filename,
+            self.index_filename,
+        )
+        self.assertFalse(os.path.exists(self.index_filename))
+        self.assertIsNone(get_hash_id_index(self.db_filename))
+
+    def test_invalid_index(self):
+        for content in [b"", b"junk", HASH_ID_INDEX_MAGIC + b"\x00" * 30]:
+            self.makeFile(content, path=self.index_filename, mode="wb")
+            self.assertRaises(
+                InvalidHashIdDb,
+                HashIdIndex,
+                self.index_filename,
+            )
+
+    def test_get_hash_id_index(self):
+        """
+        L{get_hash_id_index} builds the index of a database next to it.
+        """
+        index = get_hash_id_index(self.db_filename)
+        self.assertTrue(os.path.exists(self.index_filename))
+        self.assertTrue(index.is_index_of(self.db_filename))
+        self.assertEqual(30, index.get_hash_id(self.hash1))
+
+    def test_get_hash_id_index_reuses_index(self):
+        get_hash_id_index(self.db_filename)
+        stat = os.stat(self.index_filename)
+        with mock.patch(
+            "landscape.lib.apt.package.store.build_hash_id_index",
+        ) as build_mock:
+            index = get_hash_id_index(self.db_filename)
+        build_mock.assert_not_called()
+        self.assertEqual(stat.st_ino, os.stat(self.index_filename).st_ino)
+        self.assertEqual(30, index.get_hash_id(self.hash1))
+
+    def test_get_hash_id_index_rebuilds_stale_index(self):
+        """An index older than its database gets rebuilt."""
+        get_hash_id_index(self.db_filename)
+        HashIdStore(self.db_filename).set_hash_ids({self.hash1: 40})
+        index = get_hash_id_index(self.db_filename)
+        self.assertTrue(index.is_index_of(self.db_filename))
+        self.assertEqual(40, index.get_hash_id(self.hash1))
+
+    def test_get_hash_id_index_rebuilds_invalid_index(self):
+        self.makeFile("junk", path=self.index_filename)
+        index = get_hash_id_index(self.db_filename)
+        self.assertEqual(30, index.get_hash_id(self.hash1))
+
+    @mock.patch("logging.warning")
+    def test_get_hash_id_index_unwritable(self, logging_mock):
+        """
+        If the index can't be written, the database should be used as is.
+        """
+        with mock.patch("os.rename", side_effect=OSError("Read-only")):
+            self.assertIsNone(get_hash_id_index(self.db_filename))
+        logging_mock.assert_called_once_with(
+            "Couldn't index hash=>id database "
+            f"{self.db_filename}: Read-only",
+        )
+        self.assertEqual(
+            ["hash-id-db"],
+            os.listdir(os.path.dirname(self.db_filename)),
+        )
+
+    def test_benchmark(self):
+        """
+        Looking up 100k hashes in the index doesn't touch SQLite, and gives
+        the same results as the database.
+        """
+        count = 100000
+        db = sqlite3.connect(self.db_filename)
+        db.execute("DELETE FROM hash")
+        db.executemany(
+            "INSERT INTO hash VALUES (?, ?)",
+            ((id, id.to_bytes(20, "big")) for id in range(count)),
+        )
+        db.commit()
+        db.close()
+        index = get_hash_id_index(self.db_filename)
+        with mock.patch("sqlite3.connect") as connect_mock:
+            for id in range(0, count, 7):
+                hash = id.to_bytes(20, "big")
+                self.assertEqual(id, index.get_hash_id(hash))
+                self.assertEqual(hash, index.get_id_hash(id))
+        connect_mock.assert_not_called()
+        self.assertEqual(
+            HASH_ID_INDEX_HEADER.size + 40 * count,
+            os.path.getsize(self.index_filename),
+        )
+
+
 class PackageStoreTest(BaseTestCase):
     def setUp(self):
         super().setUp()
@@ -227,6 +402,207 @@ class PackageStoreTest(BaseTestCase):
         self.assertEqual(self.store1.get_id_hash(456), b"hash2")
         self.assertEqual(self.store1.get_id_hash(789), b"hash3")
 
+    def test_get_id_hashes_using_hash_id_db(self):
+        """
+        When lookaside hash->id dbs are used, L{get_id_hashes} has to query
+        them first, falling back to the regular db for the ids that are not
+        found there.
+        """
+        self.store1.add_hash_id_db(self.hash_id_db_factory({b"hash1": 123}))
+        self.store1.add_hash_id_db(
+            self.hash_id_db_factory({b"hash9": 123, b"hash2": 456}),
+        )
+        self.store1.set_hash_ids({b"hash3": 789, b"hash8": 456})
+        self.assertEqual(
+            {123: b"hash1", 456: b"hash2", 789: b"hash3"},
+            self.store1.get_id_hashes([123, 456, 789, 999]),
+        )
+
+    def test_add_hash_id_db_with_index(self):
+        """
+        With C{index}, the lookaside database is looked up through a
+        L{HashIdIndex} of it.
+        """
+        hash1 = b"1" * 20
+        hash2 = b"2" * 20
+        self.store1.set_hash_ids({hash2: 5})
+        self.store1.add_hash_id_db(
+            self.hash_id_db_factory({hash1: 1, b"3" * 20: 3}),
+            index=True,
+        )
+        [hash_id_store] = self.store1._hash_id_stores
+        self.assertIsInstance(hash_id_store, HashIdIndex)
+        self.assertEqual(1, self.store1.get_hash_id(hash1))
+        self.assertEqual(5, self.store1.get_hash_id(hash2))
+        self.assertEqual(hash1, self.store1.get_id_hash(1))
+        self.assertEqual(
+            {1: hash1, 5: hash2},
+            self.store1.get_id_hashes([1, 5, 7]),
+        )
+
+    def test_add_hash_id_db_with_index_non_sha1_hashes(self):
+        """
+        Lookaside databases that can't be indexed are used directly.
+        """
+        self.store1.add_hash_id_db(
+            self.hash_id_db_factory({b"hash1": 1}),
+            index=True,
+        )
+        [hash_id_store] = self.store1._hash_id_stores
+        self.assertIsInstance(hash_id_store, HashIdStore)
+        self.assertEqual(1, self.store1.get_hash_id(b"hash1"))
+
+    def test_add_hash_id_db_with_index_invalid_db(self):
+        filename = self.makeFile("junk")
+        self.assertRaises(
+            InvalidHashIdDb,
+            self.store1.add_hash_id_db,
+            filename,
+            index=True,
+        )
+        self.assertFalse(os.path.exists(filename + ".index"))
+
+    def test_get_id_hashes_benchmark(self):
+        """
+        Resolving the ids of a synthetic store of 100k packages takes a
+        few hundred queries in a single transaction, where looking them up
+        one by one takes a query and a transaction per id.
+        """
+        count = 100000
+        filename = self.makeFile()
+        db = sqlite3.connect(filename)
+        db.execute("CREATE TABLE hash (id INTEGER PRIMARY KEY, hash BLOB)")
+        db.executemany(
+            "INSERT INTO hash VALUES (?, ?)",
+            ((id, id.to_bytes(20, "big")) for id in range(count)),
+        )
+        db.commit()
+        db.close()
+        store = PackageStore(self.makeFile())
+        store.add_hash_id_db(filename)
+        [hash_id_store] = store._hash_id_stores
+        hash_id_store.get_id_hash(0)  # Connect to the database
+        statements = []
+        hash_id_store._db.set_trace_callback(statements.append)
+
+        id_hashes = store.get_id_hashes(range(count))
+        bulk_statements = len(statements)
+
+        del statements[:]
+        for id in range(0, count, 10):
+            store.get_id_hash(id)
+        single_statements = len(statements) * 10
+
+        self.assertEqual(count, len(id_hashes))
+        self.assertEqual((count - 1).to_bytes(20, "big"), id_hashes[count - 1])
+        # One SELECT per chunk of ids, plus the transaction commit.
+        self.assertTrue(bulk_statements <= count / 500 + 2)
+        self.assertTrue(single_statements >= count)
+
+    def test_get_id_bitmap(self):
+        self.store1.add_installed([1, 2, 5])
+        bitmap = self.store2.get_id_bitmap("installed")
+        self.assertEqual([1, 2, 5], bitmap.to_sequence())
+        self.assertFalse(self.store2.get_id_bitmap("locked"))
+
+    def test_get_id_set(self):
+        """
+        Package id sets are returned as C{set}s, or as bitmaps with
+        C{bitmap_id_sets}.
+        """
+        self.store1.add_installed([1, 2, 5])
+        self.assertEqual({1, 2, 5}, self.store2.get_id_set("installed"))
+        store = PackageStore(self.filename, bitmap_id_sets=True)
+        bitmap = store.get_id_set("installed")
+        self.assertIsInstance(bitmap, SequenceBitmap)
+        self.assertEqual([1, 2, 5], bitmap.to_sequence())
+
+    def test_bitmap_id_sets(self):
+        """
+        With C{bitmap_id_sets}, package id sets are kept as a single blob per
+        set, and behave the same as when they're kept as rows.
+        """
+        store1 = PackageStore(self.filename, bitmap_id_sets=True)
+        store2 = PackageStore(self.filename, bitmap_id_sets=True)
+        store1.add_available([3, 1, 2])
+        store1.add_available([2, 10])
+        store1.add_locked([4])
+        store1.remove_available([2, 11])
+        self.assertEqual([1, 3, 10], store2.get_available())
+        self.assertEqual([4], store2.get_locked())
+        self.assertEqual([], store2.get_installed())
+        store1.clear_available()
+        self.assertEqual([], store2.get_available())
+        self.assertEqual([4], store2.get_locked())
+
+        cursor = store1._db.cursor()
+        cursor.execute("SELECT COUNT(*) FROM locked")
+        self.assertEqual((0,), cursor.fetchone())
+
+    def test_bitmap_id_sets_migration(self):
+        """
+        Sets stored as rows are still readable in bitmap mode, and get
+        converted into a bitmap the first time they're modified.
+        """
+        self.store1.add_installed([1, 2])
+        store = PackageStore(self.filename, bitmap_id_sets=True)
+        self.assertEqual([1, 2], store.get_installed())
+        store.add_installed([3])
+        self.assertEqual([1, 2, 3], store.get_installed())
+        cursor = store._db.cursor()
+        cursor.execute("SELECT COUNT(*) FROM installed")
+        self.assertEqual((0,), cursor.fetchone())
+        cursor.execute("SELECT name FROM id_bitmap")
+        self.assertEqual([("installed",)], cursor.fetchall())
+
+    def test_bitmap_id_sets_disabled(self):
+        """
+        Sets stored as bitmaps are still readable once C{bitmap_id_sets} is
+        turned off, and get stored as rows again the first time they're
+        modified.
+        """
+        store = PackageStore(self.filename, bitmap_id_sets=True)
+        store.add_installed([1, 2])
+        self.assertEqual([1, 2], self.store1.get_installed())
+        self.assertEqual(
+            [1, 2],
+            self.store1.get_id_bitmap("installed").to_sequence(),
+        )
+        self.store1.remove_installed([1])
+        self.store1.add_installed([3])
+        self.assertEqual([2, 3], sorted(self.store1.get_installed()))
+        cursor = self.store1._db.cursor()
+        cursor.execute("SELECT COUNT(*) FROM installed")
+        self.assertEqual((2,), cursor.fetchone())
+        cursor.execute("SELECT name FROM id_bitmap")
+        self.assertEqual([], cursor.fetchall())
+
+    def test_bitmap_id_sets_benchmark(self):
+        """
+        A set of 100k package ids takes a single statement to be written in
+        bitmap mode, and a few bytes of storage, where rows take a statement
+        and a few bytes per id.
+        """
+        ids = list(range(1, 100001))
+        row_store = PackageStore(self.makeFile())
+        bitmap_store = PackageStore(self.makeFile(), bitmap_id_sets=True)
+        row_store.get_available()  # Connect to the databases
+        bitmap_store.get_available()
+        row_statements = []
+        bitmap_statements = []
+        row_store._db.set_trace_callback(row_statements.append)
+        bitmap_store._db.set_trace_callback(bitmap_statements.append)
+
+        row_store.add_available(ids)
+        bitmap_store.add_available(ids)
+
+        self.assertEqual(ids, bitmap_store.get_available())
+        self.assertTrue(len(row_statements) >= len(ids))
+        self.assertTrue(len(bitmap_statements) < 10)
+        cursor = bitmap_store._db.cursor()
+        cursor.execute("SELECT LENGTH(data) FROM id_bitmap")
+        self.assertTrue(cursor.fetchone()[0] < 1000)
+
     def test_add_and_get_available_packages(self):
         self.store1.add_available([1, 2])
         self.assertEqual(self.store2.get_available(), [1, 2])
@@ -1,12 +1,20 @@
+import hashlib
 import io
 import os
 import sys
+import threading
 from argparse import ArgumentParser
+from collections import deque
 
+from twisted.internet.defer import Deferred
 from twisted.internet.defer import DeferredList
+from twisted.internet.defer import fail
+from twisted.internet.defer import inlineCallbacks
+from twisted.internet.defer import returnValue
 from twisted.internet.threads import deferToThread
 from twisted.python.compat import iteritems
 from twisted.python.compat import networkString
+from twisted.python.failure import Failure
 
 
 class FetchError(Exception):
@@ -41,6 +49,24 @@ class PyCurlError(FetchError):
         return self._message
 
 
+class ChecksumError(FetchError):
+    def __init__(self, expected, actual):
+        self.expected = expected
+        self.actual = actual
+
+    def __str__(self):
+        return "Checksum mismatch: expected {}, got {}".format(
+            self.expected,
+            self.actual,
+        )
+
+
+# The libcurl error raised when a server ignores the range of a resumed
+# transfer, and the HTTP code for a range past the end of the content.
+CURLE_RANGE_ERROR = 33
+HTTP_RANGE_NOT_SATISFIABLE = 416
+
+
 def fetch(
     url,
     post=False,
@@ -54,6 +80,9 @@ def fetch(
     follow=True,
     user_agent=None,
     proxy=None,
+    output_file=None,
+    resume_from=None,
+    header_function=None,
 ):
     """Retrieve a URL and return the content.
 
@@ -71,17 +100,81 @@ def fetch(
     @param follow: If True, follow HTTP redirects (default True).
     @param user_agent: The user-agent to set in the request.
     @param proxy: The proxy url to use for the request.
+    @param output_file: Optionally, a file object the content is written to
+        as it is received, instead of being kept in memory. C{None} is
+        returned in that case.
+    @param resume_from: Optionally, the offset the transfer starts at, for
+        resuming a partial download. The content is then requested without
+        any compression, so that offsets match across transfers.
+    @param header_function: Optionally, a function the header lines of the
+        response are passed to as they're received, as C{bytes}.
     """
     import pycurl
 
-    if not isinstance(data, bytes):
-        data = data.encode("utf-8")
-    output = io.BytesIO(data)
     input = io.BytesIO()
 
     if curl is None:
         curl = pycurl.Curl()
 
+    _setup_curl(
+        curl,
+        url,
+        post=post,
+        data=data,
+        headers=headers,
+        cainfo=cainfo,
+        connect_timeout=connect_timeout,
+        total_timeout=total_timeout,
+        insecure=insecure,
+        follow=follow,
+        user_agent=user_agent,
+        proxy=proxy,
+        write=input.write if output_file is None else output_file.write,
+        resume_from=resume_from,
+        header_function=header_function,
+    )
+
+    try:
+        curl.perform()
+    except pycurl.error as e:
+        raise PyCurlError(e.args[0], e.args[1])
+
+    body = input.getvalue() if output_file is None else None
+
+    http_code = curl.getinfo(pycurl.HTTP_CODE)
+    if not _is_success(http_code, resume_from):
+        raise HTTPCodeError(http_code, body)
+
+    return body
+
+
+def _setup_curl(
+    curl,
+    url,
+    post,
+    data,
+    headers,
+    cainfo,
+    connect_timeout,
+    total_timeout,
+    insecure,
+    follow,
+    user_agent,
+    proxy,
+    write,
+    resume_from=None,
+    header_function=None,
+):
+    """Set the options of C{curl} for a request, see L{fetch}.
+
+    @param write: The function the content is passed to as it's received.
+    """
+    import pycurl
+
+    if not isinstance(data, bytes):
+        data = data.encode("utf-8")
+    output = io.BytesIO(data)
+
     # The conversion with `str()` ensures the acceptance of unicode under
     # Python 2 and `networkString()` will ensure bytes for Python 3.
     curl.setopt(pycurl.URL, networkString(str(url)))
@@ -119,22 +212,21 @@ def fetch(
     curl.setopt(pycurl.LOW_SPEED_LIMIT, 1)
     curl.setopt(pycurl.LOW_SPEED_TIME, total_timeout)
     curl.setopt(pycurl.NOSIGNAL, 1)
-    curl.setopt(pycurl.WRITEFUNCTION, input.write)
+    curl.setopt(pycurl.WRITEFUNCTION, write)
     curl.setopt(pycurl.DNS_CACHE_TIMEOUT, 0)
-    curl.setopt(pycurl.ENCODING, b"gzip,deflate")
+    if resume_from is None:
+        curl.setopt(pycurl.ENCODING, b"gzip,deflate")
+    elif resume_from:
+        curl.setopt(pycurl.RESUME_FROM_LARGE, resume_from)
+    if header_function is not None:
+        curl.setopt(pycurl.HEADERFUNCTION, header_function)
 
-    try:
-        curl.perform()
-    except pycurl.error as e:
-        raise PyCurlError(e.args[0], e.args[1])
-
-    body = input.getvalue()
 
-    http_code = curl.getinfo(pycurl.HTTP_CODE)
-    if http_code != 200:
-        raise HTTPCodeError(http_code, body)
-
-    return body
+def _is_success(http_code, resume_from):
+    """Whether C{http_code} is the one of a successful transfer."""
+    if resume_from:
+        return http_code in (200, 206)
+    return http_code == 200
 
 
 def fetch_async(*args, **kwargs):
@@ -168,6 +260,379 @@ def fetch_many_async(urls, callback=None, errback=None, **kwargs):
     return DeferredList(results, fireOnOneErrback=True, consumeErrors=True)
 
 
+class CurlMultiFetcher:
+    """Retrieve many URLs concurrently through a single C{pycurl.CurlMulti}.
+
+    All the transfers are driven by one worker thread, which is started
+    when there is something to fetch and exits once it's idle, instead of
+    tying up a reactor thread pool thread per download.  The connections,
+    the DNS cache and the SSL sessions are shared between all the
+    transfers, and the number of connections opened to a single host is
+    limited.
+
+    @param max_host_connections: The maximum number of connections to a
+        single host.
+    @param max_connections: The maximum number of connections overall.
+    @param reactor: The reactor results are delivered in, defaulting to
+        the global one.
+    """
+
+    # How long the worker thread waits for activity on the transfers
+    # before checking for new requests.
+    select_timeout = 0.1
+    dns_cache_timeout = 120
+
+    def __init__(
+        self, max_host_connections=4, max_connections=16, reactor=None
+    ):
+        if reactor is None:
+            from twisted.internet import reactor
+        self._reactor = reactor
+        self._max_host_connections = max_host_connections
+        self._max_connections = max_connections
+        self._lock = threading.Lock()
+        self._pending = deque()
+        self._thread = None
+        self._multi = None
+        self._share = None
+
+    def fetch(
+        self,
+        url,
+        post=False,
+        data="",
+        headers={},
+        cainfo=None,
+        connect_timeout=30,
+        total_timeout=600,
+        insecure=False,
+        follow=True,
+        user_agent=None,
+        proxy=None,
+        output_file=None,
+        resume_from=None,
+        header_function=None,
+    ):
+        """Retrieve a URL asynchronously, see L{fetch} for the parameters.
+
+        @return: A C{Deferred} resulting in the URL content, or in C{None}
+            if an C{output_file} was given.
+        """
+        deferred = Deferred()
+        options = dict(
+            post=post,
+            data=data,
+            headers=headers,
+            cainfo=cainfo,
+            connect_timeout=connect_timeout,
+            total_timeout=total_timeout,
+            insecure=insecure,
+            follow=follow,
+            user_agent=user_agent,
+            proxy=proxy,
+            resume_from=resume_from,
+            header_function=header_function,
+        )
+        with self._lock:
+            self._pending.append((url, options, output_file, deferred))
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name="curl-multi-fetcher",
+                )
+                self._thread.daemon = True
+                self._thread.start()
+        return deferred
+
+    def _setup(self):
+        import pycurl
+
+        self._multi = pycurl.CurlMulti()
+        self._multi.setopt(
+            pycurl.M_MAX_HOST_CONNECTIONS,
+            self._max_host_connections,
+        )
+        self._multi.setopt(
+            pycurl.M_MAX_TOTAL_CONNECTIONS,
+            self._max_connections,
+        )
+        self._share = pycurl.CurlShare()
+        self._share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_DNS)
+        self._share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_SSL_SESSION)
+
+    def _add_transfer(self, transfers, url, options, output_file, deferred):
+        import pycurl
+
+        curl = pycurl.Curl()
+        body = io.BytesIO() if output_file is None else None
+        try:
+            _setup_curl(
+                curl,
+                url,
+                write=body.write if output_file is None else output_file.write,
+                **options,
+            )
+            curl.setopt(pycurl.SHARE, self._share)
+            curl.setopt(pycurl.DNS_CACHE_TIMEOUT, self.dns_cache_timeout)
+            self._multi.add_handle(curl)
+        except Exception as error:
+            curl.close()
+            self._reactor.callFromThread(deferred.errback, error)
+            return
+        transfers[curl] = (body, options["resume_from"], deferred)
+
+    def _finish_transfer(self, transfers, curl, error=None):
+        import pycurl
+
+        body, resume_from, deferred = transfers.pop(curl)
+        self._multi.remove_handle(curl)
+        if body is not None:
+            body = body.getvalue()
+        if error is None:
+            http_code = curl.getinfo(pycurl.HTTP_CODE)
+            if not _is_success(http_code, resume_from):
+                error = HTTPCodeError(http_code, body)
+        curl.close()
+        if error is None:
+            self._reactor.callFromThread(deferred.callback, body)
+        else:
+            self._reactor.callFromThread(deferred.errback, error)
+
+    def _run(self):
+        import pycurl
+
+        if self._multi is None:
+            self._setup()
+        transfers = {}
+        while True:
+            with self._lock:
+                while self._pending:
+                    self._add_transfer(transfers, *self._pending.popleft())
+                if not transfers:
+                    self._thread = None
+                    return
+            while True:
+                status, _ = self._multi.perform()
+                if status != pycurl.E_CALL_MULTI_PERFORM:
+                    break
+            while True:
+                queued, succeeded, failed = self._multi.info_read()
+                for curl in succeeded:
+                    self._finish_transfer(transfers, curl)
+                for curl, error_code, message in failed:
+                    error = PyCurlError(error_code, message)
+                    self._finish_transfer(transfers, curl, error)
+                if not queued:
+                    break
+            if transfers:
+                self._multi.select(self.select_timeout)
+
+
+_multi_fetcher = None
+
+
+def get_multi_fetcher():
+    """Return the L{CurlMultiFetcher} shared by the whole process."""
+    global _multi_fetcher
+    if _multi_fetcher is None:
+        _multi_fetcher = CurlMultiFetcher()
+    return _multi_fetcher
+
+
+def fetch_multi_async(url, **kwargs):
+    """Retrieve a URL asynchronously, through the shared L{CurlMultiFetcher}.
+
+    @return: A C{Deferred} resulting in the URL content, or in C{None} if an
+        C{output_file} was given.
+    """
+    return get_multi_fetcher().fetch(url, **kwargs)
+
+
+def stream_to_files(urls, directory, logger=None, **kwargs):
+    """
+    Retrieve a list of URLs through the shared L{CurlMultiFetcher} and
+    stream their content to files in a directory.  Unlike L{fetch_to_files},
+    the content of the URLs is never held in memory.
+
+    @param urls: The list URLs to fetch.
+    @param directory: The directory to save the files to, the name of the file
+        will equal the last fragment of the URL.
+    @param logger: Optional function to be used to log errors for failed URLs.
+    """
+
+    def close(result, output_file):
+        output_file.close()
+        if isinstance(result, Failure):
+            os.unlink(output_file.name)
+        return result
+
+    def log_error(failure, url):
+        if logger:
+            logger(
+                "Couldn't fetch file from {} ({})".format(
+                    url,
+                    str(failure.value),
+                ),
+            )
+        return failure
+
+    results = []
+    for url in urls:
+        filename = url_to_filename(url, directory=directory)
+        try:
+            output_file = open(filename, "wb")
+        except OSError:
+            result = fail()
+        else:
+            result = fetch_multi_async(url, output_file=output_file, **kwargs)
+            result.addBoth(close, output_file)
+        result.addErrback(log_error, url)
+        results.append(result)
+    return DeferredList(results, fireOnOneErrback=True, consumeErrors=True)
+
+
+@inlineCallbacks
+def fetch_to_file_async(url, filename, sha256=None, **kwargs):
+    """Download a URL to a file, resuming any previous partial download.
+
+    The content is streamed to C{filename} with a C{.partial} suffix, which
+    is kept if the transfer fails so that the next call only asks for the
+    missing bytes with an HTTP Range request.  The C{ETag}, or else the
+    C{Last-Modified} date, of the response is saved next to the partial
+    file, and sent back in an C{If-Range} header when resuming, so that the
+    server answers with the whole content if it changed in the meantime.
+    A partial file is only resumed if there's such a validator for it, or
+    if C{sha256} is given, and the download starts over if the server
+    can't resume it.  The complete file is checked against C{sha256}, if
+    given, and then atomically renamed to C{filename}.
+
+    @param url: The URL to fetch, through the shared L{CurlMultiFetcher}.
+    @param filename: The path of the file to create.
+    @param sha256: Optionally, the expected hex SHA-256 digest of the
+        content.  A download not matching it is thrown away.
+    @return: A C{Deferred} firing with C{filename} once it's in place, or
+        failing with L{ChecksumError} or with the transfer error.
+    """
+    partial_filename = filename + ".partial"
+    validator_filename = partial_filename + ".validator"
+    headers = kwargs.pop("headers", {})
+    while True:
+        try:
+            offset = os.path.getsize(partial_filename)
+        except OSError:
+            offset = 0
+        validator = _read_validator(validator_filename)
+        request_headers = dict(headers)
+        if offset and validator is not None:
+            request_headers["If-Range"] = validator
+        elif offset and sha256 is None:
+            # Nothing tells whether the partial content is still the one
+            # of the URL, so it can't be resumed.
+            _remove_partial(partial_filename, validator_filename)
+            offset = 0
+        header_lines = []
+        with open(partial_filename, "ab") as output_file:
+            try:
+                yield fetch_multi_async(
+                    url,
+                    output_file=output_file,
+                    resume_from=offset,
+                    headers=request_headers,
+                    header_function=header_lines.append,
+                    **kwargs,
+                )
+            except HTTPCodeError as error:
+                # The body of an error response isn't part of the content.
+                output_file.truncate(offset)
+                if not offset or error.http_code != HTTP_RANGE_NOT_SATISFIABLE:
+                    raise
+            except PyCurlError as error:
+                if not offset or error.error_code != CURLE_RANGE_ERROR:
+                    _write_validator(validator_filename, header_lines)
+                    raise
+            else:
+                status, _ = _parse_header_lines(header_lines)
+                # The server may answer the whole content, if it changed,
+                # and libcurl doesn't complain if that has the size of the
+                # partial file.
+                if not offset or status != 200:
+                    break
+        # The partial download can't be resumed, start over.
+        _remove_partial(partial_filename, validator_filename)
+
+    if os.path.exists(validator_filename):
+        os.unlink(validator_filename)
+    if sha256 is not None:
+        digest = yield deferToThread(_get_file_sha256, partial_filename)
+        if digest != sha256.lower():
+            os.unlink(partial_filename)
+            raise ChecksumError(sha256, digest)
+    os.rename(partial_filename, filename)
+    returnValue(filename)
+
+
+def _parse_header_lines(header_lines):
+    """Return the status code and headers of the last response in
+    C{header_lines}, the ones before being redirections or interim
+    responses.
+
+    @return: A C{(status, headers)} tuple, with the header names lowercased.
+    """
+    status = None
+    headers = {}
+    for line in header_lines:
+        line = line.decode("latin-1").strip()
+        if line.startswith("HTTP/"):
+            status = int(line.split()[1])
+            headers = {}
+        elif ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    return status, headers
+
+
+def _write_validator(validator_filename, header_lines):
+    """Save the validator of the response in C{header_lines}, for the
+    C{If-Range} header of the next transfer.  Nothing changes if no
+    response was received at all.
+    """
+    if not header_lines:
+        return
+    _, headers = _parse_header_lines(header_lines)
+    validator = headers.get("etag")
+    if validator is None or validator.startswith("W/"):
+        # Weak entity tags can't be used in If-Range.
+        validator = headers.get("last-modified")
+    if validator is None:
+        if os.path.exists(validator_filename):
+            os.unlink(validator_filename)
+        return
+    with open(validator_filename, "w") as validator_file:
+        validator_file.write(validator)
+
+
+def _read_validator(validator_filename):
+    try:
+        with open(validator_filename) as validator_file:
+            return validator_file.read() or None
+    except OSError:
+        return None
+
+
+def _remove_partial(partial_filename, validator_filename):
+    for path in (partial_filename, validator_filename):
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def _get_file_sha256(filename):
+    digest = hashlib.sha256()
+    with open(filename, "rb") as fd:
+        for chunk in iter(lambda: fd.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 def url_to_filename(url, directory=None):
     """Return the last component of the given C{url}.
 
@@ -0,0 +1,190 @@
+"""Watch files for changes, with inotify when available.
+
+A L{FileWatcher} calls back its subscribers shortly after the files they
+watch are created, modified or deleted.  Changes are notified by inotify
+when the system supports it, and detected by polling the files otherwise.
+"""
+import logging
+import os
+
+from twisted.internet import inotify
+from twisted.python.filepath import FilePath
+
+#: The seconds to wait for more changes before calling back subscribers.
+DEBOUNCE_DELAY = 1.0
+
+#: The seconds between two polls of the files, without inotify.
+POLL_INTERVAL = 60
+
+_INOTIFY_MASK = (
+    inotify.IN_MODIFY
+    | inotify.IN_ATTRIB
+    | inotify.IN_CLOSE_WRITE
+    | inotify.IN_MOVED_FROM
+    | inotify.IN_MOVED_TO
+    | inotify.IN_CREATE
+    | inotify.IN_DELETE
+)
+
+
+class FileWatcher:
+    """Call back subscribers when the files they watch change.
+
+    Several changes happening within C{delay} seconds result in a single
+    call of each subscriber.
+
+    @param reactor: The L{EventHandlingReactor} to schedule calls with.
+    @param use_inotify: Whether changes can be notified by inotify, read
+        with the Twisted reactor wrapped by C{reactor}.
+    @param delay: The seconds to wait for more changes before calling back
+        the subscribers.
+    @param poll_interval: The seconds between two polls of the files, when
+        inotify isn't used.
+    """
+
+    def __init__(
+        self,
+        reactor,
+        use_inotify=True,
+        delay=DEBOUNCE_DELAY,
+        poll_interval=POLL_INTERVAL,
+    ):
+        self._reactor = reactor
+        self._delay = delay
+        self._poll_interval = poll_interval
+        self._callbacks = {}
+        self._pending = {}
+        self._stamps = {}
+        self._poll_call = None
+        self._notifier = None
+        self._watched_directories = set()
+        if use_inotify:
+            self._notifier = _start_notifier(reactor._reactor)
+
+    @property
+    def uses_inotify(self):
+        """Whether the changes are notified by inotify."""
+        return self._notifier is not None
+
+    def watch(self, path, callback):
+        """Call C{callback} after C{path} is created, modified or deleted.
+
+        If C{path} is a directory, changes to the files it contains are
+        reported as well.
+        """
+        path = os.path.abspath(path)
+        self._callbacks.setdefault(path, []).append(callback)
+        if self._notifier is not None:
+            directory = os.path.dirname(path)
+            if self._watch_directory(directory):
+                if os.path.isdir(path):
+                    self._watch_directory(path)
+                return
+        # Poll the files inotify can't watch.
+        self._stamps[path] = _get_stamp(path)
+        if self._poll_call is None:
+            self._poll_call = self._reactor.call_every(
+                self._poll_interval,
+                self._poll,
+            )
+
+    def stop(self):
+        """Stop watching the files."""
+        if self._poll_call is not None:
+            self._reactor.cancel_call(self._poll_call)
+            self._poll_call = None
+        for call in self._pending.values():
+            self._reactor.cancel_call(call)
+        self._pending.clear()
+        if self._notifier is not None:
+            self._notifier.loseConnection()
+            self._notifier = None
+
+    def _watch_directory(self, directory):
+        """Get notified of the changes in C{directory}, if it exists."""
+        if directory in self._watched_directories:
+            return True
+        try:
+            self._notifier.watch(
+                FilePath(directory),
+                mask=_INOTIFY_MASK,
+                callbacks=[self._notified],
+            )
+        except Exception as e:
+            logging.debug(f"Can't watch {directory} with inotify: {e}")
+            return False
+        self._watched_directories.add(directory)
+        return True
+
+    def _notified(self, ignored, filepath, mask):
+        if mask & inotify.IN_Q_OVERFLOW:
+            # Some events were lost, anything could have changed.
+            for path in list(self._callbacks):
+                self._changed(path)
+            return
+        path = os.fsdecode(filepath.path)
+        if path in self._callbacks:
+            if os.path.isdir(path):
+                self._watch_directory(path)
+            self._changed(path)
+        directory = os.path.dirname(path)
+        if directory in self._callbacks:
+            self._changed(directory)
+
+    def _poll(self):
+        for path, stamp in list(self._stamps.items()):
+            new_stamp = _get_stamp(path)
+            if new_stamp != stamp:
+                self._stamps[path] = new_stamp
+                self._changed(path)
+
+    def _changed(self, path):
+        for callback in self._callbacks[path]:
+            if callback not in self._pending:
+                self._pending[callback] = self._reactor.call_later(
+                    self._delay,
+                    self._call_back,
+                    callback,
+                )
+
+    def _call_back(self, callback):
+        del self._pending[callback]
+        try:
+            callback()
+        except Exception:
+            logging.exception("Error calling back a file watcher subscriber")
+
+
+def _start_notifier(reactor):
+    """Return a started L{INotify}, or C{None} if inotify is unavailable."""
+    try:
+        notifier = inotify.INotify(reactor)
+        notifier.startReading()
+    except Exception as e:
+        logging.info(f"Polling watched files, inotify is unavailable: {e}")
+        return None
+    return notifier
+
+
+def _get_stamp(path):
+    """
+    Return the inode, modification time and size of C{path}, along with the
+    ones of the files it contains if it's a directory.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    stamp = [(None, stat.st_ino, stat.st_mtime_ns, stat.st_size)]
+    if os.path.isdir(path):
+        try:
+            entries = sorted(os.listdir(path))
+        except OSError:
+            entries = []
+        for entry in entries:
+            try:
+                stat = os.stat(os.path.join(path, entry))
+            except OSError:
+                continue
+            stamp.append((entry, stat.st_ino, stat.st_mtime_ns, stat.st_size))
+    return stamp
@@ -0,0 +1,82 @@
+"""Cheap fixed-bucket histograms for latency measurements."""
+from bisect import bisect_left
+from math import ceil
+
+#: The upper bounds, in seconds, of the buckets of a L{LatencyHistogram}.
+#: Anything slower than the last bound falls in an extra overflow bucket.
+LATENCY_BUCKETS = (
+    0.001,
+    0.002,
+    0.005,
+    0.01,
+    0.02,
+    0.05,
+    0.1,
+    0.2,
+    0.5,
+    1,
+    2,
+    5,
+    10,
+    30,
+    60,
+)
+
+
+class LatencyHistogram:
+    """Count latencies in buckets of exponentially growing size.
+
+    Recording a latency takes constant time and memory, so it can be done
+    for every event.  Percentiles are approximated by the upper bound of the
+    bucket they fall in.
+
+    @param bounds: The sorted upper bounds of the buckets, in seconds.
+    """
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        """Record a latency of C{seconds}."""
+        seconds = max(seconds, 0.0)
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    @property
+    def mean(self):
+        if not self.count:
+            return 0.0
+        return self.total / self.count
+
+    def percentile(self, percent):
+        """Return an upper bound of the given C{percent} percentile.
+
+        @return: The latency in seconds, or C{None} if nothing was recorded.
+        """
+        if not self.count:
+            return None
+        rank = max(ceil(self.count * percent / 100), 1)
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def get_summary(self):
+        """Return a C{dict} summing the histogram up, suitable for JSON."""
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "buckets": list(self.counts),
+        }
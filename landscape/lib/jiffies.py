@@ -6,11 +6,27 @@ def detect_jiffies():
 
     A jiffy is a value used by the kernel to report certain time-based
     events.  Jiffies occur N times per second where N varies depending
-    on the hardware the kernel is running on.  This function gets the
-    uptime for the current process, forks a child process and gets the
-    uptime again; finally, using the running time of the child process
-    compared with the uptimes to determine number of jiffies per
-    second.
+    on the hardware the kernel is running on.  The kernel reports times in
+    /proc in clock ticks, whose rate is given by C{sysconf(SC_CLK_TCK)};
+    only if that's not available is it measured with L{measure_jiffies},
+    which forks child processes.
+    """
+    try:
+        jiffies = os.sysconf("SC_CLK_TCK")
+    except (ValueError, OSError):
+        jiffies = -1
+    if jiffies > 0:
+        return jiffies
+    return measure_jiffies()
+
+
+def measure_jiffies():
+    """Measure the number of jiffies per second for this machine.
+
+    This function gets the uptime for the current process, forks a child
+    process and gets the uptime again; finally, using the running time of
+    the child process compared with the uptimes to determine number of
+    jiffies per second.
     """
     uptime1_file = open("/proc/uptime")
     uptime2_file = open("/proc/uptime")
@@ -0,0 +1,243 @@
+"""Dump the network interfaces and their addresses with rtnetlink.
+
+Listing the interfaces with C{netifaces}, then querying each of them with
+C{ioctl}s, costs several system calls per interface, and container hosts
+can have thousands of them.  A netlink dump gets all the interfaces, or all
+their addresses, in a single request instead.
+
+@see: rtnetlink(7) and /usr/include/linux/rtnetlink.h.
+"""
+import errno
+import os
+import socket
+import struct
+
+NETLINK_ROUTE = 0
+
+RTM_GETLINK = 18
+RTM_GETADDR = 22
+
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+
+IFLA_ADDRESS = 1
+IFLA_BROADCAST = 2
+IFLA_IFNAME = 3
+IFLA_CARRIER_CHANGES = 35
+
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+IFA_LABEL = 3
+IFA_BROADCAST = 4
+
+_NLMSGHDR = struct.Struct("=IHHII")
+_NLMSGERR = struct.Struct("=i")
+_IFINFOMSG = struct.Struct("=BxHiII")
+_IFADDRMSG = struct.Struct("=BBBBI")
+_RTATTR = struct.Struct("=HH")
+_U32 = struct.Struct("=I")
+
+# Dump answers are made of messages of a few kilobytes at most.
+_BUFFER_SIZE = 65536
+
+
+class Link:
+    """A network interface, as dumped by L{get_interfaces}.
+
+    @ivar index: The index of the interface.
+    @ivar name: The name of the interface.
+    @ivar flags: The C{IFF_*} flags of the interface.
+    @ivar address: The hardware address of the interface, as colon
+        separated hexadecimal bytes, or C{""} if it has none.
+    @ivar broadcast: The hardware broadcast or peer address, or C{None}.
+    @ivar carrier_changes: How many times the carrier of the interface
+        went up or down, or C{None} if the kernel doesn't tell.
+    """
+
+    def __init__(
+        self,
+        index,
+        name,
+        flags,
+        address="",
+        broadcast=None,
+        carrier_changes=None,
+    ):
+        self.index = index
+        self.name = name
+        self.flags = flags
+        self.address = address
+        self.broadcast = broadcast
+        self.carrier_changes = carrier_changes
+
+
+class Address:
+    """An IP address, as dumped by L{get_interfaces}.
+
+    @ivar index: The index of the interface the address is assigned to.
+    @ivar family: C{socket.AF_INET} or C{socket.AF_INET6}.
+    @ivar address: The local address.
+    @ivar prefixlen: The length of the network prefix.
+    @ivar destination: The broadcast or peer address, or C{None}.
+    @ivar label: The label of an IPv4 address, the name of an alias
+        interface such as C{eth0:1}, or C{None}.
+    """
+
+    def __init__(
+        self,
+        index,
+        family,
+        address,
+        prefixlen,
+        destination=None,
+        label=None,
+    ):
+        self.index = index
+        self.family = family
+        self.address = address
+        self.prefixlen = prefixlen
+        self.destination = destination
+        self.label = label
+
+
+def get_interfaces():
+    """Return the network interfaces and their IP addresses.
+
+    @return: A C{(links, addresses)} tuple, of lists of L{Link} and
+        L{Address}, in the order the kernel lists them.
+    @raise OSError: If netlink can't be used.
+    """
+    with socket.socket(
+        socket.AF_NETLINK,
+        socket.SOCK_RAW,
+        NETLINK_ROUTE,
+    ) as sock:
+        sock.bind((0, 0))
+        links = [
+            _parse_link(body)
+            for body in _dump(
+                sock,
+                RTM_GETLINK,
+                _IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0),
+                1,
+            )
+        ]
+        addresses = [
+            _parse_address(body)
+            for body in _dump(
+                sock,
+                RTM_GETADDR,
+                _IFADDRMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0),
+                2,
+            )
+        ]
+    return links, [address for address in addresses if address is not None]
+
+
+def _dump(sock, message_type, payload, sequence):
+    """Send a dump request, and yield the bodies of the answer messages."""
+    request = _NLMSGHDR.pack(
+        _NLMSGHDR.size + len(payload),
+        message_type,
+        NLM_F_REQUEST | NLM_F_DUMP,
+        sequence,
+        0,
+    )
+    sock.sendall(request + payload)
+    while True:
+        data = sock.recv(_BUFFER_SIZE)
+        if not data:
+            raise OSError(errno.EPROTO, "Netlink dump ended unexpectedly")
+        offset = 0
+        while offset + _NLMSGHDR.size <= len(data):
+            length, kind, _, message_sequence, _ = _NLMSGHDR.unpack_from(
+                data,
+                offset,
+            )
+            if length < _NLMSGHDR.size:
+                raise OSError(errno.EPROTO, "Malformed netlink message")
+            body = data[offset + _NLMSGHDR.size : offset + length]
+            offset += _align(length)
+            if message_sequence != sequence:
+                continue
+            if kind == NLMSG_DONE:
+                return
+            if kind == NLMSG_ERROR:
+                error = -_NLMSGERR.unpack_from(body)[0]
+                if error:
+                    raise OSError(error, os.strerror(error))
+                continue
+            yield body
+
+
+def _align(length):
+    return (length + 3) & ~3
+
+
+def _parse_attributes(data, offset):
+    """Return the attributes following C{offset}, by type."""
+    attributes = {}
+    while offset + _RTATTR.size <= len(data):
+        length, kind = _RTATTR.unpack_from(data, offset)
+        if length < _RTATTR.size:
+            break
+        attributes[kind] = data[offset + _RTATTR.size : offset + length]
+        offset += _align(length)
+    return attributes
+
+
+def _parse_link(body):
+    _, _, index, flags, _ = _IFINFOMSG.unpack_from(body)
+    attributes = _parse_attributes(body, _IFINFOMSG.size)
+    carrier_changes = attributes.get(IFLA_CARRIER_CHANGES)
+    if carrier_changes is not None:
+        carrier_changes = _U32.unpack(carrier_changes)[0]
+    broadcast = attributes.get(IFLA_BROADCAST)
+    if broadcast is not None:
+        broadcast = _format_hardware_address(broadcast)
+    return Link(
+        index,
+        _decode_string(attributes.get(IFLA_IFNAME, b"")),
+        flags,
+        _format_hardware_address(attributes.get(IFLA_ADDRESS, b"")),
+        broadcast,
+        carrier_changes,
+    )
+
+
+def _parse_address(body):
+    """Return the L{Address} in C{body}, or C{None} if it isn't an IP."""
+    family, prefixlen, _, _, index = _IFADDRMSG.unpack_from(body)
+    if family not in (socket.AF_INET, socket.AF_INET6):
+        return None
+    attributes = _parse_attributes(body, _IFADDRMSG.size)
+    address = attributes.get(IFA_ADDRESS)
+    local = attributes.get(IFA_LOCAL)
+    destination = attributes.get(IFA_BROADCAST)
+    if local is not None:
+        # IFA_ADDRESS is the address of the peer of point-to-point links.
+        if destination is None:
+            destination = address
+        address = local
+    if address is None:
+        return None
+    label = attributes.get(IFA_LABEL)
+    return Address(
+        index,
+        family,
+        socket.inet_ntop(family, address),
+        prefixlen,
+        None if destination is None else socket.inet_ntop(family, destination),
+        None if label is None else _decode_string(label),
+    )
+
+
+def _decode_string(value):
+    return value.split(b"\0", 1)[0].decode("utf-8", "replace")
+
+
+def _format_hardware_address(value):
+    return ":".join(f"{byte:02x}" for byte in value)
@@ -1,5 +1,6 @@
 """
-Network introspection utilities using ioctl and the /proc filesystem.
+Network introspection utilities using netlink, ioctl and the /proc
+filesystem.
 """
 import array
 import errno
@@ -10,6 +11,7 @@ import struct
 
 import netifaces
 
+from landscape.lib import netlink
 from landscape.lib.compat import _PY3
 from landscape.lib.compat import long
 
@@ -19,6 +21,11 @@ __all__ = ["get_active_device_info", "get_network_traffic"]
 SIOCGIFFLAGS = 0x8913  # from header /usr/include/bits/ioctls.h
 SIOCETHTOOL = 0x8946  # As defined in include/uapi/linux/sockios.h
 ETHTOOL_GSET = 0x00000001  # Get status command.
+IFF_BROADCAST = 0x2  # from header /usr/include/linux/if.h
+
+# The speed and duplex of the interfaces, along with the state of their link
+# when they were queried, see _get_cached_speed.
+_speeds = {}
 
 
 def is_64():
@@ -147,27 +154,15 @@ def get_filtered_if_info(filters=(), extended=False):
             socket.IPPROTO_IP,
         )
 
-        for interface in netifaces.interfaces():
-            if any(f(interface) for f in filters):
-                continue
-
-            ifaddresses = netifaces.ifaddresses(interface)
-            if (
-                not is_active(ifaddresses)
-                and netifaces.AF_LINK not in ifaddresses
-            ):
-                continue
-
-            ifencoded = interface.encode()
-            flags = get_flags(sock, ifencoded)
+        for interface, ifaddresses, flags, speed in _get_interfaces(
+            sock,
+            filters,
+        ):
             ip_addresses = get_ip_addresses(ifaddresses)
 
             ifinfo = {"interface": interface}
             ifinfo["flags"] = flags
-            ifinfo["speed"], ifinfo["duplex"] = get_network_interface_speed(
-                sock,
-                ifencoded,
-            )
+            ifinfo["speed"], ifinfo["duplex"] = speed
 
             if extended:
                 ifinfo["ip_addresses"] = ip_addresses
@@ -192,6 +187,141 @@ def get_filtered_if_info(filters=(), extended=False):
     return results
 
 
+def _get_interfaces(sock, filters):
+    """
+    Yield C{(interface, ifaddresses, flags, (speed, duplex))} for each
+    interface with an address that passes all C{filters}.
+
+    The interfaces are dumped with netlink in a couple of requests, falling
+    back to querying them one by one with L{netifaces} and C{ioctl}s.
+    """
+    try:
+        interfaces = get_netlink_interfaces()
+    except OSError as e:
+        logging.debug(f"Couldn't list network interfaces with netlink: {e}")
+    else:
+        _forget_speeds(link for _, link, _ in interfaces)
+        for interface, link, ifaddresses in interfaces:
+            if any(f(interface) for f in filters):
+                continue
+            if not _has_address(ifaddresses):
+                continue
+            # Keep the flags SIOCGIFFLAGS would report.
+            flags = link.flags & 0xFFFF
+            yield interface, ifaddresses, flags, _get_cached_speed(sock, link)
+        return
+
+    for interface in netifaces.interfaces():
+        if any(f(interface) for f in filters):
+            continue
+
+        ifaddresses = netifaces.ifaddresses(interface)
+        if not _has_address(ifaddresses):
+            continue
+
+        ifencoded = interface.encode()
+        yield (
+            interface,
+            ifaddresses,
+            get_flags(sock, ifencoded),
+            get_network_interface_speed(sock, ifencoded),
+        )
+
+
+def _has_address(ifaddresses):
+    return is_active(ifaddresses) or netifaces.AF_LINK in ifaddresses
+
+
+def get_netlink_interfaces():
+    """
+    Return a C{(interface, link, ifaddresses)} tuple for each interface
+    dumped by L{netlink.get_interfaces}, where C{link} is the L{netlink.Link}
+    of the interface and C{ifaddresses} is its addresses in the format of
+    L{netifaces.ifaddresses}.
+
+    IPv4 addresses labelled with an alias, such as C{eth0:1}, are reported
+    as an interface of their own, like L{netifaces} does.
+
+    @raise OSError: If netlink can't be used.
+    """
+    links, addresses = netlink.get_interfaces()
+    interfaces = {}
+    links_by_index = {}
+    for link in links:
+        links_by_index[link.index] = link
+        entry = {"addr": link.address}
+        if link.broadcast is not None:
+            entry[_get_destination_key(link.flags)] = link.broadcast
+        interfaces[link.name] = (link, {netifaces.AF_LINK: [entry]})
+
+    for address in addresses:
+        link = links_by_index.get(address.index)
+        if link is None:
+            continue
+        interface = address.label or link.name
+        if interface not in interfaces:
+            interfaces[interface] = (link, {})
+        ifaddresses = interfaces[interface][1]
+        if address.family == socket.AF_INET:
+            family = netifaces.AF_INET
+            entry = {
+                "addr": address.address,
+                "netmask": _get_netmask(address.family, address.prefixlen),
+            }
+        else:
+            family = netifaces.AF_INET6
+            addr = address.address
+            if addr.startswith("fe80:"):
+                addr += "%" + link.name
+            entry = {
+                "addr": addr,
+                "netmask": "{}/{}".format(
+                    _get_netmask(address.family, address.prefixlen),
+                    address.prefixlen,
+                ),
+            }
+        if address.destination is not None:
+            entry[_get_destination_key(link.flags)] = address.destination
+        ifaddresses.setdefault(family, []).append(entry)
+
+    return [
+        (interface, link, ifaddresses)
+        for interface, (link, ifaddresses) in interfaces.items()
+    ]
+
+
+def _get_destination_key(flags):
+    """Return the key L{netifaces} gives the destination of an address."""
+    return "broadcast" if flags & IFF_BROADCAST else "peer"
+
+
+def _get_netmask(family, prefixlen):
+    size = 4 if family == socket.AF_INET else 16
+    mask = ((1 << prefixlen) - 1) << (size * 8 - prefixlen)
+    return socket.inet_ntop(family, mask.to_bytes(size, "big"))
+
+
+def _get_cached_speed(sock, link):
+    """
+    Return the speed and duplex of the interface of C{link}, only querying
+    them again after its link changed.
+    """
+    state = (link.index, link.flags, link.carrier_changes)
+    cached = _speeds.get(link.name)
+    if cached is None or cached[0] != state:
+        speed = get_network_interface_speed(sock, link.name.encode())
+        cached = _speeds[link.name] = (state, speed)
+    return cached[1]
+
+
+def _forget_speeds(links):
+    """Forget the speed of the interfaces not in C{links} anymore."""
+    names = {link.name for link in links}
+    for name in list(_speeds):
+        if name not in names:
+            del _speeds[name]
+
+
 def get_active_device_info(
     skipped_interfaces=("lo",),
     skip_vlan=True,
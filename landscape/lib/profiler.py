@@ -0,0 +1,138 @@
+"""Profile a running process on demand.
+
+A profile is started with L{start_profiling}, and written to a file once the
+requested number of seconds has elapsed.  Two modes are supported:
+
+ - C{"cprofile"} traces every function call of the main thread with
+   L{cProfile}, and writes the result in the L{pstats} format.
+
+ - C{"sample"} interrupts the process every few milliseconds of CPU time,
+   and counts the stacks it was running.  The overhead is much lower, and
+   the result is written in the collapsed stack format understood by flame
+   graph tools: one C{"outer;inner count"} line per distinct stack.
+
+Only one profile can run at a time in a process.
+"""
+import cProfile
+import logging
+import os
+import signal
+import time
+from collections import Counter
+
+DEFAULT_PROFILE_SECONDS = 30
+PROFILE_MODES = ("cprofile", "sample")
+
+# The CPU time between two samples of the stack sampler.
+SAMPLE_INTERVAL = 0.005
+
+
+class CProfileSession:
+    """Trace all the function calls with L{cProfile}."""
+
+    extension = "pstats"
+
+    def __init__(self):
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+
+    def dump(self, filename):
+        self._profile.dump_stats(filename)
+
+
+class StackSampler:
+    """Count the stacks running when the process is interrupted by SIGPROF.
+
+    @param interval: The CPU time between two samples, in seconds.
+    """
+
+    extension = "collapsed"
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self._interval = interval
+        self._previous_handler = None
+        self.stacks = Counter()
+
+    def start(self):
+        self._previous_handler = signal.signal(signal.SIGPROF, self.sample)
+        signal.setitimer(signal.ITIMER_PROF, self._interval, self._interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+
+    def sample(self, signum, frame):
+        """Record the stack of the given C{frame}."""
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(
+                f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})",
+            )
+            frame = frame.f_back
+        self.stacks[";".join(reversed(names))] += 1
+
+    def dump(self, filename):
+        with open(filename, "w") as output:
+            for stack, count in self.stacks.most_common():
+                output.write(f"{stack} {count:d}\n")
+
+
+_sessions = {"cprofile": CProfileSession, "sample": StackSampler}
+_running = None
+
+
+def start_profiling(
+    reactor,
+    directory,
+    name,
+    seconds=DEFAULT_PROFILE_SECONDS,
+    mode="cprofile",
+):
+    """Profile the process for the given number of C{seconds}.
+
+    @param reactor: The L{EventHandlingReactor} used to stop the profile.
+    @param directory: The directory to write the profile to.
+    @param name: The name of the profiled program, used as prefix of the
+        profile file name.
+    @param mode: One of L{PROFILE_MODES}.
+    @return: The name of the file the profile will be written to, or
+        C{None} if another profile is already running.
+    @raise ValueError: If C{mode} is not supported.
+    """
+    global _running
+
+    if mode not in _sessions:
+        raise ValueError(f"Unknown profiling mode {mode!r}")
+    if _running is not None:
+        return None
+
+    session = _sessions[mode]()
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+    filename = os.path.join(
+        directory,
+        f"{name}-{timestamp}.{session.extension}",
+    )
+
+    def stop():
+        global _running
+
+        session.stop()
+        _running = None
+        try:
+            session.dump(filename)
+        except OSError as e:
+            logging.error(f"Couldn't write the profile to {filename}: {e}")
+        else:
+            logging.info(f"Profile written to {filename}.")
+
+    logging.info(f"Profiling for {seconds:d} seconds in {mode} mode.")
+    session.start()
+    _running = session
+    reactor.call_later(seconds, stop)
+    return filename
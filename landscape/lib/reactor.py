@@ -4,9 +4,11 @@ Extend the regular Twisted reactor with event-handling features.
 import logging
 import time
 
+from twisted.internet.defer import maybeDeferred
 from twisted.internet.threads import deferToThread
 
 from landscape.lib.format import format_object
+from landscape.lib.histogram import LatencyHistogram
 
 
 class InvalidID(Exception):
@@ -30,6 +32,75 @@ class EventID:
         self._pair = pair
 
 
+class CallStats:
+    """The number of calls of something, and the time they took."""
+
+    __slots__ = ("calls", "total", "max")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.calls += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def get_summary(self):
+        return {"calls": self.calls, "total": self.total, "max": self.max}
+
+
+class ReactorStats:
+    """Timing statistics of the events fired by a reactor.
+
+    @ivar events: The L{CallStats} of each event type.
+    @ivar handlers: The L{CallStats} of each C{(event_type, handler)} pair.
+    @ivar lag: A L{LatencyHistogram} of how late the reactor runs the
+        functions scheduled with C{call_every}.
+    """
+
+    def __init__(self, get_time=time.monotonic):
+        self.get_time = get_time
+        self.events = {}
+        self.handlers = {}
+        self.lag = LatencyHistogram()
+
+    def record_event(self, event_type, seconds):
+        stats = self.events.get(event_type)
+        if stats is None:
+            stats = self.events[event_type] = CallStats()
+        stats.record(seconds)
+
+    def record_handler(self, event_type, handler, seconds):
+        key = (event_type, handler)
+        stats = self.handlers.get(key)
+        if stats is None:
+            stats = self.handlers[key] = CallStats()
+        stats.record(seconds)
+
+    def get_summary(self):
+        """Return a C{dict} summing the statistics up.
+
+        Handlers are identified by their event type and their name, as given
+        by L{format_object}.
+        """
+        handlers = {}
+        for (event_type, handler), stats in self.handlers.items():
+            handlers[
+                f"{event_type}: {format_object(handler)}"
+            ] = stats.get_summary()
+        return {
+            "events": {
+                event_type: stats.get_summary()
+                for event_type, stats in self.events.items()
+            },
+            "handlers": handlers,
+            "lag": self.lag.get_summary(),
+        }
+
+
 class EventHandlingReactorMixin:
     """Fire events identified by strings and register handlers for them.
 
@@ -38,11 +109,24 @@ class EventHandlingReactorMixin:
     run the real Twisted reactor (except of course if the event handlers
     themselves contain asynchronous calls that need the Twisted reactor
     running).
+
+    @ivar stats: The L{ReactorStats} of the reactor, if enabled with
+        L{enable_stats}, or C{None}.
     """
 
     def __init__(self):
         super().__init__()
         self._event_handlers = {}
+        self.stats = None
+
+    def enable_stats(self):
+        """Start timing the event handlers.
+
+        This should be done before scheduling any looping call, since only
+        the ones scheduled afterwards have their lag measured.
+        """
+        if self.stats is None:
+            self.stats = ReactorStats()
 
     def call_on(self, event_type, handler, priority=0):
         """Register an event handler.
@@ -75,7 +159,14 @@ class EventHandlingReactorMixin:
         @param args: Positional arguments to pass to the registered handlers.
         @param kwargs: Keyword arguments to pass to the registered handlers.
         """
-        logging.debug("Started firing %s.", event_type)
+        # Formatting the handlers isn't free, so only do it when it's going
+        # to be logged.
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+        stats = self.stats
+        if debug:
+            logging.debug("Started firing %s.", event_type)
+        if stats is not None:
+            fire_started = stats.get_time()
         results = []
         # Make a copy of the handlers that are registered at this point in
         # time, so we have a stable list in case handlers are cancelled
@@ -83,13 +174,25 @@ class EventHandlingReactorMixin:
         handlers = list(self._event_handlers.get(event_type, ()))
         for handler, priority in handlers:
             try:
-                logging.debug(
-                    "Calling %s for %s with priority %d.",
-                    format_object(handler),
-                    event_type,
-                    priority,
-                )
-                results.append(handler(*args, **kwargs))
+                if debug:
+                    logging.debug(
+                        "Calling %s for %s with priority %d.",
+                        format_object(handler),
+                        event_type,
+                        priority,
+                    )
+                if stats is None:
+                    results.append(handler(*args, **kwargs))
+                else:
+                    started = stats.get_time()
+                    try:
+                        results.append(handler(*args, **kwargs))
+                    finally:
+                        stats.record_handler(
+                            event_type,
+                            handler,
+                            stats.get_time() - started,
+                        )
             except KeyboardInterrupt:
                 logging.exception(
                     "Keyboard interrupt while running event "
@@ -111,7 +214,10 @@ class EventHandlingReactorMixin:
                     args,
                     kwargs,
                 )
-        logging.debug("Finished firing %s.", event_type)
+        if stats is not None:
+            stats.record_event(event_type, stats.get_time() - fire_started)
+        if debug:
+            logging.debug("Finished firing %s.", event_type)
         return results
 
     def cancel_call(self, id):
@@ -171,10 +277,37 @@ class EventHandlingReactor(EventHandlingReactorMixin):
         Create a new L{twisted.internet.task.LoopingCall} object and
         start it.
 
+        If the reactor L{stats} are enabled, the lag of each call is
+        recorded.
+
         @return: the created C{LoopingCall} object.
         """
-        lc = self._LoopingCall(f, *args, **kwargs)
+        if self.stats is None:
+            lc = self._LoopingCall(f, *args, **kwargs)
+            lc.start(seconds, now=False)
+            return lc
+
+        # The time the current call was due, as the LoopingCall schedules
+        # the next call only once the current one is over.
+        scheduled = []
+
+        def record_lag():
+            if not lc.interval:
+                return f(*args, **kwargs)
+            self.stats.lag.add(lc.clock.seconds() - scheduled[0])
+            result = maybeDeferred(f, *args, **kwargs)
+            return result.addBoth(record_next_call)
+
+        def record_next_call(result):
+            now = lc.clock.seconds()
+            scheduled[0] = (
+                now + lc.interval - (now - lc.starttime) % lc.interval
+            )
+            return result
+
+        lc = self._LoopingCall(record_lag)
         lc.start(seconds, now=False)
+        scheduled.append(lc.starttime + seconds)
         return lc
 
     def cancel_call(self, id):
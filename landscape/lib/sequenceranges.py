@@ -1,3 +1,5 @@
+import zlib
+
 from twisted.python.compat import xrange
 
 
@@ -61,6 +63,205 @@ class SequenceRanges:
         remove_from_ranges(self._ranges, item)
 
 
+# The positions of the bits set in each possible byte value.
+_BYTE_BITS = tuple(
+    tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)
+)
+
+# A translation table marking the bytes with bits set as 1.
+_NON_ZERO_MARKS = bytes(1) + bytes((1,)) * 255
+
+# int.bit_count is only available from Python 3.10.
+_bit_count = getattr(int, "bit_count", lambda bits: bin(bits).count("1"))
+
+
+class SequenceBitmap:
+    """A set of non-negative integers, kept as the bits of a single C{int}.
+
+    Set operations (union, intersection and difference) work on whole
+    bitmaps at once, which makes them a lot cheaper than the equivalent
+    operations on Python C{set}s when dealing with many thousands of ids.
+
+    In memory, the bitmap is uncompressed and takes one bit per integer up
+    to the largest item, for example 3.75MB for ids up to 30M, however few
+    they are.  Bitmaps can be converted from and to ranges
+    lists, as described in L{SequenceRanges}, and serialized into
+    run-length encoded, compressed blobs with L{dumps}.
+    """
+
+    __slots__ = ("_bits",)
+
+    def __init__(self, sequence=()):
+        if isinstance(sequence, SequenceBitmap):
+            self._bits = sequence._bits
+            return
+        buffer = bytearray()
+        for item in sequence:
+            if item < 0:
+                raise SequenceError(f"Found negative item ({item!r})")
+            index = item >> 3
+            if index >= len(buffer):
+                buffer.extend(bytes(max(index + 1 - len(buffer), len(buffer))))
+            buffer[index] |= 1 << (item & 7)
+        self._bits = int.from_bytes(buffer, "little")
+
+    @classmethod
+    def from_ranges(cls, ranges):
+        """Build a bitmap from a ranges list, without expanding it."""
+        buffer = bytearray()
+        for item in ranges:
+            if isinstance(item, tuple):
+                start, stop = item
+            else:
+                start = stop = item
+            if start < 0 or start > stop:
+                raise SequenceError(f"Invalid range ({item!r})")
+            if (stop >> 3) >= len(buffer):
+                buffer.extend(bytes((stop >> 3) + 1 - len(buffer)))
+            first, last = start >> 3, stop >> 3
+            first_mask = (0xFF << (start & 7)) & 0xFF
+            last_mask = 0xFF >> (7 - (stop & 7))
+            if first == last:
+                buffer[first] |= first_mask & last_mask
+            else:
+                buffer[first] |= first_mask
+                buffer[first + 1 : last] = b"\xff" * (last - first - 1)
+                buffer[last] |= last_mask
+        return cls._from_bits(int.from_bytes(buffer, "little"))
+
+    @classmethod
+    def loads(cls, data):
+        """Build a bitmap from a blob returned by L{dumps}."""
+        data = zlib.decompress(data)
+        ranges = []
+        position = offset = 0
+        while offset < len(data):
+            gap, offset = _read_varint(data, offset)
+            length, offset = _read_varint(data, offset)
+            start = position + gap
+            ranges.append((start, start + length))
+            position = start + length + 1
+        return cls.from_ranges(ranges)
+
+    @classmethod
+    def _from_bits(cls, bits):
+        obj = cls()
+        obj._bits = bits
+        return obj
+
+    def dumps(self):
+        """Return the bitmap as compressed C{bytes}.
+
+        Each run of consecutive items is encoded as two varints, the gap
+        since the end of the previous run and the length of the run, and
+        the result is compressed with zlib.
+        """
+        data = bytearray()
+        position = 0
+        for start, stop in self._iter_runs():
+            _write_varint(data, start - position)
+            _write_varint(data, stop - start)
+            position = stop + 1
+        return zlib.compress(bytes(data))
+
+    def to_sequence(self):
+        return list(self)
+
+    def to_ranges(self):
+        """Return the ranges list representing the bitmap.
+
+        The result is the same as the one of L{sequence_to_ranges}, but
+        it's computed by looking at the bits starting and ending each run
+        of consecutive items, rather than at each of the items.
+        """
+        ranges = []
+        for start, stop in self._iter_runs():
+            if stop == start:
+                ranges.append(start)
+            elif stop == start + 1:
+                ranges.extend((start, stop))
+            else:
+                ranges.append((start, stop))
+        return ranges
+
+    def _iter_runs(self):
+        """Iterate over the C{(start, stop)} runs of consecutive items."""
+        bits = self._bits
+        starts = _iter_bits(bits & ~(bits << 1))
+        stops = _iter_bits(bits & ~(bits >> 1))
+        return zip(starts, stops)
+
+    def __iter__(self):
+        return _iter_bits(self._bits)
+
+    def __len__(self):
+        return _bit_count(self._bits)
+
+    def __bool__(self):
+        return self._bits != 0
+
+    def __contains__(self, item):
+        return item >= 0 and bool(self._bits >> item & 1)
+
+    def __eq__(self, other):
+        if not isinstance(other, SequenceBitmap):
+            return NotImplemented
+        return self._bits == other._bits
+
+    def __or__(self, other):
+        return self._from_bits(self._bits | other._bits)
+
+    def __and__(self, other):
+        return self._from_bits(self._bits & other._bits)
+
+    def __sub__(self, other):
+        return self._from_bits(self._bits & ~other._bits)
+
+    def __xor__(self, other):
+        return self._from_bits(self._bits ^ other._bits)
+
+    def __repr__(self):
+        return f"<SequenceBitmap {self.to_ranges()!r}>"
+
+
+def _iter_bits(bits):
+    """Iterate over the positions of the bits set in C{bits}, in order.
+
+    The zero bytes are skipped with C{bytes.find} rather than looked at one
+    by one, as ids can be sparse: 60k ids spread up to 30M make a bitmap of
+    3.75MB, and a difference between two of them may only have a few bits
+    set.
+    """
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    marks = data.translate(_NON_ZERO_MARKS)
+    index = marks.find(1)
+    while index != -1:
+        base = index << 3
+        for bit in _BYTE_BITS[data[index]]:
+            yield base + bit
+        index = marks.find(1, index + 1)
+
+
+def _write_varint(data, value):
+    """Append C{value} to C{data}, seven bits per byte."""
+    while value > 0x7F:
+        data.append(value & 0x7F | 0x80)
+        value >>= 7
+    data.append(value)
+
+
+def _read_varint(data, offset):
+    """Return the varint at C{offset} in C{data}, and the offset after it."""
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
 def sequence_to_ranges(sequence):
     """Iterate over range items that compose the given sequence."""
 
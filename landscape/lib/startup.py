@@ -0,0 +1,165 @@
+"""Trace where the time goes while a process starts.
+
+A L{StartupTrace} records the duration of the named phases of the startup,
+and optionally of every module imported while it's tracing, so that slow
+startups can be broken down from the logs.
+"""
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from importlib.abc import MetaPathFinder
+
+#: The number of slowest imports logged by L{StartupTrace.log}.
+SLOWEST_IMPORTS = 10
+
+
+class _ImportTimer(MetaPathFinder):
+    """Time the execution of the modules found by the other finders.
+
+    @param trace: The L{StartupTrace} to record the imports into.
+    """
+
+    def __init__(self, trace):
+        self._trace = trace
+        self._finding = set()
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname in self._finding:
+            return None
+        self._finding.add(fullname)
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._finding.discard(fullname)
+        loader = spec.loader
+        if loader is None or not hasattr(loader, "exec_module"):
+            return spec
+        spec.loader = _TimedLoader(loader, self._trace)
+        return spec
+
+
+class _TimedLoader:
+    """Wrap a loader to record how long its modules take to execute."""
+
+    def __init__(self, loader, trace):
+        self._loader = loader
+        self._trace = trace
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        with self._trace.timing_import(module.__name__):
+            self._loader.exec_module(module)
+
+
+class StartupTrace:
+    """Record how long the phases of a startup and the imports take.
+
+    @param started: When the startup began, as returned by C{get_time}.
+        Defaults to now.
+    @param get_time: The monotonic clock to use.
+
+    @ivar phases: A list of C{(name, seconds)} in the order they ended.
+    @ivar imports: A C{dict} mapping module names to the seconds spent
+        executing the module itself, excluding the modules it imported.
+    """
+
+    def __init__(self, started=None, get_time=time.monotonic):
+        self._get_time = get_time
+        self.started = get_time() if started is None else started
+        self.finished = None
+        self.phases = []
+        self.imports = {}
+        self._import_stack = []
+        self._timer = None
+
+    @contextmanager
+    def phase(self, name):
+        """Record the time spent in the C{with} block as phase C{name}."""
+        started = self._get_time()
+        try:
+            yield
+        finally:
+            self.record_phase(name, self._get_time() - started)
+
+    def record_phase(self, name, seconds):
+        """Record that the phase C{name} took C{seconds}."""
+        self.phases.append((name, seconds))
+
+    @contextmanager
+    def timing_import(self, name):
+        """Record the time spent in the C{with} block importing C{name}."""
+        started = self._get_time()
+        self._import_stack.append(0.0)
+        try:
+            yield
+        finally:
+            total = self._get_time() - started
+            children = self._import_stack.pop()
+            self.imports[name] = total - children
+            if self._import_stack:
+                self._import_stack[-1] += total
+
+    def trace_imports(self):
+        """Start recording the modules imported from now on."""
+        if self._timer is None:
+            self._timer = _ImportTimer(self)
+            sys.meta_path.insert(0, self._timer)
+
+    def stop_tracing_imports(self):
+        if self._timer is not None:
+            sys.meta_path.remove(self._timer)
+            self._timer = None
+
+    def finish(self):
+        """Mark the startup as done, and log the trace.
+
+        Only the first call has an effect, so this can be hooked to events
+        firing several times.
+        """
+        if self.finished is not None:
+            return
+        self.finished = self._get_time()
+        self.stop_tracing_imports()
+        self.log()
+
+    def get_slowest_imports(self, limit=SLOWEST_IMPORTS):
+        """Return the C{limit} slowest imports as C{(name, seconds)}."""
+        imports = sorted(
+            self.imports.items(),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        return imports[:limit]
+
+    def log(self):
+        """Log the phases and the slowest imports."""
+        end = self._get_time() if self.finished is None else self.finished
+        phases = ", ".join(
+            f"{name} {seconds:.3f}s" for name, seconds in self.phases
+        )
+        logging.info(
+            f"Startup took {end - self.started:.3f}s: {phases}",
+        )
+        if self.imports:
+            slowest = ", ".join(
+                f"{name} {seconds:.3f}s"
+                for name, seconds in self.get_slowest_imports()
+            )
+            logging.info(
+                f"Imported {len(self.imports):d} modules in "
+                f"{sum(self.imports.values()):.3f}s, the slowest being: "
+                f"{slowest}",
+            )
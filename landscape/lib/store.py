@@ -1,4 +1,6 @@
 """Functions used by all sqlite-backed stores."""
+import time
+from contextlib import contextmanager
 from functools import wraps
 
 try:
@@ -7,6 +9,129 @@ except ImportError:
     from pysqlite2 import dbapi2 as sqlite3
 
 
+# The number of parsed statements kept around by each connection, enough
+# for all the distinct queries of any of our stores.
+CACHED_STATEMENTS = 256
+
+# Per-connection tuning: an 8MB page cache, and reads served from up to
+# 64MB of the database mapped in memory.
+PRAGMAS = (
+    ("cache_size", -8192),
+    ("mmap_size", 64 * 1024 * 1024),
+)
+
+
+class TransactionStats:
+    """Count the transactions run on a connection and the time they took.
+
+    @ivar transactions: The number of committed or rolled back transactions.
+    @ivar seconds: The total time spent in those transactions.
+    @ivar depth: The number of L{transaction} blocks currently entered.
+    """
+
+    def __init__(self):
+        self.transactions = 0
+        self.seconds = 0.0
+        self.depth = 0
+
+    def record(self, started):
+        """Account for a transaction started at the C{started} time."""
+        self.transactions += 1
+        self.seconds += time.monotonic() - started
+
+
+class StoreConnection(sqlite3.Connection):
+    """A SQLite connection keeping L{TransactionStats}."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = TransactionStats()
+
+
+def connect(filename, journal_mode=None):
+    """Open a tuned L{StoreConnection} to a SQLite database.
+
+    @param filename: The file of the database.
+    @param journal_mode: Optionally, the journal mode to switch the database
+        to, for example "wal".  It's only meant for databases written by a
+        single user, since readers need write access to the journal files.
+    """
+    db = sqlite3.connect(
+        filename,
+        factory=StoreConnection,
+        cached_statements=CACHED_STATEMENTS,
+    )
+    pragmas = list(PRAGMAS)
+    if journal_mode is not None:
+        pragmas.append(("journal_mode", journal_mode))
+    try:
+        for name, value in pragmas:
+            db.execute(f"PRAGMA {name}={value}")
+    except sqlite3.DatabaseError:
+        # The file is not a database, or it's read-only or busy.  Errors
+        # of the former kind are reported by the first actual query.
+        pass
+    return db
+
+
+def _get_db(store):
+    if not store._db:
+        # Create the database connection only when we start to actually
+        # use it. This is essentially just a workaroud of a sqlite bug
+        # happening when 2 concurrent processes try to create the tables
+        # around the same time, the one which fails having an incorrect
+        # cache and not seeing the tables
+        store._db = connect(
+            store._filename,
+            journal_mode=getattr(store, "_journal_mode", None),
+        )
+        store._ensure_schema()
+    return store._db
+
+
+def get_transaction_stats(store):
+    """Return the L{TransactionStats} of the connection of C{store}."""
+    stats = getattr(store._db, "stats", None)
+    if stats is None:
+        return TransactionStats()
+    return stats
+
+
+@contextmanager
+def transaction(store):
+    """Run all the store calls made in the block in a single transaction.
+
+    The transaction is committed when leaving the block, or rolled back if
+    the block raises an exception.  Since the state of the transaction is
+    kept on the database connection, this also applies to the objects
+    sharing the connection of C{store}, like the tasks of a
+    L{PackageStore}.  Nested blocks are part of the outermost transaction.
+
+    @param store: A store whose methods are decorated with L{with_cursor}.
+    """
+    db = _get_db(store)
+    stats = db.stats
+    if stats.depth:
+        stats.depth += 1
+        try:
+            yield store
+        finally:
+            stats.depth -= 1
+        return
+
+    started = time.monotonic()
+    stats.depth = 1
+    try:
+        yield store
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        stats.depth = 0
+        stats.record(started)
+
+
 def with_cursor(method):
     """Decorator that encloses the method in a database transaction.
 
@@ -15,28 +140,36 @@ def with_cursor(method):
     until the cursor was closed.  With this in mind, instead of using
     the autocommit mode, we explicitly terminate transactions and enforce
     cursor closing with this decorator.
+
+    Inside a L{transaction} block, the method is run as part of the block
+    transaction instead.
     """
 
     @wraps(method)
     def inner(self, *args, **kwargs):
-        if not self._db:
-            # Create the database connection only when we start to actually
-            # use it. This is essentially just a workaroud of a sqlite bug
-            # happening when 2 concurrent processes try to create the tables
-            # around the same time, the one which fails having an incorrect
-            # cache and not seeing the tables
-            self._db = sqlite3.connect(self._filename)
-            self._ensure_schema()
+        db = _get_db(self)
+        stats = getattr(db, "stats", None)
+        if stats is not None and stats.depth:
+            cursor = db.cursor()
+            try:
+                return method(self, cursor, *args, **kwargs)
+            finally:
+                cursor.close()
+
+        started = time.monotonic()
         try:
-            cursor = self._db.cursor()
+            cursor = db.cursor()
             try:
                 result = method(self, cursor, *args, **kwargs)
             finally:
                 cursor.close()
-            self._db.commit()
+            db.commit()
         except BaseException:
-            self._db.rollback()
+            db.rollback()
             raise
+        finally:
+            if stats is not None:
+                stats.record(started)
         return result
 
     return inner
@@ -1,18 +1,29 @@
+import hashlib
+import io
 import os
+import threading
+import time
 import unittest
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
 from threading import local
 
 import pycurl
 from twisted.internet.defer import FirstError
+from twisted.internet.defer import gatherResults
 from twisted.python.compat import unicode
 
 from landscape.lib import testing
+from landscape.lib.fetch import ChecksumError
+from landscape.lib.fetch import CurlMultiFetcher
 from landscape.lib.fetch import fetch
 from landscape.lib.fetch import fetch_async
 from landscape.lib.fetch import fetch_many_async
+from landscape.lib.fetch import fetch_to_file_async
 from landscape.lib.fetch import fetch_to_files
 from landscape.lib.fetch import HTTPCodeError
 from landscape.lib.fetch import PyCurlError
+from landscape.lib.fetch import stream_to_files
 from landscape.lib.fetch import url_to_filename
 
 
@@ -262,6 +273,21 @@ class FetchTest(
         else:
             self.fail("HTTPCodeError not raised")
 
+    def test_output_file(self):
+        """
+        If an C{output_file} is given, the content is written to it rather
+        than returned.
+        """
+        curl = CurlStub(b"result")
+        output_file = io.BytesIO()
+        result = fetch(
+            "http://example.com",
+            curl=curl,
+            output_file=output_file,
+        )
+        self.assertIs(result, None)
+        self.assertEqual(output_file.getvalue(), b"result")
+
     def test_http_error_str(self):
         self.assertEqual(
             str(HTTPCodeError(501, "")),
@@ -360,6 +386,7 @@ class FetchTest(
             curls.append(curl)
             return curl
 
+        self.addCleanup(setattr, pycurl, "Curl", pycurl.Curl)
         pycurl.Curl = pycurl_curl
         result = fetch("http://example.com")
         curl = curls[0]
@@ -584,3 +611,528 @@ class FetchTest(
 
         result.addErrback(check_error)
         return result
+
+
+def make_data(size, version=0):
+    """Return C{size} bytes of content where every offset is recognizable.
+
+    @param version: The version of the content, changing all its bytes.
+    """
+    return bytes((index + version) % 251 for index in range(size))
+
+
+class LocalHTTPServer:
+    """A local HTTP server serving C{/bytes/<size>}, C{/data/<size>} and
+    C{/missing}.
+
+    Requests for C{/data/<size>} honour the C{Range} header, unless
+    C{ranges} is C{False} or their C{If-Range} header doesn't match the
+    C{etag} or the C{last_modified} date of the content.  Their responses
+    get cut after the number of bytes popped from the C{interruptions}
+    list, if it's not empty.
+
+    @ivar version: The version of the content of C{/data/<size>}.
+    @ivar max_active: The maximum number of requests that have been served
+        at the same time.
+    @ivar range_headers: The C{Range} headers of the requests received.
+    @ivar if_range_headers: The C{If-Range} headers of the requests received.
+    """
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.requests = 0
+        self.ranges = True
+        self.interruptions = []
+        self.version = 0
+        self.etag = '"0"'
+        self.last_modified = None
+        self.range_headers = []
+        self.if_range_headers = []
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def send_data(self):
+                data = make_data(
+                    int(self.path.split("/")[-1]),
+                    server.version,
+                )
+                range_header = self.headers.get("Range")
+                if_range_header = self.headers.get("If-Range")
+                server.range_headers.append(range_header)
+                server.if_range_headers.append(if_range_header)
+                start = 0
+                if (
+                    range_header
+                    and server.ranges
+                    and if_range_header
+                    in (None, server.etag, server.last_modified)
+                ):
+                    start = int(range_header[len("bytes=") :].split("-")[0])
+                    if start >= len(data):
+                        self.send_response(416)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header(
+                        "Content-Range",
+                        f"bytes {start}-{len(data) - 1}/{len(data)}",
+                    )
+                else:
+                    self.send_response(200)
+                if server.etag is not None:
+                    self.send_header("ETag", server.etag)
+                if server.last_modified is not None:
+                    self.send_header("Last-Modified", server.last_modified)
+                body = data[start:]
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if server.interruptions:
+                    self.wfile.write(body[: server.interruptions.pop(0)])
+                    self.wfile.flush()
+                    self.close_connection = True
+                else:
+                    self.wfile.write(body)
+
+            def do_GET(self):  # noqa: N802
+                server.request_started()
+                try:
+                    if self.path.startswith("/data/"):
+                        self.send_data()
+                        return
+                    if self.path.startswith("/bytes/"):
+                        body = b"x" * int(self.path.split("/")[-1])
+                        self.send_response(200)
+                    else:
+                        body = b"not found"
+                        self.send_response(404)
+                    time.sleep(server.delay)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    server.request_finished()
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:{:d}".format(self._server.server_port)
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def request_started(self):
+        with self._lock:
+            self.requests += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+    def request_finished(self):
+        with self._lock:
+            self.active -= 1
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class CurlMultiFetcherTest(testing.FSTestCase, testing.TwistedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = LocalHTTPServer()
+        self.addCleanup(self.server.stop)
+
+    def test_fetch(self):
+        fetcher = CurlMultiFetcher()
+        result = fetcher.fetch(self.server.url + "/bytes/10")
+        return result.addCallback(self.assertEqual, b"x" * 10)
+
+    def test_fetch_http_error(self):
+        fetcher = CurlMultiFetcher()
+        result = fetcher.fetch(self.server.url + "/missing")
+
+        def got_error(error):
+            self.assertEqual(404, error.http_code)
+            self.assertEqual(b"not found", error.body)
+
+        self.assertFailure(result, HTTPCodeError)
+        return result.addCallback(got_error)
+
+    def test_fetch_connection_error(self):
+        """
+        Transfer errors make the result fail with a L{PyCurlError}.
+        """
+        fetcher = CurlMultiFetcher()
+        url = self.server.url
+        self.server.stop()
+        result = fetcher.fetch(url + "/bytes/10", connect_timeout=5)
+        return self.assertFailure(result, PyCurlError)
+
+    def test_fetch_to_output_file(self):
+        """
+        The content is streamed to the C{output_file}, if one is given.
+        """
+        fetcher = CurlMultiFetcher()
+        output_file = io.BytesIO()
+        result = fetcher.fetch(
+            self.server.url + "/bytes/100000",
+            output_file=output_file,
+        )
+
+        def check(body):
+            self.assertIs(None, body)
+            self.assertEqual(b"x" * 100000, output_file.getvalue())
+
+        return result.addCallback(check)
+
+    def test_fetch_many(self):
+        """
+        Many URLs can be fetched at once, each result being delivered to
+        its own L{Deferred}.
+        """
+        fetcher = CurlMultiFetcher()
+        sizes = list(range(1, 30))
+        results = [
+            fetcher.fetch(self.server.url + f"/bytes/{size:d}")
+            for size in sizes
+        ]
+
+        def check(bodies):
+            self.assertEqual([b"x" * size for size in sizes], bodies)
+
+        return gatherResults(results).addCallback(check)
+
+    def test_max_host_connections(self):
+        """
+        No more than C{max_host_connections} requests are made to the same
+        host at the same time.
+        """
+        self.server.delay = 0.05
+        fetcher = CurlMultiFetcher(max_host_connections=2)
+        results = [
+            fetcher.fetch(self.server.url + "/bytes/10") for i in range(8)
+        ]
+
+        def check(ignored):
+            self.assertEqual(8, self.server.requests)
+            self.assertTrue(self.server.max_active <= 2)
+
+        return gatherResults(results).addCallback(check)
+
+    def test_worker_thread_exits_when_idle(self):
+        fetcher = CurlMultiFetcher()
+        result = fetcher.fetch(self.server.url + "/bytes/10")
+
+        def check(ignored):
+            for i in range(100):
+                if fetcher._thread is None:
+                    break
+                time.sleep(0.01)
+            self.assertIs(None, fetcher._thread)
+            return fetcher.fetch(self.server.url + "/bytes/20")
+
+        result.addCallback(check)
+        return result.addCallback(self.assertEqual, b"x" * 20)
+
+    def test_stream_to_files(self):
+        """
+        L{stream_to_files} writes the content of each URL to a file named
+        after it.
+        """
+        directory = self.makeDir()
+        urls = [self.server.url + "/bytes/10", self.server.url + "/bytes/20"]
+        result = stream_to_files(urls, directory)
+
+        def check(ignored):
+            self.assertFileContent(os.path.join(directory, "10"), b"x" * 10)
+            self.assertFileContent(os.path.join(directory, "20"), b"x" * 20)
+
+        return result.addCallback(check)
+
+    def test_stream_to_files_with_errors(self):
+        """
+        Failed URLs are logged, and their partial files removed.
+        """
+        directory = self.makeDir()
+        messages = []
+        urls = [self.server.url + "/bytes/10", self.server.url + "/missing"]
+        result = stream_to_files(urls, directory, logger=messages.append)
+
+        def check(failure):
+            self.assertEqual(
+                [
+                    f"Couldn't fetch file from {self.server.url}/missing "
+                    "(Server returned HTTP code 404)",
+                ],
+                messages,
+            )
+            self.assertFalse(
+                os.path.exists(os.path.join(directory, "missing")),
+            )
+
+        result.addCallback(self.fail)
+        return result.addErrback(check)
+
+
+class FetchToFileAsyncTest(testing.FSTestCase, testing.TwistedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = LocalHTTPServer()
+        self.addCleanup(self.server.stop)
+        self.filename = os.path.join(self.makeDir(), "hash-id-db")
+        self.partial_filename = self.filename + ".partial"
+        self.validator_filename = self.partial_filename + ".validator"
+        self.url = self.server.url + "/data/100000"
+        self.data = make_data(100000)
+
+    def assertDownloaded(self, result):  # noqa: N802
+        self.assertEqual(self.filename, result)
+        self.assertFileContent(self.filename, self.data)
+        self.assertFalse(os.path.exists(self.partial_filename))
+        self.assertFalse(os.path.exists(self.validator_filename))
+
+    def make_partial(self, content, validator=None):
+        with open(self.partial_filename, "wb") as partial_file:
+            partial_file.write(content)
+        if validator is not None:
+            with open(self.validator_filename, "w") as validator_file:
+                validator_file.write(validator)
+
+    def test_fetch_to_file(self):
+        result = fetch_to_file_async(self.url, self.filename)
+        return result.addCallback(self.assertDownloaded)
+
+    def test_resume(self):
+        """
+        An interrupted transfer leaves a partial file behind, with the
+        C{ETag} of the content next to it, and the next download only
+        requests the missing bytes if the content didn't change.
+        """
+        self.server.interruptions = [30000]
+        result = fetch_to_file_async(self.url, self.filename)
+        self.assertFailure(result, PyCurlError)
+
+        def interrupted(error):
+            self.assertFalse(os.path.exists(self.filename))
+            self.assertFileContent(self.partial_filename, self.data[:30000])
+            self.assertFileContent(self.validator_filename, b'"0"')
+            return fetch_to_file_async(self.url, self.filename)
+
+        def resumed(result):
+            self.assertDownloaded(result)
+            self.assertEqual([None, "bytes=30000-"], self.server.range_headers)
+            self.assertEqual([None, '"0"'], self.server.if_range_headers)
+
+        result.addCallback(interrupted)
+        return result.addCallback(resumed)
+
+    def test_resume_many_interruptions(self):
+        self.server.interruptions = [10000, 20000, 30000]
+
+        def download(ignored=None):
+            result = fetch_to_file_async(self.url, self.filename)
+            result.addErrback(lambda failure: failure.trap(PyCurlError))
+            return result
+
+        result = download()
+        for _ in range(3):
+            result.addCallback(download)
+
+        def check(result):
+            self.assertDownloaded(result)
+            self.assertEqual(
+                [None, "bytes=10000-", "bytes=30000-", "bytes=60000-"],
+                self.server.range_headers,
+            )
+
+        return result.addCallback(check)
+
+    def test_restart_without_range_support(self):
+        """
+        If the server ignores the C{Range} header, the partial file is thrown
+        away and the download starts over.
+        """
+        self.server.ranges = False
+        self.make_partial(b"garbage", '"0"')
+        result = fetch_to_file_async(self.url, self.filename)
+
+        def check(result):
+            self.assertDownloaded(result)
+            self.assertEqual(["bytes=7-", None], self.server.range_headers)
+
+        return result.addCallback(check)
+
+    def test_restart_with_unsatisfiable_range(self):
+        """
+        A partial file at least as big as the content, for example because
+        the content changed, is thrown away.
+        """
+        self.make_partial(b"x" * 200000, '"0"')
+        result = fetch_to_file_async(self.url, self.filename)
+
+        def check(result):
+            self.assertDownloaded(result)
+            self.assertEqual(
+                ["bytes=200000-", None],
+                self.server.range_headers,
+            )
+
+        return result.addCallback(check)
+
+    def test_restart_if_changed(self):
+        """
+        If the content changed since the partial file was downloaded, the
+        server answers the whole new content, which replaces it.
+        """
+        self.server.interruptions = [30000]
+        result = fetch_to_file_async(self.url, self.filename)
+        self.assertFailure(result, PyCurlError)
+
+        def interrupted(error):
+            self.server.version = 1
+            self.server.etag = '"1"'
+            return fetch_to_file_async(self.url, self.filename)
+
+        def check(result):
+            self.data = make_data(100000, 1)
+            self.assertDownloaded(result)
+            self.assertEqual(
+                [None, "bytes=30000-", None],
+                self.server.range_headers,
+            )
+
+        result.addCallback(interrupted)
+        return result.addCallback(check)
+
+    def test_restart_if_changed_with_same_size(self):
+        """
+        The partial file is thrown away if the content changed, even if the
+        new content has the size of the partial file.
+        """
+        self.make_partial(make_data(100000, 1), '"1"')
+        result = fetch_to_file_async(self.url, self.filename)
+
+        def check(result):
+            self.assertDownloaded(result)
+            self.assertEqual(
+                ["bytes=100000-", None],
+                self.server.range_headers,
+            )
+
+        return result.addCallback(check)
+
+    def test_resume_with_last_modified(self):
+        """
+        The C{Last-Modified} date of the content is used to resume if there
+        is no C{ETag}.
+        """
+        self.server.etag = None
+        self.server.last_modified = "Mon, 19 Oct 2026 09:00:00 GMT"
+        self.server.interruptions = [30000]
+        result = fetch_to_file_async(self.url, self.filename)
+        result.addErrback(lambda failure: failure.trap(PyCurlError))
+        result.addCallback(
+            lambda ignored: fetch_to_file_async(self.url, self.filename),
+        )
+
+        def check(result):
+            self.assertDownloaded(result)
+            self.assertEqual(
+                [None, self.server.last_modified],
+                self.server.if_range_headers,
+            )
+
+        return result.addCallback(check)
+
+    def test_no_resume_without_validator(self):
+        """
+        A partial file is thrown away if nothing tells it's still part of
+        the content.
+        """
+        self.server.etag = None
+        self.make_partial(b"garbage")
+        result = fetch_to_file_async(self.url, self.filename)
+
+        def check(result):
+            self.assertDownloaded(result)
+            self.assertEqual([None], self.server.range_headers)
+
+        return result.addCallback(check)
+
+    def test_resume_with_checksum_without_validator(self):
+        """
+        A partial file without validator is resumed if the checksum of the
+        content is known, since it catches any mix up.
+        """
+        self.server.etag = None
+        self.make_partial(self.data[:30000])
+        sha256 = hashlib.sha256(self.data).hexdigest()
+        result = fetch_to_file_async(self.url, self.filename, sha256=sha256)
+
+        def check(result):
+            self.assertDownloaded(result)
+            self.assertEqual(["bytes=30000-"], self.server.range_headers)
+            self.assertEqual([None], self.server.if_range_headers)
+
+        return result.addCallback(check)
+
+    def test_http_error(self):
+        """
+        The body of an error response doesn't end up in the partial file.
+        """
+        result = fetch_to_file_async(
+            self.server.url + "/missing",
+            self.filename,
+        )
+        self.assertFailure(result, HTTPCodeError)
+
+        def check(error):
+            self.assertEqual(404, error.http_code)
+            self.assertFalse(os.path.exists(self.filename))
+            self.assertFileContent(self.partial_filename, b"")
+
+        return result.addCallback(check)
+
+    def test_checksum(self):
+        sha256 = hashlib.sha256(self.data).hexdigest()
+        result = fetch_to_file_async(self.url, self.filename, sha256=sha256)
+        return result.addCallback(self.assertDownloaded)
+
+    def test_checksum_mismatch(self):
+        """
+        A download not matching the expected checksum is thrown away, rather
+        than put in place.
+        """
+        sha256 = hashlib.sha256(b"other data").hexdigest()
+        result = fetch_to_file_async(self.url, self.filename, sha256=sha256)
+        self.assertFailure(result, ChecksumError)
+
+        def check(error):
+            self.assertEqual(sha256, error.expected)
+            digest = hashlib.sha256(self.data).hexdigest()
+            self.assertEqual(digest, error.actual)
+            self.assertFalse(os.path.exists(self.filename))
+            self.assertFalse(os.path.exists(self.partial_filename))
+
+        return result.addCallback(check)
+
+    def test_checksum_after_resume(self):
+        """The checksum covers the whole content of a resumed download."""
+        sha256 = hashlib.sha256(self.data).hexdigest()
+        self.server.interruptions = [50000]
+        result = fetch_to_file_async(self.url, self.filename, sha256=sha256)
+        result.addErrback(lambda failure: failure.trap(PyCurlError))
+        result.addCallback(
+            lambda ignored: fetch_to_file_async(
+                self.url,
+                self.filename,
+                sha256=sha256,
+            ),
+        )
+        return result.addCallback(self.assertDownloaded)
@@ -0,0 +1,102 @@
+import os
+import unittest
+
+from twisted.internet.defer import Deferred
+from twisted.trial.unittest import TestCase
+
+from landscape.lib import testing
+from landscape.lib.filewatch import FileWatcher
+from landscape.lib.reactor import EventHandlingReactor
+from landscape.lib.testing import FakeReactor
+
+
+class PollingFileWatcherTest(testing.FSTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.reactor = FakeReactor()
+        self.watcher = FileWatcher(
+            self.reactor,
+            use_inotify=False,
+            delay=1,
+            poll_interval=10,
+        )
+        self.calls = []
+
+    def callback(self):
+        self.calls.append(True)
+
+    def test_no_inotify(self):
+        self.assertFalse(self.watcher.uses_inotify)
+
+    def test_created(self):
+        """Subscribers are called back after their file is created."""
+        filename = self.makeFile()
+        self.watcher.watch(filename, self.callback)
+        self.reactor.advance(11)
+        self.assertEqual([], self.calls)
+        self.makeFile(path=filename, content="data")
+        self.reactor.advance(9)
+        self.assertEqual([], self.calls)
+        self.reactor.advance(1)
+        self.assertEqual([True], self.calls)
+
+    def test_modified_and_deleted(self):
+        filename = self.makeFile("data")
+        self.watcher.watch(filename, self.callback)
+        self.makeFile(path=filename, content="more data")
+        self.reactor.advance(11)
+        os.remove(filename)
+        self.reactor.advance(11)
+        self.assertEqual([True, True], self.calls)
+
+    def test_directory(self):
+        """Changes to the files of a watched directory are reported."""
+        directory = self.makeDir()
+        self.watcher.watch(directory, self.callback)
+        self.makeFile(dirname=directory, basename="entry", content="")
+        self.reactor.advance(11)
+        self.assertEqual([True], self.calls)
+
+    def test_debounce(self):
+        """Changes to several files result in a single call back."""
+        filenames = [self.makeFile("data"), self.makeFile("data")]
+        for filename in filenames:
+            self.watcher.watch(filename, self.callback)
+        for filename in filenames:
+            self.makeFile(path=filename, content="more data")
+        self.reactor.advance(11)
+        self.assertEqual([True], self.calls)
+
+    def test_callback_error(self):
+        """Errors calling back subscribers are logged."""
+        filename = self.makeFile()
+        self.watcher.watch(filename, lambda: 1 / 0)
+        self.makeFile(path=filename, content="")
+        with self.assertLogs(level="ERROR") as logs:
+            self.reactor.advance(11)
+        self.assertIn("ZeroDivisionError", logs.output[0])
+
+    def test_stop(self):
+        filename = self.makeFile()
+        self.watcher.watch(filename, self.callback)
+        self.watcher.stop()
+        self.makeFile(path=filename, content="")
+        self.reactor.advance(11)
+        self.assertEqual([], self.calls)
+
+
+class INotifyFileWatcherTest(testing.FSTestCase, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.watcher = FileWatcher(EventHandlingReactor(), delay=0.01)
+        self.addCleanup(self.watcher.stop)
+        if not self.watcher.uses_inotify:
+            raise self.skipTest("inotify is unavailable")
+
+    def test_created(self):
+        """Changes are notified as soon as they happen."""
+        filename = self.makeFile()
+        called = Deferred()
+        self.watcher.watch(filename, lambda: called.callback(None))
+        self.makeFile(path=filename, content="data")
+        return called
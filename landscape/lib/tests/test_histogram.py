@@ -0,0 +1,67 @@
+import unittest
+
+from landscape.lib.histogram import LatencyHistogram
+
+
+class LatencyHistogramTest(unittest.TestCase):
+    def test_empty(self):
+        histogram = LatencyHistogram()
+        self.assertEqual(0, histogram.count)
+        self.assertEqual(0.0, histogram.mean)
+        self.assertIsNone(histogram.percentile(50))
+
+    def test_add(self):
+        histogram = LatencyHistogram(bounds=(0.01, 0.1, 1))
+        histogram.add(0.005)
+        histogram.add(0.05)
+        histogram.add(0.1)
+        histogram.add(3)
+        self.assertEqual([1, 2, 0, 1], histogram.counts)
+        self.assertEqual(4, histogram.count)
+        self.assertEqual(3, histogram.max)
+        self.assertAlmostEqual(3.155 / 4, histogram.mean)
+
+    def test_add_negative(self):
+        """Negative latencies, due to clock changes, count as zero."""
+        histogram = LatencyHistogram(bounds=(0.01, 0.1))
+        histogram.add(-5)
+        self.assertEqual([1, 0, 0], histogram.counts)
+        self.assertEqual(0, histogram.total)
+
+    def test_percentile(self):
+        """
+        Percentiles are approximated by the upper bound of their bucket.
+        """
+        histogram = LatencyHistogram(bounds=(0.01, 0.1, 1))
+        for i in range(90):
+            histogram.add(0.005)
+        for i in range(10):
+            histogram.add(0.5)
+        self.assertEqual(0.01, histogram.percentile(50))
+        self.assertEqual(0.01, histogram.percentile(90))
+        self.assertEqual(0.5, histogram.percentile(99))
+
+    def test_percentile_overflow(self):
+        """
+        Percentiles past the last bucket are approximated by the maximum.
+        """
+        histogram = LatencyHistogram(bounds=(0.01,))
+        histogram.add(0.005)
+        histogram.add(42)
+        self.assertEqual(42, histogram.percentile(99))
+
+    def test_get_summary(self):
+        histogram = LatencyHistogram(bounds=(0.01, 0.1))
+        histogram.add(0.02)
+        self.assertEqual(
+            {
+                "count": 1,
+                "mean": 0.02,
+                "max": 0.02,
+                "p50": 0.02,
+                "p90": 0.02,
+                "p99": 0.02,
+                "buckets": [0, 1, 0],
+            },
+            histogram.get_summary(),
+        )
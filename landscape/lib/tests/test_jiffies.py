@@ -0,0 +1,26 @@
+import unittest
+from unittest import mock
+
+from landscape.lib.jiffies import detect_jiffies
+
+
+class DetectJiffiesTest(unittest.TestCase):
+    @mock.patch("landscape.lib.jiffies.measure_jiffies")
+    @mock.patch("os.sysconf", return_value=250)
+    def test_detect_jiffies(self, sysconf, measure_jiffies):
+        """
+        The number of jiffies per second is the clock ticks rate, without
+        having to fork processes to measure it.
+        """
+        self.assertEqual(250, detect_jiffies())
+        sysconf.assert_called_once_with("SC_CLK_TCK")
+        measure_jiffies.assert_not_called()
+
+    @mock.patch("landscape.lib.jiffies.measure_jiffies", return_value=100)
+    @mock.patch("os.sysconf", side_effect=ValueError())
+    def test_detect_jiffies_measured(self, sysconf, measure_jiffies):
+        """
+        The jiffies are measured if the clock ticks rate isn't available.
+        """
+        self.assertEqual(100, detect_jiffies())
+        measure_jiffies.assert_called_once_with()
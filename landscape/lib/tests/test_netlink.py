@@ -0,0 +1,202 @@
+import errno
+import socket
+import struct
+import unittest
+from unittest.mock import patch
+
+from landscape.lib import netlink
+from landscape.lib.netlink import get_interfaces
+
+
+def attribute(kind, value):
+    data = struct.pack("=HH", 4 + len(value), kind) + value
+    return data + b"\0" * (-len(data) % 4)
+
+
+def message(kind, body, sequence):
+    return struct.pack("=IHHII", 16 + len(body), kind, 2, sequence, 0) + body
+
+
+def link_message(index, name, flags, address, carrier_changes=None):
+    body = struct.pack("=BxHiII", 0, 1, index, flags, 0)
+    body += attribute(netlink.IFLA_IFNAME, name.encode() + b"\0")
+    body += attribute(netlink.IFLA_ADDRESS, address)
+    if carrier_changes is not None:
+        body += attribute(
+            netlink.IFLA_CARRIER_CHANGES,
+            struct.pack("=I", carrier_changes),
+        )
+    return message(16, body, 1)
+
+
+def address_message(index, family, prefixlen, attributes):
+    body = struct.pack("=BBBBI", family, prefixlen, 0, 0, index)
+    for kind, value in attributes:
+        body += attribute(kind, value)
+    return message(20, body, 2)
+
+
+class FakeSocket:
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.sent = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def bind(self, address):
+        pass
+
+    def sendall(self, data):
+        self.sent.append(data)
+
+    def recv(self, size):
+        return self.answers.pop(0)
+
+
+class GetInterfacesTest(unittest.TestCase):
+    def get_interfaces(self, answers):
+        self.socket = FakeSocket(answers)
+        with patch("socket.socket", return_value=self.socket):
+            return get_interfaces()
+
+    def test_get_interfaces(self):
+        """
+        The links and addresses are parsed from the answers to a dump
+        request of each.
+        """
+        ipv4 = socket.inet_pton(socket.AF_INET, "192.168.0.50")
+        broadcast = socket.inet_pton(socket.AF_INET, "192.168.0.255")
+        ipv6 = socket.inet_pton(socket.AF_INET6, "2001::1")
+        links, addresses = self.get_interfaces(
+            [
+                link_message(1, "lo", 0x49, b"\0" * 6)
+                + link_message(
+                    2,
+                    "eth0",
+                    0x1043,
+                    b"\xaa\xbb\xcc\xdd\xee\xf0",
+                    3,
+                ),
+                message(netlink.NLMSG_DONE, b"\0" * 4, 1),
+                address_message(
+                    2,
+                    socket.AF_INET,
+                    24,
+                    [
+                        (netlink.IFA_ADDRESS, ipv4),
+                        (netlink.IFA_LOCAL, ipv4),
+                        (netlink.IFA_LABEL, b"eth0:1\0"),
+                        (netlink.IFA_BROADCAST, broadcast),
+                    ],
+                )
+                + address_message(2, socket.AF_INET6, 64, [(1, ipv6)])
+                + message(netlink.NLMSG_DONE, b"\0" * 4, 2),
+            ],
+        )
+        self.assertEqual(
+            [
+                (1, "lo", 0x49, "00:00:00:00:00:00", None),
+                (2, "eth0", 0x1043, "aa:bb:cc:dd:ee:f0", 3),
+            ],
+            [
+                (
+                    link.index,
+                    link.name,
+                    link.flags,
+                    link.address,
+                    link.carrier_changes,
+                )
+                for link in links
+            ],
+        )
+        self.assertEqual(
+            [
+                (
+                    2,
+                    socket.AF_INET,
+                    "192.168.0.50",
+                    24,
+                    "192.168.0.255",
+                    "eth0:1",
+                ),
+                (2, socket.AF_INET6, "2001::1", 64, None, None),
+            ],
+            [
+                (
+                    address.index,
+                    address.family,
+                    address.address,
+                    address.prefixlen,
+                    address.destination,
+                    address.label,
+                )
+                for address in addresses
+            ],
+        )
+        self.assertEqual(
+            [netlink.RTM_GETLINK, netlink.RTM_GETADDR],
+            [struct.unpack_from("=IH", sent)[1] for sent in self.socket.sent],
+        )
+
+    def test_peer(self):
+        """
+        The remote address of point-to-point links is reported as the
+        destination of the local address.
+        """
+        local = socket.inet_pton(socket.AF_INET, "10.0.0.1")
+        peer = socket.inet_pton(socket.AF_INET, "10.0.0.2")
+        links, [address] = self.get_interfaces(
+            [
+                message(netlink.NLMSG_DONE, b"\0" * 4, 1),
+                address_message(
+                    3,
+                    socket.AF_INET,
+                    32,
+                    [(netlink.IFA_ADDRESS, peer), (netlink.IFA_LOCAL, local)],
+                )
+                + message(netlink.NLMSG_DONE, b"\0" * 4, 2),
+            ],
+        )
+        self.assertEqual("10.0.0.1", address.address)
+        self.assertEqual("10.0.0.2", address.destination)
+
+    def test_other_messages_skipped(self):
+        """
+        Messages answering other requests, and addresses of other families,
+        are skipped.
+        """
+        links, addresses = self.get_interfaces(
+            [
+                message(16, b"\0" * 16, 7)
+                + message(netlink.NLMSG_DONE, b"\0" * 4, 1),
+                address_message(1, socket.AF_PACKET, 0, [])
+                + message(netlink.NLMSG_DONE, b"\0" * 4, 2),
+            ],
+        )
+        self.assertEqual(([], []), (links, addresses))
+
+    def test_error(self):
+        """Errors answered by the kernel are raised."""
+        with self.assertRaises(OSError) as context:
+            self.get_interfaces(
+                [
+                    message(
+                        netlink.NLMSG_ERROR,
+                        struct.pack("=i", -errno.EPERM),
+                        1,
+                    ),
+                ],
+            )
+        self.assertEqual(errno.EPERM, context.exception.errno)
+
+    def test_system(self):
+        """The loopback interface is dumped on Linux systems."""
+        try:
+            links, addresses = get_interfaces()
+        except OSError as e:
+            self.skipTest(f"netlink is unavailable: {e}")
+        self.assertIn("lo", [link.name for link in links])
@@ -16,9 +16,13 @@ from netifaces import ifaddresses as _ifaddresses
 from netifaces import interfaces as _interfaces
 
 from landscape.lib import testing
+from landscape.lib.netlink import Address
+from landscape.lib.netlink import Link
+from landscape.lib.network import _speeds
 from landscape.lib.network import get_active_device_info
 from landscape.lib.network import get_filtered_if_info
 from landscape.lib.network import get_fqdn
+from landscape.lib.network import get_netlink_interfaces
 from landscape.lib.network import get_network_interface_speed
 from landscape.lib.network import get_network_traffic
 from landscape.lib.network import is_up
@@ -29,6 +33,16 @@ class BaseTestCase(testing.HelperTestCase, unittest.TestCase):
 
 
 class NetworkInfoTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        # Exercise the netifaces fallback, which these tests mock.
+        patcher = patch(
+            "landscape.lib.network.get_netlink_interfaces",
+            side_effect=OSError("netlink is unavailable"),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
     @skipIf(
         not get_active_device_info(extended=False),
         "no active network devices",
@@ -444,6 +458,216 @@ class NetworkInfoTest(BaseTestCase):
         self.assertTrue(all("tap" not in i["interface"] for i in device_info))
 
 
+class NetlinkNetworkInfoTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.links = [
+            Link(1, "lo", 0x10049, "00:00:00:00:00:00", "00:00:00:00:00:00"),
+            Link(
+                2, "eth0", 0x11043, "aa:bb:cc:dd:ee:f0", "ff:ff:ff:ff:ff:ff", 1
+            ),
+        ]
+        self.addresses = [
+            Address(1, socket.AF_INET, "127.0.0.1", 8, "127.0.0.1", "lo"),
+            Address(
+                2, socket.AF_INET, "192.168.0.50", 24, "192.168.0.255", "eth0"
+            ),
+            Address(2, socket.AF_INET, "192.168.1.50", 24, None, "eth0:1"),
+            Address(2, socket.AF_INET6, "2001::1", 64),
+            Address(2, socket.AF_INET6, "fe80::1", 64),
+        ]
+        patcher = patch(
+            "landscape.lib.netlink.get_interfaces",
+            side_effect=lambda: (self.links, self.addresses),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch(
+            "landscape.lib.network.get_network_interface_speed",
+            return_value=(100, True),
+        )
+        self.get_speed = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(_speeds.clear)
+
+    def test_get_netlink_interfaces(self):
+        """
+        The netlink dump is converted to the format of L{netifaces}, with the
+        IPv4 aliases as interfaces of their own.
+        """
+        interfaces = get_netlink_interfaces()
+        self.assertEqual(
+            [
+                (
+                    "lo",
+                    {
+                        AF_LINK: [
+                            {
+                                "addr": "00:00:00:00:00:00",
+                                "peer": "00:00:00:00:00:00",
+                            },
+                        ],
+                        AF_INET: [
+                            {
+                                "addr": "127.0.0.1",
+                                "netmask": "255.0.0.0",
+                                "peer": "127.0.0.1",
+                            },
+                        ],
+                    },
+                ),
+                (
+                    "eth0",
+                    {
+                        AF_LINK: [
+                            {
+                                "addr": "aa:bb:cc:dd:ee:f0",
+                                "broadcast": "ff:ff:ff:ff:ff:ff",
+                            },
+                        ],
+                        AF_INET: [
+                            {
+                                "addr": "192.168.0.50",
+                                "netmask": "255.255.255.0",
+                                "broadcast": "192.168.0.255",
+                            },
+                        ],
+                        AF_INET6: [
+                            {
+                                "addr": "2001::1",
+                                "netmask": "ffff:ffff:ffff:ffff::/64",
+                            },
+                            {
+                                "addr": "fe80::1%eth0",
+                                "netmask": "ffff:ffff:ffff:ffff::/64",
+                            },
+                        ],
+                    },
+                ),
+                (
+                    "eth0:1",
+                    {
+                        AF_INET: [
+                            {
+                                "addr": "192.168.1.50",
+                                "netmask": "255.255.255.0",
+                            },
+                        ],
+                    },
+                ),
+            ],
+            [
+                (interface, ifaddresses)
+                for interface, _, ifaddresses in interfaces
+            ],
+        )
+        self.assertIs(self.links[1], interfaces[2][1])
+
+    def test_get_active_device_info(self):
+        device_info = get_active_device_info(extended=True)
+        self.assertEqual(
+            [
+                {
+                    "interface": "eth0",
+                    "ip_address": "192.168.0.50",
+                    "mac_address": "aa:bb:cc:dd:ee:f0",
+                    "broadcast_address": "192.168.0.255",
+                    "netmask": "255.255.255.0",
+                    "ip_addresses": {
+                        AF_INET: [
+                            {
+                                "addr": "192.168.0.50",
+                                "netmask": "255.255.255.0",
+                                "broadcast": "192.168.0.255",
+                            },
+                        ],
+                        AF_INET6: [
+                            {
+                                "addr": "2001::1",
+                                "netmask": "ffff:ffff:ffff:ffff::/64",
+                            },
+                        ],
+                    },
+                    "flags": 4163,
+                    "speed": 100,
+                    "duplex": True,
+                },
+            ],
+            device_info,
+        )
+        self.get_speed.assert_called_once_with(ANY, b"eth0")
+
+    def test_filtered_interfaces_not_queried(self):
+        """The speed of the filtered out interfaces isn't queried."""
+        get_filtered_if_info(filters=(lambda interface: True,))
+        self.get_speed.assert_not_called()
+
+    def test_speed_cached(self):
+        """
+        The speed of the interfaces is only queried again after their link
+        changed, and aliases share the speed of their interface.
+        """
+        get_filtered_if_info()
+        get_filtered_if_info()
+        self.assertEqual(2, self.get_speed.call_count)
+        self.links[1].carrier_changes = 2
+        get_filtered_if_info()
+        self.assertEqual(3, self.get_speed.call_count)
+        self.links[1].flags = 0x1002
+        get_filtered_if_info()
+        self.assertEqual(4, self.get_speed.call_count)
+
+    def test_speed_forgotten(self):
+        """The speed of the interfaces which went away is forgotten."""
+        get_filtered_if_info()
+        self.assertIn("eth0", _speeds)
+        del self.links[1]
+        get_filtered_if_info()
+        self.assertNotIn("eth0", _speeds)
+
+    def test_netlink_unavailable(self):
+        """Interfaces are listed with L{netifaces} when netlink fails."""
+        with patch(
+            "landscape.lib.netlink.get_interfaces",
+            side_effect=OSError("netlink is unavailable"),
+        ), patch(
+            "landscape.lib.network.get_flags",
+            return_value=4163,
+        ), patch(
+            "landscape.lib.network.netifaces.interfaces",
+            return_value=["test_iface"],
+        ), patch(
+            "landscape.lib.network.netifaces.ifaddresses",
+            return_value={AF_INET: [{"addr": "192.168.0.50"}]},
+        ):
+            device_info = get_active_device_info()
+        self.assertEqual(["test_iface"], [i["interface"] for i in device_info])
+
+
+class NetlinkSystemTest(BaseTestCase):
+    @patch("landscape.lib.network.get_network_interface_speed")
+    def test_same_as_netifaces(self, mock_get_network_interface_speed):
+        """
+        The interfaces dumped with netlink are reported the same as the ones
+        listed with L{netifaces}.
+        """
+        mock_get_network_interface_speed.return_value = (100, True)
+        self.addCleanup(_speeds.clear)
+        try:
+            get_netlink_interfaces()
+        except OSError as e:
+            self.skipTest(f"netlink is unavailable: {e}")
+        device_info = get_filtered_if_info(extended=True)
+        with patch(
+            "landscape.lib.network.get_netlink_interfaces",
+            side_effect=OSError("netlink is unavailable"),
+        ):
+            self.assertEqual(
+                get_filtered_if_info(extended=True),
+                device_info,
+            )
+
+
 # exact output of cat /proc/net/dev snapshot with line continuations for pep8
 test_proc_net_dev_output = """\
 Inter-|   Receive                                                |  Transmit
@@ -0,0 +1,104 @@
+import os
+import pstats
+import sys
+import unittest
+
+from landscape.lib import testing
+from landscape.lib.profiler import start_profiling
+from landscape.lib.profiler import StackSampler
+from landscape.lib.testing import FakeReactor
+
+
+def busy():
+    return sum(i * i for i in range(1000))
+
+
+class StartProfilingTest(testing.FSTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.reactor = FakeReactor()
+        self.directory = self.makeDir()
+
+    def test_cprofile(self):
+        """
+        In C{cprofile} mode, the function calls are traced and written in
+        the pstats format once the profile is over.
+        """
+        filename = start_profiling(self.reactor, self.directory, "monitor", 10)
+        self.assertEqual(self.directory, os.path.dirname(filename))
+        self.assertTrue(os.path.basename(filename).startswith("monitor-"))
+        self.assertTrue(filename.endswith(".pstats"))
+        busy()
+        self.reactor.advance(9)
+        self.assertFalse(os.path.exists(filename))
+        self.reactor.advance(1)
+        stats = pstats.Stats(filename)
+        self.assertIn(
+            "busy",
+            [function for _, _, function in stats.stats.keys()],
+        )
+
+    def test_sample(self):
+        filename = start_profiling(
+            self.reactor,
+            self.directory,
+            "broker",
+            mode="sample",
+        )
+        self.assertTrue(filename.endswith(".collapsed"))
+        self.reactor.advance(30)
+        self.assertTrue(os.path.exists(filename))
+
+    def test_already_profiling(self):
+        """Only one profile can run at a time."""
+        filename = start_profiling(self.reactor, self.directory, "broker")
+        self.assertIsNone(
+            start_profiling(self.reactor, self.directory, "monitor"),
+        )
+        self.reactor.advance(30)
+        self.assertTrue(os.path.exists(filename))
+        self.assertIsNotNone(
+            start_profiling(self.reactor, self.directory, "monitor"),
+        )
+        self.reactor.advance(30)
+
+    def test_unknown_mode(self):
+        self.assertRaises(
+            ValueError,
+            start_profiling,
+            self.reactor,
+            self.directory,
+            "broker",
+            mode="magic",
+        )
+
+    def test_write_error(self):
+        """Errors writing the profile are logged."""
+        directory = os.path.join(self.directory, "missing")
+        with self.assertLogs(level="ERROR") as logs:
+            start_profiling(self.reactor, directory, "broker")
+            self.reactor.advance(30)
+        self.assertIn("Couldn't write the profile", logs.output[0])
+
+
+class StackSamplerTest(testing.FSTestCase, unittest.TestCase):
+    def test_sample(self):
+        """
+        Samples count the stacks they are taken in, outermost frame first.
+        """
+        sampler = StackSampler()
+        for i in range(2):
+            sampler.sample(None, sys._getframe())
+        [(stack, count)] = sampler.stacks.items()
+        self.assertEqual(2, count)
+        self.assertIn(";test_sample (", stack)
+        self.assertTrue(stack.split(";")[-1].startswith("test_sample ("))
+
+    def test_dump(self):
+        sampler = StackSampler()
+        sampler.stacks["main;run"] = 3
+        sampler.stacks["main;run;busy"] = 5
+        filename = self.makeFile()
+        sampler.dump(filename)
+        with open(filename) as collapsed:
+            self.assertEqual("main;run;busy 5\nmain;run 3\n", collapsed.read())
@@ -1,6 +1,11 @@
+import logging
 import time
 import types
 import unittest
+from unittest import mock
+
+from twisted.internet.task import Clock
+from twisted.internet.task import LoopingCall
 
 from landscape.lib import testing
 from landscape.lib.compat import thread
@@ -101,6 +106,61 @@ class ReactorTestMixin:
         reactor.cancel_call(id)
         reactor.cancel_call(id)
 
+    def test_stats_disabled(self):
+        """The event handlers are only timed if the stats are enabled."""
+        reactor = self.get_reactor()
+        reactor.call_on("foobar", lambda: None)
+        reactor.fire("foobar")
+        self.assertIsNone(reactor.stats)
+
+    def test_stats(self):
+        reactor = self.get_reactor()
+        reactor.enable_stats()
+        times = iter([0, 1, 3, 4, 7, 10])
+        reactor.stats.get_time = lambda: next(times)
+
+        def handle_foobar():
+            pass
+
+        reactor.call_on("foobar", handle_foobar)
+        reactor.call_on("foobar", lambda: 1 / 0)
+        self.log_helper.ignore_errors(ZeroDivisionError)
+        reactor.fire("foobar")
+
+        summary = reactor.stats.get_summary()
+        self.assertEqual(
+            {"foobar": {"calls": 1, "total": 10, "max": 10}},
+            summary["events"],
+        )
+        handlers = summary["handlers"]
+        self.assertEqual(2, len(handlers))
+        [handler_name] = [name for name in handlers if "handle_foobar" in name]
+        self.assertTrue(handler_name.startswith("foobar: "))
+        self.assertEqual(
+            {"calls": 1, "total": 2, "max": 2},
+            handlers[handler_name],
+        )
+        # Failing handlers are timed too
+        self.assertIn({"calls": 1, "total": 3, "max": 3}, handlers.values())
+
+    def test_fire_without_debug_logging(self):
+        """
+        Event handlers are not formatted for logging when debug logging is
+        disabled.
+        """
+        reactor = self.get_reactor()
+        reactor.call_on("foobar", lambda: None)
+        logger = logging.getLogger()
+        level = logger.level
+        self.addCleanup(logger.setLevel, level)
+        logger.setLevel(logging.INFO)
+        with mock.patch("landscape.lib.reactor.format_object") as format:
+            reactor.fire("foobar")
+            format.assert_not_called()
+            logger.setLevel(logging.DEBUG)
+            reactor.fire("foobar")
+            format.assert_called_once()
+
     def test_reactor_doesnt_leak(self):
         reactor = self.get_reactor()
         called = []
@@ -458,3 +518,42 @@ class EventHandlingReactorTest(
     def test_real_time(self):
         reactor = self.get_reactor()
         self.assertTrue(reactor.time() - time.time() < 3)
+
+    def test_call_every_lag(self):
+        """
+        With stats enabled, the lag of the functions run by C{call_every}
+        is recorded.
+        """
+        reactor = self.get_reactor()
+        reactor.enable_stats()
+        called = []
+        reactor.call_every(0.01, called.append, "hi")
+        reactor.call_later(0.2, reactor.stop)
+        reactor.run()
+        self.assertEqual(len(called), reactor.stats.lag.count)
+        self.assertTrue(reactor.stats.lag.max < 0.01)
+
+    def test_call_every_lag_longer_than_interval(self):
+        """
+        The lag of the functions run by C{call_every} is the time since they
+        were due, even when it's longer than the interval.
+        """
+        reactor = self.get_reactor()
+        reactor.enable_stats()
+        clock = Clock()
+
+        def looping_call(*args, **kwargs):
+            call = LoopingCall(*args, **kwargs)
+            call.clock = clock
+            return call
+
+        reactor._LoopingCall = looping_call
+        called = []
+        reactor.call_every(10, called.append, "hi")
+        clock.advance(35)
+        self.assertEqual(1, reactor.stats.lag.count)
+        self.assertEqual(25, reactor.stats.lag.max)
+        clock.advance(5)
+        self.assertEqual(["hi", "hi"], called)
+        self.assertEqual(2, reactor.stats.lag.count)
+        self.assertEqual(25, reactor.stats.lag.max)
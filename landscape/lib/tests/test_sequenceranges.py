@@ -4,6 +4,7 @@ from landscape.lib.sequenceranges import add_to_ranges
 from landscape.lib.sequenceranges import find_ranges_index
 from landscape.lib.sequenceranges import ranges_to_sequence
 from landscape.lib.sequenceranges import remove_from_ranges
+from landscape.lib.sequenceranges import SequenceBitmap
 from landscape.lib.sequenceranges import sequence_to_ranges
 from landscape.lib.sequenceranges import SequenceError
 from landscape.lib.sequenceranges import SequenceRanges
@@ -111,6 +112,121 @@ class SequenceToRangesTest(unittest.TestCase):
         self.assertRaises(SequenceError, next, sequence_to_ranges([1, 1]))
 
 
+class SequenceBitmapTest(unittest.TestCase):
+    def setUp(self):
+        self.ranges = [1, 2, (15, 17), 19, (21, 24), 26, 27]
+        self.sequence = [1, 2, 15, 16, 17, 19, 21, 22, 23, 24, 26, 27]
+
+    def test_empty(self):
+        bitmap = SequenceBitmap()
+        self.assertEqual(bitmap.to_sequence(), [])
+        self.assertEqual(bitmap.to_ranges(), [])
+        self.assertEqual(len(bitmap), 0)
+        self.assertFalse(bitmap)
+
+    def test_from_sequence(self):
+        bitmap = SequenceBitmap(self.sequence)
+        self.assertEqual(bitmap.to_sequence(), self.sequence)
+        self.assertEqual(bitmap.to_ranges(), self.ranges)
+        self.assertEqual(len(bitmap), len(self.sequence))
+
+    def test_from_unordered_sequence(self):
+        """Unlike L{sequence_to_ranges}, any order and duplicates are fine."""
+        bitmap = SequenceBitmap([27, 1, 1, 2, 0])
+        self.assertEqual(bitmap.to_sequence(), [0, 1, 2, 27])
+
+    def test_from_ranges(self):
+        bitmap = SequenceBitmap.from_ranges(self.ranges)
+        self.assertEqual(bitmap.to_sequence(), self.sequence)
+        self.assertEqual(bitmap, SequenceBitmap(self.sequence))
+
+    def test_from_ranges_across_bytes(self):
+        bitmap = SequenceBitmap.from_ranges([(3, 30), (40, 41), 63, 64])
+        self.assertEqual(
+            bitmap.to_sequence(),
+            list(range(3, 31)) + [40, 41, 63, 64],
+        )
+
+    def test_from_ranges_invalid_range(self):
+        self.assertRaises(
+            SequenceError,
+            SequenceBitmap.from_ranges,
+            [(3, 1)],
+        )
+
+    def test_negative_item(self):
+        self.assertRaises(SequenceError, SequenceBitmap, [1, -1])
+
+    def test_to_ranges_matches_sequence_to_ranges(self):
+        sequence = [0, 7, 8, 9, 100, 101, 103, 104, 105, 106, 1000]
+        self.assertEqual(
+            SequenceBitmap(sequence).to_ranges(),
+            list(sequence_to_ranges(sequence)),
+        )
+
+    def test_iter(self):
+        self.assertEqual(list(SequenceBitmap(self.sequence)), self.sequence)
+
+    def test_sparse(self):
+        """
+        Items far apart, with long runs of zero bytes between them, are
+        all found.
+        """
+        sequence = [0, 255, 256, 3 * 10**6, 3 * 10**6 + 1, 3 * 10**7]
+        bitmap = SequenceBitmap(sequence)
+        self.assertEqual(sequence, list(bitmap))
+        self.assertEqual(6, len(bitmap))
+        self.assertEqual(
+            [0, 255, 256, 3 * 10**6, 3 * 10**6 + 1, 3 * 10**7],
+            bitmap.to_ranges(),
+        )
+        self.assertEqual(
+            [3 * 10**6, 3 * 10**7],
+            list(bitmap - SequenceBitmap([0, 255, 256, 3 * 10**6 + 1])),
+        )
+
+    def test_contains(self):
+        bitmap = SequenceBitmap(self.sequence)
+        for item in self.sequence:
+            self.assertIn(item, bitmap)
+        self.assertNotIn(0, bitmap)
+        self.assertNotIn(18, bitmap)
+        self.assertNotIn(-1, bitmap)
+        self.assertNotIn(1000, bitmap)
+
+    def test_set_operations(self):
+        first = SequenceBitmap([1, 2, 3, 10])
+        second = SequenceBitmap([3, 10, 11])
+        self.assertEqual((first | second).to_sequence(), [1, 2, 3, 10, 11])
+        self.assertEqual((first & second).to_sequence(), [3, 10])
+        self.assertEqual((first - second).to_sequence(), [1, 2])
+        self.assertEqual((first ^ second).to_sequence(), [1, 2, 11])
+
+    def test_dumps_and_loads(self):
+        bitmap = SequenceBitmap(range(0, 100000, 3))
+        data = bitmap.dumps()
+        self.assertIsInstance(data, bytes)
+        self.assertEqual(SequenceBitmap.loads(data), bitmap)
+        self.assertFalse(SequenceBitmap.loads(SequenceBitmap().dumps()))
+
+    def test_dumps_is_compact(self):
+        """A dense set of ids is serialized in a handful of bytes."""
+        data = SequenceBitmap(range(100000)).dumps()
+        self.assertTrue(len(data) < 1000)
+
+    def test_dumps_run_length(self):
+        """
+        Runs of consecutive ids are encoded by their length, whatever the
+        value of the ids.
+        """
+        bitmap = SequenceBitmap.from_ranges(
+            [(10**6, 2 * 10**6), 3 * 10**6]
+        )
+        data = bitmap.dumps()
+        self.assertTrue(len(data) < 32)
+        self.assertEqual(SequenceBitmap.loads(data), bitmap)
+
+
 class RangesToSequenceTest(unittest.TestCase):
     def test_empty(self):
         self.assertEqual(list(ranges_to_sequence([])), [])
@@ -300,6 +416,7 @@ def test_suite():
             unittest.makeSuite(SequenceToRangesTest),
             unittest.makeSuite(RangesToSequenceTest),
             unittest.makeSuite(SequenceRangesTest),
+            unittest.makeSuite(SequenceBitmapTest),
             unittest.makeSuite(FindRangesIndexTest),
             unittest.makeSuite(AddToRangesTest),
             unittest.makeSuite(RemoveFromRangesTest),
@@ -0,0 +1,89 @@
+import os
+import sys
+import unittest
+
+from landscape.lib import testing
+from landscape.lib.startup import StartupTrace
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class StartupTraceTest(testing.FSTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.time = FakeTime()
+        self.trace = StartupTrace(get_time=self.time)
+
+    def test_phase(self):
+        with self.trace.phase("configuration"):
+            self.time.now = 2
+        self.trace.record_phase("plugins", 0.5)
+        self.assertEqual(
+            [("configuration", 2), ("plugins", 0.5)],
+            self.trace.phases,
+        )
+
+    def test_timing_import(self):
+        """
+        The time spent importing a module excludes the time spent importing
+        the modules it imports.
+        """
+        with self.trace.timing_import("outer"):
+            self.time.now = 1
+            with self.trace.timing_import("inner"):
+                self.time.now = 4
+        self.assertEqual({"outer": 1, "inner": 3}, self.trace.imports)
+        self.assertEqual(
+            [("inner", 3), ("outer", 1)],
+            self.trace.get_slowest_imports(),
+        )
+
+    def test_trace_imports(self):
+        """The modules imported while tracing are recorded."""
+        directory = self.makeDir()
+        self.makeFile("import json\n", dirname=directory, basename="traced.py")
+        sys.path.insert(0, directory)
+        self.addCleanup(sys.path.remove, directory)
+        self.addCleanup(sys.modules.pop, "traced", None)
+        trace = StartupTrace()
+        trace.trace_imports()
+        self.addCleanup(trace.stop_tracing_imports)
+        import traced
+
+        trace.stop_tracing_imports()
+        self.assertIn("traced", trace.imports)
+        self.assertEqual(
+            os.path.join(directory, "traced.py"),
+            traced.__file__,
+        )
+
+    def test_finish(self):
+        """
+        Finishing the trace logs it, only the first time, and stops tracing
+        the imports.
+        """
+        self.trace.record_phase("service", 1.5)
+        self.trace.imports["landscape.client.broker"] = 0.25
+        self.time.now = 3
+        with self.assertLogs(level="INFO") as logs:
+            self.trace.trace_imports()
+            [timer] = sys.meta_path[:1]
+            self.trace.finish()
+        self.assertNotIn(timer, sys.meta_path)
+        self.assertEqual(
+            [
+                "INFO:root:Startup took 3.000s: service 1.500s",
+                "INFO:root:Imported 1 modules in 0.250s, the slowest being: "
+                "landscape.client.broker 0.250s",
+            ],
+            logs.output,
+        )
+        self.time.now = 5
+        self.trace.finish()
+        self.assertEqual(3, self.trace.finished)
@@ -0,0 +1,148 @@
+import sqlite3
+import unittest
+
+from landscape.lib import testing
+from landscape.lib.store import connect
+from landscape.lib.store import get_transaction_stats
+from landscape.lib.store import transaction
+from landscape.lib.store import with_cursor
+
+
+class Item:
+    def __init__(self, db, id):
+        self._db = db
+        self.id = id
+
+    @with_cursor
+    def remove(self, cursor):
+        cursor.execute("DELETE FROM item WHERE id=?", (self.id,))
+
+
+class ItemStore:
+    _db = None
+
+    def __init__(self, filename, journal_mode=None):
+        self._filename = filename
+        self._journal_mode = journal_mode
+
+    def _ensure_schema(self):
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS item (id INTEGER PRIMARY KEY)",
+        )
+
+    @with_cursor
+    def add_item(self, cursor, id):
+        cursor.execute("INSERT INTO item VALUES (?)", (id,))
+        return Item(self._db, id)
+
+    @with_cursor
+    def get_items(self, cursor):
+        cursor.execute("SELECT id FROM item ORDER BY id")
+        return [row[0] for row in cursor.fetchall()]
+
+
+class StoreTest(testing.FSTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.filename = self.makeFile()
+        self.store = ItemStore(self.filename)
+        self.other_store = ItemStore(self.filename)
+
+    def test_with_cursor_commits(self):
+        """Each call to a L{with_cursor} method is its own transaction."""
+        self.store.add_item(1)
+        self.store.add_item(2)
+        self.assertEqual([1, 2], self.other_store.get_items())
+        stats = get_transaction_stats(self.store)
+        self.assertEqual(2, stats.transactions)
+        self.assertTrue(stats.seconds > 0)
+
+    def test_get_transaction_stats_not_connected(self):
+        stats = get_transaction_stats(self.store)
+        self.assertEqual(0, stats.transactions)
+        self.assertEqual(0, stats.seconds)
+
+    def test_transaction(self):
+        """
+        All the calls made in a L{transaction} block are committed at once,
+        when leaving the block.
+        """
+        with transaction(self.store):
+            self.store.add_item(1)
+            self.store.add_item(2)
+            self.assertEqual([1, 2], self.store.get_items())
+            self.assertEqual([], self.other_store.get_items())
+        self.assertEqual([1, 2], self.other_store.get_items())
+        self.assertEqual(1, get_transaction_stats(self.store).transactions)
+
+    def test_transaction_rolls_back(self):
+        """
+        If the block raises an exception, none of its calls are committed.
+        """
+        self.store.add_item(1)
+        with self.assertRaises(ZeroDivisionError):
+            with transaction(self.store):
+                self.store.add_item(2)
+                1 / 0
+        self.assertEqual([1], self.store.get_items())
+        self.assertEqual(0, get_transaction_stats(self.store).depth)
+
+    def test_transaction_failing_call(self):
+        """
+        A failing call in a L{transaction} block doesn't roll back the calls
+        made before it, until the block is left.
+        """
+        with self.assertRaises(sqlite3.IntegrityError):
+            with transaction(self.store):
+                self.store.add_item(1)
+                self.assertRaises(
+                    sqlite3.IntegrityError,
+                    self.store.add_item,
+                    1,
+                )
+                self.assertEqual([1], self.store.get_items())
+                self.store.add_item(1)
+        self.assertEqual([], self.store.get_items())
+
+    def test_nested_transactions(self):
+        """Nested blocks are part of the outermost transaction."""
+        with transaction(self.store):
+            self.store.add_item(1)
+            with transaction(self.store):
+                self.store.add_item(2)
+            self.assertEqual([], self.other_store.get_items())
+        self.assertEqual([1, 2], self.other_store.get_items())
+        self.assertEqual(1, get_transaction_stats(self.store).transactions)
+
+    def test_transaction_shared_connection(self):
+        """
+        Objects sharing the connection of the store take part in the
+        transaction too.
+        """
+        item = self.store.add_item(1)
+        with transaction(self.store):
+            self.store.add_item(2)
+            item.remove()
+            self.assertEqual([1], self.other_store.get_items())
+        self.assertEqual([2], self.other_store.get_items())
+
+    def test_connect_pragmas(self):
+        db = connect(self.filename)
+        self.assertEqual(-8192, db.execute("PRAGMA cache_size").fetchone()[0])
+        self.assertEqual(
+            64 * 1024 * 1024,
+            db.execute("PRAGMA mmap_size").fetchone()[0],
+        )
+        self.assertEqual(
+            "delete",
+            db.execute("PRAGMA journal_mode").fetchone()[0],
+        )
+
+    def test_connect_journal_mode(self):
+        store = ItemStore(self.filename, journal_mode="wal")
+        store.add_item(1)
+        self.assertEqual(
+            "wal",
+            store._db.execute("PRAGMA journal_mode").fetchone()[0],
+        )
+        self.assertEqual([1], self.other_store.get_items())
@@ -0,0 +1,133 @@
+import unittest
+
+from landscape.lib.timeseries import KeyedTimeSeriesBuffer
+from landscape.lib.timeseries import TimeSeriesBuffer
+
+
+class TimeSeriesBufferTest(unittest.TestCase):
+    def test_empty(self):
+        buffer = TimeSeriesBuffer("qd")
+        self.assertEqual(0, len(buffer))
+        self.assertEqual([], buffer.pop())
+        self.assertEqual([], buffer)
+
+    def test_invalid_capacity(self):
+        self.assertRaises(ValueError, TimeSeriesBuffer, "qd", capacity=1)
+
+    def test_append_and_pop(self):
+        buffer = TimeSeriesBuffer("qd")
+        buffer.append((300, 1.5))
+        buffer.append((600, 0.5))
+        self.assertEqual(2, len(buffer))
+        self.assertEqual([(300, 1.5), (600, 0.5)], buffer.pop())
+        self.assertEqual(0, len(buffer))
+
+    def test_pop_count(self):
+        """
+        Only the requested number of oldest points is removed by C{pop}.
+        """
+        buffer = TimeSeriesBuffer("qq")
+        buffer.extend([(1, 10), (2, 20), (3, 30)])
+        self.assertEqual([(1, 10), (2, 20)], buffer.pop(2))
+        self.assertEqual([(3, 30)], buffer.pop(2))
+
+    def test_peek(self):
+        buffer = TimeSeriesBuffer("qq")
+        buffer.extend([(1, 10), (2, 20)])
+        self.assertEqual([(1, 10)], buffer.peek(1))
+        self.assertEqual(2, len(buffer))
+
+    def test_integer_columns(self):
+        """Integer typecodes give back C{int} values."""
+        buffer = TimeSeriesBuffer("qqq")
+        buffer.append((300, 1024, 2048))
+        [point] = buffer.pop()
+        self.assertEqual((300, 1024, 2048), point)
+        self.assertTrue(all(isinstance(value, int) for value in point))
+
+    def test_drop_oldest_without_downsampling(self):
+        """
+        Without downsampling, the oldest point is dropped when the buffer is
+        full.
+        """
+        buffer = TimeSeriesBuffer("qd", capacity=3, downsample=False)
+        buffer.extend([(1, 1.0), (2, 2.0), (3, 3.0), (4, 4.0)])
+        self.assertEqual([(2, 2.0), (3, 3.0), (4, 4.0)], buffer)
+
+    def test_wrap_around(self):
+        buffer = TimeSeriesBuffer("qd", capacity=3, downsample=False)
+        buffer.extend([(1, 1.0), (2, 2.0)])
+        buffer.pop(1)
+        buffer.extend([(3, 3.0), (4, 4.0)])
+        self.assertEqual([(2, 2.0), (3, 3.0), (4, 4.0)], buffer.pop())
+
+    def test_downsample(self):
+        """
+        With downsampling, the oldest half of a full buffer gets averaged
+        pairwise, keeping the timestamp of the most recent point of each
+        pair.
+        """
+        buffer = TimeSeriesBuffer("qd", capacity=4)
+        buffer.extend([(1, 1.0), (2, 3.0), (3, 5.0), (4, 7.0), (5, 9.0)])
+        self.assertEqual([(2, 2.0), (3, 5.0), (4, 7.0), (5, 9.0)], buffer)
+
+    def test_downsample_integers(self):
+        buffer = TimeSeriesBuffer("qqq", capacity=4)
+        buffer.extend([(1, 1, 10), (2, 2, 15), (3, 3, 0), (4, 4, 0)])
+        buffer.append((5, 5, 0))
+        self.assertEqual((2, 1, 12), buffer.peek(1)[0])
+
+    def test_downsample_weighted(self):
+        """
+        Points that already are averages weigh as much as the points they
+        were built from.
+        """
+        buffer = TimeSeriesBuffer("qd", capacity=2)
+        buffer.extend([(1, 3.0), (2, 3.0), (3, 0.0)])
+        self.assertEqual([(2, 3.0), (3, 0.0)], buffer)
+        buffer.append((4, 0.0))
+        self.assertEqual([(3, 2.0), (4, 0.0)], buffer)
+
+    def test_bounded(self):
+        """The buffer never holds more points than its capacity."""
+        buffer = TimeSeriesBuffer("qd", capacity=16)
+        for timestamp in range(1000):
+            buffer.append((timestamp, 1.0))
+            self.assertTrue(len(buffer) <= 16)
+        points = buffer.pop()
+        self.assertEqual((999, 1.0), points[-1])
+        self.assertEqual(sorted(points), points)
+
+
+class KeyedTimeSeriesBufferTest(unittest.TestCase):
+    def test_append(self):
+        buffer = KeyedTimeSeriesBuffer("qq")
+        buffer.append("eth0", (300, 1))
+        buffer.append("eth1", (300, 2))
+        self.assertEqual(2, len(buffer))
+        self.assertIn("eth0", buffer)
+        self.assertEqual([(300, 1)], buffer["eth0"])
+
+    def test_pop_in_timestamp_order(self):
+        """
+        Points of all keys are popped oldest first, regardless of the key
+        they belong to.
+        """
+        buffer = KeyedTimeSeriesBuffer("qq")
+        buffer.append("/", (300, 1))
+        buffer.append("/home", (300, 2))
+        buffer.append("/", (600, 3))
+        buffer.append("/home", (600, 4))
+        self.assertEqual(
+            [("/", (300, 1)), ("/home", (300, 2)), ("/", (600, 3))],
+            buffer.pop(3),
+        )
+        self.assertEqual([("/home", (600, 4))], buffer.pop())
+        self.assertEqual(0, len(buffer))
+
+    def test_discard(self):
+        buffer = KeyedTimeSeriesBuffer("qq")
+        buffer.append("eth0", (300, 1))
+        buffer.discard("eth0")
+        buffer.discard("eth1")
+        self.assertEqual(0, len(buffer))
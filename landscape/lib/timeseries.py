@@ -0,0 +1,224 @@
+"""Fixed-capacity storage for time series data points.
+
+Monitor plugins collect one data point per step interval and hold on to
+them until the server accepts the corresponding message type.  While the
+client is disconnected this can take a long time, so the points are kept
+in a L{TimeSeriesBuffer}, which stores them in compact C{array} columns
+and never grows beyond its capacity.
+
+When the buffer is full, it either drops the oldest point or, if
+downsampling is enabled, halves the resolution of its oldest half by
+averaging adjacent points.  Recent data is therefore always kept at full
+resolution, while older data gets progressively coarser instead of being
+lost.
+"""
+from array import array
+from heapq import merge
+
+#: Enough 5 minutes steps to cover a week of disconnection.
+DEFAULT_CAPACITY = 2016
+
+
+class TimeSeriesBuffer:
+    """Ring buffer of fixed-width data points.
+
+    Each point is a tuple whose first element is its timestamp.  The
+    point layout is described by C{typecodes}, one C{array} typecode per
+    element, for example C{"qd"} for C{(timestamp, float_value)} points.
+
+    When downsampling, two adjacent points are merged into a single point
+    carrying the timestamp of the most recent one and the mean of their
+    values, weighted by the number of original points each of them
+    represents.  Integer columns are truncated after averaging.
+
+    @param typecodes: The C{array} typecodes of the point elements.
+    @param capacity: The maximum number of points kept in the buffer.
+    @param downsample: Whether old points get averaged, rather than
+        dropped, when the buffer is full.
+    """
+
+    def __init__(self, typecodes, capacity=DEFAULT_CAPACITY, downsample=True):
+        if capacity < 2:
+            raise ValueError("A time series buffer needs a capacity of 2+")
+        self.capacity = capacity
+        self.downsample = downsample
+        self._columns = [
+            array(typecode, [0] * capacity) for typecode in typecodes
+        ]
+        self._integral = [typecode not in ("f", "d") for typecode in typecodes]
+        self._weights = array("L", [0] * capacity)
+        self._start = 0
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        for position in range(self._length):
+            yield self._get((self._start + position) % self.capacity)
+
+    def __eq__(self, other):
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self):
+        return f"<TimeSeriesBuffer {list(self)!r}>"
+
+    def append(self, point):
+        """Add a new point at the end of the buffer."""
+        if self._length == self.capacity:
+            if self.downsample:
+                self._compact()
+            else:
+                self._start = (self._start + 1) % self.capacity
+                self._length -= 1
+        index = (self._start + self._length) % self.capacity
+        self._set(index, point, 1)
+        self._length += 1
+
+    def extend(self, points):
+        """Add all the given points at the end of the buffer."""
+        for point in points:
+            self.append(point)
+
+    def peek(self, count=None):
+        """Return up to C{count} of the oldest points, without removing them.
+
+        @param count: The maximum number of points to return, or C{None}
+            for all of them.
+        """
+        if count is None or count > self._length:
+            count = self._length
+        return [
+            self._get((self._start + position) % self.capacity)
+            for position in range(count)
+        ]
+
+    def pop(self, count=None):
+        """Remove and return up to C{count} of the oldest points.
+
+        @param count: The maximum number of points to return, or C{None}
+            for all of them.
+        """
+        points = self.peek(count)
+        self._start = (self._start + len(points)) % self.capacity
+        self._length -= len(points)
+        if not self._length:
+            self._start = 0
+        return points
+
+    def clear(self):
+        """Remove all the points from the buffer."""
+        self._start = 0
+        self._length = 0
+
+    def _get(self, index):
+        return tuple(column[index] for column in self._columns)
+
+    def _set(self, index, point, weight):
+        for column, value in zip(self._columns, point):
+            column[index] = value
+        self._weights[index] = weight
+
+    def _compact(self):
+        """Merge pairs of points in the oldest half of the buffer."""
+        capacity = self.capacity
+        pairs = self._length // 4 or 1
+        merged = []
+        for pair in range(pairs):
+            first = (self._start + 2 * pair) % capacity
+            second = (first + 1) % capacity
+            merged.append(self._merge(first, second))
+        kept = self.peek()[2 * pairs :]
+        kept_weights = [
+            self._weights[(self._start + position) % capacity]
+            for position in range(2 * pairs, self._length)
+        ]
+        self._start = 0
+        self._length = 0
+        for point, weight in merged:
+            self._set(self._length, point, weight)
+            self._length += 1
+        for point, weight in zip(kept, kept_weights):
+            self._set(self._length, point, weight)
+            self._length += 1
+
+    def _merge(self, first, second):
+        first_weight = self._weights[first]
+        second_weight = self._weights[second]
+        weight = first_weight + second_weight
+        point = [self._columns[0][second]]
+        for column, integral in zip(self._columns[1:], self._integral[1:]):
+            value = (
+                column[first] * first_weight + column[second] * second_weight
+            ) / weight
+            point.append(int(value) if integral else value)
+        return point, weight
+
+
+class KeyedTimeSeriesBuffer:
+    """A set of L{TimeSeriesBuffer}s, one per key.
+
+    This is used for data points that are collected for several entities
+    at once, like network interfaces or mount points, since only points
+    of the same entity can be averaged together.
+    """
+
+    def __init__(self, typecodes, capacity=DEFAULT_CAPACITY, downsample=True):
+        self._typecodes = typecodes
+        self._capacity = capacity
+        self._downsample = downsample
+        self._buffers = {}
+
+    def __len__(self):
+        return sum(len(buffer) for buffer in self._buffers.values())
+
+    def __contains__(self, key):
+        return key in self._buffers
+
+    def __getitem__(self, key):
+        return self._buffers[key]
+
+    def keys(self):
+        return self._buffers.keys()
+
+    def items(self):
+        return self._buffers.items()
+
+    def get_buffer(self, key):
+        """Return the buffer for the given C{key}, creating it if needed."""
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = TimeSeriesBuffer(
+                self._typecodes,
+                capacity=self._capacity,
+                downsample=self._downsample,
+            )
+            self._buffers[key] = buffer
+        return buffer
+
+    def append(self, key, point):
+        """Add a new point for the given C{key}."""
+        self.get_buffer(key).append(point)
+
+    def pop(self, count=None):
+        """Remove and return up to C{count} of the oldest points.
+
+        @return: A list of C{(key, point)} tuples, in timestamp order.
+        """
+        streams = [
+            [(key, point) for point in buffer.peek(count)]
+            for key, buffer in self._buffers.items()
+        ]
+        points = list(merge(*streams, key=lambda item: item[1][0]))
+        if count is not None:
+            points = points[:count]
+        for key, _ in points:
+            self._buffers[key].pop(1)
+        return points
+
+    def discard(self, key):
+        """Forget all the points of the given C{key}."""
+        self._buffers.pop(key, None)
@@ -1,9 +1,13 @@
 """Deployment code for the sysinfo tool."""
 
+import json
 import os
 import sys
+import tempfile
+import time
 from logging import Formatter
 from logging import getLogger
+from logging import INFO
 from logging.handlers import RotatingFileHandler
 
 from twisted.internet.defer import Deferred
@@ -75,13 +79,58 @@ class SysInfoConfiguration(BaseConfiguration):
             help="Maximum width for each column of output.",
         )
 
+        parser.add_argument(
+            "--plugin-timeout",
+            type=float,
+            default=0,
+            metavar="SECONDS",
+            help="Run the plugins in parallel, leaving out the ones that "
+            "take longer than SECONDS. The default is 0, which runs the "
+            "plugins one after the other without a time limit.",
+        )
+
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=0,
+            metavar="SECONDS",
+            help="Run the plugins in parallel, leaving out the ones still "
+            "running after SECONDS. The default is 0, for no time limit.",
+        )
+
+        parser.add_argument(
+            "--cache-ttl",
+            type=int,
+            default=0,
+            metavar="SECONDS",
+            help="Show the information saved by a previous run if it's "
+            "less than SECONDS old, instead of collecting it again. The "
+            "default is 0, which disables the cache.",
+        )
+
+        parser.add_argument(
+            "--cache-file",
+            metavar="FILE",
+            help="The file the collected information is cached in. The "
+            "default is sysinfo-cache.json in the data path.",
+        )
+
+        parser.add_argument(
+            "--refresh-cache",
+            action="store_true",
+            default=False,
+            help="Collect the information and save it to the cache file, "
+            "without displaying it.",
+        )
+
         parser.epilog = "Default plugins: {}".format(", ".join(ALL_PLUGINS))
         return parser
 
     def get_plugin_names(self, plugin_spec):
         return [x.strip() for x in plugin_spec.split(",")]
 
-    def get_plugins(self):
+    def get_enabled_plugin_names(self):
+        """Return the names of the plugins to run, in order."""
         if self.sysinfo_plugins is None:
             include = ALL_PLUGINS
         else:
@@ -90,14 +139,22 @@ class SysInfoConfiguration(BaseConfiguration):
             exclude = []
         else:
             exclude = self.get_plugin_names(self.exclude_sysinfo_plugins)
-        plugins = [x for x in include if x not in exclude]
+        return [x for x in include if x not in exclude]
+
+    def get_plugins(self):
         return [
             namedClass(
                 f"landscape.sysinfo.{plugin_name.lower()}.{plugin_name}",
             )()
-            for plugin_name in plugins
+            for plugin_name in self.get_enabled_plugin_names()
         ]
 
+    @property
+    def cache_filename(self):
+        if self.cache_file is not None:
+            return self.cache_file
+        return os.path.join(self.data_path, "sysinfo-cache.json")
+
 
 def get_landscape_log_directory(landscape_dir=None):
     """
@@ -116,6 +173,7 @@ def setup_logging(landscape_dir=None):
     landscape_dir = get_landscape_log_directory(landscape_dir)
     logger = getLogger("landscape-sysinfo")
     logger.propagate = False
+    logger.setLevel(INFO)
     if not os.path.isdir(landscape_dir):
         os.mkdir(landscape_dir)
     log_filename = os.path.join(landscape_dir, "sysinfo.log")
@@ -128,6 +186,95 @@ def setup_logging(landscape_dir=None):
     handler.setFormatter(Formatter("%(asctime)s %(levelname)-8s %(message)s"))
 
 
+def load_config(args):
+    config = SysInfoConfiguration()
+    # landscape-sysinfo needs to work where there's no
+    # /etc/landscape/client.conf See lp:1293990
+    config.load(args, accept_nonexistent_default_config=True)
+    return config
+
+
+def load_cache(config, get_time=time.time):
+    """Return the information cached by a previous run, if still valid.
+
+    The cache is only valid if it's less than C{config.cache_ttl} seconds
+    old, and if it was collected by the same plugins that are enabled now.
+
+    @return: A C{dict} with C{headers}, C{notes} and C{footnotes} keys, or
+        C{None} if there's no valid cache.
+    """
+    if config.cache_ttl <= 0:
+        return None
+    try:
+        with open(config.cache_filename) as cache_file:
+            age = get_time() - os.fstat(cache_file.fileno()).st_mtime
+            if not 0 <= age < config.cache_ttl:
+                return None
+            cache = json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+    if cache.get("plugins") != config.get_enabled_plugin_names():
+        return None
+    return cache
+
+
+def save_cache(config, sysinfo):
+    """Save the information collected by C{sysinfo} to the cache file."""
+    cache = {
+        "plugins": config.get_enabled_plugin_names(),
+        "headers": sysinfo.get_headers(),
+        "notes": sysinfo.get_notes(),
+        "footnotes": sysinfo.get_footnotes(),
+    }
+    filename = config.cache_filename
+    temporary_filename = None
+    try:
+        # Many logins may refresh an expired cache at the same time, so each
+        # of them writes its own temporary file.
+        fd, temporary_filename = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(filename)),
+        )
+        with os.fdopen(fd, "w") as cache_file:
+            json.dump(cache, cache_file)
+        os.chmod(temporary_filename, 0o644)
+        os.rename(temporary_filename, filename)
+    except OSError as e:
+        if temporary_filename is not None and os.path.exists(
+            temporary_filename,
+        ):
+            os.unlink(temporary_filename)
+        getLogger("landscape-sysinfo").warning(
+            f"Couldn't save the sysinfo cache to {filename}: {e}",
+        )
+
+
+def print_cached(args):
+    """Print the cached information, if the cache is enabled and valid.
+
+    This is the fast path of C{landscape-sysinfo}, used before anything
+    else is set up: it neither loads the plugins nor needs a reactor.
+
+    @return: C{True} if the cached information was printed, C{False} if it
+        must be collected again with L{run}.
+    """
+    config = load_config(args)
+    if config.refresh_cache:
+        return False
+    cache = load_cache(config)
+    if cache is None:
+        return False
+    print(
+        format_sysinfo(
+            [tuple(header) for header in cache["headers"]],
+            cache["notes"],
+            cache["footnotes"],
+            width=config.width,
+            indent="  ",
+        ),
+    )
+    return True
+
+
 def run(args, reactor=None, sysinfo=None):
     """
     @param reactor: The reactor to (optionally) run the sysinfo plugins in.
@@ -139,14 +286,15 @@ def run(args, reactor=None, sysinfo=None):
 
     if sysinfo is None:
         sysinfo = SysInfoPluginRegistry()
-    config = SysInfoConfiguration()
-    # landscape-sysinfo needs to work where there's no
-    # /etc/landscape/client.conf See lp:1293990
-    config.load(args, accept_nonexistent_default_config=True)
+    config = load_config(args)
     for plugin in config.get_plugins():
         sysinfo.add(plugin)
 
     def show_output(result):
+        if config.cache_ttl > 0 or config.refresh_cache:
+            save_cache(config, sysinfo)
+        if config.refresh_cache:
+            return
         print(
             format_sysinfo(
                 sysinfo.get_headers(),
@@ -158,7 +306,15 @@ def run(args, reactor=None, sysinfo=None):
         )
 
     def run_sysinfo():
-        return sysinfo.run().addCallback(show_output)
+        if reactor is not None and (config.plugin_timeout or config.timeout):
+            result = sysinfo.run_in_threads(
+                reactor,
+                plugin_timeout=config.plugin_timeout or None,
+                timeout=config.timeout or None,
+            )
+        else:
+            result = sysinfo.run()
+        return result.addCallback(show_output)
 
     if reactor is not None:
         # In case any plugins run processes or do other things that require the
@@ -25,6 +25,9 @@ def usage(info):
 
 
 class Disk:
+    # statvfs blocks for as long as a hung network mount is unreachable.
+    run_in_thread = True
+
     def __init__(self, mounts_file="/proc/mounts", statvfs=os.statvfs):
         self._mounts_file = mounts_file
         self._statvfs = statvfs
@@ -15,6 +15,10 @@ class Network:
         about network interfaces.  Defaults to L{get_active_device_info}.
     """
 
+    # Reading the interfaces and default routes can be slow on hosts with
+    # many interfaces.
+    run_in_thread = True
+
     def __init__(self, get_device_info=None):
         if get_device_info is None:
             get_device_info = partial(
@@ -4,6 +4,9 @@ from twisted.internet.defer import succeed
 
 
 class Processes:
+    # Walking /proc is slow with many processes.
+    run_in_thread = True
+
     def __init__(self, proc_dir="/proc"):
         self._proc_dir = proc_dir
 
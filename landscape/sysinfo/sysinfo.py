@@ -1,8 +1,12 @@
 import math
 import os
 import textwrap
+import threading
+import time
 from logging import getLogger
 
+from twisted.internet.defer import Deferred
+from twisted.internet.defer import maybeDeferred
 from twisted.python.failure import Failure
 
 from landscape.lib.log import log_failure
@@ -34,15 +38,21 @@ class SysInfoPluginRegistry(PluginRegistry):
     contain eventual information, such as warnings of high temperatures,
     and low disk space.  Finally, footnotes contain pointers to further
     information such as URLs.
+
+    @ivar timings: The time in seconds each plugin took to run during the
+        last L{run} or L{run_in_threads}, keyed by plugin name.
     """
 
-    def __init__(self):
+    def __init__(self, get_time=time.monotonic):
         super().__init__()
         self._header_index = {}
         self._headers = []
         self._notes = []
         self._footnotes = []
         self._plugin_error = False
+        self._get_time = get_time
+        self._recording = threading.local()
+        self.timings = {}
 
     def add_header(self, name, value):
         """Add a new information header to be displayed to the user.
@@ -54,6 +64,8 @@ class SysInfoPluginRegistry(PluginRegistry):
         explored to create a deterministic ordering even when dealing
         with values obtained asynchornously.
         """
+        if self._record("add_header", name, value):
+            return
         index = self._header_index.get(name)
         if index is None:
             self._header_index[name] = len(self._headers)
@@ -73,6 +85,8 @@ class SysInfoPluginRegistry(PluginRegistry):
 
     def add_note(self, note):
         """Add a new eventual note to be shown up to the administrator."""
+        if self._record("add_note", note):
+            return
         self._notes.append(note)
 
     def get_notes(self):
@@ -81,6 +95,8 @@ class SysInfoPluginRegistry(PluginRegistry):
 
     def add_footnote(self, note):
         """Add a new footnote to be shown up to the administrator."""
+        if self._record("add_footnote", note):
+            return
         self._footnotes.append(note)
 
     def get_footnotes(self):
@@ -93,16 +109,171 @@ class SysInfoPluginRegistry(PluginRegistry):
         This will call the run() method on each of the registered plugins,
         and return a deferred which aggregates each resulting deferred.
         """
+        self.timings = {}
         deferreds = []
         for plugin in self.get_plugins():
+            started = self._get_time()
             try:
                 result = plugin.run()
             except Exception:
                 self._log_plugin_error(Failure(), plugin)
+                self._record_timing(None, plugin, started)
             else:
                 result.addErrback(self._log_plugin_error, plugin)
+                result.addCallback(self._record_timing, plugin, started)
                 deferreds.append(result)
-        return gather_results(deferreds).addCallback(self._report_error_note)
+        result = gather_results(deferreds)
+        result.addCallback(self._report_error_note)
+        return result.addCallback(self._log_timings)
+
+    def run_in_threads(self, reactor, plugin_timeout=None, timeout=None):
+        """Run all plugins in parallel, leaving out the ones that are late.
+
+        Plugins with a true C{run_in_thread} attribute, which block on I/O,
+        are each run in their own daemon thread, so that a hung one delays
+        neither the others nor the exit of the process.  The other plugins
+        are run in the reactor thread, like L{run} does.
+
+        What the threaded plugins add to the registry is only kept once they
+        are all done, in the order of the plugins and after what the other
+        plugins added, so that the output is stable.  A plugin still running
+        after C{plugin_timeout} seconds, or C{timeout} seconds after the
+        start, is left out with a note.
+
+        @param reactor: The Twisted reactor, used for the deadlines and to
+            collect the results of the threads.
+        @param plugin_timeout: The seconds each plugin has to run, or
+            C{None} for no limit.
+        @param timeout: The seconds all the plugins have to run, or C{None}
+            for no limit.
+        """
+        self.timings = {}
+        started = self._get_time()
+        outputs = {}
+        late = []
+        pending = {}
+
+        def give_up(plugin):
+            done, call = pending.pop(plugin)
+            if call is not None and call.active():
+                call.cancel()
+            late.append(plugin)
+            done.callback(None)
+
+        def finish(result, plugin):
+            if plugin in pending:
+                done, call = pending.pop(plugin)
+                if call is not None:
+                    call.cancel()
+                done.callback(None)
+
+        def give_up_all():
+            for plugin in [p for p in self.get_plugins() if p in pending]:
+                give_up(plugin)
+
+        deferreds = []
+        for plugin in self.get_plugins():
+            plugin_started = self._get_time()
+            if getattr(plugin, "run_in_thread", False):
+                result = self._run_in_thread(reactor, plugin, outputs)
+            else:
+                result = maybeDeferred(plugin.run)
+            result.addErrback(self._log_plugin_error, plugin)
+            result.addCallback(self._record_timing, plugin, plugin_started)
+            done = Deferred()
+            call = None
+            if plugin_timeout is not None:
+                call = reactor.callLater(plugin_timeout, give_up, plugin)
+            pending[plugin] = (done, call)
+            result.addCallback(finish, plugin)
+            deferreds.append(done)
+
+        if timeout is not None and pending:
+            overall = reactor.callLater(timeout, give_up_all)
+        else:
+            overall = None
+
+        def collect(result):
+            if overall is not None and overall.active():
+                overall.cancel()
+            for plugin in self.get_plugins():
+                if plugin in outputs and plugin not in late:
+                    for method, args in outputs[plugin]:
+                        getattr(self, method)(*args)
+            if late:
+                self._report_late_plugins(late, started)
+            return result
+
+        result = gather_results(deferreds).addCallback(collect)
+        result.addCallback(self._report_error_note)
+        return result.addCallback(self._log_timings)
+
+    def _run_in_thread(self, reactor, plugin, outputs):
+        """Run C{plugin} in a new daemon thread.
+
+        @return: A deferred firing in the reactor thread once the plugin is
+            done, after what it added is stored in C{outputs}.
+        """
+        result = Deferred()
+
+        def done(calls, failure):
+            outputs[plugin] = calls
+            if failure is None:
+                result.callback(None)
+            else:
+                result.errback(failure)
+
+        def work():
+            self._recording.calls = calls = []
+            failures = []
+            try:
+                maybeDeferred(plugin.run).addErrback(failures.append)
+            finally:
+                del self._recording.calls
+            reactor.callFromThread(done, calls, (failures or [None])[0])
+
+        thread = threading.Thread(
+            target=work,
+            name=f"sysinfo-{plugin.__class__.__name__}",
+            daemon=True,
+        )
+        thread.start()
+        return result
+
+    def _record(self, method, *args):
+        """Record a call made by a plugin running in a thread.
+
+        @return: C{True} if the call was recorded, to be replayed later in
+            the reactor thread, C{False} if it should be performed now.
+        """
+        calls = getattr(self._recording, "calls", None)
+        if calls is None:
+            return False
+        calls.append((method, args))
+        return True
+
+    def _record_timing(self, result, plugin, started):
+        self.timings[plugin.__class__.__name__] = self._get_time() - started
+        return result
+
+    def _log_timings(self, result):
+        timings = ", ".join(
+            f"{name} {seconds:.3f}s" for name, seconds in self.timings.items()
+        )
+        getLogger("landscape-sysinfo").info(f"Plugin run times: {timings}")
+        return result
+
+    def _report_late_plugins(self, late, started):
+        elapsed = self._get_time() - started
+        names = ", ".join(plugin.__class__.__name__ for plugin in late)
+        getLogger("landscape-sysinfo").warning(
+            f"Plugins still running after {elapsed:.3f}s were left out: "
+            f"{names}",
+        )
+        self.add_note(
+            "Some information was left out, as it took too long to "
+            f"collect: {names}.",
+        )
 
     def _log_plugin_error(self, failure, plugin):
         self._plugin_error = True
@@ -4,6 +4,9 @@ from landscape.lib.sysstats import get_thermal_zones
 
 
 class Temperature:
+    # Some thermal zone drivers are slow to read.
+    run_in_thread = True
+
     def __init__(self, thermal_zone_path=None):
         self._thermal_zone_path = thermal_zone_path
 
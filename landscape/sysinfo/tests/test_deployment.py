@@ -1,3 +1,4 @@
+import json
 import os
 import unittest
 from logging import getLogger
@@ -13,7 +14,11 @@ from landscape.lib.testing import StandardIOHelper
 from landscape.lib.testing import TwistedTestCase
 from landscape.sysinfo.deployment import ALL_PLUGINS
 from landscape.sysinfo.deployment import get_landscape_log_directory
+from landscape.sysinfo.deployment import load_cache
+from landscape.sysinfo.deployment import load_config
+from landscape.sysinfo.deployment import print_cached
 from landscape.sysinfo.deployment import run
+from landscape.sysinfo.deployment import save_cache
 from landscape.sysinfo.deployment import setup_logging
 from landscape.sysinfo.deployment import SysInfoConfiguration
 from landscape.sysinfo.landscapelink import LandscapeLink
@@ -60,6 +65,33 @@ class DeploymentTest(ConfigTestCase, unittest.TestCase):
         self.assertEqual(len(plugins), 1)
         self.assertTrue(isinstance(plugins[0], Load))
 
+    def test_get_enabled_plugin_names(self):
+        self.configuration.load(
+            [
+                "--sysinfo-plugins",
+                "Load,Disk,TestPlugin",
+                "--exclude-sysinfo-plugins",
+                "Disk",
+                "-d",
+                self.makeDir(),
+            ],
+        )
+        self.assertEqual(
+            ["Load", "TestPlugin"],
+            self.configuration.get_enabled_plugin_names(),
+        )
+
+    def test_cache_filename(self):
+        """The cache file is in the data path by default."""
+        data_path = self.makeDir()
+        self.configuration.load(["-d", data_path])
+        self.assertEqual(
+            os.path.join(data_path, "sysinfo-cache.json"),
+            self.configuration.cache_filename,
+        )
+        self.configuration.load(["--cache-file", "/tmp/cache"])
+        self.assertEqual("/tmp/cache", self.configuration.cache_filename)
+
     def test_config_file(self):
         filename = self.makeFile()
         create_text_file(filename, "[sysinfo]\nsysinfo_plugins = TestPlugin\n")
@@ -212,6 +244,34 @@ class RunTest(
         )
         return d
 
+    def test_plugin_timeout_runs_plugins_in_threads(self):
+        """
+        With a plugin timeout, the plugins are run in parallel with
+        L{SysInfoPluginRegistry.run_in_threads}.
+        """
+        reactor = FakeReactor()
+        sysinfo = SysInfoPluginRegistry()
+        sysinfo.run_in_threads = mock.Mock(return_value=Deferred())
+        run(
+            [
+                "--sysinfo-plugins",
+                "TestPlugin",
+                "--plugin-timeout",
+                "1.5",
+                "--timeout",
+                "3",
+            ],
+            reactor=reactor,
+            sysinfo=sysinfo,
+        )
+        for x in reactor.queued_calls:
+            x()
+        sysinfo.run_in_threads.assert_called_once_with(
+            reactor,
+            plugin_timeout=1.5,
+            timeout=3,
+        )
+
     def test_stop_scheduled_in_callback(self):
         """
         Because of tm:3011, reactor.stop() must be called in a scheduled call.
@@ -244,6 +304,170 @@ class RunTest(
         self.assertEqual(reactor.scheduled_calls, [(0, reactor.stop, (), {})])
         return self.assertFailure(d, ZeroDivisionError)
 
+    def test_cache_disabled_by_default(self):
+        cache_file = self.makeFile()
+        run(["--sysinfo-plugins", "TestPlugin", "--cache-file", cache_file])
+        self.assertFalse(os.path.exists(cache_file))
+        self.assertFalse(
+            print_cached(
+                [
+                    "--sysinfo-plugins",
+                    "TestPlugin",
+                    "--cache-file",
+                    cache_file,
+                ],
+            ),
+        )
+
+    def test_cached_output(self):
+        """
+        With a cache TTL, the collected information is saved and displayed
+        again by L{print_cached} without running the plugins.
+        """
+        args = [
+            "--sysinfo-plugins",
+            "TestPlugin",
+            "--cache-ttl",
+            "60",
+            "--cache-file",
+            self.makeFile(),
+        ]
+        run(args)
+        output = self.stdout.getvalue()
+        self.stdout.truncate(0)
+        self.stdout.seek(0)
+
+        with mock.patch.object(SysInfoConfiguration, "get_plugins") as get:
+            self.assertTrue(print_cached(args))
+        get.assert_not_called()
+        self.assertEqual(output, self.stdout.getvalue())
+
+    def test_refresh_cache(self):
+        """
+        With C{--refresh-cache} the information is saved but not displayed,
+        and the cache is never used.
+        """
+        args = [
+            "--sysinfo-plugins",
+            "TestPlugin",
+            "--cache-ttl",
+            "60",
+            "--cache-file",
+            self.makeFile(),
+        ]
+        run(args + ["--refresh-cache"])
+        self.assertEqual("", self.stdout.getvalue())
+        self.assertFalse(print_cached(args + ["--refresh-cache"]))
+        self.assertTrue(print_cached(args))
+        self.assertIn("Test note", self.stdout.getvalue())
+
+    def test_expired_cache(self):
+        cache_file = self.makeFile()
+        config = load_config(
+            [
+                "--sysinfo-plugins",
+                "TestPlugin",
+                "--cache-ttl",
+                "60",
+                "--cache-file",
+                cache_file,
+            ],
+        )
+        run(
+            [
+                "--sysinfo-plugins",
+                "TestPlugin",
+                "--refresh-cache",
+                "--cache-file",
+                cache_file,
+            ],
+        )
+        mtime = os.stat(cache_file).st_mtime
+        self.assertIsNotNone(load_cache(config, lambda: mtime + 59))
+        self.assertIsNone(load_cache(config, lambda: mtime + 60))
+        self.assertIsNone(load_cache(config, lambda: mtime - 1))
+
+    def test_cache_of_other_plugins(self):
+        """The cache isn't used if it was made with different plugins."""
+        cache_file = self.makeFile()
+        run(
+            [
+                "--sysinfo-plugins",
+                "TestPlugin",
+                "--refresh-cache",
+                "--cache-file",
+                cache_file,
+            ],
+        )
+        config = load_config(
+            [
+                "--sysinfo-plugins",
+                "Load,TestPlugin",
+                "--cache-ttl",
+                "60",
+                "--cache-file",
+                cache_file,
+            ],
+        )
+        self.assertIsNone(load_cache(config))
+
+    def test_corrupted_cache(self):
+        cache_file = self.makeFile("{not json")
+        config = load_config(
+            ["--cache-ttl", "60", "--cache-file", cache_file],
+        )
+        self.assertIsNone(load_cache(config))
+
+    def test_save_cache_error(self):
+        """Failing to save the cache doesn't prevent the output."""
+        cache_file = os.path.join(self.makeDir(), "missing", "cache")
+        run(
+            [
+                "--sysinfo-plugins",
+                "TestPlugin",
+                "--cache-ttl",
+                "60",
+                "--cache-file",
+                cache_file,
+            ],
+        )
+        self.assertIn("Test note", self.stdout.getvalue())
+
+    def test_save_cache_concurrently(self):
+        """
+        Concurrent writers of the cache each write their own temporary file,
+        which is then renamed to the cache file.
+        """
+        directory = self.makeDir()
+        cache_file = os.path.join(directory, "cache")
+        config = load_config(["--cache-ttl", "60", "--cache-file", cache_file])
+        sysinfo = SysInfoPluginRegistry()
+        sysinfo.add_note("Test note")
+        dump = json.dump
+        temporary_filenames = []
+
+        def dump_concurrently(cache, cache_file):
+            temporary_filenames.append(cache_file.name)
+            if len(temporary_filenames) == 1:
+                save_cache(config, sysinfo)
+            dump(cache, cache_file)
+
+        with mock.patch("json.dump", side_effect=dump_concurrently):
+            save_cache(config, sysinfo)
+
+        self.assertEqual(2, len(set(temporary_filenames)))
+        self.assertEqual(["cache"], os.listdir(directory))
+        self.assertEqual(["Test note"], load_cache(config)["notes"])
+
+    def test_save_cache_error_removes_temporary_file(self):
+        directory = self.makeDir()
+        config = load_config(
+            ["--cache-file", os.path.join(directory, "cache")],
+        )
+        with mock.patch("os.rename", side_effect=OSError("rename failed")):
+            save_cache(config, SysInfoPluginRegistry())
+        self.assertEqual([], os.listdir(directory))
+
     def test_get_landscape_log_directory_unprivileged(self):
         """
         If landscape-sysinfo is running as a non-privileged user the
@@ -1,12 +1,16 @@
 import os
+import threading
 import unittest
 from logging import getLogger
+from logging import INFO
 from logging import StreamHandler
+from queue import Queue
 from unittest import mock
 
 from twisted.internet.defer import Deferred
 from twisted.internet.defer import fail
 from twisted.internet.defer import succeed
+from twisted.internet.task import Clock
 
 from landscape.lib.compat import StringIO
 from landscape.lib.plugin import PluginRegistry
@@ -254,6 +258,188 @@ class SysInfoPluginRegistryTest(HelperTestCase):
         )
 
 
+class ThreadClock(Clock):
+    """A L{Clock} queueing the calls made from other threads."""
+
+    def __init__(self):
+        super().__init__()
+        self.thread_calls = Queue()
+
+    def callFromThread(self, f, *args, **kwargs):  # noqa: N802
+        self.thread_calls.put((f, args, kwargs))
+
+    def run_thread_call(self):
+        """Wait for a call from another thread, and run it."""
+        f, args, kwargs = self.thread_calls.get(timeout=5)
+        f(*args, **kwargs)
+
+
+class HeaderPlugin:
+    run_in_thread = True
+
+    def __init__(self, name, event=None):
+        self.name = name
+        self.event = event
+
+    def register(self, registry):
+        self.registry = registry
+
+    def run(self):
+        if self.event is not None:
+            self.event.wait(5)
+        self.registry.add_header(self.name, "value")
+        return succeed(None)
+
+
+class RunInThreadsTest(HelperTestCase):
+    def setUp(self):
+        super().setUp()
+        self.reactor = ThreadClock()
+        self.sysinfo = SysInfoPluginRegistry()
+        self.sysinfo_logfile = StringIO()
+        self.handler = StreamHandler(self.sysinfo_logfile)
+        self.logger = getLogger("landscape-sysinfo")
+        self.logger.addHandler(self.handler)
+        self.addCleanup(self.logger.setLevel, self.logger.level)
+        self.logger.setLevel(INFO)
+
+    def tearDown(self):
+        super().tearDown()
+        self.logger.removeHandler(self.handler)
+
+    def test_run_in_threads(self):
+        """
+        Blocking plugins are run in threads, and what they add is kept in
+        the order of the plugins, whichever finishes first.
+        """
+        event = threading.Event()
+        self.sysinfo.add(HeaderPlugin("Slow", event))
+        self.sysinfo.add(HeaderPlugin("Fast"))
+        result = self.sysinfo.run_in_threads(self.reactor)
+        self.reactor.run_thread_call()
+        self.assertFalse(result.called)
+        self.assertEqual([], self.sysinfo.get_headers())
+        event.set()
+        self.reactor.run_thread_call()
+        self.assertTrue(result.called)
+        self.assertEqual(
+            [("Slow", "value"), ("Fast", "value")],
+            self.sysinfo.get_headers(),
+        )
+        self.assertEqual(["HeaderPlugin"], list(self.sysinfo.timings))
+
+    def test_run_in_threads_with_reactor_plugins(self):
+        """
+        Plugins without a true C{run_in_thread} attribute are run in the
+        reactor thread.
+        """
+        plugin = HeaderPlugin("Reactor")
+        plugin.run_in_thread = False
+        self.sysinfo.add(plugin)
+        result = self.sysinfo.run_in_threads(self.reactor)
+        self.assertTrue(result.called)
+        self.assertEqual([("Reactor", "value")], self.sysinfo.get_headers())
+
+    def test_plugin_timeout(self):
+        """
+        Plugins running for longer than the plugin timeout are left out,
+        and a note mentions them.
+        """
+        event = threading.Event()
+        self.addCleanup(event.set)
+        self.sysinfo.add(HeaderPlugin("Slow", event))
+        self.sysinfo.add(HeaderPlugin("Fast"))
+        result = self.sysinfo.run_in_threads(self.reactor, plugin_timeout=2)
+        self.reactor.run_thread_call()
+        self.reactor.advance(2)
+        self.assertTrue(result.called)
+        self.assertEqual([("Fast", "value")], self.sysinfo.get_headers())
+        self.assertEqual(
+            [
+                "Some information was left out, as it took too long to "
+                "collect: HeaderPlugin.",
+            ],
+            self.sysinfo.get_notes(),
+        )
+        self.assertIn(
+            "were left out: HeaderPlugin",
+            self.sysinfo_logfile.getvalue(),
+        )
+
+        # The late plugin finishing doesn't change anything.
+        event.set()
+        self.reactor.run_thread_call()
+        self.assertEqual([("Fast", "value")], self.sysinfo.get_headers())
+
+    def test_timeout(self):
+        """
+        Plugins still running once the overall timeout expires are left
+        out, including the ones running in the reactor thread.
+        """
+
+        class HangingPlugin:
+            def register(self, registry):
+                pass
+
+            def run(self):
+                return Deferred()
+
+        self.sysinfo.add(HangingPlugin())
+        self.sysinfo.add(HeaderPlugin("Fast"))
+        result = self.sysinfo.run_in_threads(
+            self.reactor,
+            plugin_timeout=10,
+            timeout=5,
+        )
+        self.reactor.run_thread_call()
+        self.reactor.advance(5)
+        self.assertTrue(result.called)
+        self.assertEqual([("Fast", "value")], self.sysinfo.get_headers())
+        self.assertIn("HangingPlugin", self.sysinfo.get_notes()[0])
+        self.assertEqual([], self.reactor.getDelayedCalls())
+
+    def test_deadlines_cancelled(self):
+        """No timers are left behind once all the plugins are done."""
+        self.sysinfo.add(HeaderPlugin("Fast"))
+        result = self.sysinfo.run_in_threads(
+            self.reactor,
+            plugin_timeout=10,
+            timeout=5,
+        )
+        self.reactor.run_thread_call()
+        self.assertTrue(result.called)
+        self.assertEqual([], self.reactor.getDelayedCalls())
+        self.assertEqual([], self.sysinfo.get_notes())
+
+    def test_thread_errors_logged(self):
+        self.log_helper.ignore_errors(ZeroDivisionError)
+
+        class BadPlugin(HeaderPlugin):
+            def run(self):
+                1 / 0
+
+        self.sysinfo.add(BadPlugin("Bad"))
+        result = self.sysinfo.run_in_threads(self.reactor)
+        self.reactor.run_thread_call()
+        self.assertTrue(result.called)
+        log = self.sysinfo_logfile.getvalue()
+        self.assertIn("BadPlugin plugin raised an exception.", log)
+        self.assertIn("ZeroDivisionError", log)
+        self.assertEqual(1, len(self.sysinfo.get_notes()))
+
+    def test_timings_logged(self):
+        """The time each plugin took to run is logged."""
+        times = iter([0, 1, 3.5])
+        sysinfo = SysInfoPluginRegistry(get_time=lambda: next(times))
+        sysinfo.add(HeaderPlugin("Test"))
+        sysinfo.run()
+        self.assertEqual({"HeaderPlugin": 1}, sysinfo.timings)
+        self.assertIn(
+            "Plugin run times: HeaderPlugin 1.000s",
+            self.sysinfo_logfile.getvalue(),
+        )
+
+
 class FormatTest(unittest.TestCase):
     def test_no_headers(self):
         output = format_sysinfo([])